@@ -2,12 +2,12 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from datetime import timedelta
-from django.db.models import F
+from django.db.models import Count, Q
 from django.utils import timezone
 from django.urls import reverse
 
 from orders.models import Order
-from stock.models import StockItem
+from stock.services.stock_health import stock_health
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -99,16 +99,7 @@ def dashboard_stats(request, format=None):
     if date_to:
         orders = orders.filter(order_date__date__lte=date_to)
 
-    active_stock = StockItem.objects.filter(is_active=True)
-
-    out_of_stock = active_stock.filter(available_stock_in_mtr=0).count()
-    low_stock = active_stock.filter(
-        available_stock_in_mtr__gt=0,
-        available_stock_in_mtr__lte=F('minimum_stock_level'),
-    ).count()
-    in_stock = active_stock.filter(
-        available_stock_in_mtr__gt=F('minimum_stock_level')
-    ).count()
+    stock = stock_health()
 
     return Response({
         'filters': {
@@ -116,21 +107,21 @@ def dashboard_stats(request, format=None):
             'date_from': date_from,
             'date_to': date_to,
         },
-        'orders': {
-            'total': orders.count(),
-            'new': orders.filter(order_status=Order.STATUS_NEW).count(),
-            'label_printed': orders.filter(order_status=Order.STATUS_LABEL_PRINTED).count(),
-            'in_progress': orders.filter(order_status=Order.STATUS_IN_PROGRESS).count(),
-            'completed': orders.filter(order_status=Order.STATUS_COMPLETED).count(),
-            'shipped': orders.filter(order_status=Order.STATUS_SHIPPED).count(),
-            'cancelled': orders.filter(order_status=Order.STATUS_CANCELLED).count(),
-        },
+        'orders': orders.aggregate(
+            total=Count('pk'),
+            new=Count('pk', filter=Q(order_status=Order.STATUS_NEW)),
+            label_printed=Count('pk', filter=Q(order_status=Order.STATUS_LABEL_PRINTED)),
+            in_progress=Count('pk', filter=Q(order_status=Order.STATUS_IN_PROGRESS)),
+            completed=Count('pk', filter=Q(order_status=Order.STATUS_COMPLETED)),
+            shipped=Count('pk', filter=Q(order_status=Order.STATUS_SHIPPED)),
+            cancelled=Count('pk', filter=Q(order_status=Order.STATUS_CANCELLED)),
+        ),
         'stock': {
-            'total_items': StockItem.objects.count(),
-            'active_items': active_stock.count(),
-            'in_stock': in_stock,
-            'low_stock': low_stock,
-            'out_of_stock': out_of_stock,
-            'inactive': StockItem.objects.filter(is_active=False).count(),
+            'total_items': stock['total_items'],
+            'active_items': stock['active_items'],
+            'in_stock': stock['in_stock'],
+            'low_stock': stock['low_stock'],
+            'out_of_stock': stock['out_of_stock'],
+            'inactive': stock['inactive_items'],
         },
     })
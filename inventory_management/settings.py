@@ -173,6 +173,23 @@ CORS_ALLOW_CREDENTIALS = True
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Shipping label files: set to x-accel-redirect (nginx) or x-sendfile (Apache/lighttpd)
+# to let the web server send label bodies instead of Django.
+SHIPPING_LABEL_SENDFILE = os.environ.get('SHIPPING_LABEL_SENDFILE', '').strip().lower()
+SHIPPING_LABEL_ACCEL_REDIRECT_PREFIX = os.environ.get('SHIPPING_LABEL_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+
+# Stock item responses embed only this many of the latest movements; the full
+# history is paged from /api/v1/stock/<sku>/movements/.
+STOCK_RECENT_MOVEMENTS_LIMIT = int(os.environ.get('STOCK_RECENT_MOVEMENTS_LIMIT', '10'))
+# Rows written per transaction by the stock spreadsheet import.
+STOCK_IMPORT_CHUNK_SIZE = int(os.environ.get('STOCK_IMPORT_CHUNK_SIZE', '500'))
+# Stock KPIs are cached until the next stock write, and at most this long.
+STOCK_HEALTH_CACHE_SECONDS = int(os.environ.get('STOCK_HEALTH_CACHE_SECONDS', '300'))
+# Zones in the order pickers walk them (comma separated); other zones follow alphabetically.
+PICK_WALK_ZONE_ORDER = os.environ.get('PICK_WALK_ZONE_ORDER', '')
+# Batch pick lists are cached until the batch's orders change, and at most this long.
+PICK_LIST_CACHE_SECONDS = int(os.environ.get('PICK_LIST_CACHE_SECONDS', '300'))
+
 # JWT Settings
 from datetime import timedelta
 
@@ -240,6 +257,10 @@ ROYAL_MAIL_OAUTH_TOKEN_URL = os.environ.get(
     '',
 )
 ROYAL_MAIL_OAUTH_SCOPE = os.environ.get('ROYAL_MAIL_OAUTH_SCOPE', '')
+ROYAL_MAIL_OAUTH_BACKGROUND_REFRESH = os.environ.get(
+    'ROYAL_MAIL_OAUTH_BACKGROUND_REFRESH',
+    'false',
+).strip().lower() in {'1', 'true', 'yes', 'on'}
 ROYAL_MAIL_DEFAULT_PACKAGE_FORMAT = os.environ.get('ROYAL_MAIL_DEFAULT_PACKAGE_FORMAT', 'Parcel')
 ROYAL_MAIL_DEFAULT_WEIGHT_GRAMS = int(os.environ.get('ROYAL_MAIL_DEFAULT_WEIGHT_GRAMS', '100'))
 ROYAL_MAIL_CREATE_LABEL_IN_RESPONSE = os.environ.get(
@@ -250,6 +271,10 @@ ROYAL_MAIL_REPLACE_UNPOSTAGED_ORDERS = os.environ.get(
     'ROYAL_MAIL_REPLACE_UNPOSTAGED_ORDERS',
     'true',
 ).strip().lower() in {'1', 'true', 'yes', 'on'}
+ROYAL_MAIL_BULK_CHUNK_SIZE = int(os.environ.get('ROYAL_MAIL_BULK_CHUNK_SIZE', '100'))
+ROYAL_MAIL_LABEL_FETCH_WORKERS = int(os.environ.get('ROYAL_MAIL_LABEL_FETCH_WORKERS', '4'))
+ROYAL_MAIL_SHIPPING_PROFILE_TTL_SECONDS = int(os.environ.get('ROYAL_MAIL_SHIPPING_PROFILE_TTL_SECONDS', '3600'))
+ROYAL_MAIL_BOOKING_CONCURRENCY = int(os.environ.get('ROYAL_MAIL_BOOKING_CONCURRENCY', '4'))
 ROYAL_MAIL_LABEL_DOCUMENT_TYPE = os.environ.get('ROYAL_MAIL_LABEL_DOCUMENT_TYPE', 'postageLabel')
 ROYAL_MAIL_LABEL_INCLUDE_RETURNS_LABEL = os.environ.get(
     'ROYAL_MAIL_LABEL_INCLUDE_RETURNS_LABEL',
@@ -260,6 +285,12 @@ ROYAL_MAIL_LABEL_INCLUDE_CN = os.environ.get(
     'false',
 ).strip().lower() in {'1', 'true', 'yes', 'on'}
 
+# Shared courier HTTP transport (Royal Mail, DPD, Tiaknight)
+COURIER_HTTP_MAX_RETRIES = int(os.environ.get('COURIER_HTTP_MAX_RETRIES', '2'))
+COURIER_HTTP_BACKOFF_SECONDS = float(os.environ.get('COURIER_HTTP_BACKOFF_SECONDS', '0.5'))
+COURIER_HTTP_MAX_BACKOFF_SECONDS = float(os.environ.get('COURIER_HTTP_MAX_BACKOFF_SECONDS', '10'))
+COURIER_HTTP_POOL_MAXSIZE = int(os.environ.get('COURIER_HTTP_POOL_MAXSIZE', '10'))
+
 # DPD Shipping API
 DPD_INTEGRATION_ENABLED = os.environ.get(
     'DPD_INTEGRATION_ENABLED',
@@ -275,7 +306,9 @@ DPD_API_SECRET = os.environ.get('DPD_API_SECRET', '')
 DPD_API_TOKEN = os.environ.get('DPD_API_TOKEN', '')
 DPD_CUSTOMER_ID = os.environ.get('DPD_CUSTOMER_ID', '')
 DPD_BU_CODE = os.environ.get('DPD_BU_CODE', '')
+DPD_TOKEN_DEFAULT_TTL_SECONDS = int(os.environ.get('DPD_TOKEN_DEFAULT_TTL_SECONDS', '3600'))
 DPD_DEFAULT_SERVICE_CODE = os.environ.get('DPD_DEFAULT_SERVICE_CODE', '')
+DPD_BOOKING_CONCURRENCY = int(os.environ.get('DPD_BOOKING_CONCURRENCY', '2'))
 DPD_DEFAULT_SERVICE_ELEMENT_CODES = [
     value.strip()
     for value in os.environ.get('DPD_DEFAULT_SERVICE_ELEMENT_CODES', '').split(',')
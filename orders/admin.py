@@ -1,6 +1,10 @@
 from django.contrib import admin
+from django.utils import timezone
 from django.utils.html import format_html
-from .models import Order, OrderItem, OrderBatch, OrderBatchOrder, OrderStatusHistory, RoyalMailOAuthToken
+from .models import (
+    Order, OrderItem, OrderBatch, OrderBatchOrder, OrderStatusHistory, RoyalMailOAuthToken, ImporterStatus,
+    DPDAccessToken, BackgroundJob,
+)
 
 
 class OrderItemInline(admin.TabularInline):
@@ -383,3 +387,79 @@ class RoyalMailOAuthTokenAdmin(admin.ModelAdmin):
         if len(value) <= 8:
             return '********'
         return f"{value[:4]}...{value[-4:]}"
+
+
+@admin.register(DPDAccessToken)
+class DPDAccessTokenAdmin(admin.ModelAdmin):
+    """Admin view for the cached DPD access token."""
+
+    list_display = ['id', 'expires_at', 'is_expired_display', 'refreshed_at', 'refresh_locked_until', 'updated_at']
+    readonly_fields = [
+        'credential_key', 'masked_access_token', 'expires_at', 'raw_response', 'refreshed_at',
+        'refresh_lock_owner', 'refresh_locked_until', 'created_at', 'updated_at',
+    ]
+    fields = readonly_fields
+    actions = ['expire_tokens']
+
+    def has_add_permission(self, request):
+        return False
+
+    def masked_access_token(self, obj):
+        value = obj.access_token
+        if not value:
+            return ''
+        if len(value) <= 8:
+            return '********'
+        return f"{value[:4]}...{value[-4:]}"
+    masked_access_token.short_description = 'Access token'
+
+    def is_expired_display(self, obj):
+        return obj.is_expired
+    is_expired_display.boolean = True
+    is_expired_display.short_description = 'Expired'
+
+    def expire_tokens(self, request, queryset):
+        updated = queryset.update(expires_at=timezone.now())
+        self.message_user(request, f'{updated} DPD token(s) expired; the next booking fetches a new one.')
+    expire_tokens.short_description = 'Expire selected tokens'
+
+
+@admin.register(ImporterStatus)
+class ImporterStatusAdmin(admin.ModelAdmin):
+    """Admin view for scheduled importer run state."""
+
+    list_display = [
+        'source', 'last_result', 'last_started_at', 'last_duration_seconds',
+        'consecutive_failures', 'next_run_at', 'lock_owner', 'locked_until',
+    ]
+    list_filter = ['source', 'last_result']
+    readonly_fields = [
+        'source', 'last_started_at', 'last_finished_at', 'last_duration_seconds',
+        'last_result', 'last_error', 'last_counts', 'last_success_at',
+        'consecutive_failures', 'run_count', 'failure_count', 'skipped_count', 'last_skipped_at',
+        'created_at', 'updated_at',
+    ]
+    fields = readonly_fields + ['lock_owner', 'locked_until', 'next_run_at']
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(admin.ModelAdmin):
+    """Admin view for queued background jobs and their per-item outcomes."""
+
+    list_display = [
+        'id', 'job_type', 'status', 'processed_count', 'total_count',
+        'failed_count', 'created_by', 'created_at', 'finished_at',
+    ]
+    list_filter = ['job_type', 'status']
+    readonly_fields = [
+        'job_type', 'params', 'total_count', 'processed_count', 'succeeded_count',
+        'failed_count', 'skipped_count', 'results', 'error', 'attempts',
+        'created_by', 'started_at', 'finished_at', 'created_at', 'updated_at',
+    ]
+    fields = readonly_fields + ['status', 'lock_owner', 'locked_until']
+
+    def has_add_permission(self, request):
+        return False
@@ -30,6 +30,11 @@ class EbayConfig:
     
     # Order sync settings
     DAYS_TO_FETCH = config('EBAY_DAYS_TO_FETCH', default=30, cast=int)  # How many days back to fetch orders
+    ACCOUNT = config('EBAY_ACCOUNT', default='default')  # Key for the per-account ModTime watermark
+    ENTRIES_PER_PAGE = config('EBAY_ENTRIES_PER_PAGE', default=100, cast=int)  # GetOrders maximum is 100
+    PAGE_WORKERS = config('EBAY_PAGE_WORKERS', default=4, cast=int)  # Concurrent GetOrders page requests
+    MOD_TIME_OVERLAP_MINUTES = config('EBAY_MOD_TIME_OVERLAP_MINUTES', default=5, cast=int)
+    MAX_MOD_TIME_DAYS = 30  # eBay rejects ModTimeFrom older than 30 days
     
     @classmethod
     def get_api_domain(cls):
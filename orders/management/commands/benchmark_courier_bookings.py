@@ -0,0 +1,127 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.services.booking_benchmark import SCENARIO_CHOICES, BookingBenchmark
+from orders.services.courier_simulator import CourierSimulator
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark Royal Mail/DPD booking and the Tiaknight import end to end against the local '
+        'courier simulator, reporting throughput and p50/p95/p99 latency.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenarios',
+            default=','.join(SCENARIO_CHOICES),
+            help=f"Comma-separated scenarios to run (default: {','.join(SCENARIO_CHOICES)}).",
+        )
+        parser.add_argument('--orders', type=int, default=20, help='Orders booked per booking scenario.')
+        parser.add_argument('--concurrency', type=int, default=1, help='Bookings in flight at once.')
+        parser.add_argument('--tiaknight-fetches', type=int, default=5, help='Tiaknight import runs.')
+        parser.add_argument(
+            '--simulator-url',
+            default='',
+            help='Use an already running run_courier_simulator instead of starting one in-process.',
+        )
+        parser.add_argument('--latency-ms', type=float, default=50)
+        parser.add_argument('--jitter-ms', type=float, default=20)
+        parser.add_argument('--error-rate', type=float, default=0.0)
+        parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+        parser.add_argument('--orders-per-fetch', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--username', default='', help='User the bookings are made as (default: first superuser).')
+        parser.add_argument('--keep-data', action='store_true', help='Keep the orders the benchmark created.')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+
+    def handle(self, *args, **options):
+        scenarios = [name.strip() for name in options['scenarios'].split(',') if name.strip()]
+        unknown = [name for name in scenarios if name not in SCENARIO_CHOICES]
+        if unknown or not scenarios:
+            raise CommandError(
+                f"Unknown scenario(s): {', '.join(unknown) or '-'}. Choose from: {', '.join(SCENARIO_CHOICES)}"
+            )
+
+        benchmark = BookingBenchmark(
+            self._user(options['username']),
+            orders=options['orders'],
+            concurrency=options['concurrency'],
+            tiaknight_fetches=options['tiaknight_fetches'],
+            keep_data=options['keep_data'],
+        )
+
+        simulator = None
+        simulator_url = options['simulator_url'].rstrip('/')
+        if not simulator_url:
+            simulator = CourierSimulator(
+                latency_ms=options['latency_ms'],
+                jitter_ms=options['jitter_ms'],
+                error_rate=options['error_rate'],
+                rate_limit_rate=options['rate_limit_rate'],
+                orders_per_fetch=options['orders_per_fetch'],
+                order_ref_prefix=f'SIM{benchmark.run_id}',
+                seed=options['seed'],
+            ).start()
+            simulator_url = simulator.url
+
+        try:
+            results = benchmark.run(simulator_url, scenarios)
+        finally:
+            if simulator is not None:
+                simulator.stop()
+
+        report = {
+            'simulator_url': simulator_url,
+            'orders': benchmark.orders,
+            'concurrency': benchmark.concurrency,
+            'results': results,
+            'transport': benchmark.transport_metrics(),
+            'simulator': simulator.stats() if simulator is not None else None,
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self._write_report(report)
+
+    def _user(self, username):
+        User = get_user_model()
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist as exc:
+                raise CommandError(f'User {username} does not exist') from exc
+        user = User.objects.filter(is_superuser=True, is_active=True).order_by('id').first()
+        if user is None:
+            raise CommandError('No active superuser found; pass --username.')
+        return user
+
+    def _write_report(self, report):
+        self.stdout.write(
+            f"Simulator {report['simulator_url']} | {report['orders']} orders per booking scenario "
+            f"| concurrency {report['concurrency']}"
+        )
+        self.stdout.write(
+            f"{'scenario':<12} {'ops':>5} {'failed':>6} {'ops/s':>8} "
+            f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}"
+        )
+        for row in report['results']:
+            self.stdout.write(
+                f"{row['scenario']:<12} {row['operations']:>5} {row['failed']:>6} "
+                f"{row['throughput_per_second']:>8} {row['p50_ms']:>8} {row['p95_ms']:>8} "
+                f"{row['p99_ms']:>8} {row['max_ms']:>8}"
+            )
+            if 'orders_imported' in row:
+                self.stdout.write(
+                    f"{'':<12} {row['orders_imported']} orders imported, {row['orders_per_second']} orders/s"
+                )
+            for error in row['errors']:
+                self.stdout.write(self.style.WARNING(f'  {error}'))
+
+        for host, metrics in report['transport'].items():
+            self.stdout.write(
+                f"HTTP {host}: {metrics['requests']} requests, {metrics['retries']} retries, "
+                f"{metrics['errors']} errors, avg {metrics['avg_seconds']}s"
+            )
@@ -1,6 +1,8 @@
 from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
 
+from orders.models import ImporterStatus
+from orders.services.import_scheduler import acquire_importer_lock, release_importer_lock
 from orders.services.remote_tiaknight_import import (
     RemoteTiaknightConfigError,
     RemoteTiaknightFetchError,
@@ -16,6 +18,13 @@ class Command(BaseCommand):
         started_at = timezone.localtime()
         self.stdout.write(f"[{started_at:%Y-%m-%d %H:%M:%S %Z}] Remote Tiaknight import started.")
 
+        lock_owner = f'import_remote_tiaknight_orders:{started_at:%Y%m%d%H%M%S%f}'
+        if not acquire_importer_lock(ImporterStatus.SOURCE_TIAKNIGHT, lock_owner):
+            self.stdout.write(self.style.WARNING(
+                f"[{started_at:%Y-%m-%d %H:%M:%S %Z}] Another Tiaknight import is still running; skipped."
+            ))
+            return
+
         try:
             result = import_remote_tiaknight_orders(user=None)
         except (
@@ -27,6 +36,8 @@ class Command(BaseCommand):
             failed_at = timezone.localtime()
             self.stderr.write(f"[{failed_at:%Y-%m-%d %H:%M:%S %Z}] Remote Tiaknight import failed: {exc}")
             raise CommandError(str(exc)) from exc
+        finally:
+            release_importer_lock(ImporterStatus.SOURCE_TIAKNIGHT, lock_owner)
 
         completed_at = timezone.localtime()
         self.stdout.write(self.style.SUCCESS(
@@ -0,0 +1,72 @@
+import io
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from orders.services.payload_archive import PayloadArchiveError, TiaknightPayloadArchive
+from orders.services.xml_parser import XMLOrderParser
+
+
+class Command(BaseCommand):
+    help = 'List archived Tiaknight payloads or replay one through the XML order parser.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--request-id', default=None, help='Tiaknight RequestID of the payload to replay')
+        parser.add_argument('--order-ref', default=None, help='Replay the newest payload containing this order ref')
+        parser.add_argument('--dir', default=None, help='Archive directory (default: TIA_RAW_PAYLOAD_DIR)')
+        parser.add_argument('--list', action='store_true', help='List archived payloads instead of replaying')
+        parser.add_argument('--print', action='store_true', help='Print the payload XML instead of importing it')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Run the import and roll it back, reporting what would be created.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            archive = TiaknightPayloadArchive.from_env(options['dir'])
+        except PayloadArchiveError as exc:
+            raise CommandError(str(exc)) from exc
+
+        if options['list']:
+            for entry in archive.entries():
+                self.stdout.write(
+                    f"{entry.get('archived_at')} request_id={entry.get('request_id') or '-'} "
+                    f"segment={entry['segment']} offset={entry['offset']} "
+                    f"size={entry.get('size')} refs={','.join(entry.get('order_refs') or []) or '-'}"
+                )
+            return
+
+        if not options['request_id'] and not options['order_ref']:
+            raise CommandError('Pass --request-id or --order-ref (or --list).')
+
+        try:
+            entry = archive.find(request_id=options['request_id'], order_ref=options['order_ref'])
+            payload = archive.read_entry(entry)
+        except PayloadArchiveError as exc:
+            raise CommandError(str(exc)) from exc
+
+        if options['print']:
+            self.stdout.write(payload)
+            return
+
+        dry_run = options['dry_run']
+        try:
+            with transaction.atomic():
+                result = XMLOrderParser().parse_and_create_orders(
+                    io.BytesIO(payload.encode('utf-8')),
+                    user=None,
+                )
+                if dry_run:
+                    transaction.set_rollback(True)
+        except ValueError as exc:
+            raise CommandError(str(exc)) from exc
+
+        mode = 'Dry run replay' if dry_run else 'Replay'
+        self.stdout.write(self.style.SUCCESS(
+            f"{mode} of request_id={entry.get('request_id') or '-'} complete."
+        ))
+        self.stdout.write(f"orders_created: {result['created_count']}")
+        self.stdout.write(f"orders_failed: {result['failed_count']}")
+        for error in result['errors'][:10]:
+            self.stdout.write(f'  {error}')
@@ -0,0 +1,61 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from orders.services.courier_simulator import CourierSimulator
+
+
+class Command(BaseCommand):
+    help = 'Serve a local Royal Mail / DPD / Tiaknight stand-in for load testing without live courier APIs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency-ms', type=float, default=50, help='Mean response delay per request.')
+        parser.add_argument('--jitter-ms', type=float, default=20, help='Uniform +/- spread around the mean delay.')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with HTTP 503.')
+        parser.add_argument(
+            '--rate-limit-rate',
+            type=float,
+            default=0.0,
+            help='Fraction of requests answered with HTTP 429 (Retry-After: 0).',
+        )
+        parser.add_argument('--orders-per-fetch', type=int, default=5, help='Orders returned by each GetNewOrders call.')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for repeatable latency and faults.')
+
+    def handle(self, *args, **options):
+        simulator = CourierSimulator(
+            options['host'],
+            options['port'],
+            latency_ms=options['latency_ms'],
+            jitter_ms=options['jitter_ms'],
+            error_rate=options['error_rate'],
+            rate_limit_rate=options['rate_limit_rate'],
+            orders_per_fetch=options['orders_per_fetch'],
+            seed=options['seed'],
+        )
+        endpoints = simulator.endpoints
+        self.stdout.write(self.style.SUCCESS(f'Courier simulator listening on {simulator.url}'))
+        self.stdout.write('Point a WIMS instance at it with:')
+        self.stdout.write(f"  ROYAL_MAIL_API_BASE_URL={endpoints['royal_mail_base_url']}")
+        self.stdout.write(f"  DPD_API_BASE_URL={endpoints['dpd_base_url']}")
+        self.stdout.write(f"  DPD_TOKEN_URL={endpoints['dpd_token_url']}")
+        self.stdout.write(f"  TIA_URL={endpoints['tiaknight_url']}")
+
+        def stop(*args):
+            # shutdown() blocks until serve_forever returns, so run it off the main thread.
+            threading.Thread(target=simulator.httpd.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        try:
+            simulator.serve_forever()
+        finally:
+            simulator.httpd.server_close()
+        stats = simulator.stats()
+        self.stdout.write('Requests served:')
+        for route, count in sorted(stats['requests'].items()):
+            self.stdout.write(f'  {route}: {count}')
+        for fault, count in sorted(stats['faults'].items()):
+            self.stdout.write(f'  fault {fault}: {count}')
@@ -0,0 +1,88 @@
+import os
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.models import ImporterStatus
+from orders.services.import_scheduler import (
+    DEFAULT_BACKOFF_SECONDS,
+    DEFAULT_LOCK_TTL_SECONDS,
+    DEFAULT_MAX_BACKOFF_SECONDS,
+    ImportScheduler,
+    default_sources,
+)
+
+
+class Command(BaseCommand):
+    help = 'Run the Tiaknight and eBay order importers on a schedule in one long-lived process.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sources',
+            default=os.environ.get('IMPORTER_SOURCES', ImporterStatus.SOURCE_TIAKNIGHT),
+            help='Comma-separated importer sources to schedule (tiaknight, ebay).',
+        )
+        parser.add_argument(
+            '--tiaknight-interval',
+            type=int,
+            default=int(os.environ.get('IMPORTER_TIAKNIGHT_INTERVAL_SECONDS', '3600')),
+            help='Seconds between Tiaknight imports (default: 3600).',
+        )
+        parser.add_argument(
+            '--ebay-interval',
+            type=int,
+            default=int(os.environ.get('IMPORTER_EBAY_INTERVAL_SECONDS', '3600')),
+            help='Seconds between eBay imports (default: 3600).',
+        )
+        parser.add_argument(
+            '--backoff',
+            type=int,
+            default=int(os.environ.get('IMPORTER_BACKOFF_SECONDS', DEFAULT_BACKOFF_SECONDS)),
+            help='First retry delay after a Tiaknight fetch error; doubles per consecutive failure.',
+        )
+        parser.add_argument(
+            '--max-backoff',
+            type=int,
+            default=int(os.environ.get('IMPORTER_MAX_BACKOFF_SECONDS', DEFAULT_MAX_BACKOFF_SECONDS)),
+            help='Upper bound for the retry delay.',
+        )
+        parser.add_argument(
+            '--lock-ttl',
+            type=int,
+            default=int(os.environ.get('IMPORTER_LOCK_TTL_SECONDS', DEFAULT_LOCK_TTL_SECONDS)),
+            help='Seconds before a lock left by a crashed run is considered stale.',
+        )
+        parser.add_argument('--poll', type=int, default=5, help='Seconds between schedule checks.')
+        parser.add_argument('--once', action='store_true', help='Run every due importer once and exit.')
+
+    def handle(self, *args, **options):
+        available = default_sources(
+            tiaknight_interval_seconds=options['tiaknight_interval'],
+            ebay_interval_seconds=options['ebay_interval'],
+        )
+        names = [name.strip() for name in options['sources'].split(',') if name.strip()]
+        unknown = [name for name in names if name not in available]
+        if unknown or not names:
+            raise CommandError(
+                f"Unknown importer source(s): {', '.join(unknown) or '-'}. "
+                f"Choose from: {', '.join(available)}"
+            )
+
+        scheduler = ImportScheduler(
+            [available[name] for name in names],
+            poll_seconds=options['poll'],
+            stdout=self.stdout,
+            lock_ttl_seconds=options['lock_ttl'],
+            backoff_seconds=options['backoff'],
+            max_backoff_seconds=options['max_backoff'],
+        )
+
+        if options['once']:
+            scheduler.run_pending()
+            return
+
+        signal.signal(signal.SIGTERM, scheduler.stop)
+        signal.signal(signal.SIGINT, scheduler.stop)
+        self.stdout.write(self.style.SUCCESS(f"Importer scheduler started for: {', '.join(names)}"))
+        scheduler.run_forever()
+        self.stdout.write('Importer scheduler stopped.')
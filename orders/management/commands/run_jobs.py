@@ -0,0 +1,55 @@
+import os
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.models import BackgroundJob
+from orders.services.jobs import DEFAULT_LOCK_TTL_SECONDS, JobRunner, load_job_handlers
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (e.g. batch shipment booking) in one long-lived worker process.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--job-types',
+            default=os.environ.get('JOB_RUNNER_TYPES', ''),
+            help='Comma-separated job types to run (default: all).',
+        )
+        parser.add_argument(
+            '--lock-ttl',
+            type=int,
+            default=int(os.environ.get('JOB_LOCK_TTL_SECONDS', DEFAULT_LOCK_TTL_SECONDS)),
+            help='Seconds without progress before a running job is considered abandoned and re-queued.',
+        )
+        parser.add_argument('--poll', type=int, default=2, help='Seconds between queue checks.')
+        parser.add_argument('--once', action='store_true', help='Run every queued job once and exit.')
+
+    def handle(self, *args, **options):
+        load_job_handlers()
+        available = dict(BackgroundJob.TYPE_CHOICES)
+        job_types = [name.strip() for name in options['job_types'].split(',') if name.strip()]
+        unknown = [name for name in job_types if name not in available]
+        if unknown:
+            raise CommandError(
+                f"Unknown job type(s): {', '.join(unknown)}. Choose from: {', '.join(available)}"
+            )
+
+        runner = JobRunner(
+            job_types=job_types or None,
+            poll_seconds=options['poll'],
+            ttl_seconds=options['lock_ttl'],
+            stdout=self.stdout,
+        )
+
+        if options['once']:
+            runner.run_pending()
+            return
+
+        signal.signal(signal.SIGTERM, runner.stop)
+        signal.signal(signal.SIGINT, runner.stop)
+        self.stdout.write(self.style.SUCCESS(
+            f"Job runner started for: {', '.join(job_types) or 'all job types'}"
+        ))
+        runner.run_forever()
+        self.stdout.write('Job runner stopped.')
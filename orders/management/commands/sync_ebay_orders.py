@@ -5,15 +5,17 @@ Usage:
     python manage.py sync_ebay_orders
     python manage.py sync_ebay_orders --days=7
     python manage.py sync_ebay_orders --status=Active
+    python manage.py sync_ebay_orders --full
+
+Without --days, orders modified since the last successful sync (the per-account
+ModTime watermark) are fetched. The first run, --days and --full use a CreateTime window.
 """
 from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth import get_user_model
 from orders.services.ebay_service import EbayService
 from orders.ebay_config import EbayConfig
-import logging
 
 User = get_user_model()
-logger = logging.getLogger(__name__)
 
 
 class Command(BaseCommand):
@@ -42,6 +44,12 @@ class Command(BaseCommand):
             default=None,
             help='Username to associate with the sync (default: None)'
         )
+        
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Ignore the ModTime watermark and fetch the whole --days window'
+        )
     
     def handle(self, *args, **options):
         """Execute the command"""
@@ -71,69 +79,50 @@ class Command(BaseCommand):
         
         # Display sync parameters
         days_text = days if days else EbayConfig.DAYS_TO_FETCH
-        self.stdout.write(f'Fetching orders from last {days_text} days')
+        if options['full'] or days:
+            self.stdout.write(f'Fetching orders from last {days_text} days')
+        else:
+            self.stdout.write('Fetching orders modified since the last sync (full window on first run)')
         self.stdout.write(f'Order status filter: {status}')
         
         try:
             # Initialize eBay service
             ebay_service = EbayService()
             
-            # Fetch orders from eBay
             self.stdout.write(self.style.NOTICE('Fetching orders from eBay...'))
-            ebay_orders = ebay_service.fetch_orders(days_back=days, order_status=status)
-            
-            if not ebay_orders:
-                self.stdout.write(self.style.WARNING('No orders found in the specified date range'))
-                return
-            
-            self.stdout.write(f'Found {len(ebay_orders)} orders from eBay')
-            
-            # Sync each order to database
-            created_count = 0
-            skipped_count = 0
-            error_count = 0
+            result = ebay_service.sync_orders(
+                days_back=days,
+                order_status=status,
+                user=user,
+                incremental=not options['full'],
+            )
             
-            for ebay_order in ebay_orders:
-                order_id = ebay_order.get('OrderID', 'Unknown')
-                
-                try:
-                    order, created = ebay_service.sync_order_to_db(ebay_order, user=user)
-                    
-                    if created:
-                        created_count += 1
-                        self.stdout.write(
-                            self.style.SUCCESS(
-                                f'✓ Created order {order.order_number} (eBay: {order_id})'
-                            )
-                        )
-                    else:
-                        skipped_count += 1
-                        self.stdout.write(
-                            self.style.WARNING(
-                                f'⊘ Skipped order {order_id} (already exists as {order.order_number})'
-                            )
-                        )
-                
-                except Exception as e:
-                    error_count += 1
-                    self.stdout.write(
-                        self.style.ERROR(
-                            f'✗ Error processing order {order_id}: {str(e)}'
-                        )
+            for error in result['errors']:
+                self.stdout.write(
+                    self.style.ERROR(
+                        f"✗ Error processing order {error['order_id']}: {error['error']}"
                     )
-                    logger.exception(f'Error syncing eBay order {order_id}')
+                )
             
             # Summary
             self.stdout.write('')
             self.stdout.write(self.style.SUCCESS('=== Sync Summary ==='))
-            self.stdout.write(f'Total orders found: {len(ebay_orders)}')
-            self.stdout.write(self.style.SUCCESS(f'Created: {created_count}'))
-            self.stdout.write(self.style.WARNING(f'Skipped: {skipped_count}'))
+            self.stdout.write(f"Mode: {result['mode']}")
+            if result['mod_time_from']:
+                self.stdout.write(f"Modified since: {result['mod_time_from']:%Y-%m-%d %H:%M:%S %Z}")
+            self.stdout.write(f"Pages fetched: {result['pages_fetched']} in {result['fetch_seconds']}s")
+            self.stdout.write(f"Total orders found: {result['fetched_count']}")
+            self.stdout.write(self.style.SUCCESS(f"Created: {result['created_count']}"))
+            self.stdout.write(f"Updated: {result['updated_count']}")
+            self.stdout.write(self.style.WARNING(f"Skipped: {result['skipped_count']}"))
             
-            if error_count > 0:
-                self.stdout.write(self.style.ERROR(f'Errors: {error_count}'))
+            if result['error_count'] > 0:
+                self.stdout.write(self.style.ERROR(f"Errors: {result['error_count']}"))
             else:
-                self.stdout.write(f'Errors: {error_count}')
+                self.stdout.write(f"Errors: {result['error_count']}")
+            self.stdout.write(f"Total time: {result['total_seconds']}s")
+            if result['mod_time_watermark']:
+                self.stdout.write(f"Watermark: {result['mod_time_watermark']:%Y-%m-%d %H:%M:%S %Z}")
             
             self.stdout.write('')
             self.stdout.write(self.style.SUCCESS('eBay order sync completed!'))
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-19 07:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0011_order_shipping_label_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImporterStatus',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('tiaknight', 'Tiaknight'), ('ebay', 'eBay')], max_length=30, unique=True)),
+                ('lock_owner', models.CharField(blank=True, default='', max_length=120)),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+                ('last_started_at', models.DateTimeField(blank=True, null=True)),
+                ('last_finished_at', models.DateTimeField(blank=True, null=True)),
+                ('last_duration_seconds', models.FloatField(blank=True, null=True)),
+                ('last_result', models.CharField(blank=True, choices=[('SUCCESS', 'Success'), ('FAILED', 'Failed'), ('SKIPPED', 'Skipped')], default='', max_length=20)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('last_counts', models.JSONField(blank=True, default=dict)),
+                ('last_success_at', models.DateTimeField(blank=True, null=True)),
+                ('next_run_at', models.DateTimeField(blank=True, null=True)),
+                ('consecutive_failures', models.PositiveIntegerField(default=0)),
+                ('run_count', models.PositiveIntegerField(default=0)),
+                ('failure_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Importer Status',
+                'verbose_name_plural': 'Importer Statuses',
+                'db_table': 'importer_statuses',
+                'ordering': ['source'],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-19 07:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0012_importer_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EbaySyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account', models.CharField(max_length=100, unique=True)),
+                ('mod_time_watermark', models.DateTimeField(blank=True, help_text='ModTimeTo of the last fully synced GetOrders window', null=True)),
+                ('last_synced_at', models.DateTimeField(blank=True, null=True)),
+                ('last_pages_fetched', models.PositiveIntegerField(default=0)),
+                ('last_orders_fetched', models.PositiveIntegerField(default=0)),
+                ('last_duration_seconds', models.FloatField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'eBay Sync State',
+                'verbose_name_plural': 'eBay Sync States',
+                'db_table': 'ebay_sync_states',
+                'ordering': ['account'],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-19 09:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0013_ebay_sync_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DPDAccessToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('credential_key', models.CharField(help_text='SHA-256 of the token URL and API key the token was issued for', max_length=64, unique=True)),
+                ('access_token', models.TextField(blank=True, default='')),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+                ('raw_response', models.JSONField(blank=True, default=dict)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+                ('refresh_lock_owner', models.CharField(blank=True, default='', max_length=120)),
+                ('refresh_locked_until', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'DPD Access Token',
+                'verbose_name_plural': 'DPD Access Tokens',
+                'db_table': 'dpd_access_tokens',
+                'ordering': ['-updated_at'],
+            },
+        ),
+    ]
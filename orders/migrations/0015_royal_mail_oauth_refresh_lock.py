@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 09:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0014_dpd_access_token'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='royalmailoauthtoken',
+            name='refresh_lock_owner',
+            field=models.CharField(blank=True, default='', max_length=120),
+        ),
+        migrations.AddField(
+            model_name='royalmailoauthtoken',
+            name='refresh_locked_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
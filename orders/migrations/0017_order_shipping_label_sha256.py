@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0016_background_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='shipping_label_sha256',
+            field=models.CharField(blank=True, default='', help_text='SHA-256 of the stored label PDF, used as its storage key and ETag', max_length=64),
+        ),
+    ]
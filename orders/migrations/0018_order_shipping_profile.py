@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0017_order_shipping_label_sha256'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='shipping_profile',
+            field=models.JSONField(blank=True, default=dict, help_text='Cached item-derived shipping facts (weight, fleece rule); cleared when items change'),
+        ),
+    ]
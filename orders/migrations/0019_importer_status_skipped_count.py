@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-19 09:38
+
+from django.db import migrations, models
+
+
+def clear_skipped_results(apps, schema_editor):
+    # Skips are counted in skipped_count now; SKIPPED is no longer a result.
+    ImporterStatus = apps.get_model('orders', 'ImporterStatus')
+    ImporterStatus.objects.filter(last_result='SKIPPED').update(last_result='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0018_order_shipping_profile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importerstatus',
+            name='last_skipped_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='importerstatus',
+            name='skipped_count',
+            field=models.PositiveIntegerField(default=0, help_text='Runs skipped because another run held the lock'),
+        ),
+        migrations.RunPython(clear_skipped_results, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='importerstatus',
+            name='last_result',
+            field=models.CharField(blank=True, choices=[('SUCCESS', 'Success'), ('FAILED', 'Failed')], default='', max_length=20),
+        ),
+    ]
@@ -159,7 +159,15 @@ class Order(models.Model):
         max_length=500, blank=True, null=True,
         help_text="Stored printable carrier label file path under MEDIA_ROOT"
     )
+    shipping_label_sha256 = models.CharField(
+        max_length=64, blank=True, default='',
+        help_text="SHA-256 of the stored label PDF, used as its storage key and ETag"
+    )
     shipping_label_downloaded_at = models.DateTimeField(blank=True, null=True)
+    shipping_profile = models.JSONField(
+        default=dict, blank=True,
+        help_text="Cached item-derived shipping facts (weight, fleece rule); cleared when items change"
+    )
     
     # Notes and Additional Info
     customer_notes = models.TextField(blank=True, null=True,
@@ -217,23 +225,7 @@ class Order(models.Model):
     def save(self, *args, **kwargs):
         """Auto-generate order number if not provided"""
         if not self.order_number:
-            # Generate order number: ORD-YYYYMMDD-XXXX
-            from django.db.models import Max
-            today = timezone.now().date()
-            prefix = f"ORD-{today.strftime('%Y%m%d')}"
-            
-            # Get last order number for today
-            last_order = Order.all_objects.filter(
-                order_number__startswith=prefix
-            ).aggregate(Max('order_number'))
-            
-            if last_order['order_number__max']:
-                last_num = int(last_order['order_number__max'].split('-')[-1])
-                new_num = last_num + 1
-            else:
-                new_num = 1
-            
-            self.order_number = f"{prefix}-{new_num:04d}"
+            self.order_number = self.generate_order_numbers(1)[0]
         
         # Calculate total if not set
         if not self.total_amount or self.total_amount == 0:
@@ -241,6 +233,25 @@ class Order(models.Model):
         
         super().save(*args, **kwargs)
     
+    @classmethod
+    def generate_order_numbers(cls, count):
+        """Return the next ``count`` order numbers for today: ORD-YYYYMMDD-XXXX"""
+        from django.db.models import Max
+        today = timezone.now().date()
+        prefix = f"ORD-{today.strftime('%Y%m%d')}"
+        
+        # Get last order number for today
+        last_order = cls.all_objects.filter(
+            order_number__startswith=prefix
+        ).aggregate(Max('order_number'))
+        
+        if last_order['order_number__max']:
+            last_num = int(last_order['order_number__max'].split('-')[-1])
+        else:
+            last_num = 0
+        
+        return [f"{prefix}-{last_num + offset:04d}" for offset in range(1, count + 1)]
+    
     def calculate_totals(self):
         """Calculate order totals from order items"""
         items = self.items.all()
@@ -255,6 +266,29 @@ class Order(models.Model):
         # Calculate total
         self.total_amount = self.subtotal + self.tax_amount + self.shipping_cost - self.discount_amount
     
+    @classmethod
+    def invalidate_shipping_profiles(cls, order_ids):
+        """Clear cached shipping profiles so the next booking recomputes them from items."""
+        order_ids = [order_id for order_id in order_ids if order_id]
+        if order_ids:
+            cls.all_objects.filter(id__in=order_ids).exclude(shipping_profile={}).update(shipping_profile={})
+
+    @classmethod
+    def invalidate_pick_lists(cls, order_ids):
+        """Drop the cached pick lists of every batch holding one of these orders."""
+        from orders.services.pick_list import invalidate_pick_list
+
+        order_ids = [order_id for order_id in order_ids if order_id]
+        if not order_ids:
+            return
+        batch_ids = (
+            OrderBatchOrder.objects.filter(order_id__in=order_ids)
+            .values_list('batch_id', flat=True)
+            .distinct()
+        )
+        for batch_id in batch_ids:
+            invalidate_pick_list(batch_id)
+
     def soft_delete(self, user=None):
         """Soft delete the order"""
         self.is_deleted = True
@@ -262,6 +296,7 @@ class Order(models.Model):
         if user:
             self.deleted_by = user
         self.save()
+        Order.invalidate_pick_lists([self.pk])
     
     def restore(self):
         """Restore soft deleted order"""
@@ -269,9 +304,11 @@ class Order(models.Model):
         self.deleted_at = None
         self.deleted_by = None
         self.save()
+        Order.invalidate_pick_lists([self.pk])
     
     def hard_delete(self):
         """Permanently delete the order"""
+        Order.invalidate_pick_lists([self.pk])
         super().delete()
     
     def get_completion_percentage(self):
@@ -462,6 +499,13 @@ class Order(models.Model):
         return ', '.join(filter(None, parts))
 
 
+# Item fields the order's cached shipping profile (weight, parcel size, fleece check)
+# and its batches' pick lists are built from.
+SHIPPING_PROFILE_ITEM_FIELDS = frozenset({
+    'sku', 'quantity', 'stock_item', 'stock_item_id', 'product_name', 'product_type',
+})
+
+
 class OrderItem(models.Model):
     """Individual items within an order"""
     
@@ -556,6 +600,24 @@ class OrderItem(models.Model):
         if not self.line_total or self.line_total == 0:
             self.line_total = (self.unit_price * self.quantity) - self.discount_amount
         super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or not SHIPPING_PROFILE_ITEM_FIELDS.isdisjoint(update_fields):
+            self._invalidate_order_shipping_profile()
+            Order.invalidate_pick_lists([self.order_id])
+
+    def delete(self, *args, **kwargs):
+        order_id = self.order_id
+        result = super().delete(*args, **kwargs)
+        self.order_id = order_id
+        self._invalidate_order_shipping_profile()
+        Order.invalidate_pick_lists([order_id])
+        return result
+
+    def _invalidate_order_shipping_profile(self):
+        Order.invalidate_shipping_profiles([self.order_id])
+        cached_order = self._state.fields_cache.get('order')
+        if cached_order is not None:
+            cached_order.shipping_profile = {}
 
 
 class OrderBatch(models.Model):
@@ -698,6 +760,8 @@ class RoyalMailOAuthToken(models.Model):
     expires_at = models.DateTimeField(blank=True, null=True)
     raw_response = models.JSONField(default=dict, blank=True)
     is_active = models.BooleanField(default=True)
+    refresh_lock_owner = models.CharField(max_length=120, blank=True, default='')
+    refresh_locked_until = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -730,3 +794,189 @@ class RoyalMailOAuthToken(models.Model):
         if not self.expires_at:
             return False
         return self.expires_at <= timezone.now() + timezone.timedelta(minutes=5)
+
+
+class DPDAccessToken(models.Model):
+    """Cached DPD client-credentials token shared by every worker process."""
+
+    credential_key = models.CharField(
+        max_length=64,
+        unique=True,
+        help_text="SHA-256 of the token URL and API key the token was issued for",
+    )
+    access_token = models.TextField(blank=True, default='')
+    expires_at = models.DateTimeField(blank=True, null=True)
+    raw_response = models.JSONField(default=dict, blank=True)
+    refreshed_at = models.DateTimeField(blank=True, null=True)
+    refresh_lock_owner = models.CharField(max_length=120, blank=True, default='')
+    refresh_locked_until = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'dpd_access_tokens'
+        ordering = ['-updated_at']
+        verbose_name = 'DPD Access Token'
+        verbose_name_plural = 'DPD Access Tokens'
+
+    def __str__(self):
+        return f"DPD access token (expires {self.expires_at or 'unknown'})"
+
+    @property
+    def is_expired(self):
+        if not self.access_token or not self.expires_at:
+            return True
+        return self.expires_at <= timezone.now()
+
+    def is_usable(self, margin_seconds=0):
+        if self.is_expired:
+            return False
+        return self.expires_at > timezone.now() + timezone.timedelta(seconds=margin_seconds)
+
+
+class ImporterStatus(models.Model):
+    """Run state, overlap lock and last-run metrics for a scheduled order importer."""
+
+    SOURCE_TIAKNIGHT = 'tiaknight'
+    SOURCE_EBAY = 'ebay'
+
+    SOURCE_CHOICES = [
+        (SOURCE_TIAKNIGHT, 'Tiaknight'),
+        (SOURCE_EBAY, 'eBay'),
+    ]
+
+    RESULT_SUCCESS = 'SUCCESS'
+    RESULT_FAILED = 'FAILED'
+
+    RESULT_CHOICES = [
+        (RESULT_SUCCESS, 'Success'),
+        (RESULT_FAILED, 'Failed'),
+    ]
+
+    source = models.CharField(max_length=30, choices=SOURCE_CHOICES, unique=True)
+    lock_owner = models.CharField(max_length=120, blank=True, default='')
+    locked_until = models.DateTimeField(blank=True, null=True)
+    last_started_at = models.DateTimeField(blank=True, null=True)
+    last_finished_at = models.DateTimeField(blank=True, null=True)
+    last_duration_seconds = models.FloatField(blank=True, null=True)
+    last_result = models.CharField(max_length=20, choices=RESULT_CHOICES, blank=True, default='')
+    last_error = models.TextField(blank=True, null=True)
+    last_counts = models.JSONField(default=dict, blank=True)
+    last_success_at = models.DateTimeField(blank=True, null=True)
+    next_run_at = models.DateTimeField(blank=True, null=True)
+    consecutive_failures = models.PositiveIntegerField(default=0)
+    run_count = models.PositiveIntegerField(default=0)
+    failure_count = models.PositiveIntegerField(default=0)
+    skipped_count = models.PositiveIntegerField(
+        default=0, help_text='Runs skipped because another run held the lock'
+    )
+    last_skipped_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'importer_statuses'
+        ordering = ['source']
+        verbose_name = 'Importer Status'
+        verbose_name_plural = 'Importer Statuses'
+
+    def __str__(self):
+        return f"{self.get_source_display()} importer ({self.last_result or 'never run'})"
+
+    @property
+    def is_running(self):
+        return bool(self.lock_owner and self.locked_until and self.locked_until > timezone.now())
+
+
+class EbaySyncState(models.Model):
+    """Per-account incremental sync watermark for eBay GetOrders."""
+
+    account = models.CharField(max_length=100, unique=True)
+    mod_time_watermark = models.DateTimeField(
+        blank=True, null=True,
+        help_text="ModTimeTo of the last fully synced GetOrders window"
+    )
+    last_synced_at = models.DateTimeField(blank=True, null=True)
+    last_pages_fetched = models.PositiveIntegerField(default=0)
+    last_orders_fetched = models.PositiveIntegerField(default=0)
+    last_duration_seconds = models.FloatField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'ebay_sync_states'
+        ordering = ['account']
+        verbose_name = 'eBay Sync State'
+        verbose_name_plural = 'eBay Sync States'
+
+    def __str__(self):
+        return f"eBay sync {self.account} @ {self.mod_time_watermark or 'never'}"
+
+
+class BackgroundJob(models.Model):
+    """Long-running operation queued from the API and run by ``manage.py run_jobs``."""
+
+    TYPE_SHIPMENT_BOOKING = 'shipment_booking'
+
+    TYPE_CHOICES = [
+        (TYPE_SHIPMENT_BOOKING, 'Shipment booking'),
+    ]
+
+    STATUS_QUEUED = 'QUEUED'
+    STATUS_RUNNING = 'RUNNING'
+    STATUS_COMPLETED = 'COMPLETED'
+    STATUS_FAILED = 'FAILED'
+
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    job_type = models.CharField(max_length=50, choices=TYPE_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    params = models.JSONField(default=dict, blank=True)
+    total_count = models.PositiveIntegerField(default=0)
+    processed_count = models.PositiveIntegerField(default=0)
+    succeeded_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+    skipped_count = models.PositiveIntegerField(default=0)
+    results = models.JSONField(
+        default=list, blank=True,
+        help_text="One outcome entry per processed item"
+    )
+    error = models.TextField(blank=True, null=True)
+    attempts = models.PositiveIntegerField(default=0)
+    lock_owner = models.CharField(max_length=120, blank=True, default='')
+    locked_until = models.DateTimeField(blank=True, null=True)
+    created_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='background_jobs'
+    )
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'background_jobs'
+        ordering = ['-created_at']
+        verbose_name = 'Background Job'
+        verbose_name_plural = 'Background Jobs'
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='background_job_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_job_type_display()} job #{self.pk} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in {self.STATUS_COMPLETED, self.STATUS_FAILED}
+
+    @property
+    def progress_percent(self):
+        if not self.total_count:
+            return 100 if self.is_finished else 0
+        return round(100 * self.processed_count / self.total_count, 1)
@@ -4,7 +4,9 @@ from django.db import transaction
 from django.db.models import Count
 from django.utils import timezone
 from decimal import Decimal
-from .models import Order, OrderItem, OrderBatch, OrderBatchOrder, OrderStatusHistory
+from .models import (
+    Order, OrderItem, OrderBatch, OrderBatchOrder, OrderStatusHistory, ImporterStatus, BackgroundJob,
+)
 from stock.serializers import StockItemListSerializer
 from stock.sku_utils import normalize_sku_reference
 from products.serializers import get_product_child_product_url, get_product_weight_kg
@@ -400,6 +402,7 @@ class OrderCreateUpdateSerializer(serializers.ModelSerializer):
         if items_data is not None:
             # Remove old items
             instance.items.all().delete()
+            Order.invalidate_shipping_profiles([instance.id])
             
             # Create new items
             for item_data in items_data:
@@ -433,6 +436,14 @@ class RoyalMailShipmentSerializer(serializers.Serializer):
     return_label_pdf = serializers.BooleanField(required=False, default=False)
 
 
+class RoyalMailBatchShipmentSerializer(serializers.Serializer):
+    """Serializer for booking every eligible order in a batch through Royal Mail Click & Drop."""
+    order_ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    package_format_identifier = serializers.CharField(required=False, allow_blank=True)
+    service_code = serializers.CharField(required=False, allow_blank=True)
+    notes = serializers.CharField(required=False, allow_blank=True)
+
+
 class DPDShipmentSerializer(serializers.Serializer):
     """Serializer for booking shipment through DPD Shipping API."""
     weight_in_grams = serializers.IntegerField(required=False, min_value=1)
@@ -441,6 +452,24 @@ class DPDShipmentSerializer(serializers.Serializer):
     return_label_pdf = serializers.BooleanField(required=False, default=False)
 
 
+class ShipmentBookingJobSerializer(serializers.Serializer):
+    """Serializer for queueing a background job that books shipments for many orders."""
+    courier = serializers.ChoiceField(choices=['royal_mail', 'dpd'], default='royal_mail')
+    order_ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    weight_in_grams = serializers.IntegerField(required=False, min_value=1)
+    package_format_identifier = serializers.CharField(required=False, allow_blank=True)
+    service_code = serializers.CharField(required=False, allow_blank=True)
+    notes = serializers.CharField(required=False, allow_blank=True)
+
+
+class ShippingOptionsSerializer(serializers.Serializer):
+    """Serializer for resolving Royal Mail shipping options for many orders at once."""
+    order_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=1000)
+    weight_in_grams = serializers.IntegerField(required=False, min_value=1)
+    package_format_identifier = serializers.CharField(required=False, allow_blank=True)
+    service_code = serializers.CharField(required=False, allow_blank=True)
+
+
 class OrderCancelSerializer(serializers.Serializer):
     """Serializer for cancelling an order"""
     reason = serializers.CharField(required=True)
@@ -676,3 +705,41 @@ def get_order_source_display_value(order):
     if order.order_source in {Order.SOURCE_XML, Order.SOURCE_WEBSITE}:
         return 'WEB'
     return order.order_source
+
+
+class ImporterStatusSerializer(serializers.ModelSerializer):
+    """Serializer for scheduled importer run state and last-run metrics."""
+
+    source_display = serializers.CharField(source='get_source_display', read_only=True)
+    is_running = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = ImporterStatus
+        fields = [
+            'source', 'source_display', 'is_running', 'locked_until',
+            'last_started_at', 'last_finished_at', 'last_duration_seconds',
+            'last_result', 'last_error', 'last_counts', 'last_success_at',
+            'next_run_at', 'consecutive_failures', 'run_count', 'failure_count',
+            'skipped_count', 'last_skipped_at', 'updated_at',
+        ]
+        read_only_fields = fields
+
+
+class BackgroundJobSerializer(serializers.ModelSerializer):
+    """Serializer for background job progress and per-item outcomes."""
+
+    job_type_display = serializers.CharField(source='get_job_type_display', read_only=True)
+    progress_percent = serializers.FloatField(read_only=True)
+    is_finished = serializers.BooleanField(read_only=True)
+    created_by_username = serializers.CharField(source='created_by.username', read_only=True, default=None)
+
+    class Meta:
+        model = BackgroundJob
+        fields = [
+            'id', 'job_type', 'job_type_display', 'status', 'is_finished', 'params',
+            'total_count', 'processed_count', 'succeeded_count', 'failed_count',
+            'skipped_count', 'progress_percent', 'results', 'error', 'attempts',
+            'created_by', 'created_by_username', 'started_at', 'finished_at',
+            'created_at', 'updated_at',
+        ]
+        read_only_fields = fields
@@ -0,0 +1,158 @@
+import hashlib
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Prefetch
+
+from orders.models import OrderBatchOrder, OrderItem
+from orders.services.royal_mail import RoyalMailAPIError, RoyalMailConfigError
+
+
+logger = logging.getLogger(__name__)
+
+
+LABEL_ORDER_BATCH = 'batch'
+LABEL_ORDER_LOCATION = 'location'
+LABEL_ORDER_COURIER = 'courier'
+LABEL_ORDER_CHOICES = (LABEL_ORDER_BATCH, LABEL_ORDER_LOCATION, LABEL_ORDER_COURIER)
+
+MERGED_LABEL_DIR = 'shipping_labels/batches'
+
+
+class BatchLabelError(RuntimeError):
+    pass
+
+
+def batch_label_orders(batch, order_by=LABEL_ORDER_BATCH):
+    """Return the batch's orders in print order, with items and stock locations prefetched."""
+    if order_by not in LABEL_ORDER_CHOICES:
+        raise ValueError(f"order_by must be one of: {', '.join(LABEL_ORDER_CHOICES)}")
+
+    links = OrderBatchOrder.objects.filter(batch=batch).select_related('order').prefetch_related(
+        Prefetch(
+            'order__items',
+            queryset=OrderItem.objects.select_related('stock_item__primary_location').order_by('id'),
+        )
+    ).order_by('created_at', 'id')
+    orders = [link.order for link in links if not link.order.is_deleted]
+
+    if order_by == LABEL_ORDER_LOCATION:
+        orders.sort(key=lambda order: (_pick_location(order), order.order_number or ''))
+    elif order_by == LABEL_ORDER_COURIER:
+        orders.sort(key=lambda order: (
+            (order.courier_service_code or order.carrier or '').upper(),
+            order.order_number or '',
+        ))
+    return orders
+
+
+def label_set_key(orders, order_by):
+    """Hash of the print order and each saved label version; changes whenever a label does."""
+    digest = hashlib.sha256(order_by.encode('utf-8'))
+    for order in orders:
+        saved_at = order.shipping_label_downloaded_at.isoformat() if order.shipping_label_downloaded_at else ''
+        digest.update(f'|{order.id}:{order.shipping_label_file or ""}:{saved_at}'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def orders_missing_labels(orders):
+    """Orders booked with Royal Mail whose label file has not been saved yet."""
+    return [
+        order for order in orders
+        if order.royal_mail_order_identifier and not _label_exists(order)
+    ]
+
+
+def fetch_missing_labels(orders, client, save_label, max_workers=None):
+    """
+    Download labels for orders that have a Royal Mail identifier but no saved file.
+
+    Downloads run concurrently; ``save_label(order, pdf_bytes)`` is called from
+    the calling thread so storage and DB writes stay on the request connection.
+    Returns ``{order_id: error message}`` for labels that could not be fetched.
+    """
+    missing = orders_missing_labels(orders)
+    if not missing:
+        return {}
+
+    errors = {}
+    max_workers = max(1, min(len(missing), max_workers or settings.ROYAL_MAIL_LABEL_FETCH_WORKERS))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            order.id: executor.submit(client.get_order_label_pdf, order.royal_mail_order_identifier)
+            for order in missing
+        }
+        for order in missing:
+            try:
+                save_label(order, futures[order.id].result())
+            except (RoyalMailAPIError, RoyalMailConfigError) as exc:
+                errors[order.id] = str(exc)
+    return errors
+
+
+def merged_batch_labels(batch, orders, order_by):
+    """
+    Return ``(storage_path, included_orders, missing_orders)`` for the merged batch PDF.
+
+    The merged file is cached in storage under the label-set key, so repeated
+    prints of an unchanged batch serve the same file without re-merging.
+    """
+    included = [order for order in orders if _label_exists(order)]
+    missing = [order for order in orders if order not in included]
+    if not included:
+        raise BatchLabelError('No saved shipping labels are available for this batch')
+
+    key = label_set_key(included, order_by)
+    path = f'{MERGED_LABEL_DIR}/batch-{batch.id}-{key[:20]}.pdf'
+    if default_storage.exists(path):
+        return path, included, missing
+
+    try:
+        from pypdf import PdfReader, PdfWriter
+    except ImportError as exc:
+        raise BatchLabelError('Merging label PDFs requires the pypdf package') from exc
+
+    writer = PdfWriter()
+    for order in included:
+        with default_storage.open(order.shipping_label_file, 'rb') as label_file:
+            writer.append(PdfReader(io.BytesIO(label_file.read())))
+    output = io.BytesIO()
+    writer.write(output)
+
+    _delete_stale_merges(batch)
+    saved_path = default_storage.save(path, ContentFile(output.getvalue()))
+    logger.info('Merged %s shipping labels for batch %s into %s', len(included), batch.id, saved_path)
+    return saved_path, included, missing
+
+
+def _label_exists(order):
+    return bool(order.shipping_label_file) and default_storage.exists(order.shipping_label_file)
+
+
+def _pick_location(order):
+    locations = []
+    for item in order.items.all():
+        stock_item = item.stock_item
+        if stock_item is None:
+            continue
+        if stock_item.primary_location_id:
+            locations.append(stock_item.primary_location.name)
+        elif stock_item.warehouse_location:
+            locations.append(stock_item.warehouse_location)
+    # Orders without a known location print last.
+    return min(locations) if locations else '\uffff'
+
+
+def _delete_stale_merges(batch):
+    try:
+        _, file_names = default_storage.listdir(MERGED_LABEL_DIR)
+    except (FileNotFoundError, NotImplementedError):
+        return
+    prefix = f'batch-{batch.id}-'
+    for file_name in file_names:
+        if file_name.startswith(prefix):
+            default_storage.delete(f'{MERGED_LABEL_DIR}/{file_name}')
@@ -0,0 +1,267 @@
+import math
+import os
+import random
+import shutil
+import string
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from orders.models import Order
+from orders.services.courier_simulator import simulator_endpoints
+from orders.services.http_transport import get_transport
+from orders.services.remote_tiaknight_import import (
+    RemoteTiaknightConfigError,
+    RemoteTiaknightFetchError,
+    RemoteTiaknightParseError,
+    import_remote_tiaknight_orders,
+)
+
+
+SCENARIO_ROYAL_MAIL = 'royal_mail'
+SCENARIO_DPD = 'dpd'
+SCENARIO_TIAKNIGHT = 'tiaknight'
+SCENARIO_CHOICES = (SCENARIO_ROYAL_MAIL, SCENARIO_DPD, SCENARIO_TIAKNIGHT)
+
+BOOKING_ACTIONS = {
+    SCENARIO_ROYAL_MAIL: 'book_royal_mail_shipping',
+    SCENARIO_DPD: 'book_dpd_shipping',
+}
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of ``values``; 0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(scenario, latencies, errors, wall_seconds, **extra):
+    """Throughput and latency percentiles (milliseconds) for one scenario run."""
+    count = len(latencies)
+    return {
+        'scenario': scenario,
+        'operations': count,
+        'succeeded': count - len(errors),
+        'failed': len(errors),
+        'wall_seconds': round(wall_seconds, 3),
+        'throughput_per_second': round(count / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'max_ms': round(max(latencies, default=0) * 1000, 1),
+        'errors': errors[:5],
+        **extra,
+    }
+
+
+@contextmanager
+def simulated_courier_settings(simulator_url, work_dir):
+    """Point the Royal Mail, DPD and Tiaknight clients at a courier simulator."""
+    endpoints = simulator_endpoints(simulator_url)
+    overrides = {
+        'MEDIA_ROOT': os.path.join(work_dir, 'media'),
+        'ROYAL_MAIL_API_BASE_URL': endpoints['royal_mail_base_url'],
+        'ROYAL_MAIL_API_KEY': 'simulator-api-key',
+        'DPD_INTEGRATION_ENABLED': True,
+        'DPD_API_BASE_URL': endpoints['dpd_base_url'],
+        'DPD_TOKEN_URL': endpoints['dpd_token_url'],
+        'DPD_API_KEY': 'simulator-key',
+        'DPD_API_SECRET': 'simulator-secret',
+        'DPD_API_TOKEN': '',
+    }
+    # Only fill DPD account and sender details that are not configured already.
+    for name, value in {
+        'DPD_CUSTOMER_ID': 'SIMULATOR',
+        'DPD_BU_CODE': '015',
+        'DPD_DEFAULT_SERVICE_CODE': '11',
+        'DPD_SENDER_NAME': 'Simulator Sender',
+        'DPD_SENDER_COUNTRY_CODE': 'GB',
+        'DPD_SENDER_POSTCODE': 'SW1A 1AA',
+        'DPD_SENDER_CITY': 'London',
+        'DPD_SENDER_STREET': '1 Simulator Street',
+    }.items():
+        if not getattr(settings, name, None):
+            overrides[name] = value
+
+    environ = {
+        'TIA_URL': endpoints['tiaknight_url'],
+        'TIA_CLIENTID': 'simulator',
+        'TIA_USERNAME': 'simulator',
+        'TIA_PASSWORD': 'simulator',
+        'TIA_AUTO_UPDATE': 'false',
+        'TIA_AUDIT_LOG_PATH': os.path.join(work_dir, 'tiaknight_refs.log'),
+        'TIA_SAVE_RAW_PAYLOAD': 'false',
+        'TIA_GAP_RECOVERY_ATTEMPTS': '0',
+    }
+    previous = {name: os.environ.get(name) for name in environ}
+    os.environ.update(environ)
+    try:
+        with override_settings(**overrides):
+            yield endpoints
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+class BookingBenchmark:
+    """
+    Drive the booking views and the Tiaknight import against a courier simulator.
+
+    Booking scenarios create ``orders`` COMPLETED orders and call the real
+    ``book_royal_mail_shipping``/``book_dpd_shipping`` actions, ``concurrency``
+    at a time; the Tiaknight scenario runs ``tiaknight_fetches`` imports one
+    after another, as the importer lock does in production. Everything the run
+    creates is deleted afterwards unless ``keep_data`` is set.
+    """
+
+    def __init__(self, user, *, orders=20, concurrency=1, tiaknight_fetches=5, keep_data=False):
+        self.user = user
+        self.orders = max(1, int(orders))
+        self.concurrency = max(1, int(concurrency))
+        self.tiaknight_fetches = max(1, int(tiaknight_fetches))
+        self.keep_data = keep_data
+        self.run_id = ''.join(random.choices(string.ascii_uppercase, k=6))
+        self.factory = APIRequestFactory()
+        self._imported_refs = []
+
+    @property
+    def order_prefix(self):
+        return f'BENCH-{self.run_id}-'
+
+    def run(self, simulator_url, scenarios=SCENARIO_CHOICES):
+        work_dir = tempfile.mkdtemp(prefix='courier-benchmark-')
+        try:
+            with simulated_courier_settings(simulator_url, work_dir):
+                results = []
+                for scenario in scenarios:
+                    if scenario == SCENARIO_TIAKNIGHT:
+                        results.append(self.run_tiaknight_imports())
+                    else:
+                        results.append(self.run_bookings(scenario))
+                return results
+        finally:
+            if not self.keep_data:
+                self.cleanup()
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def run_bookings(self, scenario):
+        from orders.views import OrderViewSet
+
+        view = OrderViewSet.as_view({'post': BOOKING_ACTIONS[scenario]})
+        order_ids = self._create_orders(scenario)
+
+        def book(order_id):
+            request = self.factory.post(f'/api/v1/orders/{order_id}/', {}, format='json')
+            force_authenticate(request, user=self.user)
+            started = time.perf_counter()
+            response = view(request, pk=order_id)
+            elapsed = time.perf_counter() - started
+            error = None
+            if response.status_code != 200:
+                error = f'order {order_id}: HTTP {response.status_code} {_response_error(response)}'
+            return elapsed, error
+
+        started = time.perf_counter()
+        outcomes = self._map(book, order_ids)
+        wall_seconds = time.perf_counter() - started
+        return summarize(
+            scenario,
+            [elapsed for elapsed, _ in outcomes],
+            [error for _, error in outcomes if error],
+            wall_seconds,
+        )
+
+    def run_tiaknight_imports(self):
+        latencies = []
+        errors = []
+        imported = 0
+        started = time.perf_counter()
+        for _ in range(self.tiaknight_fetches):
+            fetch_started = time.perf_counter()
+            try:
+                result = import_remote_tiaknight_orders(user=None)
+            except (
+                RemoteTiaknightConfigError,
+                RemoteTiaknightFetchError,
+                RemoteTiaknightParseError,
+                ValueError,
+            ) as exc:
+                errors.append(str(exc))
+            else:
+                self._imported_refs.extend(result.get('received_order_refs') or [])
+                imported += result['created_count']
+                if result['failed_count']:
+                    errors.append(f"{result['failed_count']} order(s) failed to import")
+            latencies.append(time.perf_counter() - fetch_started)
+        wall_seconds = time.perf_counter() - started
+        return summarize(
+            SCENARIO_TIAKNIGHT,
+            latencies,
+            errors,
+            wall_seconds,
+            orders_imported=imported,
+            orders_per_second=round(imported / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+        )
+
+    def transport_metrics(self):
+        return get_transport().metrics()
+
+    def cleanup(self):
+        Order.all_objects.filter(external_order_id__startswith=self.order_prefix).delete()
+        if self._imported_refs:
+            Order.all_objects.filter(external_order_id__in=self._imported_refs).delete()
+
+    def _create_orders(self, scenario):
+        orders = [
+            Order(
+                external_order_id=f'{self.order_prefix}{scenario}-{index:05d}',
+                customer_name=f'Benchmark Customer {index}',
+                customer_email='benchmark@example.com',
+                shipping_address_line1='1 Benchmark Street',
+                shipping_city='London',
+                shipping_postal_code='SW1A 1AA',
+                shipping_country='UK',
+                courier_service_code='STD',
+                total_amount=Decimal('10.00'),
+                order_status=Order.STATUS_COMPLETED,
+                created_by=self.user,
+            )
+            for index in range(self.orders)
+        ]
+        # save() assigns order numbers, so create one by one rather than bulk_create.
+        for order in orders:
+            order.save()
+        return [order.id for order in orders]
+
+    def _map(self, func, items):
+        if self.concurrency == 1:
+            return [func(item) for item in items]
+
+        def run_in_thread(item):
+            try:
+                return func(item)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            return list(executor.map(run_in_thread, items))
+
+
+def _response_error(response):
+    data = getattr(response, 'data', None)
+    if isinstance(data, dict):
+        return data.get('error') or data
+    return ''
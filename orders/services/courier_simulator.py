@@ -0,0 +1,293 @@
+import base64
+import http.server
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from xml.sax.saxutils import escape
+
+
+ROYAL_MAIL_PREFIX = '/royal-mail/api/v1'
+DPD_PREFIX = '/dpd'
+TIAKNIGHT_PATH = '/tiaknight/api/soap/service/6'
+
+# Smallest PDF that label storage and pypdf accept.
+SIMULATED_LABEL_PDF = (
+    b'%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n'
+    b'2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n'
+    b'3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 288 432]>>endobj\n'
+    b'trailer<</Root 1 0 R>>\n%%EOF\n'
+)
+
+_ROYAL_MAIL_LABEL_RE = re.compile(rf'^{ROYAL_MAIL_PREFIX}/orders/(?P<identifier>[^/?]+)/label$', re.IGNORECASE)
+_ROYAL_MAIL_ORDER_RE = re.compile(rf'^{ROYAL_MAIL_PREFIX}/orders/(?P<identifier>[^/?]+)$', re.IGNORECASE)
+_SOAP_ORDER_REF_RE = re.compile(r'<order_ref>([^<]*)</order_ref>')
+
+
+class CourierSimulator:
+    """
+    Local stand-in for the Royal Mail Click & Drop, DPD and Tiaknight SOAP APIs.
+
+    Each request waits ``latency_ms`` (+/- ``jitter_ms``) before answering, then
+    fails with HTTP 429 at ``rate_limit_rate`` and HTTP 503 at ``error_rate`` so
+    client retries and error paths are exercised. Responses carry just enough of
+    each courier's shape for the existing clients and extractors to accept them.
+    """
+
+    def __init__(
+        self,
+        host='127.0.0.1',
+        port=0,
+        *,
+        latency_ms=50,
+        jitter_ms=20,
+        error_rate=0.0,
+        rate_limit_rate=0.0,
+        orders_per_fetch=5,
+        order_ref_prefix='SIM',
+        seed=None,
+    ):
+        self.latency_ms = max(0.0, float(latency_ms))
+        self.jitter_ms = max(0.0, float(jitter_ms))
+        self.error_rate = min(1.0, max(0.0, float(error_rate)))
+        self.rate_limit_rate = min(1.0, max(0.0, float(rate_limit_rate)))
+        self.orders_per_fetch = max(1, int(orders_per_fetch))
+        self.order_ref_prefix = order_ref_prefix
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._sequence = itertools.count(1)
+        self._order_refs = itertools.count(1)
+        self._requests = Counter()
+        self._faults = Counter()
+        self.httpd = http.server.ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def endpoints(self):
+        return simulator_endpoints(self.url)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self.httpd.serve_forever()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def stats(self):
+        with self._lock:
+            return {'requests': dict(self._requests), 'faults': dict(self._faults)}
+
+    def _next_id(self):
+        with self._lock:
+            return next(self._sequence)
+
+    def _next_order_ref(self):
+        with self._lock:
+            return f'{self.order_ref_prefix}{next(self._order_refs):07d}'
+
+    def _delay_and_fault(self, route):
+        """Sleep the simulated latency and return a fault status (429/503) or None."""
+        with self._lock:
+            self._requests[route] += 1
+            jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms)
+            roll = self._random.random()
+        time.sleep(max(0.0, self.latency_ms + jitter) / 1000)
+        if roll < self.rate_limit_rate:
+            fault = 429
+        elif roll < self.rate_limit_rate + self.error_rate:
+            fault = 503
+        else:
+            return None
+        with self._lock:
+            self._faults[f'{route}:{fault}'] += 1
+        return fault
+
+    def _handler_class(self):
+        simulator = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                self._dispatch('GET')
+
+            def do_POST(self):
+                self._dispatch('POST')
+
+            def do_DELETE(self):
+                self._dispatch('DELETE')
+
+            def log_message(self, *args):
+                pass
+
+            def _dispatch(self, method):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                path = self.path.split('?', 1)[0]
+                route, handler = simulator._route(method, path, body)
+                if handler is None:
+                    self._send(404, {'Content-Type': 'application/json'}, b'{"error": "Unknown simulator route"}')
+                    return
+                fault = simulator._delay_and_fault(route)
+                if fault is not None:
+                    headers = {'Content-Type': 'application/json'}
+                    if fault == 429:
+                        headers['Retry-After'] = '0'
+                    self._send(fault, headers, json.dumps({'error': f'Simulated HTTP {fault}'}).encode('utf-8'))
+                    return
+                self._send(*handler(path, body))
+
+            def _send(self, status_code, headers, payload):
+                self.send_response(status_code)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+    def _route(self, method, path, body):
+        lowered = path.lower()
+        if method == 'POST' and lowered == f'{ROYAL_MAIL_PREFIX}/orders':
+            return 'royal_mail.create_orders', self._royal_mail_create_orders
+        if method == 'GET' and _ROYAL_MAIL_LABEL_RE.match(path):
+            return 'royal_mail.label', self._royal_mail_label
+        if method == 'DELETE' and _ROYAL_MAIL_ORDER_RE.match(path):
+            return 'royal_mail.delete_order', self._royal_mail_delete_order
+        if method == 'POST' and lowered == f'{DPD_PREFIX}/oauth/token':
+            return 'dpd.token', self._dpd_token
+        if method == 'POST' and lowered == f'{DPD_PREFIX}/api/v1.1/shipments':
+            return 'dpd.shipments', self._dpd_shipments
+        if method == 'POST' and lowered == TIAKNIGHT_PATH:
+            if b'GetOrder>' in body:
+                return 'tiaknight.get_order', self._tiaknight_get_order
+            return 'tiaknight.get_new_orders', self._tiaknight_get_new_orders
+        return None, None
+
+    def _royal_mail_create_orders(self, path, body):
+        try:
+            items = json.loads(body or b'{}').get('items') or []
+        except ValueError:
+            return _json(400, {'errors': [{'errorMessage': 'Request body is not JSON'}]})
+        created = []
+        for item in items:
+            identifier = self._next_id()
+            entry = {
+                'orderIdentifier': identifier,
+                'orderReference': item.get('orderReference'),
+                'trackingNumber': f'SIM{identifier:09d}GB',
+                'createdOn': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            }
+            if (item.get('label') or {}).get('includeLabelInResponse'):
+                entry['label'] = base64.b64encode(SIMULATED_LABEL_PDF).decode('ascii')
+            created.append(entry)
+        return _json(200, {
+            'successCount': len(created),
+            'errorsCount': 0,
+            'createdOrders': created,
+            'failedOrders': [],
+        })
+
+    def _royal_mail_label(self, path, body):
+        return 200, {'Content-Type': 'application/pdf'}, SIMULATED_LABEL_PDF
+
+    def _royal_mail_delete_order(self, path, body):
+        identifier = _ROYAL_MAIL_ORDER_RE.match(path).group('identifier')
+        return _json(200, {'deletedOrders': [{'orderIdentifier': identifier}], 'errors': []})
+
+    def _dpd_token(self, path, body):
+        return _json(200, {
+            'access_token': f'simulated-dpd-token-{self._next_id()}',
+            'token_type': 'Bearer',
+            'expires_in': 3600,
+        })
+
+    def _dpd_shipments(self, path, body):
+        shipment_id = self._next_id()
+        return _json(200, {
+            'data': {
+                'shipmentResults': [{
+                    'shipmentId': str(shipment_id),
+                    'parcelResults': [{'parcelNumber': f'1550{shipment_id:010d}'}],
+                    'labelFile': base64.b64encode(SIMULATED_LABEL_PDF).decode('ascii'),
+                }],
+            },
+        })
+
+    def _tiaknight_get_new_orders(self, path, body):
+        refs = [self._next_order_ref() for _ in range(self.orders_per_fetch)]
+        orders_xml = '<web_orders>' + ''.join(_tiaknight_order_xml(ref) for ref in refs) + '</web_orders>'
+        return _soap(self._next_id(), orders_xml)
+
+    def _tiaknight_get_order(self, path, body):
+        match = _SOAP_ORDER_REF_RE.search(body.decode('utf-8', errors='replace'))
+        ref = match.group(1) if match else self._next_order_ref()
+        return _soap(self._next_id(), f'<web_orders>{_tiaknight_order_xml(ref)}</web_orders>')
+
+
+def simulator_endpoints(url):
+    """Client base URLs for a simulator listening at ``url``."""
+    url = url.rstrip('/')
+    return {
+        'royal_mail_base_url': f'{url}{ROYAL_MAIL_PREFIX}',
+        'dpd_base_url': f'{url}{DPD_PREFIX}/api/v1.1',
+        'dpd_token_url': f'{url}{DPD_PREFIX}/oauth/token',
+        'tiaknight_url': f'{url}{TIAKNIGHT_PATH}',
+    }
+
+
+def _json(status_code, payload):
+    return status_code, {'Content-Type': 'application/json'}, json.dumps(payload).encode('utf-8')
+
+
+def _soap(request_id, orders_xml):
+    envelope = (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<SOAP-ENV:Envelope xmlns:SOAP-ENV="http://schemas.xmlsoap.org/soap/envelope/">'
+        '<SOAP-ENV:Body><return>'
+        f'<item><key>RequestID</key><value>SIM-{request_id}</value></item>'
+        f'<item><key>DateTime</key><value>{time.strftime("%Y-%m-%d %H:%M:%S")}</value></item>'
+        f'<item><key>Result</key><value>{escape(orders_xml)}</value></item>'
+        '</return></SOAP-ENV:Body></SOAP-ENV:Envelope>'
+    )
+    return 200, {'Content-Type': 'text/xml; charset=utf-8'}, envelope.encode('utf-8')
+
+
+def _tiaknight_order_xml(ref):
+    return (
+        '<web_order>'
+        f'<order><order_reference>{ref}</order_reference>'
+        f'<order_date>{time.strftime("%Y-%m-%d %H:%M:%S")}</order_date>'
+        '<courier_name>Standard Delivery</courier_name>'
+        '<product_total_ex>10.00</product_total_ex><grand_total_vat>2.00</grand_total_vat>'
+        '<grand_total_inc>12.00</grand_total_inc></order>'
+        '<customer><billing_firstname>Simulated</billing_firstname>'
+        f'<billing_lastname>Customer {ref}</billing_lastname>'
+        '<billing_email>simulated@example.com</billing_email>'
+        '<delivery_address1>1 Simulator Street</delivery_address1><delivery_town>London</delivery_town>'
+        '<delivery_postcode>SW1A 1AA</delivery_postcode><delivery_country>UK</delivery_country></customer>'
+        '<products><product><product_reference>SIM-FABRIC</product_reference>'
+        '<title>Simulated Fabric</title><quantity>1</quantity><price_inc>12.00</price_inc></product></products>'
+        '</web_order>'
+    )
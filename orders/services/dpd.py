@@ -1,10 +1,22 @@
 import base64
+import hashlib
+import json
 import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timezone as dt_timezone
 from decimal import Decimal
 
 import requests
 from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
 
+from orders.models import DPDAccessToken
+from orders.services.http_transport import get_transport
 from products.serializers import get_product_weight_kg
 
 
@@ -30,7 +42,7 @@ class DPDShippingClient:
     credentials for a token endpoint, so both modes are supported by settings.
     """
 
-    def __init__(self, timeout=30):
+    def __init__(self, timeout=30, transport=None):
         self.enabled = settings.DPD_INTEGRATION_ENABLED
         self.base_url = settings.DPD_API_BASE_URL.rstrip('/')
         self.token_url = settings.DPD_TOKEN_URL
@@ -45,6 +57,7 @@ class DPDShippingClient:
         self.print_format = settings.DPD_LABEL_FORMAT
         self.label_size = settings.DPD_LABEL_SIZE
         self.timeout = timeout
+        self.transport = transport or get_transport()
 
     def ensure_configured(self):
         missing = []
@@ -74,13 +87,23 @@ class DPDShippingClient:
         url = f'{self.base_url}/shipments'
         logger.info('Creating DPD shipment for local order %s', order.order_number)
 
+        access_token = self.get_access_token()
         try:
-            response = requests.post(
+            response = self.transport.post(
                 url,
                 json=payload,
-                headers=self._headers(),
+                headers=self._headers(access_token),
                 timeout=self.timeout,
             )
+            if response.status_code == 401 and not self.api_token:
+                # The cached token was revoked or expired early; fetch a new one once.
+                self.invalidate_access_token(access_token)
+                response = self.transport.post(
+                    url,
+                    json=payload,
+                    headers=self._headers(),
+                    timeout=self.timeout,
+                )
         except requests.RequestException as exc:
             raise DPDAPIError(f'DPD request failed: {exc}') from exc
 
@@ -132,14 +155,22 @@ class DPDShippingClient:
     def get_access_token(self):
         if self.api_token:
             return self.api_token
+        return dpd_token_cache.get(self._credential_key(), self.request_access_token)
+
+    def invalidate_access_token(self, token):
+        if not self.api_token:
+            dpd_token_cache.invalidate(self._credential_key(), token)
 
+    def request_access_token(self):
+        """POST the client-credentials grant; returns ``(token, expires_at, response_data)``."""
         try:
-            response = requests.post(
+            response = self.transport.post(
                 self.token_url,
                 data={'grant_type': 'client_credentials'},
                 auth=(self.api_key, self.api_secret),
                 headers={'Accept': 'application/json'},
                 timeout=self.timeout,
+                idempotent=True,
             )
         except requests.RequestException as exc:
             raise DPDAPIError(f'DPD token request failed: {exc}') from exc
@@ -159,11 +190,14 @@ class DPDShippingClient:
                 status_code=response.status_code,
                 response_data=response_data,
             )
-        return token
+        return token, _token_expires_at(token, response_data), response_data
 
-    def _headers(self):
+    def _credential_key(self):
+        return hashlib.sha256(f'{self.token_url}|{self.api_key}'.encode('utf-8')).hexdigest()
+
+    def _headers(self, access_token=None):
         return {
-            'Authorization': f'Bearer {self.get_access_token()}',
+            'Authorization': f'Bearer {access_token or self.get_access_token()}',
             'Content-Type': 'application/json',
             'Accept': 'application/json',
         }
@@ -211,7 +245,11 @@ class DPDShippingClient:
 
     def _order_weight_in_grams(self, order):
         total = Decimal('0.000')
-        for item in order.items.select_related('stock_item__product').prefetch_related('stock_item__product__extended_data'):
+        if 'items' in getattr(order, '_prefetched_objects_cache', {}):
+            items = order.items.all()
+        else:
+            items = order.items.select_related('stock_item__product').prefetch_related('stock_item__product__extended_data')
+        for item in items:
             product = getattr(getattr(item, 'stock_item', None), 'product', None)
             total += get_product_weight_kg(product) * Decimal(item.quantity or 0)
         return int((total * Decimal('1000')).quantize(Decimal('1'))) if total > 0 else 0
@@ -247,6 +285,136 @@ class DPDShippingClient:
                 )
 
 
+class DPDTokenCache:
+    """
+    Process-memory cache in front of the shared ``DPDAccessToken`` row.
+
+    Only one thread per process fetches a token at a time, and across processes
+    the ``refresh_locked_until`` row lock makes other workers wait for the token
+    being fetched instead of requesting their own.
+    """
+
+    def __init__(self, *, refresh_margin_seconds=60, lock_ttl_seconds=30, wait_seconds=10, poll_seconds=0.2):
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.lock_ttl_seconds = lock_ttl_seconds
+        self.wait_seconds = wait_seconds
+        self.poll_seconds = poll_seconds
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    def get(self, credential_key, fetch):
+        token = self._fresh_memory_token(credential_key)
+        if token:
+            return token
+        with self._lock:
+            token = self._fresh_memory_token(credential_key)
+            if token:
+                return token
+            token, expires_at = self._shared_token(credential_key, fetch)
+            self._tokens[credential_key] = (token, expires_at)
+            return token
+
+    def invalidate(self, credential_key, token=None):
+        with self._lock:
+            cached = self._tokens.get(credential_key)
+            if cached and (token is None or cached[0] == token):
+                self._tokens.pop(credential_key, None)
+        rows = DPDAccessToken.objects.filter(credential_key=credential_key)
+        if token is not None:
+            rows = rows.filter(access_token=token)
+        rows.update(expires_at=timezone.now())
+
+    def clear(self):
+        with self._lock:
+            self._tokens.clear()
+
+    def _fresh_memory_token(self, credential_key):
+        cached = self._tokens.get(credential_key)
+        if not cached:
+            return None
+        token, expires_at = cached
+        if expires_at > timezone.now() + timezone.timedelta(seconds=self.refresh_margin_seconds):
+            return token
+        return None
+
+    def _shared_token(self, credential_key, fetch):
+        row, _ = DPDAccessToken.objects.get_or_create(credential_key=credential_key)
+        if row.is_usable(self.refresh_margin_seconds):
+            return row.access_token, row.expires_at
+
+        owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        deadline = time.monotonic() + self.wait_seconds
+        locked = False
+        while True:
+            now = timezone.now()
+            locked = bool(DPDAccessToken.objects.filter(credential_key=credential_key).filter(
+                Q(refresh_locked_until__isnull=True) | Q(refresh_locked_until__lte=now)
+            ).update(
+                refresh_lock_owner=owner,
+                refresh_locked_until=now + timezone.timedelta(seconds=self.lock_ttl_seconds),
+            ))
+            row.refresh_from_db()
+            if row.is_usable(self.refresh_margin_seconds):
+                if locked:
+                    self._release(credential_key, owner)
+                return row.access_token, row.expires_at
+            if locked or time.monotonic() >= deadline:
+                break
+            time.sleep(self.poll_seconds)
+
+        try:
+            token, expires_at, response_data = fetch()
+            DPDAccessToken.objects.filter(credential_key=credential_key).update(
+                access_token=token,
+                expires_at=expires_at,
+                raw_response=_redact_token_response(response_data),
+                refreshed_at=timezone.now(),
+            )
+            logger.info('Fetched new DPD access token valid until %s', expires_at)
+            return token, expires_at
+        finally:
+            if locked:
+                self._release(credential_key, owner)
+
+    def _release(self, credential_key, owner):
+        DPDAccessToken.objects.filter(credential_key=credential_key, refresh_lock_owner=owner).update(
+            refresh_lock_owner='',
+            refresh_locked_until=None,
+        )
+
+
+dpd_token_cache = DPDTokenCache()
+
+
+def _token_expires_at(token, response_data):
+    """Expiry from ``expires_in``, else the JWT ``exp`` claim, else the configured default TTL."""
+    expires_in = _find_first_value(response_data, {'expires_in', 'expiresIn'})
+    if expires_in:
+        try:
+            return timezone.now() + timezone.timedelta(seconds=int(float(expires_in)))
+        except (TypeError, ValueError):
+            pass
+
+    parts = str(token).split('.')
+    if len(parts) == 3:
+        try:
+            claims = json.loads(base64.urlsafe_b64decode(parts[1] + '=' * (-len(parts[1]) % 4)))
+            return datetime.fromtimestamp(int(claims['exp']), tz=dt_timezone.utc)
+        except (KeyError, TypeError, ValueError, OverflowError):
+            pass
+
+    return timezone.now() + timezone.timedelta(seconds=settings.DPD_TOKEN_DEFAULT_TTL_SECONDS)
+
+
+def _redact_token_response(response_data):
+    if not isinstance(response_data, dict):
+        return {}
+    return {
+        key: value for key, value in response_data.items()
+        if key not in {'access_token', 'token', 'jwt', 'id_token', 'refresh_token'}
+    }
+
+
 def extract_dpd_label_pdf(response_data):
     label_value = _find_first_value(response_data, {'labelFile', 'label_file', 'label'})
     if not label_value:
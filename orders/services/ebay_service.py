@@ -4,14 +4,17 @@ Handles interaction with eBay API to fetch and process orders.
 """
 from ebaysdk.trading import Connection as Trading
 from ebaysdk.exception import ConnectionError
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.db import transaction
 from django.utils import timezone
 from decimal import Decimal
 import logging
+import time
 
 from orders.ebay_config import EbayConfig
-from orders.models import Order, OrderItem
-from products.models import Product
+from orders.models import EbaySyncState, Order, OrderItem, OrderStatusHistory
+from stock.services.sku_resolver import sku_resolver
 from stock.sku_utils import normalize_sku_reference
 
 logger = logging.getLogger(__name__)
@@ -20,13 +23,27 @@ logger = logging.getLogger(__name__)
 class EbayService:
     """Service class to handle eBay API operations"""
     
-    def __init__(self):
-        """Initialize eBay Trading API connection"""
-        if not EbayConfig.is_configured():
-            raise ValueError("eBay API credentials not properly configured. Please check your .env file.")
-        
+    def __init__(self, connection_factory=None):
+        """
+        Initialize eBay Trading API connection
+
+        Args:
+            connection_factory: Optional callable returning a Trading API connection.
+                Page requests made concurrently each get their own connection.
+        """
+        if connection_factory is None:
+            if not EbayConfig.is_configured():
+                raise ValueError("eBay API credentials not properly configured. Please check your .env file.")
+            connection_factory = self._build_connection
+
+        self._connection_factory = connection_factory
+        self.api = connection_factory()
+        self.last_fetch_stats = {}
+
+    @staticmethod
+    def _build_connection():
         config = EbayConfig.get_trading_api_config()
-        self.api = Trading(
+        return Trading(
             config_file=None,
             domain=config['domain'],
             appid=config['appid'],
@@ -38,56 +55,71 @@ class EbayService:
             timeout=config['timeout']
         )
     
-    def fetch_orders(self, days_back=None, order_status=None):
+    def fetch_orders(self, days_back=None, order_status=None, mod_time_from=None, mod_time_to=None):
         """
-        Fetch orders from eBay
+        Fetch every page of orders from eBay
         
         Args:
             days_back (int): Number of days to look back for orders. Defaults to config setting.
             order_status (str): Filter by order status ('All', 'Active', 'Completed', etc.)
+            mod_time_from (datetime): Fetch orders modified since this time instead of a
+                CreateTime window (incremental sync).
+            mod_time_to (datetime): Upper bound for the ModTime window. Defaults to now.
         
         Returns:
-            list: List of order dictionaries from eBay
+            list: List of order dictionaries from eBay, unique by OrderID
         """
-        if days_back is None:
-            days_back = EbayConfig.DAYS_TO_FETCH
-        
-        # Calculate date range
-        end_time = timezone.now()
-        start_time = end_time - timedelta(days=days_back)
+        started = time.monotonic()
+        end_time = mod_time_to or timezone.now()
+        params = {
+            'OrderRole': 'Seller',
+            'OrderStatus': order_status or 'All',
+            'DetailLevel': 'ReturnAll',
+        }
+        if mod_time_from is not None:
+            params['ModTimeFrom'] = _ebay_time(mod_time_from)
+            params['ModTimeTo'] = _ebay_time(end_time)
+        else:
+            if days_back is None:
+                days_back = EbayConfig.DAYS_TO_FETCH
+            params['CreateTimeFrom'] = _ebay_time(end_time - timedelta(days=days_back))
+            params['CreateTimeTo'] = _ebay_time(end_time)
         
         try:
-            # Format dates for eBay API (ISO 8601 format)
-            create_time_from = start_time.strftime('%Y-%m-%dT%H:%M:%S.000Z')
-            create_time_to = end_time.strftime('%Y-%m-%dT%H:%M:%S.000Z')
-            
-            logger.info(f"Fetching eBay orders from {create_time_from} to {create_time_to}")
+            logger.info(f"Fetching eBay orders with {params}")
             
-            # Call eBay GetOrders API
-            response = self.api.execute('GetOrders', {
-                'CreateTimeFrom': create_time_from,
-                'CreateTimeTo': create_time_to,
-                'OrderRole': 'Seller',
-                'OrderStatus': order_status or 'All',
-                'DetailLevel': 'ReturnAll',
-                'Pagination': {
-                    'EntriesPerPage': 100,
-                    'PageNumber': 1
-                }
-            })
+            first_page_orders, total_pages = self._fetch_orders_page(self.api, params, 1)
+            pages = {1: first_page_orders}
+            remaining = list(range(2, total_pages + 1))
+            if remaining:
+                workers = max(1, min(EbayConfig.PAGE_WORKERS, len(remaining)))
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    futures = {
+                        executor.submit(self._fetch_orders_page, None, params, page_number): page_number
+                        for page_number in remaining
+                    }
+                    for future in as_completed(futures):
+                        page_orders, _ = future.result()
+                        pages[futures[future]] = page_orders
             
-            # Parse response
+            # Orders modified mid-pagination can shift between pages, so keep the first copy.
             orders = []
-            if response.reply.get('OrderArray'):
-                order_array = response.reply.OrderArray.Order
-                # Ensure it's always a list
-                if not isinstance(order_array, list):
-                    order_array = [order_array]
-                orders = order_array
-                logger.info(f"Successfully fetched {len(orders)} orders from eBay")
-            else:
-                logger.info("No orders found in the specified date range")
+            seen_order_ids = set()
+            for page_number in sorted(pages):
+                for order in pages[page_number]:
+                    order_id = order.get('OrderID')
+                    if order_id in seen_order_ids:
+                        continue
+                    seen_order_ids.add(order_id)
+                    orders.append(order)
             
+            self.last_fetch_stats = {
+                'pages': total_pages,
+                'orders': len(orders),
+                'seconds': round(time.monotonic() - started, 3),
+                'window_end': end_time,
+            }
+            logger.info(f"Successfully fetched {len(orders)} orders from eBay in {total_pages} page(s)")
             return orders
             
         except ConnectionError as e:
@@ -96,7 +128,28 @@ class EbayService:
         except Exception as e:
             logger.error(f"Error fetching eBay orders: {str(e)}")
             raise
-    
+
+    def _fetch_orders_page(self, api, params, page_number):
+        """Return (orders, total_pages) for one GetOrders page."""
+        api = api or self._connection_factory()
+        response = api.execute('GetOrders', {
+            **params,
+            'Pagination': {
+                'EntriesPerPage': min(100, max(1, EbayConfig.ENTRIES_PER_PAGE)),
+                'PageNumber': page_number,
+            },
+        })
+        reply = response.dict()
+        orders = (reply.get('OrderArray') or {}).get('Order') or []
+        if not isinstance(orders, list):
+            orders = [orders]
+        pagination = reply.get('PaginationResult') or {}
+        try:
+            total_pages = int(pagination.get('TotalNumberOfPages') or 1)
+        except (TypeError, ValueError):
+            total_pages = 1
+        return orders, max(1, total_pages)
+
     def parse_ebay_order(self, ebay_order):
         """
         Parse eBay order data into our Order model format
@@ -130,13 +183,16 @@ class EbayService:
             
             # Extract shipping info
             shipping_service = ebay_order.get('ShippingServiceSelected', {})
+            tracking_details = (
+                _as_list((ebay_order.get('ShippingDetails') or {}).get('ShipmentTrackingDetails')) or [{}]
+            )[0]
             
             # Build order data
             order_data = {
                 'external_order_id': order_id,
                 'order_source': Order.SOURCE_EBAY,
                 'customer_name': shipping_address.get('Name', buyer_user_id),
-                'customer_email': ebay_order.get('TransactionArray', {}).get('Transaction', [{}])[0].get('Buyer', {}).get('Email', ''),
+                'customer_email': (_as_list((ebay_order.get('TransactionArray') or {}).get('Transaction')) or [{}])[0].get('Buyer', {}).get('Email', ''),
                 'customer_phone': shipping_address.get('Phone', ''),
                 
                 # Shipping address
@@ -164,8 +220,8 @@ class EbayService:
                 
                 # Shipping info
                 'shipping_method': shipping_service.get('ShippingService', ''),
-                'tracking_number': ebay_order.get('ShippingDetails', {}).get('ShipmentTrackingDetails', [{}])[0].get('ShipmentTrackingNumber', ''),
-                'carrier': ebay_order.get('ShippingDetails', {}).get('ShipmentTrackingDetails', [{}])[0].get('ShippingCarrierUsed', ''),
+                'tracking_number': tracking_details.get('ShipmentTrackingNumber', ''),
+                'carrier': tracking_details.get('ShippingCarrierUsed', ''),
                 
                 # Payment info
                 'payment_method': ebay_order.get('CheckoutStatus', {}).get('PaymentMethod', 'PayPal'),
@@ -174,6 +230,9 @@ class EbayService:
                 'customer_notes': ebay_order.get('BuyerCheckoutMessage', ''),
             }
             
+            if order_data['order_date'] is None:
+                order_data.pop('order_date')
+            
             return order_data
             
         except Exception as e:
@@ -191,11 +250,7 @@ class EbayService:
             list: List of order item dictionaries
         """
         items = []
-        transactions = ebay_order.get('TransactionArray', {}).get('Transaction', [])
-        
-        # Ensure transactions is always a list
-        if not isinstance(transactions, list):
-            transactions = [transactions]
+        transactions = _as_list((ebay_order.get('TransactionArray') or {}).get('Transaction'))
         
         for transaction in transactions:
             item_data = transaction.get('Item', {})
@@ -223,53 +278,213 @@ class EbayService:
         Returns:
             tuple: (Order object, created boolean)
         """
-        try:
+        result = self.sync_orders_batch([ebay_order], user=user)
+        if result['errors']:
+            raise ValueError(result['errors'][0]['error'])
+        order_id = ebay_order.get('OrderID', '')
+        return result['orders'][order_id], order_id in result['created_order_ids']
+    
+    def sync_orders_batch(self, ebay_orders, user=None):
+        """
+        Upsert a fetched list of eBay orders with set-based queries
+        
+        Existing orders and stock items are resolved with one query each, new
+        orders and their items are bulk-created, and status/payment/tracking
+        changes on existing orders are written with one bulk update.
+        
+        Returns:
+            dict: created/updated/skipped/error counts, per-order errors and
+            ``orders`` keyed by eBay OrderID
+        """
+        result = {
+            'created_count': 0,
+            'updated_count': 0,
+            'skipped_count': 0,
+            'error_count': 0,
+            'errors': [],
+            'orders': {},
+            'created_order_ids': set(),
+        }
+        
+        parsed = {}
+        for ebay_order in ebay_orders:
             order_id = ebay_order.get('OrderID', '')
+            if not order_id or order_id in parsed:
+                continue
+            try:
+                parsed[order_id] = (self.parse_ebay_order(ebay_order), self.parse_order_items(ebay_order))
+            except Exception as e:
+                result['error_count'] += 1
+                result['errors'].append({'order_id': order_id or 'Unknown', 'error': str(e)})
+        if not parsed:
+            return result
+        
+        existing_orders = {
+            order.external_order_id: order
+            for order in Order.all_objects.filter(external_order_id__in=list(parsed))
+        }
+        skus = {
+            item['sku']
+            for order_id, (_, items) in parsed.items()
+            if order_id not in existing_orders
+            for item in items
+            if item['sku']
+        }
+        stock_items = sku_resolver.resolve_many(skus)
+        
+        with transaction.atomic():
+            new_order_ids = [order_id for order_id in parsed if order_id not in existing_orders]
+            order_numbers = Order.generate_order_numbers(len(new_order_ids))
+            new_orders = []
+            for order_id, order_number in zip(new_order_ids, order_numbers):
+                order_data, _ = parsed[order_id]
+                new_orders.append(Order(order_number=order_number, created_by=user, **order_data))
+            Order.objects.bulk_create(new_orders)
             
-            # Check if order already exists
-            existing_order = Order.objects.filter(external_order_id=order_id).first()
-            
-            if existing_order:
-                logger.info(f"Order {order_id} already exists. Skipping.")
-                return existing_order, False
-            
-            # Parse order data
-            order_data = self.parse_ebay_order(ebay_order)
-            
-            # Set user if provided
-            if user:
-                order_data['created_by'] = user
+            new_items = []
+            for order in new_orders:
+                _, items = parsed[order.external_order_id]
+                for item_data in items:
+                    stock_item = stock_items.get(item_data['sku'])
+                    new_items.append(OrderItem(
+                        order=order,
+                        stock_item=stock_item,
+                        sku=item_data['sku'],
+                        product_name=item_data['title'],
+                        product_type=stock_item.product_type if stock_item else None,
+                        quantity=item_data['quantity'],
+                        quantity_ordered=item_data['quantity'],
+                        unit_price=item_data['unit_price'],
+                        line_total=item_data['total_price'],
+                        ebay_item_id=item_data['ebay_item_id'],
+                    ))
+            OrderItem.objects.bulk_create(new_items)
             
-            # Create order
-            order = Order.objects.create(**order_data)
+            changed_orders, changed_fields, history = self._apply_ebay_updates(existing_orders, parsed, user)
+            if changed_orders:
+                Order.all_objects.bulk_update(changed_orders, sorted(changed_fields | {'updated_at'}))
+            if history:
+                OrderStatusHistory.objects.bulk_create(history)
+        
+        for order in new_orders:
+            result['orders'][order.external_order_id] = order
+            result['created_order_ids'].add(order.external_order_id)
+        result['orders'].update(existing_orders)
+        result['created_count'] = len(new_orders)
+        result['updated_count'] = len(changed_orders)
+        result['skipped_count'] = len(existing_orders) - len(changed_orders)
+        logger.info(
+            f"eBay batch sync: {result['created_count']} created, {result['updated_count']} updated, "
+            f"{result['skipped_count']} unchanged, {result['error_count']} errors"
+        )
+        return result
+    
+    def _apply_ebay_updates(self, existing_orders, parsed, user=None):
+        """Copy changed eBay payment/tracking/terminal status onto existing orders in memory."""
+        now = timezone.now()
+        changed_orders = []
+        changed_fields = set()
+        history = []
+        for order_id, order in existing_orders.items():
+            order_data, _ = parsed[order_id]
+            fields = set()
             
-            # Parse and create order items
-            items = self.parse_order_items(ebay_order)
+            if order_data['payment_status'] != order.payment_status:
+                order.payment_status = order_data['payment_status']
+                fields.add('payment_status')
+            for field in ('tracking_number', 'carrier', 'shipped_date'):
+                value = order_data.get(field)
+                if value and value != getattr(order, field):
+                    setattr(order, field, value)
+                    fields.add(field)
             
-            for item_data in items:
-                # Try to find matching product by SKU
-                product = None
-                if item_data['sku']:
-                    product = Product.objects.filter(sku=item_data['sku']).first()
-                
-                OrderItem.objects.create(
+            # WIMS owns the warehouse workflow; eBay may only close an order out.
+            new_status = order_data['order_status']
+            if (
+                new_status in (Order.STATUS_SHIPPED, Order.STATUS_CANCELLED)
+                and order.order_status not in (Order.STATUS_SHIPPED, Order.STATUS_CANCELLED)
+            ):
+                history.append(OrderStatusHistory(
                     order=order,
-                    product=product,
-                    sku=item_data['sku'] if not product else None,
-                    product_name=item_data['title'],
-                    quantity_ordered=item_data['quantity'],
-                    unit_price=item_data['unit_price'],
-                    line_total=item_data['total_price'],
-                    ebay_item_id=item_data['ebay_item_id']
-                )
-            
-            logger.info(f"Successfully synced eBay order {order_id} to database as {order.order_number}")
-            return order, True
+                    from_status=order.order_status,
+                    to_status=new_status,
+                    changed_by=user,
+                    change_reason=f"Order status synced from eBay ({new_status})",
+                ))
+                order.order_status = new_status
+                fields.add('order_status')
             
-        except Exception as e:
-            logger.error(f"Error syncing eBay order to database: {str(e)}")
-            raise
+            if fields:
+                order.updated_at = now
+                changed_orders.append(order)
+                changed_fields |= fields
+        return changed_orders, changed_fields, history
     
+    def sync_orders(self, days_back=None, order_status=None, user=None, incremental=True):
+        """
+        Fetch eBay orders and upsert them to the database in one batch
+
+        When ``days_back`` is not given and a watermark exists for this account,
+        only orders modified since the last fully synced window are fetched.
+
+        Returns:
+            dict: fetched/created/skipped/error counts, pages, timing and per-order errors
+        """
+        started = time.monotonic()
+        state, _ = EbaySyncState.objects.get_or_create(account=EbayConfig.ACCOUNT)
+        mod_time_from = None
+        if incremental and days_back is None and state.mod_time_watermark:
+            oldest_allowed = timezone.now() - timedelta(days=EbayConfig.MAX_MOD_TIME_DAYS) + timedelta(minutes=1)
+            mod_time_from = max(
+                state.mod_time_watermark - timedelta(minutes=EbayConfig.MOD_TIME_OVERLAP_MINUTES),
+                oldest_allowed,
+            )
+
+        ebay_orders = self.fetch_orders(
+            days_back=days_back,
+            order_status=order_status,
+            mod_time_from=mod_time_from,
+        )
+        result = {
+            'mode': 'incremental' if mod_time_from else 'window',
+            'mod_time_from': mod_time_from,
+            'pages_fetched': self.last_fetch_stats.get('pages', 0),
+            'fetch_seconds': self.last_fetch_stats.get('seconds', 0),
+            'fetched_count': len(ebay_orders),
+            'created_count': 0,
+            'updated_count': 0,
+            'skipped_count': 0,
+            'error_count': 0,
+            'errors': [],
+        }
+        try:
+            batch_result = self.sync_orders_batch(ebay_orders, user=user)
+        except Exception as e:
+            logger.exception('Error writing eBay order batch')
+            batch_result = {
+                'created_count': 0,
+                'updated_count': 0,
+                'skipped_count': 0,
+                'error_count': len(ebay_orders),
+                'errors': [{'order_id': 'batch', 'error': str(e)}],
+            }
+        for key in ('created_count', 'updated_count', 'skipped_count', 'error_count', 'errors'):
+            result[key] = batch_result[key]
+
+        result['total_seconds'] = round(time.monotonic() - started, 3)
+        state.last_synced_at = timezone.now()
+        state.last_pages_fetched = result['pages_fetched']
+        state.last_orders_fetched = result['fetched_count']
+        state.last_duration_seconds = result['total_seconds']
+        update_fields = ['last_synced_at', 'last_pages_fetched', 'last_orders_fetched', 'last_duration_seconds', 'updated_at']
+        # Only advance the watermark when every order in the window landed; failures are retried next run.
+        if not result['error_count']:
+            state.mod_time_watermark = self.last_fetch_stats.get('window_end')
+            update_fields.append('mod_time_watermark')
+        state.save(update_fields=update_fields)
+        result['mod_time_watermark'] = state.mod_time_watermark
+        return result
+
     def _map_ebay_status(self, ebay_status):
         """Map eBay order status to our Order status"""
         status_map = {
@@ -297,6 +512,20 @@ class EbayService:
         try:
             # eBay uses ISO 8601 format
             dt = datetime.strptime(date_string, '%Y-%m-%dT%H:%M:%S.%fZ')
-            return timezone.make_aware(dt, timezone.utc)
+            return timezone.make_aware(dt, dt_timezone.utc)
         except (ValueError, TypeError):
             return None
+
+
+def _ebay_time(value):
+    """Format a datetime for the Trading API (UTC, ISO 8601)."""
+    if timezone.is_aware(value):
+        value = value.astimezone(dt_timezone.utc)
+    return value.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+
+def _as_list(value):
+    """Trading API returns a single element as a dict and repeated elements as a list."""
+    if not value:
+        return []
+    return value if isinstance(value, list) else [value]
@@ -0,0 +1,217 @@
+import logging
+import random
+import threading
+import time
+from datetime import timezone as dt_timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+
+logger = logging.getLogger(__name__)
+
+
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+# Statuses that mean the courier did not process the request, so even a
+# non-idempotent POST (e.g. creating a shipment) is safe to send again.
+NOT_PROCESSED_STATUS_CODES = frozenset({429, 503})
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+
+
+class CourierHTTPTransport:
+    """
+    Shared HTTP transport for the courier and Tiaknight clients.
+
+    Keeps one pooled keep-alive ``requests.Session`` per host, retries 429/5xx
+    responses and connection errors with jittered exponential backoff (honouring
+    ``Retry-After``), and records per-host latency counters.
+
+    POST/PATCH requests are only retried when the request never reached the
+    server or the server says it did not process it (429/503), unless the caller
+    passes ``idempotent=True`` (token requests). ``max_retries=0`` turns retries
+    off for one call while keeping its latency counted.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_retries=2,
+        backoff_seconds=0.5,
+        max_backoff_seconds=10,
+        pool_maxsize=10,
+        sleep=time.sleep,
+    ):
+        self.max_retries = max(0, int(max_retries))
+        self.backoff_seconds = max(0, float(backoff_seconds))
+        self.max_backoff_seconds = max(0, float(max_backoff_seconds))
+        self.pool_maxsize = max(1, int(pool_maxsize))
+        self.sleep = sleep
+        self._sessions = {}
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            max_retries=settings.COURIER_HTTP_MAX_RETRIES,
+            backoff_seconds=settings.COURIER_HTTP_BACKOFF_SECONDS,
+            max_backoff_seconds=settings.COURIER_HTTP_MAX_BACKOFF_SECONDS,
+            pool_maxsize=settings.COURIER_HTTP_POOL_MAXSIZE,
+        )
+
+    def session_for(self, url):
+        """Return the pooled session for ``url``'s scheme and host."""
+        key = _host_key(url)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=0)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._sessions[key] = session
+            return session
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def request(self, method, url, *, idempotent=None, max_retries=None, **kwargs):
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        max_retries = self.max_retries if max_retries is None else max(0, int(max_retries))
+        session = self.session_for(url)
+        host = _host_key(url)
+
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            try:
+                response = session.request(method, url, **kwargs)
+            except requests.RequestException as exc:
+                self._record(host, time.monotonic() - started, error=True)
+                retryable = idempotent or isinstance(exc, requests.ConnectTimeout)
+                if not retryable or attempt >= max_retries:
+                    raise
+                delay = self.backoff_delay(attempt)
+                logger.warning('%s %s failed (%s); retrying in %.2fs', method, url, exc, delay)
+            else:
+                elapsed = time.monotonic() - started
+                self._record(host, elapsed)
+                logger.debug('%s %s -> HTTP %s in %.3fs', method, url, response.status_code, elapsed)
+                retryable_statuses = RETRY_STATUS_CODES if idempotent else NOT_PROCESSED_STATUS_CODES
+                if response.status_code not in retryable_statuses or attempt >= max_retries:
+                    return response
+                delay = self.retry_delay(response, attempt)
+                if delay is None:
+                    return response
+                logger.warning(
+                    '%s %s returned HTTP %s; retrying in %.2fs',
+                    method, url, response.status_code, delay,
+                )
+                response.close()
+
+            attempt += 1
+            self._record_retry(host)
+            self.sleep(delay)
+
+    def backoff_delay(self, attempt):
+        """Full-jitter exponential backoff for retry ``attempt`` (0-based)."""
+        ceiling = min(self.max_backoff_seconds, self.backoff_seconds * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    def retry_delay(self, response, attempt):
+        """Delay before retrying ``response``; None when Retry-After exceeds the backoff cap."""
+        retry_after = _parse_retry_after(response.headers.get('Retry-After'))
+        if retry_after is None:
+            return self.backoff_delay(attempt)
+        if retry_after > self.max_backoff_seconds:
+            return None
+        return retry_after
+
+    def metrics(self):
+        with self._lock:
+            snapshot = {}
+            for host, counters in self._metrics.items():
+                row = dict(counters)
+                row['avg_seconds'] = round(row['total_seconds'] / row['requests'], 4) if row['requests'] else 0
+                row['total_seconds'] = round(row['total_seconds'], 4)
+                row['max_seconds'] = round(row['max_seconds'], 4)
+                snapshot[host] = row
+            return snapshot
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+    def _counters(self, host):
+        return self._metrics.setdefault(host, {
+            'requests': 0,
+            'errors': 0,
+            'retries': 0,
+            'total_seconds': 0.0,
+            'max_seconds': 0.0,
+        })
+
+    def _record(self, host, elapsed, error=False):
+        with self._lock:
+            counters = self._counters(host)
+            counters['requests'] += 1
+            counters['total_seconds'] += elapsed
+            counters['max_seconds'] = max(counters['max_seconds'], elapsed)
+            if error:
+                counters['errors'] += 1
+
+    def _record_retry(self, host):
+        with self._lock:
+            self._counters(host)['retries'] += 1
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    """Return the process-wide courier transport, creating it from settings on first use."""
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = CourierHTTPTransport.from_settings()
+    return _transport
+
+
+def _host_key(url):
+    parts = urlsplit(url)
+    return f'{parts.scheme}://{parts.netloc}'.lower()
+
+
+def _parse_retry_after(value):
+    if not value:
+        return None
+    value = str(value).strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    if timezone.is_naive(retry_at):
+        retry_at = timezone.make_aware(retry_at, dt_timezone.utc)
+    return max(0.0, (retry_at - timezone.now()).total_seconds())
@@ -0,0 +1,229 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from orders.models import ImporterStatus
+from orders.services.remote_tiaknight_import import RemoteTiaknightFetchError
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_LOCK_TTL_SECONDS = 2 * 60 * 60
+DEFAULT_BACKOFF_SECONDS = 60
+DEFAULT_MAX_BACKOFF_SECONDS = 60 * 60
+
+
+class ImporterLockedError(RuntimeError):
+    pass
+
+
+@dataclass
+class ImporterSource:
+    """A schedulable importer: ``run`` returns a dict of counts for the status row."""
+
+    name: str
+    run: callable
+    interval_seconds: int
+    backoff_exceptions: tuple = ()
+
+
+def _owner_id():
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+def acquire_importer_lock(source, owner, ttl_seconds=DEFAULT_LOCK_TTL_SECONDS):
+    """Claim the per-source lock row; returns False while another run holds it."""
+    ImporterStatus.objects.get_or_create(source=source)
+    now = timezone.now()
+    claimed = ImporterStatus.objects.filter(source=source).filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lte=now) | Q(lock_owner=owner)
+    ).update(lock_owner=owner, locked_until=now + timedelta(seconds=ttl_seconds))
+    return bool(claimed)
+
+
+def release_importer_lock(source, owner):
+    ImporterStatus.objects.filter(source=source, lock_owner=owner).update(
+        lock_owner='',
+        locked_until=None,
+    )
+
+
+def backoff_delay(consecutive_failures, base_seconds=DEFAULT_BACKOFF_SECONDS, max_seconds=DEFAULT_MAX_BACKOFF_SECONDS):
+    if consecutive_failures <= 0:
+        return 0
+    return min(max_seconds, base_seconds * (2 ** (consecutive_failures - 1)))
+
+
+def run_importer(
+    source,
+    *,
+    owner=None,
+    lock_ttl_seconds=DEFAULT_LOCK_TTL_SECONDS,
+    backoff_seconds=DEFAULT_BACKOFF_SECONDS,
+    max_backoff_seconds=DEFAULT_MAX_BACKOFF_SECONDS,
+):
+    """
+    Run one importer under its overlap lock and record the outcome.
+
+    Returns the refreshed ``ImporterStatus`` row. Raises ``ImporterLockedError``
+    when a previous run (from the scheduler, cron or the API) still holds the lock.
+    """
+    owner = owner or _owner_id()
+    if not acquire_importer_lock(source.name, owner, ttl_seconds=lock_ttl_seconds):
+        # last_result belongs to the run holding the lock; only count the skip.
+        ImporterStatus.objects.filter(source=source.name).update(
+            skipped_count=F('skipped_count') + 1,
+            last_skipped_at=timezone.now(),
+        )
+        raise ImporterLockedError(f'{source.name} importer is already running')
+
+    started_at = timezone.now()
+    started_clock = time.monotonic()
+    ImporterStatus.objects.filter(source=source.name).update(last_started_at=started_at)
+    try:
+        counts = source.run() or {}
+    except Exception as exc:
+        duration = time.monotonic() - started_clock
+        status_row = ImporterStatus.objects.get(source=source.name)
+        failures = status_row.consecutive_failures + 1
+        if isinstance(exc, source.backoff_exceptions):
+            delay = backoff_delay(failures, backoff_seconds, max_backoff_seconds)
+        else:
+            delay = source.interval_seconds
+        finished_at = timezone.now()
+        ImporterStatus.objects.filter(source=source.name).update(
+            last_finished_at=finished_at,
+            last_duration_seconds=round(duration, 3),
+            last_result=ImporterStatus.RESULT_FAILED,
+            last_error=str(exc),
+            last_counts={},
+            next_run_at=finished_at + timedelta(seconds=delay),
+            consecutive_failures=failures,
+            run_count=F('run_count') + 1,
+            failure_count=F('failure_count') + 1,
+        )
+        logger.exception('%s importer failed; next run in %ss', source.name, delay)
+    else:
+        duration = time.monotonic() - started_clock
+        finished_at = timezone.now()
+        ImporterStatus.objects.filter(source=source.name).update(
+            last_finished_at=finished_at,
+            last_duration_seconds=round(duration, 3),
+            last_result=ImporterStatus.RESULT_SUCCESS,
+            last_error=None,
+            last_counts=counts,
+            last_success_at=finished_at,
+            next_run_at=finished_at + timedelta(seconds=source.interval_seconds),
+            consecutive_failures=0,
+            run_count=F('run_count') + 1,
+        )
+        logger.info('%s importer finished in %.2fs: %s', source.name, duration, counts)
+    finally:
+        release_importer_lock(source.name, owner)
+
+    return ImporterStatus.objects.get(source=source.name)
+
+
+def run_tiaknight_import():
+    from orders.services.remote_tiaknight_import import import_remote_tiaknight_orders
+
+    result = import_remote_tiaknight_orders(user=None)
+    return {
+        'orders_received': result.get('received_order_refs_count', 0),
+        'orders_created': result['created_count'],
+        'orders_failed': result['failed_count'],
+        'missing_sequence_order_refs': len(result.get('missing_sequence_order_refs', [])),
+    }
+
+
+def run_ebay_import():
+    from orders.services.ebay_service import EbayService
+
+    result = EbayService().sync_orders()
+    return {
+        'pages_fetched': result['pages_fetched'],
+        'orders_received': result['fetched_count'],
+        'orders_created': result['created_count'],
+        'orders_skipped': result['skipped_count'],
+        'orders_failed': result['error_count'],
+    }
+
+
+def default_sources(tiaknight_interval_seconds=3600, ebay_interval_seconds=3600):
+    return {
+        ImporterStatus.SOURCE_TIAKNIGHT: ImporterSource(
+            name=ImporterStatus.SOURCE_TIAKNIGHT,
+            run=run_tiaknight_import,
+            interval_seconds=tiaknight_interval_seconds,
+            backoff_exceptions=(RemoteTiaknightFetchError,),
+        ),
+        ImporterStatus.SOURCE_EBAY: ImporterSource(
+            name=ImporterStatus.SOURCE_EBAY,
+            run=run_ebay_import,
+            interval_seconds=ebay_interval_seconds,
+        ),
+    }
+
+
+class ImportScheduler:
+    """Runs importer sources in one long-lived process at their configured intervals."""
+
+    def __init__(self, sources, *, poll_seconds=5, stdout=None, **run_options):
+        self.sources = list(sources)
+        self.poll_seconds = poll_seconds
+        self.run_options = run_options
+        self.owner = _owner_id()
+        self.stop_event = threading.Event()
+        self.stdout = stdout
+
+    def stop(self, *args):
+        self.stop_event.set()
+
+    def due_sources(self, now=None):
+        now = now or timezone.now()
+        next_runs = dict(
+            ImporterStatus.objects.filter(
+                source__in=[source.name for source in self.sources]
+            ).values_list('source', 'next_run_at')
+        )
+        return [
+            source for source in self.sources
+            if not next_runs.get(source.name) or next_runs[source.name] <= now
+        ]
+
+    def run_pending(self):
+        ran = []
+        for source in self.due_sources():
+            if self.stop_event.is_set():
+                break
+            close_old_connections()
+            try:
+                status_row = run_importer(source, owner=self.owner, **self.run_options)
+            except ImporterLockedError as exc:
+                self._write(f'{exc}; skipping this tick.')
+                continue
+            ran.append(status_row)
+            self._write(
+                f'{source.name}: {status_row.last_result} in {status_row.last_duration_seconds}s '
+                f'counts={status_row.last_counts} next_run_at={status_row.next_run_at:%Y-%m-%d %H:%M:%S %Z}'
+            )
+        return ran
+
+    def run_forever(self):
+        while not self.stop_event.is_set():
+            self.run_pending()
+            close_old_connections()
+            self.stop_event.wait(self.poll_seconds)
+
+    def _write(self, message):
+        if self.stdout is not None:
+            self.stdout.write(f'[{timezone.localtime():%Y-%m-%d %H:%M:%S %Z}] {message}')
@@ -0,0 +1,246 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import timedelta
+from importlib import import_module
+
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from orders.models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_LOCK_TTL_SECONDS = 15 * 60
+DEFAULT_FLUSH_SECONDS = 1.0
+
+JOB_HANDLERS = {}
+# Modules that register handlers with ``register_job_handler`` on import.
+HANDLER_MODULES = (
+    'orders.services.shipment_booking',
+)
+
+
+class JobLockLostError(RuntimeError):
+    pass
+
+
+def register_job_handler(job_type):
+    """Register ``handler(job, progress)`` as the runner for ``job_type``."""
+    def decorator(handler):
+        JOB_HANDLERS[job_type] = handler
+        return handler
+    return decorator
+
+
+def load_job_handlers():
+    for module in HANDLER_MODULES:
+        import_module(module)
+    return JOB_HANDLERS
+
+
+def _owner_id():
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+def enqueue_job(job_type, params, *, total_count=0, user=None):
+    if job_type not in dict(BackgroundJob.TYPE_CHOICES):
+        raise ValueError(f'Unknown job type: {job_type}')
+    return BackgroundJob.objects.create(
+        job_type=job_type,
+        params=params,
+        total_count=total_count,
+        created_by=user,
+    )
+
+
+def _claimable(now):
+    # Running jobs whose lock expired were left by a crashed worker and are picked up again.
+    return Q(status=BackgroundJob.STATUS_QUEUED) | Q(
+        status=BackgroundJob.STATUS_RUNNING,
+        locked_until__lte=now,
+    )
+
+
+def claim_next_job(owner, ttl_seconds=DEFAULT_LOCK_TTL_SECONDS, job_types=None):
+    """Lock and return the oldest runnable job, or None when the queue is empty."""
+    now = timezone.now()
+    candidates = BackgroundJob.objects.filter(_claimable(now))
+    if job_types:
+        candidates = candidates.filter(job_type__in=job_types)
+    for job_id in candidates.order_by('created_at', 'id').values_list('id', flat=True)[:20]:
+        claimed = BackgroundJob.objects.filter(_claimable(now), id=job_id).update(
+            status=BackgroundJob.STATUS_RUNNING,
+            lock_owner=owner,
+            locked_until=now + timedelta(seconds=ttl_seconds),
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            job = BackgroundJob.objects.get(id=job_id)
+            if not job.started_at:
+                job.started_at = now
+                BackgroundJob.objects.filter(id=job_id).update(started_at=now)
+            return job
+    return None
+
+
+class JobProgress:
+    """
+    Thread-safe per-item outcome recorder for a running job.
+
+    Handlers call ``record`` from any thread; counters and results are written
+    to the job row at most every ``flush_seconds`` (and on ``flush``), and each
+    write also extends the job lock so long runs are not reclaimed.
+    """
+
+    def __init__(self, job, owner, *, ttl_seconds=DEFAULT_LOCK_TTL_SECONDS, flush_seconds=DEFAULT_FLUSH_SECONDS):
+        self.job = job
+        self.owner = owner
+        self.ttl_seconds = ttl_seconds
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+        self._done_keys = {
+            str(entry.get('key')) for entry in job.results
+            if isinstance(entry, dict) and entry.get('key') is not None
+        }
+
+    def is_done(self, key):
+        """True when ``key`` was recorded by an earlier attempt of this job."""
+        return str(key) in self._done_keys
+
+    def set_total(self, total_count):
+        with self._lock:
+            self.job.total_count = total_count
+
+    def record(self, key, outcome, **detail):
+        if outcome not in {'succeeded', 'failed', 'skipped'}:
+            raise ValueError(f'Unknown job outcome: {outcome}')
+        with self._lock:
+            self.job.results.append({'key': key, 'outcome': outcome, **detail})
+            self._done_keys.add(str(key))
+            self.job.processed_count += 1
+            counter = f'{outcome}_count'
+            setattr(self.job, counter, getattr(self.job, counter) + 1)
+        if time.monotonic() - self._last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            self._last_flush = time.monotonic()
+            updated = BackgroundJob.objects.filter(id=self.job.id, lock_owner=self.owner).update(
+                total_count=self.job.total_count,
+                processed_count=self.job.processed_count,
+                succeeded_count=self.job.succeeded_count,
+                failed_count=self.job.failed_count,
+                skipped_count=self.job.skipped_count,
+                results=list(self.job.results),
+                locked_until=timezone.now() + timedelta(seconds=self.ttl_seconds),
+                updated_at=timezone.now(),
+            )
+        if not updated:
+            raise JobLockLostError(f'Job {self.job.id} lock was taken over by another worker')
+
+
+def run_job(job, owner, *, ttl_seconds=DEFAULT_LOCK_TTL_SECONDS, flush_seconds=DEFAULT_FLUSH_SECONDS):
+    """
+    Run a claimed job's handler and record the outcome on the job row.
+
+    Handler exceptions mark the job FAILED with the error; per-item failures
+    recorded through ``progress`` leave it COMPLETED with ``failed_count`` set.
+    Returns the refreshed job.
+    """
+    handler = load_job_handlers().get(job.job_type)
+    progress = JobProgress(job, owner, ttl_seconds=ttl_seconds, flush_seconds=flush_seconds)
+    started_clock = time.monotonic()
+    try:
+        if handler is None:
+            raise ValueError(f'No handler registered for job type {job.job_type}')
+        handler(job, progress)
+        progress.flush()
+    except JobLockLostError:
+        logger.warning('Job %s was reclaimed by another worker; abandoning this run', job.id)
+        return BackgroundJob.objects.get(id=job.id)
+    except Exception as exc:
+        logger.exception('Job %s (%s) failed', job.id, job.job_type)
+        final_status = BackgroundJob.STATUS_FAILED
+        error = str(exc)
+    else:
+        final_status = BackgroundJob.STATUS_COMPLETED
+        error = None
+
+    BackgroundJob.objects.filter(id=job.id, lock_owner=owner).update(
+        status=final_status,
+        error=error,
+        total_count=job.total_count,
+        processed_count=job.processed_count,
+        succeeded_count=job.succeeded_count,
+        failed_count=job.failed_count,
+        skipped_count=job.skipped_count,
+        results=job.results,
+        lock_owner='',
+        locked_until=None,
+        finished_at=timezone.now(),
+    )
+    logger.info(
+        'Job %s (%s) %s in %.2fs: %s processed, %s failed',
+        job.id, job.job_type, final_status, time.monotonic() - started_clock,
+        job.processed_count, job.failed_count,
+    )
+    return BackgroundJob.objects.get(id=job.id)
+
+
+class JobRunner:
+    """Claims and runs queued background jobs one at a time in a long-lived process."""
+
+    def __init__(
+        self,
+        *,
+        job_types=None,
+        poll_seconds=2,
+        ttl_seconds=DEFAULT_LOCK_TTL_SECONDS,
+        flush_seconds=DEFAULT_FLUSH_SECONDS,
+        stdout=None,
+    ):
+        self.job_types = job_types
+        self.poll_seconds = poll_seconds
+        self.ttl_seconds = ttl_seconds
+        self.flush_seconds = flush_seconds
+        self.owner = _owner_id()
+        self.stop_event = threading.Event()
+        self.stdout = stdout
+
+    def stop(self, *args):
+        self.stop_event.set()
+
+    def run_pending(self):
+        """Run jobs until the queue is empty or the runner is stopped."""
+        ran = []
+        while not self.stop_event.is_set():
+            close_old_connections()
+            job = claim_next_job(self.owner, self.ttl_seconds, job_types=self.job_types)
+            if job is None:
+                break
+            self._write(f'Job {job.id} ({job.job_type}) started, attempt {job.attempts}')
+            job = run_job(job, self.owner, ttl_seconds=self.ttl_seconds, flush_seconds=self.flush_seconds)
+            ran.append(job)
+            self._write(
+                f'Job {job.id}: {job.status} processed={job.processed_count}/{job.total_count} '
+                f'succeeded={job.succeeded_count} failed={job.failed_count} skipped={job.skipped_count}'
+            )
+        return ran
+
+    def run_forever(self):
+        while not self.stop_event.is_set():
+            self.run_pending()
+            close_old_connections()
+            self.stop_event.wait(self.poll_seconds)
+
+    def _write(self, message):
+        if self.stdout is not None:
+            self.stdout.write(f'[{timezone.localtime():%Y-%m-%d %H:%M:%S %Z}] {message}')
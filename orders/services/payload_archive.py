@@ -0,0 +1,267 @@
+import fcntl
+import gzip
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+
+from django.utils import timezone
+
+
+INDEX_FILE_NAME = 'index.jsonl'
+SEGMENT_PREFIX = 'tiaknight_payloads'
+DEFAULT_SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_RETENTION_DAYS = 90
+
+
+class PayloadArchiveError(RuntimeError):
+    pass
+
+
+class PayloadNotFoundError(PayloadArchiveError):
+    pass
+
+
+class _GzipCodec:
+    name = 'gzip'
+    extension = 'gz'
+
+    def compress(self, data):
+        return gzip.compress(data, compresslevel=6)
+
+    def decompress(self, data):
+        return gzip.decompress(data)
+
+
+class _ZstdCodec:
+    name = 'zstd'
+    extension = 'zst'
+
+    def __init__(self):
+        try:
+            import zstandard
+        except ImportError as exc:
+            raise PayloadArchiveError(
+                'TIA_RAW_PAYLOAD_COMPRESSION=zstd requires the zstandard package'
+            ) from exc
+        self._compressor = zstandard.ZstdCompressor(level=10)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def decompress(self, data):
+        return self._decompressor.decompress(data)
+
+
+def get_codec(name):
+    name = (name or 'gzip').strip().lower()
+    if name in {'gzip', 'gz'}:
+        return _GzipCodec()
+    if name in {'zstd', 'zst'}:
+        return _ZstdCodec()
+    raise PayloadArchiveError(f'Unsupported payload compression: {name}')
+
+
+class TiaknightPayloadArchive:
+    """
+    Append-only archive of raw Tiaknight order payloads.
+
+    Each payload is compressed on its own and appended to a day-rotated segment
+    file (rolled over again once it passes ``segment_max_bytes``). ``index.jsonl``
+    maps request ids and order refs to ``(segment, offset, length)`` so a single
+    payload can be read back without decompressing the whole segment.
+
+    Segment and index writes hold an exclusive ``flock`` on ``index.jsonl.lock``
+    so overlapping importer runs cannot interleave lines or lose entries while
+    ``prune`` rewrites the index.
+    """
+
+    def __init__(
+        self,
+        root_dir,
+        *,
+        compression='gzip',
+        segment_max_bytes=DEFAULT_SEGMENT_MAX_BYTES,
+        retention_days=DEFAULT_RETENTION_DAYS,
+    ):
+        self.root_dir = Path(root_dir)
+        self.codec = get_codec(compression)
+        self.segment_max_bytes = max(0, int(segment_max_bytes or 0))
+        self.retention_days = max(0, int(retention_days or 0))
+
+    @classmethod
+    def from_env(cls, root_dir=None):
+        return cls(
+            root_dir or os.environ.get('TIA_RAW_PAYLOAD_DIR', 'logs/tiaknight_payloads'),
+            compression=os.environ.get('TIA_RAW_PAYLOAD_COMPRESSION', 'gzip'),
+            segment_max_bytes=_env_int(
+                os.environ.get('TIA_RAW_PAYLOAD_SEGMENT_MAX_BYTES'),
+                DEFAULT_SEGMENT_MAX_BYTES,
+            ),
+            retention_days=_env_int(
+                os.environ.get('TIA_RAW_PAYLOAD_RETENTION_DAYS'),
+                DEFAULT_RETENTION_DAYS,
+            ),
+        )
+
+    @property
+    def index_path(self):
+        return self.root_dir / INDEX_FILE_NAME
+
+    def append(self, payload, *, request_id=None, order_refs=None):
+        """Compress and append one payload, returning its index entry."""
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        now = timezone.now()
+        compressed = self.codec.compress(payload)
+
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+        with file_lock(self.index_path):
+            segment_path = self._writable_segment(now, len(compressed))
+            with segment_path.open('ab') as segment:
+                offset = segment.tell()
+                segment.write(compressed)
+
+            entry = {
+                'request_id': str(request_id) if request_id else None,
+                'archived_at': now.isoformat(),
+                'segment': segment_path.name,
+                'offset': offset,
+                'length': len(compressed),
+                'size': len(payload),
+                'codec': self.codec.name,
+                'sha256': hashlib.sha256(payload).hexdigest(),
+                'order_refs': list(order_refs or []),
+            }
+            with self.index_path.open('a', encoding='utf-8') as index_file:
+                index_file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+
+        self.prune(now=now)
+        return entry
+
+    def entries(self):
+        if not self.index_path.exists():
+            return []
+        entries = []
+        with self.index_path.open('r', encoding='utf-8') as index_file:
+            for line in index_file:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return entries
+
+    def find(self, *, request_id=None, order_ref=None):
+        """Return the newest index entry matching a request id or order ref."""
+        for entry in reversed(self.entries()):
+            if request_id and entry.get('request_id') == str(request_id):
+                return entry
+            if order_ref and order_ref in (entry.get('order_refs') or []):
+                return entry
+        target = request_id or order_ref
+        raise PayloadNotFoundError(f'No archived Tiaknight payload found for {target}')
+
+    def read_entry(self, entry):
+        segment_path = self.root_dir / entry['segment']
+        if not segment_path.exists():
+            raise PayloadNotFoundError(f"Archive segment {entry['segment']} no longer exists")
+        with segment_path.open('rb') as segment:
+            segment.seek(entry['offset'])
+            compressed = segment.read(entry['length'])
+        payload = get_codec(entry.get('codec')).decompress(compressed)
+        if entry.get('sha256') and hashlib.sha256(payload).hexdigest() != entry['sha256']:
+            raise PayloadArchiveError(
+                f"Archived payload checksum mismatch in {entry['segment']} at offset {entry['offset']}"
+            )
+        return payload.decode('utf-8')
+
+    def read(self, *, request_id=None, order_ref=None):
+        return self.read_entry(self.find(request_id=request_id, order_ref=order_ref))
+
+    def prune(self, now=None):
+        """Delete segments older than the retention window and drop their index rows."""
+        if not self.retention_days or not self.root_dir.exists():
+            return []
+        now = now or timezone.now()
+        cutoff = (timezone.localtime(now) - timedelta(days=self.retention_days)).strftime('%Y%m%d')
+
+        expired = set()
+        for segment_path in self.root_dir.glob(f'{SEGMENT_PREFIX}_*'):
+            segment_day = _segment_day(segment_path.name)
+            if segment_day and segment_day < cutoff:
+                expired.add(segment_path.name)
+        if not expired:
+            return []
+
+        with file_lock(self.index_path):
+            kept = [entry for entry in self.entries() if entry.get('segment') not in expired]
+            tmp_path = self.index_path.with_suffix('.jsonl.tmp')
+            with tmp_path.open('w', encoding='utf-8') as index_file:
+                for entry in kept:
+                    index_file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+            os.replace(tmp_path, self.index_path)
+
+            for name in expired:
+                try:
+                    (self.root_dir / name).unlink()
+                except FileNotFoundError:
+                    pass
+        return sorted(expired)
+
+    def _writable_segment(self, now, incoming_bytes):
+        day = timezone.localtime(now).strftime('%Y%m%d')
+        sequence = 1
+        existing = sorted(self.root_dir.glob(f'{SEGMENT_PREFIX}_{day}_*.{self.codec.extension}'))
+        if existing:
+            latest = existing[-1]
+            sequence = _segment_sequence(latest.name) or 1
+            size = latest.stat().st_size
+            if self.segment_max_bytes and size and size + incoming_bytes > self.segment_max_bytes:
+                sequence += 1
+        return self.root_dir / f'{SEGMENT_PREFIX}_{day}_{sequence:03d}.{self.codec.extension}'
+
+
+@contextmanager
+def file_lock(path):
+    """
+    Hold an exclusive ``flock`` on ``<path>.lock`` for the block.
+
+    The lock lives in a sibling file because ``path`` itself may be replaced
+    with ``os.replace`` while it is held.
+    """
+    lock_path = Path(f'{path}.lock')
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with lock_path.open('a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _segment_day(name):
+    parts = name.split('.', 1)[0].split('_')
+    if len(parts) < 4 or not parts[-2].isdigit():
+        return None
+    return parts[-2]
+
+
+def _segment_sequence(name):
+    parts = name.split('.', 1)[0].split('_')
+    try:
+        return int(parts[-1])
+    except (IndexError, ValueError):
+        return None
+
+
+def _env_int(value, default):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
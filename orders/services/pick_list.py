@@ -0,0 +1,206 @@
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Min, Sum
+from django.utils import timezone
+
+from orders.models import OrderItem
+from stock.models import StockItem
+from stock.services.sku_resolver import sku_resolver
+
+
+PICK_LIST_CACHE_KEY = 'order_batch:{batch_id}:pick_list'
+
+# Zone letters, then aisle and bay numbers: "A-03-12", "B0412", "C 4".
+LOCATION_CODE_PATTERN = re.compile(r'^\s*([A-Za-z]*)[\s\-_/.]*(\d*)[\s\-_/.]*(\d*)')
+
+STOCK_LOCATION_FIELDS = {
+    'primary_location_id': 'stock_item__primary_location_id',
+    'primary_location_name': 'stock_item__primary_location__name',
+    'secondary_location_id': 'stock_item__secondary_location_id',
+    'secondary_location_name': 'stock_item__secondary_location__name',
+    'warehouse_location': 'stock_item__warehouse_location',
+}
+
+
+def pick_list_cache_key(batch_id):
+    return PICK_LIST_CACHE_KEY.format(batch_id=batch_id)
+
+
+def batch_pick_list(batch, refresh=False):
+    """
+    The batch's pick list, cached for at most ``PICK_LIST_CACHE_SECONDS``.
+
+    The cache is dropped when the batch's order set changes, when one of its
+    orders is soft-deleted or restored, and when an item is added, deleted
+    or saved with a quantity, SKU, stock item or name change. Moving a stock
+    item to another location does not drop it, so new locations show up
+    once the cache expires or on ``?refresh=true``.
+    """
+    key = pick_list_cache_key(batch.pk)
+    pick_list = None if refresh else cache.get(key)
+    if pick_list is None:
+        pick_list = build_pick_list(batch)
+        cache.set(key, pick_list, settings.PICK_LIST_CACHE_SECONDS)
+    return pick_list
+
+
+def invalidate_pick_list(batch_id):
+    key = pick_list_cache_key(batch_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def build_pick_list(batch):
+    """
+    One line per stock SKU across every order in the batch, in walk order.
+
+    Quantities are summed by the database in one grouped query that also
+    reads each stock item's locations. Lines not linked to a stock item are
+    matched through the SKU resolver. The walk is read from the primary
+    location's name, or ``warehouse_location`` when there is none; location
+    ids are generated ("LOC001") and say nothing about where a bin is.
+    Lines are sorted along the warehouse walk: zones in
+    ``PICK_WALK_ZONE_ORDER``, aisles in ascending order, and bays walked up
+    the first aisle visited, down the next and so on, so the picker never
+    walks an aisle twice. SKUs without a location come last.
+    """
+    rows = (
+        OrderItem.objects.filter(order__batch_links__batch=batch, order__is_deleted=False)
+        .values('stock_item_id', 'sku', *STOCK_LOCATION_FIELDS.values())
+        .annotate(
+            quantity=Sum('quantity'),
+            order_count=Count('order_id', distinct=True),
+            item_count=Count('id'),
+            product_name=Min('product_name'),
+        )
+        .order_by()
+    )
+
+    lines = {}
+    unlinked = []
+    for row in rows:
+        if row['stock_item_id'] is None:
+            unlinked.append(row)
+            continue
+        locations = {field: row[lookup] for field, lookup in STOCK_LOCATION_FIELDS.items()}
+        _add_to_line(lines, row['stock_item_id'], row, locations)
+
+    if unlinked:
+        resolved = sku_resolver.resolve_many(
+            {row['sku'] for row in unlinked},
+            queryset=StockItem.objects.select_related('primary_location', 'secondary_location'),
+        )
+        for row in unlinked:
+            stock_item = resolved.get(row['sku'])
+            if stock_item is None:
+                _add_to_line(lines, row['sku'] or '', row, dict.fromkeys(STOCK_LOCATION_FIELDS), linked=False)
+            else:
+                _add_to_line(lines, stock_item.pk, row, _stock_item_locations(stock_item))
+
+    zone_order = walk_zone_order()
+    ordered = walk_order(lines.values(), zone_order)
+    for sequence, line in enumerate(ordered, start=1):
+        line['sequence'] = sequence
+
+    return {
+        'batch_id': batch.pk,
+        'batch_name': batch.batch_name,
+        'walk_zone_order': zone_order,
+        'lines_count': len(ordered),
+        'total_quantity': sum(line['quantity'] for line in ordered),
+        'unlocated_count': sum(1 for line in ordered if line['location']['code'] is None),
+        'lines': ordered,
+        'generated_at': timezone.now(),
+    }
+
+
+def _stock_item_locations(stock_item):
+    return {
+        'primary_location_id': stock_item.primary_location_id,
+        'primary_location_name': stock_item.primary_location.name if stock_item.primary_location_id else None,
+        'secondary_location_id': stock_item.secondary_location_id,
+        'secondary_location_name': stock_item.secondary_location.name if stock_item.secondary_location_id else None,
+        'warehouse_location': stock_item.warehouse_location,
+    }
+
+
+def _add_to_line(lines, sku, row, locations, linked=True):
+    line = lines.get(sku)
+    if line is None:
+        code = (
+            (locations['primary_location_name'] or '').strip()
+            or (locations['warehouse_location'] or '').strip()
+            or None
+        )
+        zone, aisle, bay = parse_location_code(code)
+        lines[sku] = {
+            'sku': sku,
+            'product_name': row['product_name'],
+            'stock_item_linked': linked,
+            'quantity': row['quantity'] or 0,
+            'order_count': row['order_count'],
+            'item_count': row['item_count'],
+            'location': {
+                'code': code,
+                'id': locations['primary_location_id'],
+                'name': locations['primary_location_name'],
+                'zone': zone,
+                'aisle': aisle,
+                'bay': bay,
+            },
+            'secondary_location': (
+                {'code': locations['secondary_location_id'], 'name': locations['secondary_location_name']}
+                if locations['secondary_location_id'] else None
+            ),
+            'warehouse_location': locations['warehouse_location'],
+        }
+        return
+    # Several source SKUs resolved to one stock item. An order holding more
+    # than one of them is counted twice; the count is only a picking hint.
+    line['quantity'] += row['quantity'] or 0
+    line['order_count'] += row['order_count']
+    line['item_count'] += row['item_count']
+
+
+def walk_zone_order():
+    return [zone.strip().upper() for zone in settings.PICK_WALK_ZONE_ORDER.split(',') if zone.strip()]
+
+
+def parse_location_code(code):
+    """(zone, aisle, bay) from a location code; parts that are missing come back as None."""
+    match = LOCATION_CODE_PATTERN.match(code or '')
+    if not code or not match or not any(match.groups()):
+        return None, None, None
+    zone, aisle, bay = match.groups()
+    return zone.upper() or None, int(aisle) if aisle else None, int(bay) if bay else None
+
+
+def walk_order(lines, zone_order):
+    """``lines`` sorted along the serpentine walk through ``zone_order``."""
+    keys = {id(line): aisle_key(line['location']['code'], zone_order) for line in lines}
+    # Alternate direction on each aisle actually visited, not on aisle parity:
+    # a batch touching only aisles 1, 3 and 5 still walks up, down, up.
+    visited = sorted({key for key in keys.values() if key is not None})
+    directions = {key: 1 if index % 2 == 0 else -1 for index, key in enumerate(visited)}
+
+    def sort_key(line):
+        code = line['location']['code']
+        key = keys[id(line)]
+        if key is None:
+            return (1, (), 0, code or '', line['sku'])
+        bay = line['location']['bay'] if line['location']['bay'] is not None else 0
+        return (0, key, directions[key] * bay, code, line['sku'])
+
+    return sorted(lines, key=sort_key)
+
+
+def aisle_key(code, zone_order):
+    """Sort key of the aisle holding ``code``, or None when it has no usable location."""
+    zone, aisle, _bay = parse_location_code(code)
+    if code is None or (zone is None and aisle is None):
+        return None
+    zone_rank = zone_order.index(zone) if zone in zone_order else len(zone_order)
+    return (zone_rank, zone or '', aisle if aisle is not None else 0)
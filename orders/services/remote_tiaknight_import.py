@@ -1,12 +1,16 @@
+import functools
 import io
 import os
 import time
 import xml.etree.ElementTree as ET
+from datetime import timedelta
 from pathlib import Path
 
 from dotenv import load_dotenv
 from django.utils import timezone
 
+from orders.services.http_transport import get_transport
+from orders.services.payload_archive import DEFAULT_RETENTION_DAYS, TiaknightPayloadArchive, file_lock
 from orders.services.xml_parser import XMLOrderParser
 
 
@@ -35,6 +39,7 @@ def import_remote_tiaknight_orders(user=None):
     audit_log_path = os.environ.get('TIA_AUDIT_LOG_PATH', 'logs/remote_tiaknight_order_refs.log')
     save_raw_payload = _env_bool(os.environ.get('TIA_SAVE_RAW_PAYLOAD', 'false'))
     raw_payload_dir = os.environ.get('TIA_RAW_PAYLOAD_DIR', 'logs/tiaknight_payloads')
+    retention_days = _env_int(os.environ.get('TIA_RAW_PAYLOAD_RETENTION_DAYS'), DEFAULT_RETENTION_DAYS)
     gap_recovery_attempts = _env_int(os.environ.get('TIA_GAP_RECOVERY_ATTEMPTS'), 2)
     gap_recovery_delay_seconds = _env_float(os.environ.get('TIA_GAP_RECOVERY_DELAY_SECONDS'), 0)
     fetch_order_details = _env_bool(os.environ.get('TIA_FETCH_ORDER_DETAILS', 'true'))
@@ -46,10 +51,21 @@ def import_remote_tiaknight_orders(user=None):
         )
 
     try:
-        from scripts.soap_client import fetch_soap_response, fetch_order_response, extract_result_xml
+        from scripts.soap_client import (
+            extract_result_xml,
+            fetch_order_response,
+            fetch_soap_response,
+        )
     except Exception as exc:
         raise RemoteTiaknightFetchError(f'Could not import SOAP client: {exc}') from exc
 
+    # Send GetNewOrders, gap recovery and the per-order GetOrder detail calls
+    # through the courier transport: one pooled keep-alive session, per-call
+    # latency metrics, and retries for the read-only GetOrder calls only.
+    transport = get_transport()
+    fetch_soap_response = functools.partial(fetch_soap_response, transport=transport)
+    fetch_order_response = functools.partial(fetch_order_response, transport=transport)
+
     soap_bytes, http_status = _fetch_tiaknight_soap(
         fetch_soap_response,
         url=url,
@@ -102,6 +118,7 @@ def import_remote_tiaknight_orders(user=None):
             orders_xml_str,
             raw_payload_dir=raw_payload_dir,
             request_id=request_id,
+            order_refs=order_refs,
         )
     write_import_audit(
         audit_log_path=audit_log_path,
@@ -116,6 +133,7 @@ def import_remote_tiaknight_orders(user=None):
         recovery_fetches=recovery_fetches,
         detail_fetches=detail_fetches,
     )
+    prune_import_audit(audit_log_path, retention_days)
 
     parser = XMLOrderParser()
     xml_file = io.BytesIO(orders_xml_str.encode('utf-8'))
@@ -396,10 +414,51 @@ def write_import_audit(
         f"{detail_note}"
         f"{raw_payload_note}\n"
     )
-    with path.open('a', encoding='utf-8') as audit_log:
+    with file_lock(path), path.open('a', encoding='utf-8') as audit_log:
         audit_log.write(line)
 
 
+def prune_import_audit(audit_log_path, retention_days, now=None):
+    """
+    Drop audit lines older than ``retention_days``, returning how many went.
+
+    The highest ref per prefix among the dropped lines is kept in a single
+    ``pruned_before=`` line, so gap detection still starts from the last ref
+    ever received.
+    """
+    path = Path(audit_log_path)
+    if not retention_days or not path.exists():
+        return 0
+    now = now or timezone.now()
+    cutoff = (timezone.localtime(now) - timedelta(days=int(retention_days))).strftime('%Y-%m-%d')
+
+    with file_lock(path):
+        with path.open('r', encoding='utf-8') as audit_log:
+            first_day = _audit_line_day(audit_log.readline())
+        if not first_day or first_day >= cutoff:
+            return 0
+
+        kept = []
+        dropped = 0
+        max_by_prefix = {}
+        with path.open('r', encoding='utf-8') as audit_log:
+            for line in audit_log:
+                day = _audit_line_day(line)
+                if not day or day >= cutoff:
+                    kept.append(line)
+                    continue
+                dropped += 1
+                _merge_max_refs(max_by_prefix, line)
+
+        refs = ','.join(f'{prefix}{number}' for prefix, number in sorted(max_by_prefix.items())) or '-'
+        tmp_path = path.with_name(f'{path.name}.tmp')
+        with tmp_path.open('w', encoding='utf-8') as audit_log:
+            audit_log.write(f'[{cutoff} 00:00:00] pruned_before={cutoff} pruned_lines={dropped} refs={refs}\n')
+            audit_log.writelines(kept)
+        os.replace(tmp_path, path)
+    return dropped
+
+
 def detect_missing_sequence_refs(order_refs, audit_log_path):
     """Detect numeric order-reference gaps against current payload and previous audit max."""
     current = [_split_order_ref(ref) for ref in order_refs]
@@ -438,17 +497,28 @@ def _previous_max_refs_by_prefix(audit_log_path):
         return {}
 
     for line in lines:
-        refs_value = _audit_value(line, 'refs')
-        if not refs_value or refs_value == '-':
-            continue
-        for ref in refs_value.split(','):
-            prefix, number = _split_order_ref(ref.strip())
-            if not prefix or number is None:
-                continue
-            max_by_prefix[prefix] = max(number, max_by_prefix.get(prefix, number))
+        _merge_max_refs(max_by_prefix, line)
     return max_by_prefix
 
 
+def _merge_max_refs(max_by_prefix, line):
+    refs_value = _audit_value(line, 'refs')
+    if not refs_value or refs_value == '-':
+        return
+    for ref in refs_value.split(','):
+        prefix, number = _split_order_ref(ref.strip())
+        if not prefix or number is None:
+            continue
+        max_by_prefix[prefix] = max(number, max_by_prefix.get(prefix, number))
+
+
+def _audit_line_day(line):
+    day = line[1:11] if line.startswith('[') else ''
+    if len(day) != 10 or day[4] != '-' or day[7] != '-':
+        return None
+    return day
+
+
 def _audit_value(line, key):
     marker = f'{key}='
     start = line.find(marker)
@@ -474,15 +544,11 @@ def _split_order_ref(ref):
     return ref[:index], int(ref[index:])
 
 
-def write_raw_payload(orders_xml_str, *, raw_payload_dir, request_id=None):
-    """Optionally persist the raw embedded orders XML for deep audit."""
-    now = timezone.localtime()
-    safe_request_id = ''.join(ch for ch in str(request_id or 'no-request-id') if ch.isalnum() or ch in '-_')
-    payload_dir = Path(raw_payload_dir)
-    payload_dir.mkdir(parents=True, exist_ok=True)
-    path = payload_dir / f"tiaknight_orders_{now:%Y%m%d_%H%M%S}_{safe_request_id}.xml"
-    path.write_text(orders_xml_str, encoding='utf-8')
-    return str(path)
+def write_raw_payload(orders_xml_str, *, raw_payload_dir, request_id=None, order_refs=None):
+    """Optionally archive the raw embedded orders XML for deep audit and replay."""
+    archive = TiaknightPayloadArchive.from_env(raw_payload_dir)
+    entry = archive.append(orders_xml_str, request_id=request_id, order_refs=order_refs)
+    return f"{archive.root_dir / entry['segment']}@{entry['offset']}"
 
 
 def _find_text(element, tag):
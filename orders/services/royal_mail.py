@@ -1,20 +1,34 @@
 import base64
 import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
 from decimal import Decimal
 from urllib.parse import urlencode
 
 import requests
 from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Prefetch, Q, prefetch_related_objects
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
-from orders.models import RoyalMailOAuthToken
+from orders.models import Order, OrderItem, RoyalMailOAuthToken
 from orders.services.courier import courier_service_code
+from orders.services.http_transport import get_transport
 from products.serializers import get_product_weight_kg
 
 
 logger = logging.getLogger(__name__)
 
 
+# Bump when the cached shipping profile gains or changes fields.
+SHIPPING_PROFILE_VERSION = 1
+
+
 class RoyalMailConfigError(ValueError):
     pass
 
@@ -36,7 +50,7 @@ class RoyalMailOAuthError(RuntimeError):
 class RoyalMailOAuthClient:
     """OAuth helper for connecting WIMS to Royal Mail Click & Drop."""
 
-    def __init__(self, timeout=30):
+    def __init__(self, timeout=30, transport=None):
         self.client_id = settings.ROYAL_MAIL_CLIENT_ID
         self.client_secret = settings.ROYAL_MAIL_CLIENT_SECRET
         self.callback_url = settings.ROYAL_MAIL_OAUTH_CALLBACK_URL
@@ -44,6 +58,7 @@ class RoyalMailOAuthClient:
         self.token_url = settings.ROYAL_MAIL_OAUTH_TOKEN_URL
         self.scope = settings.ROYAL_MAIL_OAUTH_SCOPE
         self.timeout = timeout
+        self.transport = transport or get_transport()
 
     def ensure_configured(self):
         missing = []
@@ -98,22 +113,18 @@ class RoyalMailOAuthClient:
         })
 
     def get_valid_access_token(self):
-        token = RoyalMailOAuthToken.get_active()
-        if not token:
-            raise RoyalMailConfigError('Royal Mail OAuth is not connected')
-        if token.needs_refresh and token.refresh_token:
-            token = self.refresh_token(token)
-        if token.is_expired:
-            raise RoyalMailConfigError('Royal Mail OAuth token is expired; reconnect Royal Mail')
-        return token.access_token
+        if settings.ROYAL_MAIL_OAUTH_BACKGROUND_REFRESH:
+            royal_mail_token_cache.start_background_refresh(RoyalMailOAuthClient)
+        return royal_mail_token_cache.get_access_token(self)
 
     def _request_token(self, data):
         try:
-            response = requests.post(
+            response = self.transport.post(
                 self.token_url,
                 data=data,
                 headers={'Content-Type': 'application/x-www-form-urlencoded'},
                 timeout=self.timeout,
+                idempotent=True,
             )
         except requests.RequestException as exc:
             raise RoyalMailOAuthError(f'Royal Mail OAuth request failed: {exc}') from exc
@@ -143,7 +154,7 @@ class RoyalMailOAuthClient:
                 expires_at = None
 
         RoyalMailOAuthToken.objects.filter(is_active=True).update(is_active=False)
-        return RoyalMailOAuthToken.objects.create(
+        token = RoyalMailOAuthToken.objects.create(
             access_token=access_token,
             refresh_token=response_data.get('refresh_token'),
             token_type=response_data.get('token_type'),
@@ -152,6 +163,8 @@ class RoyalMailOAuthClient:
             raw_response=response_data,
             is_active=True,
         )
+        royal_mail_token_cache.invalidate()
+        return token
 
     def _parse_response(self, response):
         try:
@@ -160,13 +173,160 @@ class RoyalMailOAuthClient:
             return {'raw': response.text}
 
 
+class RoyalMailTokenCache:
+    """
+    Process-level cache of the active Royal Mail OAuth access token.
+
+    The cached token is trusted for ``recheck_seconds`` before its row version
+    (id + updated_at) is compared with the database again. Refreshes are
+    single-flight: a conditional update on ``refresh_locked_until`` lets one
+    worker refresh while the others keep using the still-valid token, or wait
+    for the new row when the old one has already expired.
+    """
+
+    def __init__(self, *, recheck_seconds=30, lock_ttl_seconds=30, wait_seconds=10, poll_seconds=0.2):
+        self.recheck_seconds = recheck_seconds
+        self.lock_ttl_seconds = lock_ttl_seconds
+        self.wait_seconds = wait_seconds
+        self.poll_seconds = poll_seconds
+        self._entry = None
+        self._lock = threading.Lock()
+        self._refresher = None
+        self._stop_event = threading.Event()
+
+    def get_access_token(self, client):
+        token = self._cached_access_token()
+        if token:
+            return token
+        with self._lock:
+            token = self._cached_access_token()
+            if token:
+                return token
+            active = RoyalMailOAuthToken.get_active()
+            if not active:
+                self._entry = None
+                raise RoyalMailConfigError('Royal Mail OAuth is not connected')
+            if active.needs_refresh and active.refresh_token:
+                active = self.refresh(client, active)
+            if active.is_expired:
+                self._entry = None
+                raise RoyalMailConfigError('Royal Mail OAuth token is expired; reconnect Royal Mail')
+            self._entry = {
+                'version': (active.pk, active.updated_at),
+                'access_token': active.access_token,
+                'expires_at': active.expires_at,
+                'checked_at': time.monotonic(),
+            }
+            return active.access_token
+
+    def invalidate(self):
+        self._entry = None
+
+    def refresh(self, client, token):
+        """Refresh ``token`` unless another worker is already doing it; returns the token to use."""
+        owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        now = timezone.now()
+        claimed = RoyalMailOAuthToken.objects.filter(pk=token.pk, is_active=True).filter(
+            Q(refresh_locked_until__isnull=True) | Q(refresh_locked_until__lte=now)
+        ).update(
+            refresh_lock_owner=owner,
+            refresh_locked_until=now + timezone.timedelta(seconds=self.lock_ttl_seconds),
+        )
+        if claimed:
+            try:
+                current = RoyalMailOAuthToken.get_active()
+                if current and (current.pk != token.pk or not current.needs_refresh):
+                    return current
+                logger.info('Refreshing Royal Mail OAuth token expiring at %s', token.expires_at)
+                return client.refresh_token(token)
+            finally:
+                RoyalMailOAuthToken.objects.filter(pk=token.pk, refresh_lock_owner=owner).update(
+                    refresh_lock_owner='',
+                    refresh_locked_until=None,
+                )
+
+        if not token.is_expired:
+            return token
+
+        deadline = time.monotonic() + self.wait_seconds
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_seconds)
+            current = RoyalMailOAuthToken.get_active()
+            if current is None:
+                raise RoyalMailConfigError('Royal Mail OAuth is not connected')
+            if current.pk != token.pk:
+                return current
+        return token
+
+    def start_background_refresh(self, client_factory):
+        """Start a daemon thread that refreshes the token shortly before it needs refreshing."""
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+        with self._lock:
+            if self._refresher is not None and self._refresher.is_alive():
+                return
+            self._stop_event.clear()
+            self._refresher = threading.Thread(
+                target=self._refresh_loop,
+                args=(client_factory,),
+                name='royal-mail-oauth-refresh',
+                daemon=True,
+            )
+            self._refresher.start()
+
+    def stop_background_refresh(self):
+        self._stop_event.set()
+
+    def _refresh_loop(self, client_factory):
+        while not self._stop_event.is_set():
+            delay = 300
+            try:
+                close_old_connections()
+                token = RoyalMailOAuthToken.get_active()
+                if token and token.expires_at and token.refresh_token:
+                    if token.needs_refresh:
+                        self.refresh(client_factory(), token)
+                        self.invalidate()
+                        delay = self.recheck_seconds
+                    else:
+                        # needs_refresh flips five minutes before expiry; wake just after that.
+                        refresh_at = token.expires_at - timezone.timedelta(minutes=5)
+                        delay = min(300, max(1, (refresh_at - timezone.now()).total_seconds() + 1))
+            except Exception:
+                logger.exception('Background Royal Mail OAuth token refresh failed')
+                delay = 60
+            finally:
+                close_old_connections()
+            self._stop_event.wait(delay)
+
+    def _cached_access_token(self):
+        entry = self._entry
+        if not entry:
+            return None
+        if entry['expires_at'] and entry['expires_at'] <= timezone.now() + timezone.timedelta(minutes=5):
+            return None
+        if time.monotonic() - entry['checked_at'] < self.recheck_seconds:
+            return entry['access_token']
+        version = RoyalMailOAuthToken.objects.filter(is_active=True).order_by('-updated_at').values_list(
+            'pk', 'updated_at',
+        ).first()
+        if version != entry['version']:
+            return None
+        entry['checked_at'] = time.monotonic()
+        return entry['access_token']
+
+
+royal_mail_token_cache = RoyalMailTokenCache()
+
+
 class RoyalMailClickDropClient:
     """Client for Royal Mail Click & Drop API order creation."""
 
-    def __init__(self, api_key=None, base_url=None, timeout=30):
+    def __init__(self, api_key=None, base_url=None, timeout=30, transport=None):
         self.api_key = api_key if api_key is not None else settings.ROYAL_MAIL_API_KEY
         self.base_url = (base_url or settings.ROYAL_MAIL_API_BASE_URL).rstrip('/')
         self.timeout = timeout
+        self.transport = transport or get_transport()
 
     def ensure_configured(self):
         if not self.base_url:
@@ -186,7 +346,7 @@ class RoyalMailClickDropClient:
         logger.info('Creating Royal Mail order for local order %s', order.order_number)
 
         try:
-            response = requests.post(
+            response = self.transport.post(
                 url,
                 json=payload,
                 headers=self._headers(),
@@ -206,6 +366,110 @@ class RoyalMailClickDropClient:
 
         return response_data
 
+    def create_orders(self, orders_with_options, *, chunk_size=None):
+        """Create many orders in Click & Drop, sending ``chunk_size`` orders per request.
+
+        ``orders_with_options`` is a list of ``(order, shipping_options)`` pairs.
+        Returns one result per order, in input order, with ``created``, ``response``
+        (the createdOrders/failedOrders entry), ``errors`` and ``status_code`` (set
+        when the whole request was rejected). Orders rejected by
+        Royal Mail, or in a chunk whose request failed, are returned as errors
+        rather than raised so the rest of the run can continue.
+        """
+        self.ensure_configured()
+        chunk_size = max(1, int(chunk_size or settings.ROYAL_MAIL_BULK_CHUNK_SIZE))
+        url = f'{self.base_url}/Orders'
+        results = []
+
+        for start in range(0, len(orders_with_options), chunk_size):
+            chunk = orders_with_options[start:start + chunk_size]
+            payload = {'items': [self._order_payload(order, options) for order, options in chunk]}
+            logger.info('Creating %s Royal Mail orders in one request', len(chunk))
+            try:
+                response = self.transport.post(
+                    url,
+                    json=payload,
+                    headers=self._headers(),
+                    timeout=self.timeout,
+                )
+            except requests.RequestException as exc:
+                results.extend(
+                    self._bulk_result(order, errors=[f'Royal Mail request failed: {exc}'])
+                    for order, _ in chunk
+                )
+                continue
+
+            response_data = self._parse_response(response)
+            if response.status_code >= 400:
+                results.extend(
+                    self._bulk_result(
+                        order,
+                        response=response_data,
+                        errors=[f'Royal Mail returned HTTP {response.status_code}'],
+                        status_code=response.status_code,
+                    )
+                    for order, _ in chunk
+                )
+                continue
+
+            results.extend(self._map_bulk_response([order for order, _ in chunk], response_data))
+
+        return results
+
+    def _map_bulk_response(self, orders, response_data):
+        """Match createdOrders/failedOrders entries back to local orders by orderReference."""
+        if not isinstance(response_data, dict):
+            response_data = {}
+        created_orders = response_data.get('createdOrders')
+        failed_orders = response_data.get('failedOrders')
+
+        if created_orders is None and failed_orders is None and len(orders) == 1:
+            try:
+                self._raise_for_order_errors(response_data, 200)
+            except RoyalMailAPIError as exc:
+                return [self._bulk_result(orders[0], response=response_data, errors=[str(exc)])]
+            return [self._bulk_result(orders[0], created=True, response=response_data)]
+
+        created_by_reference = defaultdict(deque)
+        for entry in created_orders or []:
+            created_by_reference[str(entry.get('orderReference') or '')].append(entry)
+        failed_by_reference = defaultdict(deque)
+        for entry in failed_orders or []:
+            reference = (entry.get('order') or {}).get('orderReference') or entry.get('orderReference')
+            failed_by_reference[str(reference or '')].append(entry)
+
+        results = []
+        for order in orders:
+            reference = self._order_reference(order)
+            if created_by_reference[reference]:
+                results.append(self._bulk_result(
+                    order,
+                    created=True,
+                    response=created_by_reference[reference].popleft(),
+                ))
+            elif failed_by_reference[reference]:
+                entry = failed_by_reference[reference].popleft()
+                errors = [
+                    (error.get('errorMessage') or str(error)) if isinstance(error, dict) else str(error)
+                    for error in entry.get('errors') or []
+                ] or ['Royal Mail did not create the shipment']
+                results.append(self._bulk_result(order, response=entry, errors=errors))
+            else:
+                results.append(self._bulk_result(
+                    order,
+                    errors=['Royal Mail did not return a result for this order'],
+                ))
+        return results
+
+    def _bulk_result(self, order, *, created=False, response=None, errors=None, status_code=None):
+        return {
+            'order': order,
+            'created': created,
+            'response': response,
+            'errors': errors or [],
+            'status_code': status_code,
+        }
+
     def delete_order(self, order_identifier):
         """Delete an existing Royal Mail order before replacing an unpostaged draft."""
         self.ensure_configured()
@@ -216,7 +480,7 @@ class RoyalMailClickDropClient:
         logger.info('Deleting Royal Mail order %s before rebooking', order_identifier)
 
         try:
-            response = requests.delete(
+            response = self.transport.delete(
                 url,
                 headers=self._headers(),
                 timeout=self.timeout,
@@ -267,7 +531,7 @@ class RoyalMailClickDropClient:
             params['includeCN'] = 'true'
 
         try:
-            response = requests.get(
+            response = self.transport.get(
                 url,
                 params=params,
                 headers=self._headers(accept='application/pdf'),
@@ -302,6 +566,9 @@ class RoyalMailClickDropClient:
             package_format_identifier=package_format_identifier,
             service_code=service_code,
         )
+        return {'items': [self._order_payload(order, shipping_options)]}
+
+    def _order_payload(self, order, shipping_options):
         weight_in_grams = shipping_options['weight_in_grams']
         package_format_identifier = shipping_options['package_format_identifier']
         service_code = shipping_options['service_code']
@@ -345,7 +612,7 @@ class RoyalMailClickDropClient:
                 'includeCN': settings.ROYAL_MAIL_LABEL_INCLUDE_CN,
             }
 
-        return {'items': [royal_mail_order]}
+        return royal_mail_order
 
     def resolve_shipping_options(self, order, *, weight_in_grams=None, package_format_identifier=None, service_code=None):
         """Resolve Royal Mail package/service using WIMS booking rules.
@@ -354,35 +621,121 @@ class RoyalMailClickDropClient:
         codes such as STD are treated as delivery-method inputs, not Royal Mail
         service codes, then converted through the criteria table.
         """
-        resolved_weight = int(weight_in_grams or self._order_weight_in_grams(order) or settings.ROYAL_MAIL_DEFAULT_WEIGHT_GRAMS)
+        options, _ = self.explain_shipping_options(
+            order,
+            weight_in_grams=weight_in_grams,
+            package_format_identifier=package_format_identifier,
+            service_code=service_code,
+        )
+        return options
+
+    def explain_shipping_options(self, order, *, weight_in_grams=None, package_format_identifier=None, service_code=None):
+        """Return ``(options, reasons)`` where reasons describe how each option was chosen.
+
+        Item-derived inputs come from the order's cached shipping profile, so
+        repeated resolutions do not walk the order's items and products again.
+        """
+        profile = self.shipping_profile(order)
+        reasons = []
+        if weight_in_grams:
+            resolved_weight = int(weight_in_grams)
+            reasons.append(f'Weight {resolved_weight}g was given explicitly.')
+        elif profile['weight_in_grams']:
+            resolved_weight = profile['weight_in_grams']
+            reasons.append(f"Weight {resolved_weight}g from product weights of {profile['item_count']} item(s).")
+        else:
+            resolved_weight = int(settings.ROYAL_MAIL_DEFAULT_WEIGHT_GRAMS)
+            reasons.append(f'No product weights found; using default weight {resolved_weight}g.')
+
         explicit_service_code, delivery_code_override = self._split_requested_service_code(service_code)
+        delivery_code = delivery_code_override or self._delivery_code(order)
         derived_package, derived_service = self._derive_package_and_service(
             order,
             resolved_weight,
             delivery_code_override=delivery_code_override,
+            has_fleece_up_to_5_mtr=profile['has_fleece_up_to_5_mtr'],
         )
+        if derived_service:
+            rule = ' (fleece up to 5 mtr)' if delivery_code == 'STD' and profile['has_fleece_up_to_5_mtr'] else ''
+            reasons.append(
+                f'Delivery method {delivery_code} at {resolved_weight}g{rule} maps to '
+                f'{derived_package} / {derived_service}.'
+            )
         explicit_package = None if delivery_code_override else package_format_identifier
         resolved_package = explicit_package or derived_package or settings.ROYAL_MAIL_DEFAULT_PACKAGE_FORMAT
         resolved_service = explicit_service_code or derived_service
+        if explicit_package:
+            reasons.append(f'Package format {explicit_package} was given explicitly.')
+        elif not derived_package:
+            reasons.append(f'Using default package format {resolved_package}.')
+        if explicit_service_code:
+            reasons.append(f'Service code {explicit_service_code} was given explicitly.')
 
         if not resolved_service:
-            delivery_code = delivery_code_override or self._delivery_code(order) or 'UNKNOWN'
             raise ValueError(
                 'No Royal Mail service code mapping found for '
-                f'delivery method {delivery_code} and weight {resolved_weight}g. '
+                f"delivery method {delivery_code or 'UNKNOWN'} and weight {resolved_weight}g. "
                 'Update the Royal Mail criteria or pass a valid Royal Mail service_code.'
             )
 
-        return {
+        options = {
             'weight_in_grams': resolved_weight,
             'package_format_identifier': resolved_package,
             'service_code': resolved_service,
         }
+        return options, reasons
+
+    def shipping_profile(self, order):
+        """Return the order's cached item-derived shipping facts, computing them if stale."""
+        return self.shipping_profiles([order])[order.id]
+
+    def shipping_profiles(self, orders):
+        """
+        Return ``{order_id: profile}`` for ``orders``, refreshing stale profiles together.
+
+        Orders without a fresh profile get their items, stock items, products and
+        product extended data loaded in one prefetch pass, and the new profiles are
+        written back in a single bulk update.
+        """
+        stale = [order for order in orders if not self.shipping_profile_is_fresh(order.shipping_profile)]
+        if stale:
+            prefetch_related_objects(
+                [order for order in stale if 'items' not in getattr(order, '_prefetched_objects_cache', {})],
+                Prefetch(
+                    'items',
+                    queryset=OrderItem.objects.select_related('stock_item__product').prefetch_related(
+                        'stock_item__product__extended_data',
+                    ),
+                ),
+            )
+            computed_at = timezone.now().isoformat()
+            for order in stale:
+                items = list(order.items.all())
+                order.shipping_profile = {
+                    'version': SHIPPING_PROFILE_VERSION,
+                    'weight_in_grams': self._items_weight_in_grams(items),
+                    'has_fleece_up_to_5_mtr': self._items_have_fleece_up_to_5_mtr(items),
+                    'item_count': len(items),
+                    'computed_at': computed_at,
+                }
+            Order.all_objects.bulk_update(stale, ['shipping_profile'])
+        return {order.id: order.shipping_profile for order in orders}
+
+    def shipping_profile_is_fresh(self, profile):
+        if not profile or profile.get('version') != SHIPPING_PROFILE_VERSION:
+            return False
+        computed_at = parse_datetime(profile.get('computed_at') or '')
+        if computed_at is None:
+            return False
+        age = (timezone.now() - computed_at).total_seconds()
+        return age < settings.ROYAL_MAIL_SHIPPING_PROFILE_TTL_SECONDS
 
-    def _derive_package_and_service(self, order, weight_in_grams, delivery_code_override=None):
+    def _derive_package_and_service(self, order, weight_in_grams, delivery_code_override=None, has_fleece_up_to_5_mtr=None):
         delivery_code = delivery_code_override or self._delivery_code(order)
+        if has_fleece_up_to_5_mtr is None:
+            has_fleece_up_to_5_mtr = self._has_fleece_up_to_5_mtr(order)
 
-        if delivery_code == 'STD' and self._has_fleece_up_to_5_mtr(order):
+        if delivery_code == 'STD' and has_fleece_up_to_5_mtr:
             return 'Parcel', 'TPS48'
 
         if delivery_code == 'STD':
@@ -437,8 +790,15 @@ class RoyalMailClickDropClient:
         return ''.join(str(raw_code).upper().split())
 
     def _order_weight_in_grams(self, order):
+        if 'items' in getattr(order, '_prefetched_objects_cache', {}):
+            items = order.items.all()
+        else:
+            items = order.items.select_related('stock_item__product').prefetch_related('stock_item__product__extended_data')
+        return self._items_weight_in_grams(items)
+
+    def _items_weight_in_grams(self, items):
         total = Decimal('0.000')
-        for item in order.items.select_related('stock_item__product').prefetch_related('stock_item__product__extended_data'):
+        for item in items:
             product = getattr(getattr(item, 'stock_item', None), 'product', None)
             total += get_product_weight_kg(product) * Decimal(item.quantity or 0)
         return int((total * Decimal('1000')).quantize(Decimal('1'))) if total > 0 else 0
@@ -452,9 +812,12 @@ class RoyalMailClickDropClient:
         return timezone.localtime(order.order_date).weekday() == 4
 
     def _has_fleece_up_to_5_mtr(self, order):
+        return self._items_have_fleece_up_to_5_mtr(order.items.select_related('stock_item__product'))
+
+    def _items_have_fleece_up_to_5_mtr(self, items):
         fleece_quantity = Decimal('0')
         has_fleece = False
-        for item in order.items.all():
+        for item in items:
             searchable = ' '.join(filter(None, [
                 item.product_name,
                 item.product_type,
@@ -0,0 +1,371 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.db import connection
+
+from orders.models import BackgroundJob, Order
+from orders.services.dpd import (
+    DPDAPIError,
+    DPDShippingClient,
+    extract_dpd_label_pdf,
+    extract_dpd_shipment_identifier,
+    extract_dpd_tracking_number,
+)
+from orders.services.jobs import enqueue_job, register_job_handler
+from orders.services.royal_mail import (
+    RoyalMailAPIError,
+    RoyalMailClickDropClient,
+    RoyalMailOAuthError,
+    extract_royal_mail_label_pdf,
+    extract_royal_mail_order_identifier,
+    extract_royal_mail_reference,
+    extract_tracking_number,
+)
+from orders.services.shipping_labels import save_shipping_label_pdf
+
+
+COURIER_ROYAL_MAIL = 'royal_mail'
+COURIER_DPD = 'dpd'
+COURIER_CHOICES = (COURIER_ROYAL_MAIL, COURIER_DPD)
+
+
+def courier_concurrency(courier):
+    """Maximum simultaneous booking requests a job sends to ``courier``."""
+    if courier == COURIER_DPD:
+        return max(1, settings.DPD_BOOKING_CONCURRENCY)
+    return max(1, settings.ROYAL_MAIL_BOOKING_CONCURRENCY)
+
+
+def booking_skip_reason(order, courier):
+    """Why ``order`` must not be booked with ``courier`` again, or None when it can be."""
+    if order.order_status == Order.STATUS_SHIPPED:
+        return 'Order is already shipped.'
+    if order.order_status != Order.STATUS_COMPLETED:
+        return f'Order is {order.order_status}; only COMPLETED orders are booked.'
+    if courier == COURIER_ROYAL_MAIL and order.royal_mail_order_identifier:
+        return 'Royal Mail shipment already exists for this order.'
+    if courier == COURIER_DPD and order.shipping_label_file:
+        return 'Shipping label already exists for this order.'
+    return None
+
+
+def enqueue_shipment_booking(order_ids, courier, *, user=None, options=None, batch=None):
+    if courier not in COURIER_CHOICES:
+        raise ValueError(f"courier must be one of: {', '.join(COURIER_CHOICES)}")
+    params = {
+        'courier': courier,
+        'order_ids': list(order_ids),
+        'options': {key: value for key, value in (options or {}).items() if value not in (None, '')},
+    }
+    if batch is not None:
+        params['batch_id'] = batch.id
+    return enqueue_job(
+        BackgroundJob.TYPE_SHIPMENT_BOOKING,
+        params,
+        total_count=len(params['order_ids']),
+        user=user,
+    )
+
+
+def _append_note(order, note_parts, notes=None):
+    if notes:
+        note_parts.append(notes)
+    note = ' '.join(note_parts)
+    order.internal_notes = f"{order.internal_notes}\n{note}".strip() if order.internal_notes else note
+
+
+def send_royal_mail_bookings(client, bookable, *, concurrency=None):
+    """
+    Network half of booking ``bookable`` ``(order, shipping_options)`` pairs with Royal Mail.
+
+    Orders go through ``client.create_orders`` in bulk chunks, then labels
+    missing from the response are downloaded concurrently. Returns the
+    ``create_orders`` results with ``shipping_options``, ``label_pdf`` and
+    ``label_error`` added. No database rows are touched, so it can run on a
+    pool thread; ``record_royal_mail_booking`` saves each result.
+    """
+    if not bookable:
+        return []
+    options_by_order_id = {order.id: shipping_options for order, shipping_options in bookable}
+    results = client.create_orders(bookable)
+    for result in results:
+        result['shipping_options'] = options_by_order_id[result['order'].id]
+    fetch_royal_mail_labels(client, [result for result in results if result['created']], concurrency=concurrency)
+    return results
+
+
+def fetch_royal_mail_labels(client, results, *, concurrency=None):
+    """
+    Set ``label_pdf``/``label_error`` on created booking ``results``.
+
+    Labels returned inline are used as they are; the rest are downloaded
+    ``concurrency`` (default ``ROYAL_MAIL_LABEL_FETCH_WORKERS``) at a time
+    over the client's pooled transport instead of one round trip after
+    another.
+    """
+    missing = []
+    for result in results:
+        result['label_pdf'] = extract_royal_mail_label_pdf(result['response'])
+        result['label_error'] = None
+        if result['label_pdf']:
+            continue
+        order_identifier = extract_royal_mail_order_identifier(result['response'])
+        if order_identifier:
+            missing.append((result, order_identifier))
+        else:
+            result['label_error'] = RoyalMailAPIError(
+                'Royal Mail did not return an order identifier for label download.'
+            )
+    if not missing:
+        return results
+
+    def download(entry):
+        result, order_identifier = entry
+        try:
+            result['label_pdf'] = client.get_order_label_pdf(order_identifier)
+        except RoyalMailAPIError as exc:
+            result['label_error'] = exc
+
+    workers = min(len(missing), max(1, concurrency or settings.ROYAL_MAIL_LABEL_FETCH_WORKERS))
+    if workers <= 1:
+        for entry in missing:
+            download(entry)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(download, missing))
+    return results
+
+
+def record_royal_mail_booking(result, *, note, notes=None, user=None):
+    """
+    Save a created Royal Mail booking ``result`` on its order.
+
+    Appends ``note`` (and ``notes``) to the internal notes, stores the
+    service and Click & Drop identifier, saves the label and marks the
+    order shipped once a label is saved.
+    """
+    order = result['order']
+    response_data = result['response']
+    shipping_options = result['shipping_options']
+    label_pdf = result.get('label_pdf')
+    tracking_number = extract_tracking_number(response_data)
+    order_identifier = extract_royal_mail_order_identifier(response_data)
+    reference = order.external_order_id or extract_royal_mail_reference(response_data)
+
+    note_parts = [note]
+    if reference:
+        note_parts.append(f'Reference: {reference}.')
+    if order_identifier:
+        note_parts.append(f'Royal Mail ID: {order_identifier}.')
+    _append_note(order, note_parts, notes)
+    if shipping_options.get('service_code'):
+        order.shipping_method = shipping_options['service_code']
+    if order_identifier:
+        order.royal_mail_order_identifier = order_identifier
+    order.save(update_fields=['internal_notes', 'shipping_method', 'royal_mail_order_identifier', 'updated_at'])
+
+    if label_pdf:
+        save_shipping_label_pdf(order, label_pdf)
+        order.mark_shipped(tracking_number=tracking_number, carrier='Royal Mail', user=user)
+    return {
+        'tracking_number': tracking_number,
+        'royal_mail_order_identifier': order_identifier,
+        'royal_mail_reference': reference,
+        'royal_mail_booking_options': shipping_options,
+        'label_saved': bool(label_pdf),
+        'label_error': result.get('label_error'),
+        'order_status': order.order_status,
+    }
+
+
+class RoyalMailJobBooker:
+    courier = COURIER_ROYAL_MAIL
+    api_errors = (RoyalMailAPIError, RoyalMailOAuthError)
+
+    def __init__(self, job, options):
+        self.job = job
+        self.options = options
+        self.client = RoyalMailClickDropClient()
+
+    def prepare(self):
+        self.client.ensure_configured()
+
+    def resolve(self, order):
+        return self.client.resolve_shipping_options(
+            order,
+            weight_in_grams=self.options.get('weight_in_grams'),
+            package_format_identifier=self.options.get('package_format_identifier') or None,
+            service_code=self.options.get('service_code') or None,
+        )
+
+    def chunks(self, pending):
+        """One bulk create request per ``ROYAL_MAIL_BULK_CHUNK_SIZE`` orders."""
+        chunk_size = max(1, settings.ROYAL_MAIL_BULK_CHUNK_SIZE)
+        return [pending[start:start + chunk_size] for start in range(0, len(pending), chunk_size)]
+
+    def send(self, chunk):
+        """Network-only part of the booking; runs on a pool thread."""
+        # Label downloads already run inside a pool slot, so keep them sequential per chunk.
+        results = send_royal_mail_bookings(self.client, chunk, concurrency=1)
+        return [(result['order'], result['shipping_options'], result) for result in results]
+
+    def apply(self, order, shipping_options, result, user):
+        if not result['created']:
+            raise RoyalMailAPIError(
+                '; '.join(result['errors']),
+                status_code=result.get('status_code'),
+                response_data=result['response'],
+            )
+        detail = record_royal_mail_booking(
+            result,
+            note=f'Royal Mail Click & Drop shipment booked by job {self.job.id}.',
+            notes=self.options.get('notes'),
+            user=user,
+        )
+        if detail['label_error'] is not None:
+            detail['label_error'] = str(detail['label_error'])
+        return detail
+
+
+class DPDJobBooker:
+    courier = COURIER_DPD
+    api_errors = (DPDAPIError,)
+
+    def __init__(self, job, options):
+        self.job = job
+        self.options = options
+        self.client = DPDShippingClient()
+
+    def prepare(self):
+        self.client.ensure_configured()
+        # Fetch the token once here so pool threads share the cached copy.
+        self.client.get_access_token()
+
+    def resolve(self, order):
+        return {
+            'weight_in_grams': self.options.get('weight_in_grams'),
+            'service_code': self.options.get('service_code') or settings.DPD_DEFAULT_SERVICE_CODE,
+        }
+
+    def chunks(self, pending):
+        """DPD has no bulk endpoint: one shipment request per order."""
+        return [[entry] for entry in pending]
+
+    def send(self, chunk):
+        return [
+            (order, shipping_options, self.client.create_shipment(
+                order,
+                weight_in_grams=shipping_options['weight_in_grams'],
+                service_code=shipping_options['service_code'],
+            ))
+            for order, shipping_options in chunk
+        ]
+
+    def apply(self, order, shipping_options, response_data, user):
+        label_pdf = extract_dpd_label_pdf(response_data)
+        if not label_pdf:
+            raise DPDAPIError('DPD did not return a printable PDF label.', response_data=response_data)
+
+        save_shipping_label_pdf(order, label_pdf, provider='dpd')
+        tracking_number = extract_dpd_tracking_number(response_data)
+        shipment_identifier = extract_dpd_shipment_identifier(response_data)
+        note_parts = [f'DPD shipment booked by job {self.job.id}.']
+        if shipment_identifier:
+            note_parts.append(f'DPD shipment ID: {shipment_identifier}.')
+        _append_note(order, note_parts, self.options.get('notes'))
+        order.shipping_method = shipping_options['service_code']
+        order.save(update_fields=['internal_notes', 'shipping_method', 'updated_at'])
+        order.mark_shipped(tracking_number=tracking_number, carrier='DPD', user=user)
+        return {
+            'tracking_number': tracking_number,
+            'dpd_shipment_identifier': shipment_identifier,
+            'service_code': shipping_options['service_code'],
+            'label_saved': True,
+            'order_status': order.order_status,
+        }
+
+
+BOOKERS = {
+    COURIER_ROYAL_MAIL: RoyalMailJobBooker,
+    COURIER_DPD: DPDJobBooker,
+}
+
+
+def _send_in_thread(booker, chunk):
+    try:
+        return booker.send(chunk)
+    finally:
+        # Pool threads should not touch the database; close any connection a lazy lookup opened.
+        connection.close()
+
+
+@register_job_handler(BackgroundJob.TYPE_SHIPMENT_BOOKING)
+def run_shipment_booking_job(job, progress):
+    """
+    Book every order in ``job.params['order_ids']`` with one courier.
+
+    Orders are sent in the courier's chunks (bulk requests for Royal Mail,
+    one shipment per request for DPD) on a pool bounded by the courier's
+    concurrency setting; label storage and order updates stay on the job
+    thread.
+    """
+    params = job.params or {}
+    courier = params.get('courier')
+    if courier not in BOOKERS:
+        raise ValueError(f"courier must be one of: {', '.join(COURIER_CHOICES)}")
+    order_ids = [int(order_id) for order_id in params.get('order_ids') or []]
+    progress.set_total(len(order_ids))
+    booker = BOOKERS[courier](job, params.get('options') or {})
+
+    orders = Order.objects.filter(id__in=order_ids).prefetch_related(
+        'items__stock_item__product__extended_data',
+    ).in_bulk()
+    pending = []
+    for order_id in order_ids:
+        if progress.is_done(order_id):
+            continue
+        order = orders.get(order_id)
+        if order is None:
+            progress.record(order_id, 'failed', errors=['Order not found.'])
+            continue
+        reason = booking_skip_reason(order, courier)
+        if reason:
+            progress.record(order_id, 'skipped', order_number=order.order_number, reason=reason)
+            continue
+        try:
+            pending.append((order, booker.resolve(order)))
+        except ValueError as exc:
+            progress.record(order_id, 'failed', order_number=order.order_number, errors=[str(exc)])
+
+    if not pending:
+        return
+    booker.prepare()
+
+    user = job.created_by
+    chunks = booker.chunks(pending)
+    with ThreadPoolExecutor(max_workers=min(len(chunks), courier_concurrency(courier))) as executor:
+        futures = {executor.submit(_send_in_thread, booker, chunk): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            try:
+                sent = future.result()
+            except booker.api_errors + (ValueError,) as exc:
+                for order, _ in futures[future]:
+                    _record_failure(progress, order, exc)
+                continue
+            for order, shipping_options, response in sent:
+                try:
+                    detail = booker.apply(order, shipping_options, response, user)
+                except booker.api_errors + (ValueError,) as exc:
+                    _record_failure(progress, order, exc)
+                else:
+                    progress.record(order.id, 'succeeded', order_number=order.order_number, **detail)
+
+
+def _record_failure(progress, order, exc):
+    progress.record(
+        order.id,
+        'failed',
+        order_number=order.order_number,
+        errors=[str(exc)],
+        status_code=getattr(exc, 'status_code', None),
+    )
@@ -0,0 +1,195 @@
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils import timezone
+from django.utils.http import parse_etags, quote_etag
+
+from orders.models import Order
+
+
+LABEL_CONTENT_TYPE = 'application/pdf'
+SENDFILE_X_SENDFILE = 'x-sendfile'
+SENDFILE_X_ACCEL_REDIRECT = 'x-accel-redirect'
+
+IMMUTABLE_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'private, no-cache'
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def label_storage_path(provider, digest):
+    return f'shipping_labels/{provider}/{digest[:2]}/{digest}.pdf'
+
+
+def save_shipping_label_pdf(order, pdf_content, provider='royal_mail'):
+    """
+    Store a courier label PDF for ``order`` under its content hash and record it on the order.
+
+    Identical labels share one file, so re-saving the same label writes nothing.
+    A new label is written to a new path before the order is pointed at it, and
+    the old file is only removed once no order references it, so readers never
+    see a missing or half-written label.
+    """
+    if not pdf_content:
+        return None
+
+    digest = hashlib.sha256(pdf_content).hexdigest()
+    path = label_storage_path(provider, digest)
+    if order.shipping_label_sha256 == digest and order.shipping_label_file == path:
+        return path
+
+    saved_path = path if default_storage.exists(path) else default_storage.save(path, ContentFile(pdf_content))
+    previous_path = order.shipping_label_file
+    order.shipping_label_file = saved_path
+    order.shipping_label_sha256 = digest
+    order.shipping_label_downloaded_at = timezone.now()
+    order.save(update_fields=[
+        'shipping_label_file',
+        'shipping_label_sha256',
+        'shipping_label_downloaded_at',
+        'updated_at',
+    ])
+
+    if previous_path and previous_path != saved_path:
+        _delete_unreferenced_label(previous_path)
+    return saved_path
+
+
+def _delete_unreferenced_label(path):
+    if not Order.all_objects.filter(shipping_label_file=path).exists():
+        default_storage.delete(path)
+
+
+def label_etag(order):
+    return quote_etag(order.shipping_label_sha256) if order.shipping_label_sha256 else None
+
+
+def serve_shipping_label(request, order, *, immutable=False):
+    """
+    Return a response for ``order``'s saved label PDF, or None when the file is missing.
+
+    Conditional requests matching the label's strong ETag get a 304 without
+    touching storage. With ``SHIPPING_LABEL_SENDFILE`` set, the file body is
+    handed to the web server via X-Sendfile/X-Accel-Redirect; otherwise single
+    byte ranges are answered with 206. ``immutable`` marks URLs that pin one
+    label version (the signed public link) as cacheable for a year.
+    """
+    if not order.shipping_label_file:
+        return None
+
+    etag = label_etag(order)
+    cache_control = IMMUTABLE_CACHE_CONTROL if immutable and etag else REVALIDATE_CACHE_CONTROL
+    filename = f'order-{order.id}-label.pdf'
+
+    if etag and _etag_matches(request.headers.get('If-None-Match'), etag):
+        response = HttpResponseNotModified()
+        return _with_label_headers(response, etag, cache_control)
+
+    sendfile_mode = (settings.SHIPPING_LABEL_SENDFILE or '').strip().lower()
+    if sendfile_mode:
+        response = _sendfile_response(order.shipping_label_file, sendfile_mode)
+        if response is not None:
+            response['Content-Disposition'] = f'inline; filename="{filename}"'
+            return _with_label_headers(response, etag, cache_control)
+
+    try:
+        label_file = default_storage.open(order.shipping_label_file, 'rb')
+    except FileNotFoundError:
+        return None
+
+    if etag is None:
+        # Labels saved before content hashing: hash once and keep it for later requests.
+        etag = quote_etag(_backfill_label_hash(order, label_file))
+
+    size = label_file.size
+    byte_range = _requested_range(request, etag, size)
+    if byte_range is None:
+        response = FileResponse(label_file, content_type=LABEL_CONTENT_TYPE, filename=filename)
+    elif byte_range == 'unsatisfiable':
+        label_file.close()
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+    else:
+        start, end = byte_range
+        label_file.seek(start)
+        body = label_file.read(end - start + 1)
+        label_file.close()
+        response = HttpResponse(body, status=206, content_type=LABEL_CONTENT_TYPE)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Disposition'] = f'inline; filename="{filename}"'
+    response['Accept-Ranges'] = 'bytes'
+    return _with_label_headers(response, etag, cache_control)
+
+
+def _with_label_headers(response, etag, cache_control):
+    if etag:
+        response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    return response
+
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    # If-None-Match uses weak comparison, so W/"abc" matches "abc".
+    return any(tag.removeprefix('W/') == etag for tag in parse_etags(header))
+
+
+def _sendfile_response(name, mode):
+    response = HttpResponse(content_type=LABEL_CONTENT_TYPE)
+    if mode == SENDFILE_X_ACCEL_REDIRECT:
+        prefix = settings.SHIPPING_LABEL_ACCEL_REDIRECT_PREFIX.rstrip('/')
+        response['X-Accel-Redirect'] = f'{prefix}/{name}'
+        return response
+    if mode == SENDFILE_X_SENDFILE:
+        try:
+            response['X-Sendfile'] = default_storage.path(name)
+        except NotImplementedError:
+            return None
+        return response
+    return None
+
+
+def _requested_range(request, etag, size):
+    """Parse a single ``bytes=`` Range header into ``(start, end)``; None means serve it all."""
+    header = request.headers.get('Range')
+    if not header or request.method != 'GET':
+        return None
+    if_range = request.headers.get('If-Range')
+    if if_range and if_range.strip() != etag:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        # Multiple or malformed ranges: RFC 9110 allows ignoring Range entirely.
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        suffix_length = int(last)
+        if suffix_length == 0:
+            return 'unsatisfiable'
+        return max(0, size - suffix_length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return 'unsatisfiable'
+    return start, end
+
+
+def _backfill_label_hash(order, label_file):
+    digest = hashlib.sha256()
+    for chunk in label_file.chunks():
+        digest.update(chunk)
+    label_file.seek(0)
+    order.shipping_label_sha256 = digest.hexdigest()
+    Order.all_objects.filter(id=order.id, shipping_label_file=order.shipping_label_file).update(
+        shipping_label_sha256=order.shipping_label_sha256,
+    )
+    return order.shipping_label_sha256
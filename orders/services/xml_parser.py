@@ -7,6 +7,7 @@ from django.utils import timezone
 from ..models import Order, OrderItem
 from .courier import courier_service_code, normalize_courier_service_name
 from stock.models import StockItem
+from stock.services.sku_resolver import resolve_stock_item
 from stock.sku_utils import normalize_sku_reference
 
 
@@ -343,7 +344,9 @@ class XMLOrderParser:
 
         # Try to find stock item by SKU
         try:
-            stock_item = StockItem.objects.get(sku=sku)
+            stock_item = resolve_stock_item(sku, queryset=StockItem.objects.select_related('color'))
+            if stock_item is None:
+                raise StockItem.DoesNotExist
             item_data['stock_item'] = stock_item
             if not item_data.get('product_type'):
                 item_data['product_type'] = stock_item.product_type
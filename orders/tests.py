@@ -3,9 +3,12 @@ import base64
 import io
 import os
 import tempfile
+import threading
+import time
 from django.test import TestCase
 from django.test import override_settings
 from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
 from django.utils import timezone
 from datetime import timedelta
 from decimal import Decimal
@@ -13,7 +16,7 @@ from unittest.mock import Mock, patch
 from xml.sax.saxutils import escape
 from zoneinfo import ZoneInfo
 from rest_framework.test import APIClient
-from .models import Order, OrderItem, OrderBatch, RoyalMailOAuthToken
+from .models import Order, OrderItem, OrderBatch, RoyalMailOAuthToken, ImporterStatus, BackgroundJob
 from .services.xml_parser import XMLOrderParser
 from colors.models import Color
 from products.models import Product, ProductExtendedData
@@ -405,7 +408,847 @@ class RemoteTiaknightImportAuditTest(TestCase):
             ['WEB236578', 'WEB236579', 'WEB236580', 'WEB236581', 'WEB236583'],
         )
 
+    def test_payload_archive_round_trips_rotates_and_prunes_segments(self):
+        from orders.services.payload_archive import TiaknightPayloadArchive
 
+        with tempfile.TemporaryDirectory() as tmpdir:
+            archive = TiaknightPayloadArchive(tmpdir, segment_max_bytes=1, retention_days=30)
+            first = archive.append('<web_orders><a/></web_orders>', request_id='REQ-1', order_refs=['WEB1'])
+            second = archive.append('<web_orders><b/></web_orders>', request_id='REQ-2', order_refs=['WEB2'])
+
+            self.assertNotEqual(first['segment'], second['segment'])
+            self.assertEqual(archive.read(request_id='REQ-1'), '<web_orders><a/></web_orders>')
+            self.assertEqual(archive.read(order_ref='WEB2'), '<web_orders><b/></web_orders>')
+
+            old_segment = os.path.join(tmpdir, 'tiaknight_payloads_20000101_001.gz')
+            with open(old_segment, 'wb') as segment_file:
+                segment_file.write(b'old')
+
+            removed = archive.prune()
+
+            self.assertEqual(removed, ['tiaknight_payloads_20000101_001.gz'])
+            self.assertFalse(os.path.exists(old_segment))
+            self.assertEqual(len(archive.entries()), 2)
+
+    def test_audit_log_prune_keeps_recent_lines_and_last_refs(self):
+        from orders.services.remote_tiaknight_import import detect_missing_sequence_refs, prune_import_audit
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            audit_path = os.path.join(tmpdir, 'tiaknight_refs.log')
+            with open(audit_path, 'w', encoding='utf-8') as audit_log:
+                audit_log.write('[2000-01-01 10:00:00 UTC] http_status=200 refs=WEB100,WEB105\n')
+                audit_log.write('[2000-01-02 10:00:00 UTC] http_status=200 refs=WEB110\n')
+                audit_log.write(f'[{timezone.localtime():%Y-%m-%d %H:%M:%S %Z}] http_status=200 refs=WEB108\n')
+
+            self.assertEqual(prune_import_audit(audit_path, 90), 2)
+            self.assertEqual(prune_import_audit(audit_path, 90), 0)
+
+            with open(audit_path, encoding='utf-8') as audit_log:
+                lines = audit_log.read().splitlines()
+            self.assertEqual(len(lines), 2)
+            self.assertIn('pruned_lines=2 refs=WEB110', lines[0])
+            self.assertIn('refs=WEB108', lines[1])
+            self.assertEqual(detect_missing_sequence_refs(['WEB112'], audit_path), ['WEB111'])
+
+    @patch('orders.services.remote_tiaknight_import.XMLOrderParser.parse_and_create_orders')
+    @patch('scripts.soap_client.fetch_soap_response')
+    def test_import_archives_compressed_raw_payload(self, mock_fetch, mock_parse):
+        from orders.services.payload_archive import TiaknightPayloadArchive
+        from orders.services.remote_tiaknight_import import import_remote_tiaknight_orders
+
+        orders_xml = '<web_orders><web_order><order><order_reference>WEB100001</order_reference></order></web_order></web_orders>'
+        soap_response = (
+            '<Envelope><Body>'
+            '<item><key>RequestID</key><value>REQ-ARCHIVE</value></item>'
+            f'<item><key>Result</key><value>{escape(orders_xml)}</value></item>'
+            '</Body></Envelope>'
+        ).encode('utf-8')
+        mock_fetch.return_value = (soap_response, 200)
+        mock_parse.return_value = {'created_count': 1, 'failed_count': 0, 'orders': [], 'errors': []}
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            payload_dir = os.path.join(tmpdir, 'payloads')
+            with patch.dict(os.environ, {
+                'TIA_URL': 'https://www.tiaknightfabrics.co.uk/api/soap/service/6',
+                'TIA_CLIENTID': 'Tiaknightfabrics',
+                'TIA_USERNAME': 'UserTiaknightfabrics341',
+                'TIA_PASSWORD': 'secret',
+                'TIA_AUDIT_LOG_PATH': os.path.join(tmpdir, 'tiaknight_refs.log'),
+                'TIA_SAVE_RAW_PAYLOAD': 'true',
+                'TIA_RAW_PAYLOAD_DIR': payload_dir,
+                'TIA_GAP_RECOVERY_ATTEMPTS': '0',
+                'TIA_FETCH_ORDER_DETAILS': 'false',
+            }, clear=False):
+                result = import_remote_tiaknight_orders(user=None)
+
+            self.assertTrue(result['tiaknight_raw_payload_path'].endswith('.gz@0'))
+            archive = TiaknightPayloadArchive(payload_dir)
+            self.assertEqual(archive.read(request_id='REQ-ARCHIVE'), orders_xml)
+            self.assertEqual(archive.entries()[0]['order_refs'], ['WEB100001'])
+
+
+class ImportSchedulerTest(TestCase):
+    def _source(self, run, interval_seconds=3600):
+        from orders.services.import_scheduler import ImporterSource
+        from orders.services.remote_tiaknight_import import RemoteTiaknightFetchError
+
+        return ImporterSource(
+            name=ImporterStatus.SOURCE_TIAKNIGHT,
+            run=run,
+            interval_seconds=interval_seconds,
+            backoff_exceptions=(RemoteTiaknightFetchError,),
+        )
+
+    def test_run_importer_records_duration_counts_and_next_run(self):
+        from orders.services.import_scheduler import run_importer
+
+        status_row = run_importer(self._source(lambda: {'orders_created': 3}))
+
+        self.assertEqual(status_row.last_result, ImporterStatus.RESULT_SUCCESS)
+        self.assertEqual(status_row.last_counts, {'orders_created': 3})
+        self.assertIsNotNone(status_row.last_duration_seconds)
+        self.assertEqual(status_row.run_count, 1)
+        self.assertFalse(status_row.is_running)
+        self.assertGreater(status_row.next_run_at, timezone.now() + timedelta(minutes=59))
+
+    def test_run_importer_skips_when_another_run_holds_the_lock(self):
+        from orders.services.import_scheduler import (
+            ImporterLockedError,
+            acquire_importer_lock,
+            run_importer,
+        )
+
+        self.assertTrue(acquire_importer_lock(ImporterStatus.SOURCE_TIAKNIGHT, 'cron'))
+        ImporterStatus.objects.filter(source=ImporterStatus.SOURCE_TIAKNIGHT).update(
+            last_result=ImporterStatus.RESULT_SUCCESS,
+        )
+        run = Mock(return_value={})
+
+        with self.assertRaises(ImporterLockedError):
+            run_importer(self._source(run), owner='scheduler')
+
+        run.assert_not_called()
+        status_row = ImporterStatus.objects.get(source=ImporterStatus.SOURCE_TIAKNIGHT)
+        self.assertTrue(status_row.is_running)
+        # The lock holder's outcome stays visible; the skip is only counted.
+        self.assertEqual(status_row.last_result, ImporterStatus.RESULT_SUCCESS)
+        self.assertEqual(status_row.skipped_count, 1)
+        self.assertIsNotNone(status_row.last_skipped_at)
+
+    def test_run_importer_backs_off_exponentially_on_fetch_errors(self):
+        from orders.services.import_scheduler import run_importer
+        from orders.services.remote_tiaknight_import import RemoteTiaknightFetchError
+
+        source = self._source(Mock(side_effect=RemoteTiaknightFetchError('HTTP 503')))
+        first = run_importer(source, backoff_seconds=60, max_backoff_seconds=600)
+        second = run_importer(source, backoff_seconds=60, max_backoff_seconds=600)
+
+        self.assertEqual(second.consecutive_failures, 2)
+        self.assertEqual(second.last_result, ImporterStatus.RESULT_FAILED)
+        self.assertEqual(second.last_error, 'HTTP 503')
+        first_delay = (first.next_run_at - first.last_finished_at).total_seconds()
+        second_delay = (second.next_run_at - second.last_finished_at).total_seconds()
+        self.assertAlmostEqual(first_delay, 60, delta=1)
+        self.assertAlmostEqual(second_delay, 120, delta=1)
+        self.assertFalse(second.is_running)
+
+    def test_importer_status_endpoint_returns_last_run_metrics(self):
+        from orders.services.import_scheduler import run_importer
+
+        run_importer(self._source(lambda: {'orders_created': 2}))
+        user = User.objects.create_user(username='importer-viewer', password='pass')
+        client = APIClient()
+        client.force_authenticate(user=user)
+
+        response = client.get('/api/v1/importers/tiaknight/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['last_result'], ImporterStatus.RESULT_SUCCESS)
+        self.assertEqual(response.data['last_counts'], {'orders_created': 2})
+        self.assertFalse(response.data['is_running'])
+
+
+class BackgroundJobTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='job-user', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _order(self, index, order_status=Order.STATUS_COMPLETED):
+        order = Order.objects.create(
+            customer_name=f'Job Customer {index}',
+            external_order_id=f'WEB-JOB-{index}',
+            shipping_address_line1='1 Job Street',
+            shipping_city='London',
+            shipping_postal_code='SW1A 1AA',
+            shipping_country='UK',
+            total_amount=Decimal('10.00'),
+            order_status=order_status,
+            courier_service_code='STD',
+            created_by=self.user,
+        )
+        OrderItem.objects.create(
+            order=order,
+            sku=f'JOB-{index}',
+            product_name='Job Product',
+            quantity=1,
+            quantity_ordered=1,
+            unit_price=Decimal('10.00'),
+        )
+        return order
+
+    @override_settings(
+        ROYAL_MAIL_API_KEY='test-api-key',
+        ROYAL_MAIL_API_BASE_URL='https://api.parcel.royalmail.com/api/v1',
+        ROYAL_MAIL_BOOKING_CONCURRENCY=2,
+        ROYAL_MAIL_BULK_CHUNK_SIZE=2,
+        MEDIA_ROOT=tempfile.mkdtemp(),
+    )
+    @patch('orders.services.http_transport.CourierHTTPTransport.post')
+    def test_batch_booking_job_books_orders_in_bulk_chunks_with_bounded_concurrency(self, mock_post):
+        from django.core.management import call_command
+
+        orders = [self._order(index) for index in range(4)]
+        orders.append(self._order(4, order_status=Order.STATUS_NEW))
+        batch = OrderBatch.objects.create(batch_date=timezone.localdate(), batch_number=7, created_by=self.user)
+        for order in orders:
+            batch.order_links.create(order=order)
+
+        label = base64.b64encode(b'%PDF-1.4 job label').decode('ascii')
+        in_flight = {'current': 0, 'max': 0}
+        in_flight_lock = threading.Lock()
+
+        def create_orders(url, **kwargs):
+            references = [item['orderReference'] for item in kwargs['json']['items']]
+            with in_flight_lock:
+                in_flight['current'] += 1
+                in_flight['max'] = max(in_flight['max'], in_flight['current'])
+            time.sleep(0.05)
+            with in_flight_lock:
+                in_flight['current'] -= 1
+            response = Mock(status_code=200)
+            response.json.return_value = {
+                'createdOrders': [
+                    {
+                        'orderReference': reference,
+                        'orderIdentifier': 8000 + int(reference.rsplit('-', 1)[1]),
+                        'trackingNumber': f'TRK-{reference}',
+                        'label': label,
+                    }
+                    for reference in references if reference != 'WEB-JOB-1'
+                ],
+                'failedOrders': [
+                    {'order': {'orderReference': reference}, 'errors': [{'errorMessage': 'Invalid postcode'}]}
+                    for reference in references if reference == 'WEB-JOB-1'
+                ],
+            }
+            return response
+
+        mock_post.side_effect = create_orders
+
+        response = self.client.post(f'/api/v1/order-batches/{batch.id}/booking-jobs/', {}, format='json')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], BackgroundJob.STATUS_QUEUED)
+        self.assertEqual(response.data['total_count'], 5)
+        self.assertTrue(response.data['status_url'].endswith(f"/api/v1/jobs/{response.data['id']}/"))
+        mock_post.assert_not_called()
+
+        call_command('run_jobs', '--once', stdout=io.StringIO())
+
+        job_response = self.client.get(f"/api/v1/jobs/{response.data['id']}/")
+        self.assertEqual(job_response.status_code, 200)
+        job = job_response.data
+        self.assertEqual(job['status'], BackgroundJob.STATUS_COMPLETED)
+        self.assertEqual(job['processed_count'], 5)
+        self.assertEqual(job['succeeded_count'], 3)
+        self.assertEqual(job['failed_count'], 1)
+        self.assertEqual(job['skipped_count'], 1)
+        self.assertEqual(job['progress_percent'], 100.0)
+        outcomes = {entry['key']: entry for entry in job['results']}
+        self.assertEqual(outcomes[orders[1].id]['outcome'], 'failed')
+        self.assertEqual(outcomes[orders[1].id]['errors'], ['Invalid postcode'])
+        self.assertEqual(outcomes[orders[4].id]['outcome'], 'skipped')
+        self.assertTrue(outcomes[orders[0].id]['label_saved'])
+        # Four bookable orders, two per bulk request, both requests in flight together.
+        self.assertEqual(mock_post.call_count, 2)
+        self.assertEqual(in_flight['max'], 2)
+
+        orders[0].refresh_from_db()
+        self.assertEqual(orders[0].order_status, Order.STATUS_SHIPPED)
+        self.assertEqual(orders[0].tracking_number, 'TRK-WEB-JOB-0')
+        self.assertTrue(orders[0].shipping_label_file)
+        orders[1].refresh_from_db()
+        self.assertEqual(orders[1].order_status, Order.STATUS_COMPLETED)
+
+    def test_abandoned_job_is_reclaimed_and_resumes_after_recorded_items(self):
+        from orders.services.jobs import claim_next_job, run_job
+
+        first, second = self._order(1), self._order(2, order_status=Order.STATUS_NEW)
+        job = BackgroundJob.objects.create(
+            job_type=BackgroundJob.TYPE_SHIPMENT_BOOKING,
+            status=BackgroundJob.STATUS_RUNNING,
+            params={'courier': 'royal_mail', 'order_ids': [first.id, second.id]},
+            total_count=2,
+            processed_count=1,
+            succeeded_count=1,
+            results=[{'key': first.id, 'outcome': 'succeeded'}],
+            lock_owner='crashed-worker',
+            locked_until=timezone.now() + timedelta(minutes=5),
+        )
+
+        self.assertIsNone(claim_next_job('worker'))
+
+        BackgroundJob.objects.filter(id=job.id).update(locked_until=timezone.now() - timedelta(seconds=1))
+        claimed = claim_next_job('worker')
+        self.assertEqual(claimed.id, job.id)
+        self.assertEqual(claimed.attempts, 1)
+
+        finished = run_job(claimed, 'worker')
+
+        self.assertEqual(finished.status, BackgroundJob.STATUS_COMPLETED)
+        self.assertEqual(finished.processed_count, 2)
+        self.assertEqual(finished.succeeded_count, 1)
+        self.assertEqual(finished.skipped_count, 1)
+        self.assertEqual([entry['key'] for entry in finished.results], [first.id, second.id])
+        self.assertFalse(finished.lock_owner)
+
+
+class RecordedTradingAPI:
+    """Trading API stand-in that replays recorded GetOrders pages."""
+
+    class _Response:
+        def __init__(self, reply):
+            self._reply = reply
+
+        def dict(self):
+            return self._reply
+
+    def __init__(self, pages, calls):
+        self.pages = pages
+        self.calls = calls
+
+    def execute(self, verb, data):
+        self.calls.append((verb, data))
+        page_number = data['Pagination']['PageNumber']
+        return self._Response(self.pages[page_number - 1])
+
+
+def recorded_get_orders_pages(order_ids_per_page):
+    pages = []
+    for order_ids in order_ids_per_page:
+        orders = [{'OrderID': order_id, 'OrderStatus': 'Active'} for order_id in order_ids]
+        pages.append({
+            'Ack': 'Success',
+            'OrderArray': {'Order': orders[0] if len(orders) == 1 else orders},
+            'PaginationResult': {
+                'TotalNumberOfPages': str(len(order_ids_per_page)),
+                'TotalNumberOfEntries': str(sum(len(ids) for ids in order_ids_per_page)),
+            },
+        })
+    return pages
+
+
+class EbayOrderSyncTest(TestCase):
+    def _service(self, pages, calls):
+        from orders.services.ebay_service import EbayService
+
+        return EbayService(connection_factory=lambda: RecordedTradingAPI(pages, calls))
+
+    def test_fetch_orders_reads_every_page_and_dedupes_shifted_orders(self):
+        calls = []
+        service = self._service(
+            recorded_get_orders_pages([['1-A', '1-B'], ['1-B', '2-A'], ['3-A']]),
+            calls,
+        )
+
+        orders = service.fetch_orders(days_back=7)
+
+        self.assertEqual([order['OrderID'] for order in orders], ['1-A', '1-B', '2-A', '3-A'])
+        self.assertEqual(sorted(call[1]['Pagination']['PageNumber'] for call in calls), [1, 2, 3])
+        self.assertIn('CreateTimeFrom', calls[0][1])
+        self.assertEqual(service.last_fetch_stats['pages'], 3)
+        self.assertEqual(service.last_fetch_stats['orders'], 4)
+
+    def test_sync_orders_uses_mod_time_watermark_after_first_run(self):
+        from orders.models import EbaySyncState
+
+        calls = []
+        service = self._service(recorded_get_orders_pages([['1-A'], ['2-A']]), calls)
+
+        first = service.sync_orders()
+
+        self.assertEqual(first['mode'], 'window')
+        self.assertEqual(first['pages_fetched'], 2)
+        self.assertEqual(first['created_count'], 2)
+        watermark = EbaySyncState.objects.get().mod_time_watermark
+        self.assertIsNotNone(watermark)
+
+        calls.clear()
+        second = service.sync_orders()
+
+        self.assertEqual(second['mode'], 'incremental')
+        self.assertEqual(second['created_count'], 0)
+        self.assertEqual(second['skipped_count'], 2)
+        self.assertIn('ModTimeFrom', calls[0][1])
+        self.assertNotIn('CreateTimeFrom', calls[0][1])
+        self.assertGreater(EbaySyncState.objects.get().mod_time_watermark, watermark)
+
+    @patch('orders.services.ebay_service.EbayService.sync_orders_batch')
+    def test_sync_orders_keeps_watermark_when_an_order_fails(self, mock_batch):
+        from orders.models import EbaySyncState
+
+        mock_batch.side_effect = RuntimeError('boom')
+        service = self._service(recorded_get_orders_pages([['1-A']]), [])
+
+        result = service.sync_orders()
+
+        self.assertEqual(result['error_count'], 1)
+        self.assertIsNone(EbaySyncState.objects.get().mod_time_watermark)
+
+    def _ebay_order(self, order_id, sku, quantity=2, status='Active', payment='Pending', tracking=None):
+        order = {
+            'OrderID': order_id,
+            'OrderStatus': status,
+            'CheckoutStatus': {'Status': payment, 'PaymentMethod': 'PayPal'},
+            'CreatedTime': '2026-08-01T10:00:00.000Z',
+            'ShippingAddress': {'Name': 'Ebay Buyer', 'CountryName': 'United Kingdom'},
+            'Total': {'value': '24.00'},
+            'Subtotal': {'value': '20.00'},
+            'TransactionArray': {'Transaction': {
+                'QuantityPurchased': str(quantity),
+                'TransactionPrice': {'value': '10.00'},
+                'Buyer': {'Email': 'buyer@example.com'},
+                'Item': {'ItemID': f'item-{order_id}', 'SKU': sku, 'Title': f'Fabric {sku}'},
+            }},
+        }
+        if tracking:
+            order['ShippingDetails'] = {'ShipmentTrackingDetails': {
+                'ShipmentTrackingNumber': tracking,
+                'ShippingCarrierUsed': 'Royal Mail',
+            }}
+        return order
+
+    def test_sync_orders_batch_creates_orders_with_stock_items_resolved_by_sku(self):
+        from orders.services.ebay_service import EbayService
+
+        color = Color.objects.create(color_code='EB1', color_name='Ebay Blue')
+        product = Product.objects.create(
+            vs_parent_id=20202,
+            vs_child_id=20202,
+            parent_reference='109 LT',
+            parent_product_title='Ebay Fabric',
+            child_reference='109 LT DSND',
+            child_product_title='Ebay Fabric',
+        )
+        stock_item = StockItem.objects.create(
+            sku='109 LT DSND',
+            product_type='109 LT',
+            product=product,
+            color=color,
+        )
+        service = EbayService(connection_factory=Mock)
+
+        # The unmatched SKU costs one extra alias lookup.
+        with self.assertNumQueries(8):
+            result = service.sync_orders_batch([
+                self._ebay_order('E-1', '(109 LT) DSND'),
+                self._ebay_order('E-2', 'MISSING SKU', quantity=1),
+            ])
+
+        self.assertEqual(result['created_count'], 2)
+        first = Order.objects.get(external_order_id='E-1')
+        self.assertEqual(first.order_source, Order.SOURCE_EBAY)
+        self.assertTrue(first.order_number.startswith('ORD-'))
+        self.assertNotEqual(first.order_number, Order.objects.get(external_order_id='E-2').order_number)
+        item = first.items.get()
+        self.assertEqual(item.stock_item, stock_item)
+        self.assertEqual(item.sku, '109 LT DSND')
+        self.assertEqual(item.quantity, 2)
+        self.assertEqual(item.line_total, Decimal('20.00'))
+        self.assertIsNone(Order.objects.get(external_order_id='E-2').items.get().stock_item)
+
+    def test_sync_orders_batch_updates_payment_tracking_and_terminal_status(self):
+        from orders.services.ebay_service import EbayService
+
+        service = EbayService(connection_factory=Mock)
+        service.sync_orders_batch([self._ebay_order('E-3', 'SKU-3'), self._ebay_order('E-4', 'SKU-4')])
+        order = Order.objects.get(external_order_id='E-3')
+        order.order_status = Order.STATUS_IN_PROGRESS
+        order.save(update_fields=['order_status'])
+
+        result = service.sync_orders_batch([
+            self._ebay_order('E-3', 'SKU-3', status='Completed', payment='Complete', tracking='RM123'),
+            self._ebay_order('E-4', 'SKU-4'),
+        ])
+
+        self.assertEqual(result['created_count'], 0)
+        self.assertEqual(result['updated_count'], 1)
+        self.assertEqual(result['skipped_count'], 1)
+        order.refresh_from_db()
+        self.assertEqual(order.payment_status, Order.PAYMENT_PAID)
+        self.assertEqual(order.tracking_number, 'RM123')
+        self.assertEqual(order.carrier, 'Royal Mail')
+        self.assertEqual(order.order_status, Order.STATUS_SHIPPED)
+        self.assertEqual(order.items.count(), 1)
+        self.assertTrue(order.status_history.filter(to_status=Order.STATUS_SHIPPED).exists())
+
+
+class FakeCourierServer:
+    """Local HTTP/1.1 server that replays scripted (status, headers, body) responses."""
+
+    def __init__(self, responses):
+        import http.server
+        import threading
+
+        self.responses = list(responses)
+        self.requests = []
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _reply(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                server.requests.append({
+                    'method': self.command,
+                    'path': self.path,
+                    'body': body,
+                    'client_port': self.client_address[1],
+                })
+                status_code, headers, payload = server.responses.pop(0)
+                self.send_response(status_code)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = do_DELETE = _reply
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.httpd.server_address[1]}'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class CourierHTTPTransportTest(TestCase):
+    def _transport(self, **kwargs):
+        from orders.services.http_transport import CourierHTTPTransport
+
+        self.sleeps = []
+        transport = CourierHTTPTransport(sleep=self.sleeps.append, **kwargs)
+        self.addCleanup(transport.close)
+        return transport
+
+    def test_retries_rate_limited_get_honouring_retry_after_on_one_connection(self):
+        transport = self._transport(max_retries=2, max_backoff_seconds=5)
+        pdf = b'%PDF-1.4 fake courier label'
+
+        with FakeCourierServer([
+            (429, {'Retry-After': '2'}, b'{"error": "slow down"}'),
+            (503, {}, b''),
+            (200, {'Content-Type': 'application/pdf'}, pdf),
+        ]) as server:
+            response = transport.get(f'{server.url}/orders/1/label', timeout=5)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, pdf)
+        self.assertEqual(len(server.requests), 3)
+        self.assertEqual(len({row['client_port'] for row in server.requests}), 1)
+        self.assertEqual(self.sleeps[0], 2.0)
+        self.assertLessEqual(self.sleeps[1], 1.0)
+        metrics = transport.metrics()[server.url]
+        self.assertEqual(metrics['requests'], 3)
+        self.assertEqual(metrics['retries'], 2)
+
+    def test_post_is_not_retried_after_server_error_but_is_after_rate_limit(self):
+        transport = self._transport(max_retries=3)
+
+        with FakeCourierServer([
+            (500, {}, b'{"error": "boom"}'),
+            (429, {'Retry-After': '0'}, b''),
+            (200, {'Content-Type': 'application/json'}, b'{"ok": true}'),
+        ]) as server:
+            failed = transport.post(f'{server.url}/Orders', json={'items': []}, timeout=5)
+            retried = transport.post(f'{server.url}/Orders', json={'items': []}, timeout=5)
+
+        self.assertEqual(failed.status_code, 500)
+        self.assertEqual(retried.json(), {'ok': True})
+        self.assertEqual(len(server.requests), 3)
+
+    def test_gives_up_when_retry_after_exceeds_backoff_cap(self):
+        transport = self._transport(max_retries=2, max_backoff_seconds=1)
+
+        with FakeCourierServer([(429, {'Retry-After': '120'}, b'')]) as server:
+            response = transport.get(f'{server.url}/Orders', timeout=5)
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(self.sleeps, [])
+
+    @override_settings(
+        ROYAL_MAIL_API_KEY='test-api-key',
+        ROYAL_MAIL_LABEL_DOCUMENT_TYPE='postageLabel',
+        ROYAL_MAIL_LABEL_INCLUDE_RETURNS_LABEL=False,
+        ROYAL_MAIL_LABEL_INCLUDE_CN=False,
+    )
+    def test_royal_mail_client_uses_injected_transport(self):
+        from orders.services.royal_mail import RoyalMailClickDropClient
+
+        transport = self._transport(max_retries=1)
+        with FakeCourierServer([
+            (502, {}, b''),
+            (200, {'Content-Type': 'application/pdf'}, b'%PDF-1.4 label'),
+        ]) as server:
+            client = RoyalMailClickDropClient(base_url=server.url, transport=transport)
+            label = client.get_order_label_pdf('9001')
+
+        self.assertEqual(label, b'%PDF-1.4 label')
+        self.assertTrue(server.requests[-1]['path'].startswith('/orders/9001/label?documentType=postageLabel'))
+
+
+    def test_tiaknight_get_order_is_retried_but_get_new_orders_is_not(self):
+        from scripts.soap_client import fetch_order_response, fetch_soap_response
+
+        transport = self._transport(max_retries=2)
+        soap = (200, {'Content-Type': 'text/xml'}, b'<Envelope><Result>ok</Result></Envelope>')
+        with FakeCourierServer([(503, {}, b''), soap, (503, {}, b'')]) as server:
+            url = f'{server.url}/api/soap/service/6'
+            body, status_code = fetch_order_response(url, 'client', 'user', 'secret', 'WEB1', transport=transport)
+            self.assertEqual((body, status_code), (soap[2], 200))
+
+            _, status_code = fetch_soap_response(url, 'client', 'user', 'secret', transport=transport)
+            self.assertEqual(status_code, 503)
+
+        self.assertEqual(len(server.requests), 3)
+        self.assertIn(b'GetOrder>', server.requests[0]['body'])
+        self.assertIn(b'GetNewOrders>', server.requests[2]['body'])
+        metrics = transport.metrics()[server.url.lower()]
+        self.assertEqual((metrics['requests'], metrics['retries']), (3, 1))
+
+
+class CourierSimulatorBenchmarkTest(TestCase):
+    def test_benchmark_books_and_imports_against_simulator_then_cleans_up(self):
+        from orders.services.booking_benchmark import BookingBenchmark, percentile
+        from orders.services.courier_simulator import CourierSimulator
+
+        self.assertEqual(percentile([0.4, 0.1, 0.3, 0.2], 50), 0.2)
+        self.assertEqual(percentile([0.4, 0.1, 0.3, 0.2], 99), 0.4)
+
+        user = User.objects.create_superuser('benchmark-admin', 'bench@example.com', 'password')
+        benchmark = BookingBenchmark(user, orders=2, tiaknight_fetches=1)
+        with CourierSimulator(latency_ms=0, jitter_ms=0, orders_per_fetch=2, order_ref_prefix='SIMTEST') as simulator:
+            results = {row['scenario']: row for row in benchmark.run(simulator.url)}
+            stats = simulator.stats()
+
+        for scenario in ('royal_mail', 'dpd', 'tiaknight'):
+            self.assertEqual(results[scenario]['failed'], 0, results[scenario]['errors'])
+        self.assertEqual(results['royal_mail']['operations'], 2)
+        self.assertEqual(results['tiaknight']['orders_imported'], 2)
+        self.assertEqual(stats['requests']['royal_mail.create_orders'], 2)
+        self.assertEqual(stats['requests']['dpd.shipments'], 2)
+        self.assertEqual(stats['requests']['tiaknight.get_new_orders'], 1)
+        self.assertFalse(Order.all_objects.exists())
+
+
+@override_settings(
+    DPD_INTEGRATION_ENABLED=True,
+    DPD_API_BASE_URL='https://dpd.example.test/api/v1.1',
+    DPD_TOKEN_URL='https://dpd.example.test/oauth/token',
+    DPD_API_KEY='dpd-key',
+    DPD_API_SECRET='dpd-secret',
+    DPD_API_TOKEN='',
+    DPD_TOKEN_DEFAULT_TTL_SECONDS=3600,
+)
+class DPDTokenCacheTest(TestCase):
+    def setUp(self):
+        from orders.services.dpd import dpd_token_cache
+
+        dpd_token_cache.clear()
+        self.addCleanup(dpd_token_cache.clear)
+        self.transport = Mock()
+        self.issued = []
+
+    def _token_response(self, expires_in=3600):
+        token = f'dpd-token-{len(self.issued) + 1}'
+        self.issued.append(token)
+        response = Mock(status_code=200)
+        response.json.return_value = {'access_token': token, 'expires_in': expires_in}
+        return response
+
+    def _client(self):
+        from orders.services.dpd import DPDShippingClient
+
+        return DPDShippingClient(transport=self.transport)
+
+    def test_token_is_fetched_once_and_shared_through_the_database(self):
+        from orders.models import DPDAccessToken
+        from orders.services.dpd import dpd_token_cache
+
+        self.transport.post.side_effect = lambda *args, **kwargs: self._token_response()
+
+        self.assertEqual(self._client().get_access_token(), 'dpd-token-1')
+        self.assertEqual(self._client().get_access_token(), 'dpd-token-1')
+        dpd_token_cache.clear()
+        self.assertEqual(self._client().get_access_token(), 'dpd-token-1')
+
+        self.assertEqual(self.transport.post.call_count, 1)
+        row = DPDAccessToken.objects.get()
+        self.assertEqual(row.access_token, 'dpd-token-1')
+        self.assertNotIn('access_token', row.raw_response)
+        self.assertIsNone(row.refresh_locked_until)
+
+    def test_token_close_to_expiry_is_refreshed(self):
+        self.transport.post.side_effect = [self._token_response(expires_in=30), self._token_response()]
+
+        self.assertEqual(self._client().get_access_token(), 'dpd-token-1')
+        self.assertEqual(self._client().get_access_token(), 'dpd-token-2')
+
+    def test_waits_for_token_being_fetched_by_another_worker(self):
+        from orders.models import DPDAccessToken
+        from orders.services.dpd import DPDTokenCache
+
+        client = self._client()
+        DPDAccessToken.objects.create(
+            credential_key=client._credential_key(),
+            refresh_lock_owner='other-worker',
+            refresh_locked_until=timezone.now() + timedelta(seconds=30),
+        )
+
+        def other_worker_finishes(seconds):
+            DPDAccessToken.objects.update(
+                access_token='other-worker-token',
+                expires_at=timezone.now() + timedelta(hours=1),
+            )
+
+        cache = DPDTokenCache(wait_seconds=5, poll_seconds=0)
+        with patch('orders.services.dpd.time.sleep', side_effect=other_worker_finishes):
+            token = cache.get(client._credential_key(), client.request_access_token)
+
+        self.assertEqual(token, 'other-worker-token')
+        self.transport.post.assert_not_called()
+
+    def test_shipment_rejected_with_401_refetches_token_once(self):
+        from orders.services.dpd import DPDShippingClient
+
+        unauthorized = Mock(status_code=401)
+        unauthorized.json.return_value = {'error': 'token revoked'}
+        created = Mock(status_code=200)
+        created.json.return_value = {'shipmentResults': [{'shipment': {'shipmentId': 'S1'}}]}
+        self.transport.post.side_effect = [self._token_response(), unauthorized, self._token_response(), created]
+        client = self._client()
+
+        with patch.object(DPDShippingClient, 'ensure_configured'), \
+                patch.object(DPDShippingClient, 'build_create_shipment_payload', return_value={}):
+            response_data = client.create_shipment(Mock(order_number='ORD-1'))
+
+        self.assertEqual(response_data['shipmentResults'][0]['shipment']['shipmentId'], 'S1')
+        shipment_calls = [call for call in self.transport.post.call_args_list if call.args[0].endswith('/shipments')]
+        self.assertEqual(shipment_calls[-1].kwargs['headers']['Authorization'], 'Bearer dpd-token-2')
+
+
+@override_settings(
+    ROYAL_MAIL_CLIENT_ID='rm-client',
+    ROYAL_MAIL_CLIENT_SECRET='rm-secret',
+    ROYAL_MAIL_OAUTH_CALLBACK_URL='https://wims.example.test/auth/royalmail/callback',
+    ROYAL_MAIL_OAUTH_AUTHORIZATION_URL='https://auth.example.test/authorize',
+    ROYAL_MAIL_OAUTH_TOKEN_URL='https://auth.example.test/token',
+    ROYAL_MAIL_OAUTH_BACKGROUND_REFRESH=False,
+)
+class RoyalMailTokenCacheTest(TestCase):
+    def setUp(self):
+        from orders.services.royal_mail import royal_mail_token_cache
+
+        royal_mail_token_cache.invalidate()
+        self.addCleanup(royal_mail_token_cache.invalidate)
+        self.transport = Mock()
+
+    def _client(self):
+        from orders.services.royal_mail import RoyalMailOAuthClient
+
+        return RoyalMailOAuthClient(transport=self.transport)
+
+    def _token(self, access_token='rm-access-1', expires_in=timedelta(hours=1)):
+        return RoyalMailOAuthToken.objects.create(
+            access_token=access_token,
+            refresh_token='rm-refresh',
+            expires_at=timezone.now() + expires_in,
+            is_active=True,
+        )
+
+    def test_cached_token_is_served_without_querying_the_database(self):
+        self._token()
+
+        self.assertEqual(self._client().get_valid_access_token(), 'rm-access-1')
+        with self.assertNumQueries(0):
+            self.assertEqual(self._client().get_valid_access_token(), 'rm-access-1')
+
+    def test_cached_token_is_dropped_when_the_row_version_changes(self):
+        from orders.services.royal_mail import royal_mail_token_cache
+
+        self._token()
+        self._client().get_valid_access_token()
+        RoyalMailOAuthToken.objects.update(is_active=False)
+        self._token(access_token='rm-access-reconnected')
+
+        with patch.object(royal_mail_token_cache, 'recheck_seconds', 0):
+            self.assertEqual(self._client().get_valid_access_token(), 'rm-access-reconnected')
+
+    def test_expiring_token_is_refreshed_once(self):
+        self._token(expires_in=timedelta(minutes=2))
+        refreshed = Mock(status_code=200)
+        refreshed.json.return_value = {'access_token': 'rm-access-2', 'refresh_token': 'rm-refresh-2', 'expires_in': 3600}
+        self.transport.post.return_value = refreshed
+
+        self.assertEqual(self._client().get_valid_access_token(), 'rm-access-2')
+        self.assertEqual(self._client().get_valid_access_token(), 'rm-access-2')
+
+        self.assertEqual(self.transport.post.call_count, 1)
+        self.assertEqual(RoyalMailOAuthToken.objects.filter(is_active=True).count(), 1)
+        self.assertFalse(RoyalMailOAuthToken.objects.filter(refresh_locked_until__isnull=False).exists())
+
+    def test_worker_keeps_valid_token_while_another_worker_refreshes(self):
+        token = self._token(expires_in=timedelta(minutes=2))
+        RoyalMailOAuthToken.objects.filter(pk=token.pk).update(
+            refresh_lock_owner='other-worker',
+            refresh_locked_until=timezone.now() + timedelta(seconds=30),
+        )
+
+        self.assertEqual(self._client().get_valid_access_token(), 'rm-access-1')
+        self.transport.post.assert_not_called()
+
+    def test_worker_waits_for_refresh_of_expired_token(self):
+        token = self._token(expires_in=timedelta(seconds=-5))
+        RoyalMailOAuthToken.objects.filter(pk=token.pk).update(
+            refresh_lock_owner='other-worker',
+            refresh_locked_until=timezone.now() + timedelta(seconds=30),
+        )
+
+        def other_worker_finishes(seconds):
+            RoyalMailOAuthToken.objects.update(is_active=False)
+            self._token(access_token='rm-access-from-other-worker')
+
+        with patch('orders.services.royal_mail.time.sleep', side_effect=other_worker_finishes):
+            self.assertEqual(self._client().get_valid_access_token(), 'rm-access-from-other-worker')
+        self.transport.post.assert_not_called()
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class OrderWithItemsAPITest(TestCase):
     """Test order list endpoint with nested order items"""
 
@@ -759,6 +1602,123 @@ class OrderWithItemsAPITest(TestCase):
         self.assertIn('Some orders already belong to an active batch', response.data['error'])
         self.assertEqual(second_batch.order_links.count(), 0)
 
+    @override_settings(PICK_WALK_ZONE_ORDER='B,A')
+    def test_order_batch_pick_list_sums_skus_along_walk_sequence(self):
+        from django.core.cache import cache
+        from products.models import Location
+
+        cache.clear()
+        color = Color.objects.create(color_code='PCK', color_name='Pick Color')
+        # Locations get generated ids (LOC001, ...); the walk comes from their names.
+        locations = {name: Location.objects.create(name=name) for name in (
+            'A-01-05', 'A-01-02', 'A-03-10', 'A-03-03', 'B-01-01',
+        )}
+        stock_items = {}
+        for index, (sku, location, warehouse_location) in enumerate([
+            ('PICK ONE', 'A-01-05', None),
+            ('PICK TWO', 'A-01-02', None),
+            ('PICK THREE', 'A-03-10', None),
+            ('PICK FOUR', 'A-03-03', None),
+            ('PICK FIVE', 'B-01-01', None),
+            ('PICK SIX', None, 'C-4'),
+            ('PICK SEVEN', None, None),
+        ]):
+            product = Product.objects.create(
+                vs_parent_id=20200 + index,
+                vs_child_id=20200 + index,
+                parent_reference=sku,
+                parent_product_title=sku,
+                child_reference=sku,
+                child_product_title=sku,
+            )
+            stock_items[sku] = StockItem.objects.create(
+                sku=sku,
+                product_type='PICK',
+                product=product,
+                color=color,
+                primary_location=locations.get(location),
+                warehouse_location=warehouse_location,
+            )
+
+        batch = OrderBatch.objects.create(batch_number=3, batch_date=timezone.localdate(), created_by=self.user)
+        for order_index in range(3):
+            order = Order.objects.create(customer_name=f'Pick {order_index}', total_amount=Decimal('10.00'))
+            batch.order_links.create(order=order)
+            for sku in stock_items:
+                OrderItem.objects.create(
+                    order=order,
+                    stock_item=stock_items[sku],
+                    sku=sku,
+                    product_name=sku,
+                    quantity=order_index + 1,
+                    quantity_ordered=order_index + 1,
+                    unit_price=Decimal('1.00'),
+                )
+        # A line that only carries the source spelling joins its stock item's line.
+        OrderItem.objects.create(
+            order=order, sku='(PICK ONE)', product_name='PICK ONE', quantity=4, quantity_ordered=4,
+            unit_price=Decimal('1.00'),
+        )
+
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/v1/order-batches/{batch.id}/pick-list/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [line['sku'] for line in response.data['lines']],
+            ['PICK FIVE', 'PICK ONE', 'PICK TWO', 'PICK FOUR', 'PICK THREE', 'PICK SIX', 'PICK SEVEN'],
+        )
+        first_line = response.data['lines'][1]
+        self.assertEqual((first_line['sequence'], first_line['quantity']), (2, 10))
+        self.assertEqual(first_line['location']['id'], locations['A-01-05'].id)
+        self.assertTrue(first_line['location']['id'].startswith('LOC'))
+        self.assertEqual(first_line['location']['zone'], 'A')
+        self.assertEqual((first_line['location']['aisle'], first_line['location']['bay']), (1, 5))
+        self.assertEqual(response.data['lines'][2]['order_count'], 3)
+        self.assertEqual(response.data['total_quantity'], 46)
+        self.assertEqual(response.data['unlocated_count'], 1)
+
+        with self.assertNumQueries(1):
+            self.client.get(f'/api/v1/order-batches/{batch.id}/pick-list/')
+
+        self.client.patch(
+            f'/api/v1/order-batches/{batch.id}/orders/',
+            {'order_ids': [order.id]},
+            format='json',
+        )
+        response = self.client.get(f'/api/v1/order-batches/{batch.id}/pick-list/')
+        self.assertEqual(response.data['lines'][0]['quantity'], 3)
+
+    def test_order_batch_pick_list_cache_drops_when_items_or_orders_change(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        batch = OrderBatch.objects.create(batch_number=4, batch_date=timezone.localdate(), created_by=self.user)
+        order = Order.objects.create(customer_name='Pick Cache', total_amount=Decimal('10.00'))
+        batch.order_links.create(order=order)
+        item = OrderItem.objects.create(
+            order=order, sku='CACHE ONE', product_name='CACHE ONE', quantity=2, quantity_ordered=2,
+            unit_price=Decimal('1.00'),
+        )
+        url = f'/api/v1/order-batches/{batch.id}/pick-list/'
+        self.assertEqual(self.client.get(url).data['total_quantity'], 2)
+
+        item.quantity = 5
+        item.save(update_fields=['quantity', 'updated_at'])
+        self.assertEqual(self.client.get(url).data['total_quantity'], 5)
+
+        extra = OrderItem.objects.create(
+            order=order, sku='CACHE TWO', product_name='CACHE TWO', quantity=1, quantity_ordered=1,
+            unit_price=Decimal('1.00'),
+        )
+        self.assertEqual(self.client.get(url).data['total_quantity'], 6)
+
+        extra.delete()
+        self.assertEqual(self.client.get(url).data['total_quantity'], 5)
+
+        order.soft_delete(user=self.user)
+        self.assertEqual(self.client.get(url).data['lines'], [])
+
     def test_order_detail_returns_item_lable_printed(self):
         order = Order.objects.create(
             customer_name='Detail Customer',
@@ -1480,8 +2440,8 @@ class OrderWithItemsAPITest(TestCase):
         ROYAL_MAIL_DEFAULT_PACKAGE_FORMAT='Parcel',
         ROYAL_MAIL_DEFAULT_WEIGHT_GRAMS=100,
     )
-    @patch('orders.services.royal_mail.requests.get')
-    @patch('orders.services.royal_mail.requests.post')
+    @patch('orders.services.http_transport.CourierHTTPTransport.get')
+    @patch('orders.services.http_transport.CourierHTTPTransport.post')
     def test_book_royal_mail_shipping_creates_remote_order_and_marks_shipped(self, mock_post, mock_get):
         self._mock_royal_mail_label_response(mock_get)
         royal_mail_response = {
@@ -1603,7 +2563,7 @@ class OrderWithItemsAPITest(TestCase):
         DPD_SENDER_PHONE='07123456789',
         DPD_SENDER_EMAIL='warehouse@example.com',
     )
-    @patch('orders.services.dpd.requests.post')
+    @patch('orders.services.http_transport.CourierHTTPTransport.post')
     def test_book_dpd_shipping_creates_remote_shipment_and_marks_shipped(self, mock_post):
         encoded_label = base64.b64encode(b'%PDF-1.4 dpd label').decode('ascii')
         dpd_response = {
@@ -1744,7 +2704,7 @@ class OrderWithItemsAPITest(TestCase):
         DPD_SENDER_PHONE='07123456789',
         DPD_SENDER_EMAIL='warehouse@example.com',
     )
-    @patch('orders.services.dpd.requests.post')
+    @patch('orders.services.http_transport.CourierHTTPTransport.post')
     def test_book_dpd_shipping_blocks_duplicate_shipped_order(self, mock_post):
         order = Order.objects.create(
             customer_name='Already Shipped',
@@ -1770,8 +2730,8 @@ class OrderWithItemsAPITest(TestCase):
         ROYAL_MAIL_DEFAULT_PACKAGE_FORMAT='Parcel',
         ROYAL_MAIL_DEFAULT_WEIGHT_GRAMS=100,
     )
-    @patch('orders.services.royal_mail.requests.get')
-    @patch('orders.services.royal_mail.requests.post')
+    @patch('orders.services.http_transport.CourierHTTPTransport.get')
+    @patch('orders.services.http_transport.CourierHTTPTransport.post')
     def test_book_royal_mail_shipping_omits_base64_label_from_json_response(self, mock_post, mock_get):
         encoded_label = base64.b64encode(b'%PDF-1.4 inline royal mail label').decode('ascii')
         mock_response = Mock(status_code=200)
@@ -1826,8 +2786,8 @@ class OrderWithItemsAPITest(TestCase):
         ROYAL_MAIL_DEFAULT_PACKAGE_FORMAT='Parcel',
         ROYAL_MAIL_DEFAULT_WEIGHT_GRAMS=100,
     )
-    @patch('orders.services.royal_mail.requests.get')
-    @patch('orders.services.royal_mail.requests.post')
+    @patch('orders.services.http_transport.CourierHTTPTransport.get')
+    @patch('orders.services.http_transport.CourierHTTPTransport.post')
     def test_book_royal_mail_shipping_can_return_pdf_directly(self, mock_post, mock_get):
         self._mock_royal_mail_label_response(mock_get, content=b'%PDF-1.4 direct label')
         mock_response = Mock(status_code=200)
@@ -1874,7 +2834,7 @@ class OrderWithItemsAPITest(TestCase):
         ROYAL_MAIL_API_KEY='test-api-key',
         ROYAL_MAIL_API_BASE_URL='https://api.parcel.royalmail.com/api/v1',
     )
-    @patch('orders.services.royal_mail.requests.post')
+    @patch('orders.services.http_transport.CourierHTTPTransport.post')
     def test_book_royal_mail_shipping_blocks_duplicate_booking_for_shipped_order(self, mock_post):
         order = Order.objects.create(
             customer_name='Already Shipped Customer',
@@ -1906,7 +2866,7 @@ class OrderWithItemsAPITest(TestCase):
         ROYAL_MAIL_API_KEY='test-api-key',
         ROYAL_MAIL_API_BASE_URL='https://api.parcel.royalmail.com/api/v1',
     )
-    @patch('orders.services.royal_mail.requests.get')
+    @patch('orders.services.http_transport.CourierHTTPTransport.get')
     def test_shipping_label_fetches_and_returns_pdf_from_royal_mail(self, mock_get):
         self._mock_royal_mail_label_response(mock_get, content=b'%PDF-1.4 fetched label')
         order = Order.objects.create(
@@ -1950,7 +2910,7 @@ class OrderWithItemsAPITest(TestCase):
         ROYAL_MAIL_API_KEY='test-api-key',
         ROYAL_MAIL_API_BASE_URL='https://api.parcel.royalmail.com/api/v1',
     )
-    @patch('orders.services.royal_mail.requests.get')
+    @patch('orders.services.http_transport.CourierHTTPTransport.get')
     def test_shipping_label_returns_clear_postage_not_applied_error(self, mock_get):
         mock_response = Mock(status_code=400)
         mock_response.headers = {'Content-Type': 'application/json'}
@@ -1986,8 +2946,8 @@ class OrderWithItemsAPITest(TestCase):
         ROYAL_MAIL_DEFAULT_PACKAGE_FORMAT='Parcel',
         ROYAL_MAIL_DEFAULT_WEIGHT_GRAMS=100,
     )
-    @patch('orders.services.royal_mail.requests.get')
-    @patch('orders.services.royal_mail.requests.post')
+    @patch('orders.services.http_transport.CourierHTTPTransport.get')
+    @patch('orders.services.http_transport.CourierHTTPTransport.post')
     def test_book_royal_mail_shipping_does_not_mark_shipped_when_postage_not_applied(self, mock_post, mock_get):
         create_response = Mock(status_code=200)
         create_response.json.return_value = {
@@ -2047,9 +3007,9 @@ class OrderWithItemsAPITest(TestCase):
         ROYAL_MAIL_DEFAULT_PACKAGE_FORMAT='Parcel',
         ROYAL_MAIL_DEFAULT_WEIGHT_GRAMS=100,
     )
-    @patch('orders.services.royal_mail.requests.delete')
-    @patch('orders.services.royal_mail.requests.get')
-    @patch('orders.services.royal_mail.requests.post')
+    @patch('orders.services.http_transport.CourierHTTPTransport.delete')
+    @patch('orders.services.http_transport.CourierHTTPTransport.get')
+    @patch('orders.services.http_transport.CourierHTTPTransport.post')
     def test_book_royal_mail_shipping_replaces_unpostaged_draft_order(self, mock_post, mock_get, mock_delete):
         delete_response = Mock(status_code=200)
         delete_response.json.return_value = {'deletedOrders': [{'orderIdentifier': '157272'}]}
@@ -2106,9 +3066,9 @@ class OrderWithItemsAPITest(TestCase):
         ROYAL_MAIL_DEFAULT_WEIGHT_GRAMS=100,
         ROYAL_MAIL_REPLACE_UNPOSTAGED_ORDERS=False,
     )
-    @patch('orders.services.royal_mail.requests.delete')
-    @patch('orders.services.royal_mail.requests.get')
-    @patch('orders.services.royal_mail.requests.post')
+    @patch('orders.services.http_transport.CourierHTTPTransport.delete')
+    @patch('orders.services.http_transport.CourierHTTPTransport.get')
+    @patch('orders.services.http_transport.CourierHTTPTransport.post')
     def test_book_royal_mail_shipping_blocks_existing_draft_when_replacement_disabled(
         self,
         mock_post,
@@ -2157,8 +3117,8 @@ class OrderWithItemsAPITest(TestCase):
         ROYAL_MAIL_DEFAULT_PACKAGE_FORMAT='Parcel',
         ROYAL_MAIL_DEFAULT_WEIGHT_GRAMS=100,
     )
-    @patch('orders.services.royal_mail.requests.get')
-    @patch('orders.services.royal_mail.requests.post')
+    @patch('orders.services.http_transport.CourierHTTPTransport.get')
+    @patch('orders.services.http_transport.CourierHTTPTransport.post')
     def test_book_royal_mail_shipping_auto_selects_letter_stl2_for_std_up_to_100g(self, mock_post, mock_get):
         self._mock_royal_mail_label_response(mock_get)
         mock_response = Mock(status_code=200)
@@ -2211,8 +3171,8 @@ class OrderWithItemsAPITest(TestCase):
         ROYAL_MAIL_DEFAULT_PACKAGE_FORMAT='Parcel',
         ROYAL_MAIL_DEFAULT_WEIGHT_GRAMS=100,
     )
-    @patch('orders.services.royal_mail.requests.get')
-    @patch('orders.services.royal_mail.requests.post')
+    @patch('orders.services.http_transport.CourierHTTPTransport.get')
+    @patch('orders.services.http_transport.CourierHTTPTransport.post')
     def test_book_royal_mail_shipping_converts_payload_std_to_royal_mail_service_code(self, mock_post, mock_get):
         self._mock_royal_mail_label_response(mock_get)
         mock_response = Mock(status_code=200)
@@ -2266,8 +3226,8 @@ class OrderWithItemsAPITest(TestCase):
         ROYAL_MAIL_DEFAULT_PACKAGE_FORMAT='Parcel',
         ROYAL_MAIL_DEFAULT_WEIGHT_GRAMS=100,
     )
-    @patch('orders.services.royal_mail.requests.get')
-    @patch('orders.services.royal_mail.requests.post')
+    @patch('orders.services.http_transport.CourierHTTPTransport.get')
+    @patch('orders.services.http_transport.CourierHTTPTransport.post')
     def test_book_royal_mail_shipping_auto_selects_large_letter_for_std_101_to_500g(self, mock_post, mock_get):
         self._mock_royal_mail_label_response(mock_get)
         mock_response = Mock(status_code=200)
@@ -2315,8 +3275,8 @@ class OrderWithItemsAPITest(TestCase):
         ROYAL_MAIL_DEFAULT_PACKAGE_FORMAT='Parcel',
         ROYAL_MAIL_DEFAULT_WEIGHT_GRAMS=100,
     )
-    @patch('orders.services.royal_mail.requests.get')
-    @patch('orders.services.royal_mail.requests.post')
+    @patch('orders.services.http_transport.CourierHTTPTransport.get')
+    @patch('orders.services.http_transport.CourierHTTPTransport.post')
     def test_book_royal_mail_shipping_auto_selects_amazon_friday_next_day_service(self, mock_post, mock_get):
         self._mock_royal_mail_label_response(mock_get)
         mock_response = Mock(status_code=200)
@@ -2366,8 +3326,8 @@ class OrderWithItemsAPITest(TestCase):
         ROYAL_MAIL_DEFAULT_PACKAGE_FORMAT='Parcel',
         ROYAL_MAIL_DEFAULT_WEIGHT_GRAMS=100,
     )
-    @patch('orders.services.royal_mail.requests.get')
-    @patch('orders.services.royal_mail.requests.post')
+    @patch('orders.services.http_transport.CourierHTTPTransport.get')
+    @patch('orders.services.http_transport.CourierHTTPTransport.post')
     def test_book_royal_mail_shipping_auto_selects_web_next_day_parcel_service(self, mock_post, mock_get):
         self._mock_royal_mail_label_response(mock_get)
         mock_response = Mock(status_code=200)
@@ -2421,7 +3381,7 @@ class OrderWithItemsAPITest(TestCase):
         ROYAL_MAIL_DEFAULT_PACKAGE_FORMAT='Parcel',
         ROYAL_MAIL_DEFAULT_WEIGHT_GRAMS=100,
     )
-    @patch('orders.services.royal_mail.requests.post')
+    @patch('orders.services.http_transport.CourierHTTPTransport.post')
     def test_book_royal_mail_shipping_requires_known_service_mapping(self, mock_post):
         order = Order.objects.create(
             customer_name='Unsupported Delivery Customer',
@@ -2461,8 +3421,8 @@ class OrderWithItemsAPITest(TestCase):
         ROYAL_MAIL_DEFAULT_PACKAGE_FORMAT='Letter',
         ROYAL_MAIL_DEFAULT_WEIGHT_GRAMS=50,
     )
-    @patch('orders.services.royal_mail.requests.get')
-    @patch('orders.services.royal_mail.requests.post')
+    @patch('orders.services.http_transport.CourierHTTPTransport.get')
+    @patch('orders.services.http_transport.CourierHTTPTransport.post')
     def test_book_royal_mail_shipping_auto_selects_fleece_parcel_for_std_up_to_5m(self, mock_post, mock_get):
         self._mock_royal_mail_label_response(mock_get)
         mock_response = Mock(status_code=200)
@@ -2510,7 +3470,7 @@ class OrderWithItemsAPITest(TestCase):
         ROYAL_MAIL_DEFAULT_PACKAGE_FORMAT='Letter',
         ROYAL_MAIL_DEFAULT_WEIGHT_GRAMS=50,
     )
-    @patch('orders.services.royal_mail.requests.post')
+    @patch('orders.services.http_transport.CourierHTTPTransport.post')
     def test_book_royal_mail_shipping_does_not_ship_when_royal_mail_returns_failed_orders(self, mock_post):
         mock_response = Mock(status_code=200)
         mock_response.json.return_value = {
@@ -2563,6 +3523,327 @@ class OrderWithItemsAPITest(TestCase):
         self.assertEqual(order.order_status, Order.STATUS_COMPLETED)
         self.assertIsNone(order.tracking_number)
 
+    @override_settings(
+        ROYAL_MAIL_API_KEY='test-api-key',
+        ROYAL_MAIL_API_BASE_URL='https://api.parcel.royalmail.com/api/v1',
+        ROYAL_MAIL_BULK_CHUNK_SIZE=2,
+    )
+    @patch('orders.services.http_transport.CourierHTTPTransport.get')
+    @patch('orders.services.http_transport.CourierHTTPTransport.post')
+    def test_order_batch_book_royal_mail_sends_chunked_bulk_requests(self, mock_post, mock_get):
+        label = base64.b64encode(b'%PDF-1.4 bulk label').decode('ascii')
+        orders = []
+        for index in range(4):
+            order = Order.objects.create(
+                customer_name=f'Bulk Customer {index}',
+                external_order_id=f'WEB-BULK-{index}',
+                shipping_address_line1='1 Bulk Street',
+                shipping_city='London',
+                shipping_postal_code='SW1A 1AA',
+                shipping_country='UK',
+                total_amount=Decimal('10.00'),
+                order_status=Order.STATUS_COMPLETED if index < 3 else Order.STATUS_NEW,
+                courier_service_code='STD',
+                created_by=self.user,
+            )
+            OrderItem.objects.create(
+                order=order,
+                sku=f'BULK-{index}',
+                product_name='Bulk Product',
+                quantity=1,
+                quantity_ordered=1,
+                unit_price=Decimal('10.00'),
+            )
+            orders.append(order)
+        batch = OrderBatch.objects.create(batch_date=timezone.localdate(), batch_number=4, created_by=self.user)
+        for order in orders:
+            batch.order_links.create(order=order)
+
+        first_chunk = Mock(status_code=200)
+        first_chunk.json.return_value = {
+            'successCount': 1,
+            'errorsCount': 1,
+            'createdOrders': [
+                {'orderReference': 'WEB-BULK-0', 'orderIdentifier': 9001, 'trackingNumber': 'RMB0', 'label': label},
+            ],
+            'failedOrders': [
+                {
+                    'order': {'orderReference': 'WEB-BULK-1'},
+                    'errors': [{'errorMessage': 'Recipient postcode is invalid'}],
+                },
+            ],
+        }
+        second_chunk = Mock(status_code=200)
+        second_chunk.json.return_value = {
+            'successCount': 1,
+            'errorsCount': 0,
+            'createdOrders': [{'orderReference': 'WEB-BULK-2', 'orderIdentifier': 9002}],
+            'failedOrders': [],
+        }
+        mock_post.side_effect = [first_chunk, second_chunk]
+        self._mock_royal_mail_label_response(mock_get)
+
+        response = self.client.post(f'/api/v1/order-batches/{batch.id}/book-royal-mail/', {}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_post.call_count, 2)
+        self.assertEqual(
+            [item['orderReference'] for item in mock_post.call_args_list[0].kwargs['json']['items']],
+            ['WEB-BULK-0', 'WEB-BULK-1'],
+        )
+        self.assertEqual(response.data['royal_mail_requests'], 2)
+        self.assertEqual(response.data['booked_count'], 2)
+        self.assertEqual(response.data['labelled_count'], 2)
+        self.assertEqual(response.data['failed_count'], 1)
+        self.assertEqual(response.data['failed'][0]['errors'], ['Recipient postcode is invalid'])
+        self.assertEqual(response.data['skipped'][0]['order_id'], orders[3].id)
+        mock_get.assert_called_once()
+
+        for order in orders:
+            order.refresh_from_db()
+        self.assertEqual(orders[0].order_status, Order.STATUS_SHIPPED)
+        self.assertEqual(orders[0].tracking_number, 'RMB0')
+        self.assertEqual(orders[0].royal_mail_order_identifier, '9001')
+        self.assertTrue(orders[0].shipping_label_file)
+        self.assertEqual(orders[1].order_status, Order.STATUS_COMPLETED)
+        self.assertIsNone(orders[1].royal_mail_order_identifier)
+        self.assertEqual(orders[2].order_status, Order.STATUS_SHIPPED)
+        self.assertEqual(orders[2].royal_mail_order_identifier, '9002')
+        self.assertEqual(orders[3].order_status, Order.STATUS_NEW)
+
+    def test_missing_royal_mail_labels_are_fetched_concurrently(self):
+        from orders.services.royal_mail import RoyalMailAPIError
+        from orders.services.shipment_booking import fetch_royal_mail_labels
+
+        in_flight = {'current': 0, 'max': 0}
+        in_flight_lock = threading.Lock()
+
+        class LabelClient:
+            def get_order_label_pdf(self, order_identifier):
+                with in_flight_lock:
+                    in_flight['current'] += 1
+                    in_flight['max'] = max(in_flight['max'], in_flight['current'])
+                time.sleep(0.05)
+                with in_flight_lock:
+                    in_flight['current'] -= 1
+                if str(order_identifier) == '3':
+                    raise RoyalMailAPIError('Royal Mail did not return a PDF label', status_code=404)
+                return f'%PDF-{order_identifier}'.encode()
+
+        results = [{'response': {'orderIdentifier': identifier}} for identifier in (1, 2, 3)]
+        results.append({'response': {}})
+
+        fetch_royal_mail_labels(LabelClient(), results, concurrency=3)
+
+        self.assertEqual(in_flight['max'], 3)
+        self.assertEqual([result['label_pdf'] for result in results[:2]], [b'%PDF-1', b'%PDF-2'])
+        self.assertEqual(results[2]['label_error'].status_code, 404)
+        self.assertIn('order identifier', str(results[3]['label_error']))
+
+    @staticmethod
+    def _one_page_pdf(width):
+        from pypdf import PdfWriter
+
+        writer = PdfWriter()
+        writer.add_blank_page(width=width, height=400)
+        output = io.BytesIO()
+        writer.write(output)
+        return output.getvalue()
+
+    @override_settings(
+        ROYAL_MAIL_API_KEY='test-api-key',
+        ROYAL_MAIL_API_BASE_URL='https://api.parcel.royalmail.com/api/v1',
+        MEDIA_ROOT=tempfile.mkdtemp(),
+    )
+    @patch('orders.services.http_transport.CourierHTTPTransport.get')
+    def test_order_batch_shipping_labels_pdf_merges_in_print_order_and_caches(self, mock_get):
+        from pypdf import PdfReader
+        from .services.shipping_labels import save_shipping_label_pdf
+
+        batch = OrderBatch.objects.create(batch_date=timezone.localdate(), batch_number=5, created_by=self.user)
+        orders = []
+        for index, courier_code in enumerate(['TPS', 'CRL', 'SD1']):
+            order = Order.objects.create(
+                customer_name=f'Label Customer {index}',
+                total_amount=Decimal('10.00'),
+                order_status=Order.STATUS_SHIPPED,
+                courier_service_code=courier_code,
+                royal_mail_order_identifier=str(7000 + index),
+                created_by=self.user,
+            )
+            batch.order_links.create(order=order)
+            orders.append(order)
+        save_shipping_label_pdf(orders[0], self._one_page_pdf(300))
+        save_shipping_label_pdf(orders[1], self._one_page_pdf(200))
+        self._mock_royal_mail_label_response(mock_get, content=self._one_page_pdf(100))
+        url = f'/api/v1/order-batches/{batch.id}/shipping-labels.pdf?order_by=courier'
+
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(response['X-Label-Count'], '3')
+        mock_get.assert_called_once()
+        self.assertIn('/orders/7002/label', mock_get.call_args.args[0])
+        pages = PdfReader(io.BytesIO(b''.join(response.streaming_content))).pages
+        # CRL, SD1, TPS
+        self.assertEqual([int(page.mediabox.width) for page in pages], [200, 100, 300])
+
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        mock_get.assert_called_once()
+        self.assertEqual(len(PdfReader(io.BytesIO(b''.join(response.streaming_content))).pages), 3)
+
+        save_shipping_label_pdf(orders[2], self._one_page_pdf(150))
+        response = self.client.get(f'/api/v1/order-batches/{batch.id}/shipping-labels.pdf/?order_by=courier')
+
+        pages = PdfReader(io.BytesIO(b''.join(response.streaming_content))).pages
+        self.assertEqual([int(page.mediabox.width) for page in pages], [200, 150, 300])
+        _, merged_files = default_storage.listdir('shipping_labels/batches')
+        self.assertEqual(len(merged_files), 1)
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp(), SHIPPING_LABEL_SENDFILE='')
+    def test_shipping_labels_are_content_addressed_and_served_with_etag_and_range(self):
+        from .services.label_links import make_public_label_token
+        from .services.shipping_labels import save_shipping_label_pdf
+
+        order = Order.objects.create(customer_name='Label Customer', total_amount=Decimal('10.00'), created_by=self.user)
+        other = Order.objects.create(customer_name='Other Customer', total_amount=Decimal('10.00'), created_by=self.user)
+        first_path = save_shipping_label_pdf(order, b'%PDF-1.4 first label')
+        self.assertEqual(save_shipping_label_pdf(other, b'%PDF-1.4 first label'), first_path)
+        order.refresh_from_db()
+        self.assertIn(order.shipping_label_sha256, first_path)
+
+        second_path = save_shipping_label_pdf(order, b'%PDF-1.4 second label')
+        self.assertNotEqual(second_path, first_path)
+        # Still referenced by the other order, so the first file is kept.
+        self.assertTrue(default_storage.exists(first_path))
+        save_shipping_label_pdf(other, b'%PDF-1.4 second label')
+        self.assertFalse(default_storage.exists(first_path))
+
+        url = f'/api/v1/orders/{order.id}/shipping-label/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF-1.4 second label')
+        etag = response['ETag']
+        self.assertEqual(etag, f'"{order.shipping_label_sha256}"')
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+        with patch('orders.services.shipping_labels.default_storage.open') as mock_open:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        mock_open.assert_not_called()
+
+        response = self.client.get(url, HTTP_RANGE='bytes=0-3')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, b'%PDF')
+        self.assertEqual(response['Content-Range'], f'bytes 0-3/{len(b"%PDF-1.4 second label")}')
+        self.assertEqual(self.client.get(url, HTTP_RANGE='bytes=500-').status_code, 416)
+
+        order.refresh_from_db()
+        public_url = f'/api/v1/orders/{order.id}/shipping-label/public/{make_public_label_token(order)}/'
+        response = APIClient().get(public_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'private, max-age=31536000, immutable')
+
+        with override_settings(SHIPPING_LABEL_SENDFILE='x-accel-redirect'):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{order.shipping_label_file}')
+        self.assertEqual(response.content, b'')
+
+    @override_settings(ROYAL_MAIL_DEFAULT_PACKAGE_FORMAT='Letter', ROYAL_MAIL_DEFAULT_WEIGHT_GRAMS=50)
+    def test_shipping_options_resolves_many_orders_from_cached_profiles(self):
+        orders = []
+        for index in range(3):
+            order = Order.objects.create(
+                customer_name=f'Options Customer {index}',
+                courier_service_code='STD',
+                total_amount=Decimal('10.00'),
+                created_by=self.user,
+            )
+            OrderItem.objects.create(
+                order=order,
+                sku=f'FLEECE-{index}',
+                product_name='Polar Fleece Fabric',
+                quantity=2,
+                quantity_ordered=2,
+                unit_price=Decimal('2.00'),
+            )
+            orders.append(order)
+        order_ids = [order.id for order in orders]
+        url = '/api/v1/orders/shipping-options/'
+
+        # Orders, items joined to stock and products, one bulk profile save.
+        with self.assertNumQueries(3):
+            response = self.client.post(url, {'order_ids': order_ids + [999999]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['missing_order_ids'], [999999])
+        first = response.data['results'][0]
+        self.assertFalse(first['profile_cached'])
+        self.assertEqual(first['shipping_options']['service_code'], 'TPS48')
+        self.assertTrue(any('fleece' in reason for reason in first['reasons']))
+
+        with self.assertNumQueries(1):
+            response = self.client.post(url, {'order_ids': order_ids}, format='json')
+        self.assertTrue(all(result['profile_cached'] for result in response.data['results']))
+
+        # Status-only item saves leave the cached profile alone.
+        item = orders[0].items.first()
+        item.lable_printed = True
+        with self.assertNumQueries(1):
+            item.save(update_fields=['lable_printed', 'updated_at'])
+        orders[0].refresh_from_db()
+        self.assertNotEqual(orders[0].shipping_profile, {})
+
+        OrderItem.objects.create(
+            order=orders[0],
+            sku='FLEECE-EXTRA',
+            product_name='Polar Fleece Fabric',
+            quantity=4,
+            quantity_ordered=4,
+            unit_price=Decimal('2.00'),
+        )
+        orders[0].refresh_from_db()
+        self.assertEqual(orders[0].shipping_profile, {})
+        response = self.client.post(url, {'order_ids': order_ids[:1]}, format='json')
+        result = response.data['results'][0]
+        self.assertFalse(result['profile_cached'])
+        # Six metres of fleece falls back to the weight table with the default weight.
+        self.assertEqual(result['shipping_options']['service_code'], 'STL2')
+
+    @override_settings(ROYAL_MAIL_DEFAULT_PACKAGE_FORMAT='Letter', ROYAL_MAIL_DEFAULT_WEIGHT_GRAMS=50)
+    def test_renaming_item_to_fleece_recomputes_cached_shipping_profile(self):
+        order = Order.objects.create(
+            customer_name='Rename Customer',
+            courier_service_code='STD',
+            total_amount=Decimal('10.00'),
+            created_by=self.user,
+        )
+        item = OrderItem.objects.create(
+            order=order,
+            sku='POPLIN-1',
+            product_name='Cotton Poplin',
+            quantity=2,
+            quantity_ordered=2,
+            unit_price=Decimal('2.00'),
+        )
+        url = '/api/v1/orders/shipping-options/'
+        response = self.client.post(url, {'order_ids': [order.id]}, format='json')
+        self.assertNotEqual(response.data['results'][0]['shipping_options']['service_code'], 'TPS48')
+
+        item.product_name = 'Polar Fleece Fabric'
+        item.save(update_fields=['product_name', 'updated_at'])
+        order.refresh_from_db()
+        self.assertEqual(order.shipping_profile, {})
+
+        response = self.client.post(url, {'order_ids': [order.id]}, format='json')
+        result = response.data['results'][0]
+        self.assertFalse(result['profile_cached'])
+        self.assertEqual(result['shipping_options']['service_code'], 'TPS48')
+
     @override_settings(
         ROYAL_MAIL_API_KEY='',
         ROYAL_MAIL_AUTH_URL='https://auth.parcel.royalmail.com',
@@ -2595,7 +3876,7 @@ class OrderWithItemsAPITest(TestCase):
         ROYAL_MAIL_DEFAULT_PACKAGE_FORMAT='Parcel',
         ROYAL_MAIL_DEFAULT_WEIGHT_GRAMS=100,
     )
-    @patch('orders.services.royal_mail.requests.post')
+    @patch('orders.services.http_transport.CourierHTTPTransport.post')
     def test_book_royal_mail_shipping_requires_api_key_even_if_oauth_token_exists(self, mock_post):
         RoyalMailOAuthToken.objects.create(
             access_token='oauth-access-token',
@@ -2696,7 +3977,7 @@ class OrderWithItemsAPITest(TestCase):
         ROYAL_MAIL_OAUTH_TOKEN_URL='https://auth.parcel.royalmail.com/oauth2/token',
         ROYAL_MAIL_OAUTH_SCOPE='orders',
     )
-    @patch('orders.services.royal_mail.requests.post')
+    @patch('orders.services.http_transport.CourierHTTPTransport.post')
     def test_royal_mail_oauth_callback_exchanges_code_and_masks_token(self, mock_post):
         mock_response = Mock(status_code=200)
         mock_response.json.return_value = {
@@ -5,6 +5,8 @@ from .views import (
     OrderItemViewSet,
     OrderBatchViewSet,
     OrderStatusHistoryViewSet,
+    ImporterStatusViewSet,
+    BackgroundJobViewSet,
     public_shipping_label,
 )
 
@@ -14,6 +16,8 @@ router.register(r'orders', OrderViewSet, basename='order')
 router.register(r'order-items', OrderItemViewSet, basename='orderitem')
 router.register(r'order-batches', OrderBatchViewSet, basename='orderbatch')
 router.register(r'order-history', OrderStatusHistoryViewSet, basename='orderhistory')
+router.register(r'importers', ImporterStatusViewSet, basename='importerstatus')
+router.register(r'jobs', BackgroundJobViewSet, basename='backgroundjob')
 
 urlpatterns = [
     path(
@@ -21,6 +25,11 @@ urlpatterns = [
         OrderViewSet.as_view({'patch': 'bulk_update_any_items_lable_printed'}),
         name='orders-items-lable-printed',
     ),
+    path(
+        'order-batches/<int:pk>/shipping-labels.pdf',
+        OrderBatchViewSet.as_view({'get': 'shipping_labels_pdf'}),
+        name='orderbatch-shipping-labels-pdf-noslash',
+    ),
     path(
         'orders/<int:order_id>/shipping-label/public/<path:token>/',
         public_shipping_label,
@@ -9,20 +9,24 @@ from django.db.models import Sum, Count, Avg, Q, Prefetch
 from django.utils import timezone
 from django.conf import settings
 from django.core import signing
-from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
 from django.http import FileResponse, HttpResponse
 from datetime import datetime, time, timedelta
 from decimal import Decimal
 from zoneinfo import ZoneInfo
-from .models import Order, OrderItem, OrderBatch, OrderBatchOrder, OrderStatusHistory, RoyalMailOAuthToken
+from .models import (
+    Order, OrderItem, OrderBatch, OrderBatchOrder, OrderStatusHistory, RoyalMailOAuthToken, ImporterStatus,
+    BackgroundJob,
+)
 from .serializers import (
     OrderListSerializer, OrderDetailSerializer, OrderCreateUpdateSerializer,
     OrderListWithItemsSerializer,
     OrderItemSerializer, OrderItemCreateSerializer, OrderStatusHistorySerializer,
     OrderConfirmSerializer, OrderShipSerializer, OrderCancelSerializer,
-    OrderStatsSerializer, RoyalMailShipmentSerializer, DPDShipmentSerializer,
-    OrderBatchListSerializer, OrderBatchCreateSerializer, OrderBatchDetailSerializer
+    OrderStatsSerializer, RoyalMailShipmentSerializer, RoyalMailBatchShipmentSerializer, DPDShipmentSerializer,
+    OrderBatchListSerializer, OrderBatchCreateSerializer, OrderBatchDetailSerializer,
+    ImporterStatusSerializer, ShipmentBookingJobSerializer, BackgroundJobSerializer,
+    ShippingOptionsSerializer,
 )
 from .services.dpd import (
     DPDAPIError,
@@ -38,12 +42,26 @@ from .services.royal_mail import (
     RoyalMailConfigError,
     RoyalMailOAuthClient,
     RoyalMailOAuthError,
-    extract_royal_mail_label_pdf,
-    extract_royal_mail_order_identifier,
-    extract_royal_mail_reference,
-    extract_tracking_number,
+    royal_mail_token_cache,
 )
 from .services.label_links import make_public_label_token, load_public_label_token
+from .services.shipping_labels import save_shipping_label_pdf, serve_shipping_label
+from .services.shipment_booking import (
+    enqueue_shipment_booking,
+    fetch_royal_mail_labels,
+    record_royal_mail_booking,
+    send_royal_mail_bookings,
+)
+from .services.batch_labels import (
+    LABEL_ORDER_BATCH,
+    LABEL_ORDER_CHOICES,
+    BatchLabelError,
+    batch_label_orders,
+    fetch_missing_labels,
+    merged_batch_labels,
+    orders_missing_labels,
+)
+from .services.pick_list import batch_pick_list, invalidate_pick_list
 
 
 def _serialize_royal_mail_oauth_token(token):
@@ -97,20 +115,6 @@ def _sanitize_dpd_response(data):
     return data
 
 
-def _save_shipping_label_pdf(order, pdf_content, provider='royal_mail'):
-    if not pdf_content:
-        return None
-
-    path = f'shipping_labels/{provider}/order-{order.id}-label.pdf'
-    if default_storage.exists(path):
-        default_storage.delete(path)
-    saved_path = default_storage.save(path, ContentFile(pdf_content))
-    order.shipping_label_file = saved_path
-    order.shipping_label_downloaded_at = timezone.now()
-    order.save(update_fields=['shipping_label_file', 'shipping_label_downloaded_at', 'updated_at'])
-    return saved_path
-
-
 def _label_error_payload(exc):
     payload = {
         'error': str(exc),
@@ -166,14 +170,11 @@ def public_shipping_label(request, order_id, token):
     if token_data.get('shipping_label_file') != order.shipping_label_file:
         return Response({'error': 'Shipping label link is no longer valid'}, status=status.HTTP_404_NOT_FOUND)
 
-    if not default_storage.exists(order.shipping_label_file):
+    # The signed link pins one stored label version, so it can be cached as immutable.
+    response = serve_shipping_label(request, order, immutable=True)
+    if response is None:
         return Response({'error': 'Shipping label file is missing'}, status=status.HTTP_404_NOT_FOUND)
-
-    return FileResponse(
-        default_storage.open(order.shipping_label_file, 'rb'),
-        content_type='application/pdf',
-        filename=f'order-{order.id}-label.pdf',
-    )
+    return response
 
 
 @api_view(['GET'])
@@ -221,6 +222,12 @@ def royal_mail_oauth_callback(request):
     })
 
 
+def _queued_booking_job_response(request, job):
+    data = BackgroundJobSerializer(job, context={'request': request}).data
+    data['status_url'] = request.build_absolute_uri(f'/api/v1/jobs/{job.id}/')
+    return Response(data, status=status.HTTP_202_ACCEPTED)
+
+
 class OrderViewSet(viewsets.ModelViewSet):
     """ViewSet for Order CRUD operations with soft delete support"""
     
@@ -714,6 +721,7 @@ class OrderViewSet(viewsets.ModelViewSet):
     def royal_mail_oauth_disconnect(self, request):
         """Deactivate saved Royal Mail OAuth tokens."""
         updated = RoyalMailOAuthToken.objects.filter(is_active=True).update(is_active=False)
+        royal_mail_token_cache.invalidate()
         return Response({
             'message': 'Royal Mail OAuth disconnected',
             'tokens_deactivated': updated,
@@ -793,54 +801,21 @@ class OrderViewSet(viewsets.ModelViewSet):
                 package_format_identifier=shipping_options['package_format_identifier'],
                 service_code=shipping_options['service_code'],
             )
-            tracking_number = extract_tracking_number(response_data)
-            royal_mail_order_identifier = extract_royal_mail_order_identifier(response_data)
-            royal_mail_reference = order.external_order_id or extract_royal_mail_reference(response_data)
-            label_pdf_from_create = extract_royal_mail_label_pdf(response_data)
-
-            note_parts = ['Royal Mail Click & Drop shipment booked.']
-            if royal_mail_reference:
-                note_parts.append(f'Reference: {royal_mail_reference}.')
-            if royal_mail_order_identifier:
-                note_parts.append(f'Royal Mail ID: {royal_mail_order_identifier}.')
-            if serializer.validated_data.get('notes'):
-                note_parts.append(serializer.validated_data['notes'])
-            note = ' '.join(note_parts)
-            order.internal_notes = f"{order.internal_notes}\n{note}".strip() if order.internal_notes else note
-            if shipping_options.get('service_code'):
-                order.shipping_method = shipping_options['service_code']
-            if royal_mail_order_identifier:
-                order.royal_mail_order_identifier = royal_mail_order_identifier
-            order.save(update_fields=[
-                'internal_notes',
-                'shipping_method',
-                'royal_mail_order_identifier',
-                'updated_at',
-            ])
-
-            label_download_error = None
-            label_url = None
-            if label_pdf_from_create:
-                _save_shipping_label_pdf(order, label_pdf_from_create)
-                label_url = _shipping_label_api_url(request, order)
-            elif royal_mail_order_identifier:
-                try:
-                    label_pdf = royal_mail_client.get_order_label_pdf(royal_mail_order_identifier)
-                    _save_shipping_label_pdf(order, label_pdf)
-                    label_url = _shipping_label_api_url(request, order)
-                except RoyalMailAPIError as exc:
-                    label_download_error = _label_error_payload(exc)
-            else:
-                label_download_error = {
-                    'error': 'Royal Mail did not return an order identifier for label download.'
-                }
-
-            if label_url:
-                order.mark_shipped(
-                    tracking_number=tracking_number,
-                    carrier='Royal Mail',
-                    user=request.user,
-                )
+            booking = {'order': order, 'response': response_data, 'shipping_options': shipping_options}
+            fetch_royal_mail_labels(royal_mail_client, [booking])
+            booked = record_royal_mail_booking(
+                booking,
+                note='Royal Mail Click & Drop shipment booked.',
+                notes=serializer.validated_data.get('notes'),
+                user=request.user,
+            )
+            tracking_number = booked['tracking_number']
+            royal_mail_order_identifier = booked['royal_mail_order_identifier']
+            royal_mail_reference = booked['royal_mail_reference']
+            label_url = _shipping_label_api_url(request, order) if booked['label_saved'] else None
+            label_download_error = (
+                _label_error_payload(booked['label_error']) if booked['label_error'] is not None else None
+            )
         except RoyalMailConfigError as exc:
             return Response({
                 'error': str(exc),
@@ -951,7 +926,7 @@ class OrderViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_502_BAD_GATEWAY,
                 )
 
-            _save_shipping_label_pdf(order, label_pdf, provider='dpd')
+            save_shipping_label_pdf(order, label_pdf, provider='dpd')
             tracking_number = extract_dpd_tracking_number(response_data)
             dpd_shipment_identifier = extract_dpd_shipment_identifier(response_data)
             service_code = serializer.validated_data.get('service_code') or settings.DPD_DEFAULT_SERVICE_CODE
@@ -1004,17 +979,75 @@ class OrderViewSet(viewsets.ModelViewSet):
             'order': OrderDetailSerializer(order, context={'request': request}).data,
         }, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['post'], url_path='booking-jobs')
+    def booking_jobs(self, request):
+        """Queue a background job that books shipments for ``order_ids``; poll /jobs/<id>/ for progress."""
+        serializer = ShipmentBookingJobSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        order_ids = serializer.validated_data.get('order_ids')
+        if not order_ids:
+            return Response({'order_ids': ['This field is required.']}, status=status.HTTP_400_BAD_REQUEST)
+
+        options = dict(serializer.validated_data)
+        courier = options.pop('courier')
+        options.pop('order_ids')
+        job = enqueue_shipment_booking(order_ids, courier, user=request.user, options=options)
+        return _queued_booking_job_response(request, job)
+
+    @action(detail=False, methods=['post'], url_path='shipping-options')
+    def shipping_options(self, request):
+        """Resolve Royal Mail package/service options for ``order_ids`` without booking them."""
+        serializer = ShippingOptionsSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        order_ids = list(dict.fromkeys(serializer.validated_data['order_ids']))
+        orders = Order.objects.in_bulk(order_ids)
+        royal_mail_client = RoyalMailClickDropClient()
+        cached_ids = {
+            order.id for order in orders.values()
+            if royal_mail_client.shipping_profile_is_fresh(order.shipping_profile)
+        }
+        royal_mail_client.shipping_profiles(list(orders.values()))
+
+        results = []
+        for order_id in order_ids:
+            order = orders.get(order_id)
+            if order is None:
+                continue
+            result = {
+                'order_id': order.id,
+                'order_number': order.order_number,
+                'profile_cached': order.id in cached_ids,
+                'shipping_options': None,
+                'reasons': [],
+                'error': None,
+            }
+            try:
+                result['shipping_options'], result['reasons'] = royal_mail_client.explain_shipping_options(
+                    order,
+                    weight_in_grams=serializer.validated_data.get('weight_in_grams'),
+                    package_format_identifier=serializer.validated_data.get('package_format_identifier') or None,
+                    service_code=serializer.validated_data.get('service_code') or None,
+                )
+            except ValueError as exc:
+                result['error'] = str(exc)
+            results.append(result)
+
+        return Response({
+            'results': results,
+            'missing_order_ids': [order_id for order_id in order_ids if order_id not in orders],
+        }, status=status.HTTP_200_OK)
+
     @action(detail=True, methods=['get'], url_path='shipping-label')
     def shipping_label(self, request, pk=None):
         """Return this order's saved printable label PDF, fetching it from Royal Mail if needed."""
         order = self.get_object()
 
-        if order.shipping_label_file and default_storage.exists(order.shipping_label_file):
-            return FileResponse(
-                default_storage.open(order.shipping_label_file, 'rb'),
-                content_type='application/pdf',
-                filename=f'order-{order.id}-label.pdf',
-            )
+        response = serve_shipping_label(request, order)
+        if response is not None:
+            return response
 
         if not order.royal_mail_order_identifier:
             return Response(
@@ -1025,7 +1058,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         try:
             royal_mail_client = RoyalMailClickDropClient()
             label_pdf = royal_mail_client.get_order_label_pdf(order.royal_mail_order_identifier)
-            _save_shipping_label_pdf(order, label_pdf)
+            save_shipping_label_pdf(order, label_pdf)
         except RoyalMailConfigError as exc:
             return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
         except RoyalMailAPIError as exc:
@@ -1036,11 +1069,13 @@ class OrderViewSet(viewsets.ModelViewSet):
             )
             return Response(_label_error_payload(exc), status=response_status)
 
-        return FileResponse(
-            default_storage.open(order.shipping_label_file, 'rb'),
-            content_type='application/pdf',
-            filename=f'order-{order.id}-label.pdf',
-        )
+        response = serve_shipping_label(request, order)
+        if response is None:
+            return Response(
+                {'error': 'Royal Mail did not return a printable label PDF.'},
+                status=status.HTTP_502_BAD_GATEWAY,
+            )
+        return response
     
     @action(detail=True, methods=['post'], url_path='deliver')
     def deliver(self, request, pk=None):
@@ -1596,14 +1631,16 @@ class OrderBatchViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         include_deleted = self.request.query_params.get('include_deleted', 'false').lower() == 'true'
         queryset = OrderBatch.objects.all() if include_deleted else OrderBatch.objects.filter(is_deleted=False)
-        queryset = queryset.select_related('created_by', 'deleted_by').prefetch_related(
-            Prefetch(
-                'order_links',
-                queryset=OrderBatchOrder.objects.select_related(
-                    'order', 'order__created_by', 'order__assigned_to'
-                ).prefetch_related('order__items')
+        queryset = queryset.select_related('created_by', 'deleted_by')
+        if self.action != 'pick_list':
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    'order_links',
+                    queryset=OrderBatchOrder.objects.select_related(
+                        'order', 'order__created_by', 'order__assigned_to'
+                    ).prefetch_related('order__items')
+                )
             )
-        )
 
         date_from = self.request.query_params.get('date_from')
         date_to = self.request.query_params.get('date_to')
@@ -1696,6 +1733,7 @@ class OrderBatchViewSet(viewsets.ModelViewSet):
                 for order_id in order_ids
                 if order_id not in existing_order_ids
             ])
+            invalidate_pick_list(batch.pk)
 
         batch = self.get_queryset().get(pk=pk)
         return Response({
@@ -1706,8 +1744,16 @@ class OrderBatchViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         batch = self.get_object()
         batch.soft_delete(user=request.user)
+        invalidate_pick_list(batch.pk)
         return Response({'message': 'Order batch deleted successfully'}, status=status.HTTP_200_OK)
 
+    @action(detail=True, methods=['get'], url_path='pick-list')
+    def pick_list(self, request, pk=None):
+        """Items of every order in the batch summed per SKU, in warehouse walk order."""
+        batch = self.get_object()
+        refresh = request.query_params.get('refresh', 'false').lower() == 'true'
+        return Response(batch_pick_list(batch, refresh=refresh))
+
     @action(detail=True, methods=['patch'], url_path='labels/printed')
     def labels_printed(self, request, pk=None):
         batch = self.get_object()
@@ -1764,6 +1810,200 @@ class OrderBatchViewSet(viewsets.ModelViewSet):
             'items': OrderItemSerializer(items, many=True, context={'request': request}).data,
         })
 
+    @action(detail=True, methods=['post'], url_path='book-royal-mail')
+    def book_royal_mail(self, request, pk=None):
+        """Book every eligible order in this batch with Royal Mail in chunked bulk requests."""
+        batch = self.get_object()
+        serializer = RoyalMailBatchShipmentSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        orders = Order.objects.filter(batch_links__batch=batch).prefetch_related(
+            'items__stock_item__product__extended_data',
+        ).order_by('id')
+        requested_ids = serializer.validated_data.get('order_ids')
+        if requested_ids:
+            orders = orders.filter(id__in=requested_ids)
+        orders = list(orders)
+        if requested_ids:
+            found_ids = {order.id for order in orders}
+            missing_ids = [order_id for order_id in requested_ids if order_id not in found_ids]
+            if missing_ids:
+                return Response(
+                    {
+                        'error': 'Some orders were not found in this batch',
+                        'missing_order_ids': missing_ids,
+                    },
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+
+        royal_mail_client = RoyalMailClickDropClient()
+        try:
+            royal_mail_client.ensure_configured()
+        except RoyalMailConfigError as exc:
+            return Response({
+                'error': str(exc),
+                'message': (
+                    'Generate a Click & Drop API authorisation key from Royal Mail '
+                    'Settings > Integrations > Click & Drop API and set ROYAL_MAIL_API_KEY.'
+                ),
+                'auth_url': settings.ROYAL_MAIL_AUTH_URL,
+                'username': settings.ROYAL_MAIL_USERNAME,
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        skipped = []
+        failed = []
+        bookable = []
+        for order in orders:
+            if order.order_status != Order.STATUS_COMPLETED:
+                skipped.append({
+                    'order_id': order.id,
+                    'order_number': order.order_number,
+                    'reason': f'Order is {order.order_status}; only COMPLETED orders are booked.',
+                })
+                continue
+            if order.royal_mail_order_identifier:
+                skipped.append({
+                    'order_id': order.id,
+                    'order_number': order.order_number,
+                    'reason': 'Royal Mail shipment already exists for this order.',
+                    'royal_mail_order_identifier': order.royal_mail_order_identifier,
+                })
+                continue
+            try:
+                shipping_options = royal_mail_client.resolve_shipping_options(
+                    order,
+                    package_format_identifier=serializer.validated_data.get('package_format_identifier') or None,
+                    service_code=serializer.validated_data.get('service_code') or None,
+                )
+            except ValueError as exc:
+                failed.append({'order_id': order.id, 'order_number': order.order_number, 'errors': [str(exc)]})
+                continue
+            bookable.append((order, shipping_options))
+
+        results = send_royal_mail_bookings(royal_mail_client, bookable)
+
+        booked = []
+        for result in results:
+            order = result['order']
+            if not result['created']:
+                failed.append({
+                    'order_id': order.id,
+                    'order_number': order.order_number,
+                    'errors': result['errors'],
+                    'royal_mail_response': _sanitize_royal_mail_response(result['response']),
+                })
+                continue
+
+            detail = record_royal_mail_booking(
+                result,
+                note=f'Royal Mail Click & Drop shipment booked with batch {batch.batch_name}.',
+                notes=serializer.validated_data.get('notes'),
+                user=request.user,
+            )
+            booked.append({
+                'order_id': order.id,
+                'order_number': order.order_number,
+                'order_status': order.order_status,
+                'tracking_number': detail['tracking_number'],
+                'royal_mail_reference': detail['royal_mail_reference'],
+                'royal_mail_order_identifier': detail['royal_mail_order_identifier'],
+                'royal_mail_booking_options': detail['royal_mail_booking_options'],
+                'label_url': _shipping_label_api_url(request, order) if detail['label_saved'] else None,
+                'label_download_error': (
+                    _label_error_payload(detail['label_error']) if detail['label_error'] is not None else None
+                ),
+            })
+
+        chunk_size = max(1, settings.ROYAL_MAIL_BULK_CHUNK_SIZE)
+        return Response({
+            'message': f'Royal Mail booking finished for batch {batch.batch_name}',
+            'batch_id': batch.id,
+            'requested_count': len(orders),
+            'booked_count': len(booked),
+            'labelled_count': sum(1 for entry in booked if entry['label_url']),
+            'failed_count': len(failed),
+            'skipped_count': len(skipped),
+            'royal_mail_requests': (len(bookable) + chunk_size - 1) // chunk_size,
+            'booked': booked,
+            'failed': failed,
+            'skipped': skipped,
+        })
+
+    @action(detail=True, methods=['post'], url_path='booking-jobs')
+    def booking_jobs(self, request, pk=None):
+        """Queue a background job that books this batch's orders; poll /jobs/<id>/ for progress."""
+        batch = self.get_object()
+        serializer = ShipmentBookingJobSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        options = dict(serializer.validated_data)
+        courier = options.pop('courier')
+        batch_order_ids = list(
+            batch.order_links.order_by('created_at', 'id').values_list('order_id', flat=True)
+        )
+        order_ids = options.pop('order_ids', None) or batch_order_ids
+        missing_ids = sorted(set(order_ids) - set(batch_order_ids))
+        if missing_ids:
+            return Response(
+                {
+                    'error': 'Some orders were not found in this batch',
+                    'missing_order_ids': missing_ids,
+                },
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        if not order_ids:
+            return Response({'error': 'This batch has no orders to book.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = enqueue_shipment_booking(order_ids, courier, user=request.user, options=options, batch=batch)
+        return _queued_booking_job_response(request, job)
+
+    @action(detail=True, methods=['get'], url_path=r'shipping-labels\.pdf')
+    def shipping_labels_pdf(self, request, pk=None):
+        """Return every saved label in this batch merged into one PDF, in print order."""
+        batch = self.get_object()
+        order_by = request.query_params.get('order_by') or LABEL_ORDER_BATCH
+        if order_by not in LABEL_ORDER_CHOICES:
+            return Response(
+                {'error': f"order_by must be one of: {', '.join(LABEL_ORDER_CHOICES)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        orders = batch_label_orders(batch, order_by=order_by)
+        fetch_errors = {}
+        if orders_missing_labels(orders):
+            royal_mail_client = RoyalMailClickDropClient()
+            try:
+                royal_mail_client.ensure_configured()
+            except RoyalMailConfigError as exc:
+                fetch_errors = {'__all__': str(exc)}
+            else:
+                fetch_errors = fetch_missing_labels(orders, royal_mail_client, save_shipping_label_pdf)
+
+        try:
+            path, included, missing = merged_batch_labels(batch, orders, order_by)
+        except BatchLabelError as exc:
+            return Response(
+                {
+                    'error': str(exc),
+                    'batch_id': batch.id,
+                    'missing_order_ids': [order.id for order in orders],
+                    'label_errors': {str(key): value for key, value in fetch_errors.items()},
+                },
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        response = FileResponse(
+            default_storage.open(path, 'rb'),
+            content_type='application/pdf',
+            filename=f'batch-{batch.id}-labels.pdf',
+        )
+        response['X-Label-Count'] = str(len(included))
+        if missing:
+            response['X-Missing-Label-Orders'] = ','.join(str(order.id) for order in missing)
+        return response
+
 
 class OrderStatusHistoryViewSet(viewsets.ReadOnlyModelViewSet):
     """Read-only viewset for order status history"""
@@ -1775,3 +2015,24 @@ class OrderStatusHistoryViewSet(viewsets.ReadOnlyModelViewSet):
     
     filterset_fields = ['order', 'from_status', 'to_status', 'changed_by']
     ordering = ['-timestamp']
+
+
+class ImporterStatusViewSet(viewsets.ReadOnlyModelViewSet):
+    """Read-only view of scheduled importer locks, last-run durations and counts."""
+
+    queryset = ImporterStatus.objects.all()
+    serializer_class = ImporterStatusSerializer
+    permission_classes = [IsAuthenticated]
+    lookup_field = 'source'
+    pagination_class = None
+
+
+class BackgroundJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Progress and per-item outcomes of queued background jobs run by ``manage.py run_jobs``."""
+
+    queryset = BackgroundJob.objects.select_related('created_by')
+    serializer_class = BackgroundJobSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['job_type', 'status', 'created_by']
+    ordering = ['-created_at']
@@ -14,6 +14,8 @@ from django.utils import timezone
 from colors.models import Color
 from products.models import Brand, Category, Location, Product, ProductExtendedData
 from stock.models import StockItem
+from stock.services.ledger import record_opening_balance, set_available
+from stock.services.sku_resolver import sku_resolver
 from stock.sku_utils import normalize_sku_reference
 
 logger = logging.getLogger(__name__)
@@ -412,10 +414,16 @@ class Command(BaseCommand):
             exists = StockItem.all_objects.filter(sku=sku).exists()
             return StockItem(sku=sku, **defaults), not exists, related_stats
 
+        available_stock = defaults.pop('available_stock_in_mtr')
         stock_item, created = StockItem.all_objects.update_or_create(
             sku=sku,
             defaults=defaults,
+            create_defaults={**defaults, 'available_stock_in_mtr': available_stock},
         )
+        if created:
+            record_opening_balance(stock_item, reason='Product CSV import')
+        else:
+            set_available(stock_item, available_stock, reason='Product CSV import')
         return stock_item, created, related_stats
 
     def _sync_categories(self, product, categories_value, dry_run=False):
@@ -520,12 +528,13 @@ class Command(BaseCommand):
         if existing_for_product:
             return self._normalize_sku(existing_for_product.sku)[:50]
 
-        if not StockItem.all_objects.filter(sku=sku).exclude(product=product).exists():
+        other_products_stock = StockItem.all_objects.exclude(product=product)
+        if sku_resolver.resolve(sku, queryset=other_products_stock) is None:
             return sku
 
         suffix = f' {product.vs_child_id}'
         candidate = f'{sku[:50 - len(suffix)]}{suffix}'
-        if not StockItem.all_objects.filter(sku=candidate).exclude(product=product).exists():
+        if sku_resolver.resolve(candidate, queryset=other_products_stock) is None:
             return candidate
 
         fallback = f'VS{product.vs_child_id}'[:50]
@@ -136,20 +136,45 @@ def _bypass_interstitial(session, url, html_text):
     return None
 
 
+def prepare_session(session=None):
+    """Return a session with the browser-like headers Tiaknight expects.
+
+    Passing a long-lived pooled session keeps the TLS connection and the
+    interstitial cookies alive across GetNewOrders/GetOrder calls.
+    """
+    session = session or requests.Session()
+    session.headers.update({
+        'User-Agent': DEFAULT_UA,
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    })
+    return session
+
+
 def fetch_soap_response(url, clientid, username, password,
                         auto_update='false', file_type='xml',
-                        verify_ssl=True, envelope=None):
+                        verify_ssl=True, envelope=None, session=None,
+                        transport=None, idempotent=False):
     """Fetch the raw SOAP response bytes from Tiaknight.
 
+    With a ``transport`` (the courier HTTP transport) every request goes
+    through it, so it is timed and uses its pooled session. The SOAP POST is
+    only retried when ``idempotent`` is set (GetOrder); GetNewOrders may mark
+    orders as fetched, so it is never sent twice.
+
     Returns (bytes, status_code) — the raw XML bytes of the HTTP response body.
     Raises RuntimeError on unrecoverable failure.
     """
     url = normalize_service_url(url)
-    session = requests.Session()
-    session.headers.update({
-        'User-Agent': DEFAULT_UA,
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-    })
+    if transport is not None:
+        session = transport.session_for(url)
+    session = prepare_session(session)
+
+    def send(method, target, **kwargs):
+        if transport is None:
+            return session.request(method, target, **kwargs)
+        if method == 'POST':
+            kwargs.update(idempotent=idempotent, max_retries=None if idempotent else 0)
+        return transport.request(method, target, **kwargs)
 
     envelope = envelope or build_get_new_orders_envelope(
         url=url,
@@ -167,8 +192,8 @@ def fetch_soap_response(url, clientid, username, password,
 
     # ── Attempt 1: Direct POST ────────────────────────────────────────
     try:
-        resp = session.post(url, data=envelope.encode('utf-8'),
-                            headers=soap_headers, verify=verify_ssl, timeout=30)
+        resp = send('POST', url, data=envelope.encode('utf-8'),
+                    headers=soap_headers, verify=verify_ssl, timeout=30)
     except requests.RequestException as e:
         raise RuntimeError(f"SOAP POST failed: {e}")
 
@@ -188,7 +213,7 @@ def fetch_soap_response(url, clientid, username, password,
     # ── Interstitial detected — handle it ─────────────────────────────
     # Step A: GET the page to see the interstitial properly
     try:
-        get_resp = session.get(url, verify=verify_ssl, timeout=15)
+        get_resp = send('GET', url, verify=verify_ssl, timeout=15)
     except requests.RequestException as e:
         raise RuntimeError(f"GET for interstitial failed: {e}")
 
@@ -210,8 +235,8 @@ def fetch_soap_response(url, clientid, username, password,
 
     # ── Attempt 2: POST with cookies + ayh_access ─────────────────────
     try:
-        resp2 = session.post(target_url, data=envelope.encode('utf-8'),
-                             headers=soap_headers, verify=verify_ssl, timeout=30)
+        resp2 = send('POST', target_url, data=envelope.encode('utf-8'),
+                     headers=soap_headers, verify=verify_ssl, timeout=30)
     except requests.RequestException as e:
         raise RuntimeError(f"SOAP POST (retry with ayh) failed: {e}")
 
@@ -249,8 +274,9 @@ def build_get_order_envelope(url, clientid, username, password, order_ref, order
     )
 
 
-def fetch_order_response(url, clientid, username, password, order_ref, order_id=None, verify_ssl=True):
-    """Fetch a single full Tiaknight order using the v6 GetOrder operation."""
+def fetch_order_response(url, clientid, username, password, order_ref, order_id=None, verify_ssl=True, session=None,
+                         transport=None):
+    """Fetch a single full Tiaknight order using the v6 GetOrder operation (read-only, so retried)."""
     envelope = build_get_order_envelope(
         url=url,
         clientid=clientid,
@@ -266,6 +292,9 @@ def fetch_order_response(url, clientid, username, password, order_ref, order_id=
         password=password,
         verify_ssl=verify_ssl,
         envelope=envelope,
+        session=session,
+        transport=transport,
+        idempotent=True,
     )
 
 
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import StockItem, StockMovement, StockBatch, StockBatchRoll
+from .models import StockItem, StockMovement, StockBatch, StockBatchRoll, StockSkuAlias
 
 @admin.register(StockItem)
 class StockItemAdmin(admin.ModelAdmin):
@@ -160,3 +160,12 @@ class StockBatchAdmin(admin.ModelAdmin):
             count += 1
         self.message_user(request, f'{count} stock batches were permanently deleted.')
     hard_delete_selected.short_description = "Hard delete selected stock batches (PERMANENT)"
+
+
+@admin.register(StockSkuAlias)
+class StockSkuAliasAdmin(admin.ModelAdmin):
+    list_display = ['alias', 'stock_item', 'source', 'created_at']
+    list_filter = ['source']
+    search_fields = ['alias', 'stock_item__sku']
+    raw_id_fields = ('stock_item',)
+    readonly_fields = ['created_at']
@@ -0,0 +1,70 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from stock.services.product_stock_sync import DEFAULT_CHUNK_SIZE
+from stock.services.product_stock_sync_benchmark import ProductStockSyncBenchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark sync_product_stock_items on a synthetic catalogue: a first sync creating every '
+        'stock item, a sync with nothing to do and a sync after some products change. '
+        'Run it against a scratch database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=50000, help='Synthetic products to create.')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument(
+            '--change-ratio',
+            type=float,
+            default=0.1,
+            help='Share of products given a new cost price before the last sync.',
+        )
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--keep-data', action='store_true', help='Keep the products and stock items created.')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+
+    def handle(self, *args, **options):
+        if options['products'] < 1 or options['chunk_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--products, --chunk-size and --workers must be at least 1')
+        if not 0 <= options['change_ratio'] <= 1:
+            raise CommandError('--change-ratio must be between 0 and 1')
+
+        benchmark = ProductStockSyncBenchmark(
+            products=options['products'],
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+            change_ratio=options['change_ratio'],
+            keep_data=options['keep_data'],
+            seed=options['seed'],
+        )
+        try:
+            results = benchmark.run()
+        except ValueError as exc:
+            raise CommandError(str(exc)) from exc
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'products': benchmark.products,
+                'chunk_size': benchmark.chunk_size,
+                'workers': benchmark.workers,
+                'results': results,
+            }, indent=2))
+            return
+
+        self.stdout.write(
+            f'{benchmark.products} products | chunk size {benchmark.chunk_size} | workers {benchmark.workers}'
+        )
+        self.stdout.write(
+            f"{'phase':<10} {'created':>8} {'updated':>8} {'unchanged':>9} "
+            f"{'seconds':>8} {'products/s':>11} {'queries':>8}"
+        )
+        for row in results:
+            self.stdout.write(
+                f"{row['phase']:<10} {row['stock_created']:>8} {row['stock_updated']:>8} "
+                f"{row['stock_unchanged']:>9} {row['wall_seconds']:>8} {row['products_per_second']:>11} "
+                f"{row['queries']:>8}"
+            )
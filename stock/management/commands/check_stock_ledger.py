@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from stock.models import StockItem, StockMovement
+from stock.services.ledger import check_ledger, reconcile
+
+
+class Command(BaseCommand):
+    help = 'Verify stock movement running balances against each other and against current stock levels.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sku', action='append', dest='skus', help='Check only this SKU (repeatable).')
+        parser.add_argument(
+            '--repair',
+            action='store_true',
+            help='Record reconciliation movements so each ledger ends at the current stock levels '
+                 '(breaks inside the chain are reported, not rewritten).',
+        )
+
+    def handle(self, *args, **options):
+        stock_items = StockItem.all_objects.order_by('sku')
+        if options['skus']:
+            stock_items = stock_items.filter(sku__in=options['skus'])
+
+        checked = 0
+        inconsistent = 0
+        repaired = 0
+        for stock_item in stock_items.iterator():
+            checked += 1
+            movements = StockMovement.all_objects.filter(
+                stock_item_id=stock_item.sku,
+                available_balance__isnull=False,
+            ).order_by('created_at', 'id').iterator()
+            problems, balance = check_ledger(stock_item, movements)
+            if balance is None and (stock_item.available_stock_in_mtr or stock_item.reserved_stock):
+                problems.append('stock has levels but no ledger movements')
+            if not problems:
+                continue
+
+            inconsistent += 1
+            for problem in problems:
+                self.stdout.write(self.style.WARNING(f'{stock_item.sku}: {problem}'))
+            if options['repair']:
+                with transaction.atomic():
+                    locked = StockItem.all_objects.select_for_update().get(sku=stock_item.sku)
+                    # Re-read the ledger end under the lock; movements may have landed since the check.
+                    last = StockMovement.all_objects.filter(
+                        stock_item_id=locked.sku,
+                        available_balance__isnull=False,
+                    ).order_by('-created_at', '-id').first()
+                    balance = (last.available_balance, last.reserved_balance) if last else None
+                    if reconcile(locked, balance):
+                        repaired += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {checked} stock items: {inconsistent} inconsistent, {repaired} repaired.'
+        ))
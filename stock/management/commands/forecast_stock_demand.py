@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from stock.services.demand_forecast import (
+    DEFAULT_HISTORY_YEARS,
+    DEFAULT_SERVICE_LEVEL,
+    DEFAULT_WINDOW_DAYS,
+    reorder_suggestions,
+    store_reorder_suggestions,
+)
+
+
+class Command(BaseCommand):
+    help = 'Forecast demand from order history and store suggested reorder points on active stock items.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--window-days', type=int, default=DEFAULT_WINDOW_DAYS,
+                            help='Days of recent demand to average.')
+        parser.add_argument('--service-level', type=float, default=DEFAULT_SERVICE_LEVEL,
+                            help='Chance of not running out during the lead time (0.5-0.999).')
+        parser.add_argument('--history-years', type=int, default=DEFAULT_HISTORY_YEARS,
+                            help='Years of order history used for the seasonal factor.')
+        parser.add_argument('--dry-run', action='store_true', help='Compute suggestions without saving them.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        suggestions = reorder_suggestions(
+            window_days=options['window_days'],
+            service_level=options['service_level'],
+            history_years=options['history_years'],
+        )
+        needing_reorder = sum(1 for suggestion in suggestions if suggestion['needs_reorder'])
+        if options['dry_run']:
+            stored = 0
+        else:
+            stored = store_reorder_suggestions(suggestions)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Stock items forecast: {len(suggestions)}, needing reorder: {needing_reorder}, '
+            f'saved: {stored} ({elapsed:.2f}s)'
+        ))
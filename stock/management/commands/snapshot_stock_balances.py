@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from stock.services.ledger import prune_balance_snapshots, take_balance_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Snapshot the ledger balance of every stock item that moved since its last snapshot.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-days',
+            type=int,
+            default=None,
+            help="Also delete snapshots older than this many days (each SKU's newest one is kept).",
+        )
+
+    def handle(self, *args, **options):
+        created = take_balance_snapshots()
+        self.stdout.write(self.style.SUCCESS(f'Stock balance snapshots written: {created}'))
+        if options['keep_days'] is not None:
+            deleted = prune_balance_snapshots(options['keep_days'])
+            self.stdout.write(f'Old snapshots deleted: {deleted}')
@@ -1,7 +1,8 @@
-from django.core.management.base import BaseCommand
-from django.db import transaction
+import time
 
-from stock.services.product_stock_sync import sync_product_stock_items
+from django.core.management.base import BaseCommand, CommandError
+
+from stock.services.product_stock_sync import DEFAULT_CHUNK_SIZE, sync_product_stock_items
 
 
 class Command(BaseCommand):
@@ -13,15 +14,38 @@ class Command(BaseCommand):
             action='store_true',
             help='Report what would be created/updated without writing.',
         )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f'Stock rows written per bulk statement and transaction (default: {DEFAULT_CHUNK_SIZE}).',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Threads writing chunks concurrently, each on its own connection (default: 1). '
+                 'Not available on SQLite, which allows one writer at a time.',
+        )
 
     def handle(self, *args, **options):
         dry_run = options['dry_run']
-        with transaction.atomic():
-            stats = sync_product_stock_items(dry_run=dry_run)
-            if dry_run:
-                transaction.set_rollback(True)
+        if options['chunk_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--chunk-size and --workers must be at least 1')
+
+        started = time.perf_counter()
+        try:
+            stats = sync_product_stock_items(
+                dry_run=dry_run,
+                chunk_size=options['chunk_size'],
+                workers=options['workers'],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc)) from exc
+        elapsed = time.perf_counter() - started
 
         mode = 'Dry run complete' if dry_run else 'Product stock sync complete'
         self.stdout.write(self.style.SUCCESS(mode))
         for key, value in stats.items():
             self.stdout.write(f'{key}: {value}')
+        self.stdout.write(f'elapsed_seconds: {elapsed:.3f}')
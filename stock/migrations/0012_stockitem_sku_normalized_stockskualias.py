@@ -0,0 +1,53 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:20
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def normalize_reference(value):
+    value = str(value or '').strip()
+    value = re.sub(r'\(([^()]*)\)', r'\1', value)
+    value = value.replace('(', ' ').replace(')', ' ')
+    return re.sub(r'\s+', ' ', value).strip()
+
+
+def backfill_sku_normalized(apps, schema_editor):
+    StockItem = apps.get_model('stock', 'StockItem')
+    for stock_item in StockItem.objects.all().only('sku').iterator():
+        StockItem.objects.filter(pk=stock_item.pk).update(
+            sku_normalized=normalize_reference(stock_item.sku)[:50],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0011_sync_all_product_stock_details'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockitem',
+            name='sku_normalized',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, help_text='normalize_sku_reference(sku), kept for indexed SKU lookups', max_length=50),
+        ),
+        migrations.CreateModel(
+            name='StockSkuAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alias', models.CharField(help_text='SKU as it appeared in a source system or before normalization', max_length=100, unique=True)),
+                ('source', models.CharField(blank=True, default='', help_text='What recorded the alias (save, normalize_stock_skus, ...)', max_length=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('stock_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sku_aliases', to='stock.stockitem')),
+            ],
+            options={
+                'verbose_name': 'Stock SKU Alias',
+                'verbose_name_plural': 'Stock SKU Aliases',
+                'db_table': 'stock_sku_aliases',
+                'ordering': ['alias'],
+            },
+        ),
+        migrations.RunPython(backfill_sku_normalized, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0012_stockitem_sku_normalized_stockskualias'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockmovement',
+            name='available_balance',
+            field=models.IntegerField(blank=True, help_text='Available stock after this movement (ledger running balance)', null=True),
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='reserved_balance',
+            field=models.IntegerField(blank=True, help_text='Reserved stock after this movement (ledger running balance)', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['stock_item', 'created_at'], name='stock_movement_item_time_idx'),
+        ),
+        migrations.CreateModel(
+            name='StockBalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField()),
+                ('available_stock', models.IntegerField()),
+                ('reserved_stock', models.IntegerField()),
+                ('last_movement_id', models.BigIntegerField(blank=True, help_text='Latest StockMovement included in this balance', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('stock_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_snapshots', to='stock.stockitem')),
+            ],
+            options={
+                'verbose_name': 'Stock Balance Snapshot',
+                'verbose_name_plural': 'Stock Balance Snapshots',
+                'db_table': 'stock_balance_snapshots',
+                'ordering': ['-taken_at'],
+                'indexes': [models.Index(fields=['stock_item', 'taken_at'], name='stock_snapshot_item_time_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0013_stock_ledger_balances_and_snapshots'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stockitem',
+            index=models.Index(
+                models.F('is_active'),
+                models.F('available_stock_in_mtr') - models.F('minimum_stock_level'),
+                name='stock_low_stock_gap_idx',
+            ),
+        ),
+    ]
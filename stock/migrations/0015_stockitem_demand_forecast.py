@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-19 13:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0014_stockitem_stock_low_stock_gap_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockitem',
+            name='forecast_daily_demand',
+            field=models.DecimalField(decimal_places=3, default=0, help_text='Forecast demand per day (seasonally adjusted)', max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='stockitem',
+            name='suggested_reorder_point',
+            field=models.IntegerField(blank=True, help_text='Free stock level at which to reorder', null=True),
+        ),
+        migrations.AddField(
+            model_name='stockitem',
+            name='suggested_order_quantity',
+            field=models.IntegerField(blank=True, help_text='Quantity to order now to cover demand', null=True),
+        ),
+        migrations.AddField(
+            model_name='stockitem',
+            name='forecast_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
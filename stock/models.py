@@ -35,6 +35,8 @@ class StockItem(models.Model):
                              to_field='color_code', db_column='color_code')
     sku = models.CharField(max_length=50, unique=True, primary_key=True,
                           help_text="Stock Keeping Unit - unique identifier")
+    sku_normalized = models.CharField(max_length=50, blank=True, default='', db_index=True, editable=False,
+                                      help_text="normalize_sku_reference(sku), kept for indexed SKU lookups")
     
     # Stock levels
     available_stock_in_mtr = models.IntegerField(
@@ -55,6 +57,15 @@ class StockItem(models.Model):
                                help_text="Primary supplier")
     lead_time_days = models.PositiveIntegerField(default=7,
                                                 help_text="Supplier lead time in days")
+
+    # Demand forecast, written nightly by the forecast_stock_demand command
+    forecast_daily_demand = models.DecimalField(max_digits=12, decimal_places=3, default=0,
+                                                help_text="Forecast demand per day (seasonally adjusted)")
+    suggested_reorder_point = models.IntegerField(blank=True, null=True,
+                                                  help_text="Free stock level at which to reorder")
+    suggested_order_quantity = models.IntegerField(blank=True, null=True,
+                                                   help_text="Quantity to order now to cover demand")
+    forecast_updated_at = models.DateTimeField(blank=True, null=True)
     
     # Cost tracking
     unit_cost = models.DecimalField(max_digits=10, decimal_places=2, default=0.00,
@@ -93,15 +104,35 @@ class StockItem(models.Model):
             models.Index(fields=['color']),
             models.Index(fields=['is_active']),
             models.Index(fields=['available_stock_in_mtr'], name='stock_availab_95624e_idx'),
+            # Serves the low-stock list: filter and sort by how far stock is above its minimum.
+            models.Index(
+                models.F('is_active'),
+                models.F('available_stock_in_mtr') - models.F('minimum_stock_level'),
+                name='stock_low_stock_gap_idx',
+            ),
         ]
     
     def __str__(self):
         return f"{self.sku} - {self.available_stock_in_mtr} mtr"
 
     def save(self, *args, **kwargs):
+        raw_sku = str(self.sku or '').strip()
         self.sku = normalize_sku_reference(self.sku)[:50]
+        self.sku_normalized = self.sku
         self.product_type = normalize_sku_reference(self.product_type)[:20]
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'sku' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'sku_normalized'}
         super().save(*args, **kwargs)
+        if raw_sku and raw_sku != self.sku:
+            # Keep the source spelling (e.g. '(109 LT) DSND') resolvable after normalizing it away.
+            StockSkuAlias.objects.get_or_create(
+                alias=raw_sku[:100],
+                defaults={'stock_item': self, 'source': 'save'},
+            )
+        from stock.services.stock_health import invalidate_stock_health
+
+        invalidate_stock_health()
     
     @property
     def total_available_stock(self):
@@ -132,38 +163,29 @@ class StockItem(models.Model):
         """Calculate total value of stock"""
         return self.available_stock_in_mtr * self.unit_cost
     
-    def reserve_stock(self, quantity):
-        """Reserve stock for an order"""
-        if self.total_available_stock >= quantity:
-            self.reserved_stock += quantity
-            self.save()
-            return True
-        return False
-    
-    def release_stock(self, quantity):
-        """Release reserved stock"""
-        if self.reserved_stock >= quantity:
-            self.reserved_stock -= quantity
-            self.save()
-            return True
-        return False
-    
-    def adjust_stock(self, quantity, reason="Manual Adjustment"):
-        """Adjust stock levels with reason tracking"""
-        old_stock = self.available_stock_in_mtr
-        self.available_stock_in_mtr = max(0, self.available_stock_in_mtr + quantity)
-        self.last_stock_update = timezone.now()
-        self.save()
-        
-        # Create stock movement record
-        StockMovement.objects.create(
-            stock_item=self,
-            movement_type='ADJUSTMENT',
-            quantity=quantity,
-            old_stock_level=old_stock,
-            new_stock_level=self.available_stock_in_mtr,
-            reason=reason
-        )
+    def reserve_stock(self, quantity, reference=None, user=None):
+        """
+        Reserve stock for an order; returns False when not enough is unreserved.
+
+        The check and the increment are one conditional UPDATE, so concurrent
+        reservations can never push ``reserved_stock`` above available stock.
+        """
+        from stock.services.ledger import change_reserved
+
+        return change_reserved(self, quantity, reference=reference, user=user) is not None
+
+    def release_stock(self, quantity, reference=None, user=None):
+        """Release reserved stock; returns False when less than ``quantity`` is reserved."""
+        from stock.services.ledger import change_reserved
+
+        return change_reserved(self, -quantity, reference=reference, user=user) is not None
+
+    def adjust_stock(self, quantity, reason="Manual Adjustment", user=None):
+        """Adjust stock levels with reason tracking; returns the new available level."""
+        from stock.services.ledger import adjust_available
+
+        adjust_available(self, quantity, reason=reason, user=user)
+        return self.available_stock_in_mtr
     
     def soft_delete(self):
         """Soft delete the stock item"""
@@ -179,7 +201,31 @@ class StockItem(models.Model):
     
     def hard_delete(self):
         """Permanently delete the stock item"""
+        from stock.services.stock_health import invalidate_stock_health
+
         super().delete()
+        invalidate_stock_health()
+
+
+class StockSkuAlias(models.Model):
+    """Historical or source-formatted SKU that resolves to a stock item"""
+
+    alias = models.CharField(max_length=100, unique=True,
+                             help_text="SKU as it appeared in a source system or before normalization")
+    stock_item = models.ForeignKey(StockItem, on_delete=models.CASCADE, related_name='sku_aliases')
+    source = models.CharField(max_length=50, blank=True, default='',
+                              help_text="What recorded the alias (save, normalize_stock_skus, ...)")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'stock_sku_aliases'
+        ordering = ['alias']
+        verbose_name = 'Stock SKU Alias'
+        verbose_name_plural = 'Stock SKU Aliases'
+
+    def __str__(self):
+        return f"{self.alias} -> {self.stock_item_id}"
+
 
 class StockMovement(models.Model):
     """Track all stock movements for audit trail"""
@@ -201,6 +247,10 @@ class StockMovement(models.Model):
     quantity = models.IntegerField(help_text="Positive for IN, negative for OUT")
     old_stock_level = models.IntegerField()
     new_stock_level = models.IntegerField()
+    available_balance = models.IntegerField(null=True, blank=True,
+                                            help_text="Available stock after this movement (ledger running balance)")
+    reserved_balance = models.IntegerField(null=True, blank=True,
+                                           help_text="Reserved stock after this movement (ledger running balance)")
     
     # References
     reference_number = models.CharField(max_length=100, blank=True, null=True,
@@ -226,6 +276,9 @@ class StockMovement(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Stock Movement'
         verbose_name_plural = 'Stock Movements'
+        indexes = [
+            models.Index(fields=['stock_item', 'created_at'], name='stock_movement_item_time_idx'),
+        ]
     
     def __str__(self):
         return f"{self.stock_item.sku} - {self.movement_type} ({self.quantity})"
@@ -247,6 +300,30 @@ class StockMovement(models.Model):
         super().delete()
 
 
+class StockBalanceSnapshot(models.Model):
+    """Periodic per-SKU ledger balance, so point-in-time queries scan only later movements"""
+
+    stock_item = models.ForeignKey(StockItem, on_delete=models.CASCADE, related_name='balance_snapshots')
+    taken_at = models.DateTimeField()
+    available_stock = models.IntegerField()
+    reserved_stock = models.IntegerField()
+    last_movement_id = models.BigIntegerField(null=True, blank=True,
+                                              help_text="Latest StockMovement included in this balance")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'stock_balance_snapshots'
+        ordering = ['-taken_at']
+        verbose_name = 'Stock Balance Snapshot'
+        verbose_name_plural = 'Stock Balance Snapshots'
+        indexes = [
+            models.Index(fields=['stock_item', 'taken_at'], name='stock_snapshot_item_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.stock_item_id} @ {self.taken_at:%Y-%m-%d %H:%M}: {self.available_stock}/{self.reserved_stock}"
+
+
 class StockBatch(models.Model):
     """Incoming stock batch containing one or more fabric rolls."""
 
@@ -1,7 +1,10 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.db import transaction
-from django.utils import timezone
 from .models import StockItem, StockMovement, StockBatch, StockBatchRoll
+from .services.allocation import POLICY_ALL_OR_NOTHING, POLICY_CHOICES
+from .services.ledger import adjust_available, change_reserved, record_opening_balance, set_available
+from .services.sku_resolver import resolve_stock_item
 from .sku_utils import normalize_sku_reference
 from colors.serializers import ColorListSerializer
 from products.models import Product
@@ -14,11 +17,19 @@ class StockMovementSerializer(serializers.ModelSerializer):
         model = StockMovement
         fields = [
             'id', 'movement_type', 'quantity', 'old_stock_level', 
-            'new_stock_level', 'reference_number', 'reason',
+            'new_stock_level', 'available_balance', 'reserved_balance',
+            'reference_number', 'reason',
             'created_by', 'is_deleted', 'deleted_at', 'created_at'
         ]
         read_only_fields = ['created_at', 'deleted_at']
 
+def recent_stock_movements(stock_item):
+    """Latest movements of ``stock_item``, from the view's bounded prefetch when present."""
+    movements = getattr(stock_item, 'recent_movement_list', None)
+    if movements is None:
+        movements = stock_item.movements.order_by('-created_at', '-id')[:settings.STOCK_RECENT_MOVEMENTS_LIMIT]
+    return StockMovementSerializer(movements, many=True).data
+
 class StockProductListSerializer(serializers.ModelSerializer):
     brand_name = serializers.CharField(source='brand.name', read_only=True)
     is_active = serializers.ReadOnlyField()
@@ -51,6 +62,7 @@ class StockItemListSerializer(serializers.ModelSerializer):
     stock_status = serializers.ReadOnlyField()
     total_available_stock = serializers.ReadOnlyField()
     is_low_stock = serializers.ReadOnlyField()
+    recent_movements = serializers.SerializerMethodField()
     
     class Meta:
         model = StockItem
@@ -59,9 +71,16 @@ class StockItemListSerializer(serializers.ModelSerializer):
             'reserved_stock', 'total_available_stock', 'stock_status',
             'is_low_stock', 'is_active', 'is_deleted',
             'primary_location', 'secondary_location',
-            'parent_product_images', 'child_product_url', 'product'
+            'parent_product_images', 'child_product_url', 'product',
+            'recent_movements'
         ]
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Movements are only listed on request (?include=movements).
+        if not self.context.get('include_movements'):
+            self.fields.pop('recent_movements')
+
     def get_primary_location(self, obj):
         return getattr(obj.primary_location, 'id', None)
 
@@ -74,6 +93,9 @@ class StockItemListSerializer(serializers.ModelSerializer):
     def get_child_product_url(self, obj):
         return get_product_child_product_url(getattr(obj, 'product', None))
 
+    def get_recent_movements(self, obj):
+        return recent_stock_movements(obj)
+
 class StockItemDetailSerializer(serializers.ModelSerializer):
     primary_location = serializers.SerializerMethodField()
     secondary_location = serializers.SerializerMethodField()
@@ -86,7 +108,7 @@ class StockItemDetailSerializer(serializers.ModelSerializer):
     total_available_stock = serializers.ReadOnlyField()
     is_low_stock = serializers.ReadOnlyField()
     stock_value = serializers.ReadOnlyField()
-    recent_movements = StockMovementSerializer(many=True, read_only=True, source='movements')
+    recent_movements = serializers.SerializerMethodField()
     
     class Meta:
         model = StockItem
@@ -106,6 +128,9 @@ class StockItemDetailSerializer(serializers.ModelSerializer):
     def get_child_product_url(self, obj):
         return get_product_child_product_url(getattr(obj, 'product', None))
 
+    def get_recent_movements(self, obj):
+        return recent_stock_movements(obj)
+
 class StockItemCreateUpdateSerializer(serializers.ModelSerializer):
     """Serializer for creating and updating stock items"""
     color_code = serializers.CharField(write_only=True, help_text="Color code to associate")
@@ -166,7 +191,10 @@ class StockItemCreateUpdateSerializer(serializers.ModelSerializer):
         if secondary:
             validated_data['secondary_location'] = Location.objects.get(id=secondary)
 
-        return super().create(validated_data)
+        with transaction.atomic():
+            instance = super().create(validated_data)
+            record_opening_balance(instance, user=self._request_user())
+        return instance
     
     def update(self, instance, validated_data):
         """Update stock item with optional color change"""
@@ -192,7 +220,27 @@ class StockItemCreateUpdateSerializer(serializers.ModelSerializer):
             else:
                 instance.secondary_location = Location.objects.get(id=secondary)
 
-        return super().update(instance, validated_data)
+        # Stock levels change through the ledger so the edit is recorded as movements.
+        available = validated_data.pop('available_stock_in_mtr', None)
+        reserved = validated_data.pop('reserved_stock', None)
+        user = self._request_user()
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            if available is not None:
+                set_available(instance, available, reason='Stock item edited', user=user)
+            if reserved is not None:
+                instance.refresh_from_db(fields=['reserved_stock'])
+                if reserved != instance.reserved_stock and change_reserved(
+                    instance, reserved - instance.reserved_stock, reason='Stock item edited', user=user,
+                ) is None:
+                    raise serializers.ValidationError(
+                        {'reserved_stock': 'Reserved stock cannot exceed available stock.'}
+                    )
+        return instance
+
+    def _request_user(self):
+        request = self.context.get('request')
+        return request.user if request and request.user.is_authenticated else None
 
 class StockAdjustmentSerializer(serializers.Serializer):
     """Serializer for stock adjustment operations"""
@@ -205,6 +253,28 @@ class StockAdjustmentSerializer(serializers.Serializer):
         return value
 
 
+class StockAllocationLineSerializer(serializers.Serializer):
+    sku = serializers.CharField(max_length=100)
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class StockAllocationSerializer(serializers.Serializer):
+    """Lines to reserve in one allocation: explicit SKU lines, orders, or an order batch."""
+    lines = StockAllocationLineSerializer(many=True, required=False)
+    order_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), required=False, max_length=1000
+    )
+    batch_id = serializers.IntegerField(required=False, min_value=1)
+    policy = serializers.ChoiceField(choices=POLICY_CHOICES, default=POLICY_ALL_OR_NOTHING)
+    reference = serializers.CharField(max_length=100, required=False, allow_blank=True)
+
+    def validate(self, attrs):
+        sources = [name for name in ('lines', 'order_ids', 'batch_id') if attrs.get(name)]
+        if len(sources) != 1:
+            raise serializers.ValidationError('Provide exactly one of lines, order_ids or batch_id.')
+        return attrs
+
+
 class StockBatchRollSerializer(serializers.ModelSerializer):
     class Meta:
         model = StockBatchRoll
@@ -271,9 +341,11 @@ class StockBatchCreateSerializer(serializers.Serializer):
 
     def validate_sku(self, value):
         sku = value.strip()
-        if find_stock_item_for_batch_sku(sku) is None:
+        stock_item = find_stock_item_for_batch_sku(sku)
+        if stock_item is None:
             raise serializers.ValidationError(f"Stock item with SKU '{sku}' not found.")
-        return sku
+        # Resolve once here; create() locks the row by its primary key.
+        return stock_item.sku
 
     def validate_rolls(self, value):
         if not value:
@@ -310,14 +382,8 @@ class StockBatchCreateSerializer(serializers.Serializer):
             )
             if stock_item is None:
                 raise serializers.ValidationError({'sku': f"Stock item with SKU '{sku}' not found."})
-            old_stock = stock_item.available_stock_in_mtr
-            stock_item.available_stock_in_mtr = old_stock + incoming_meterage
             stock_item.supplier = supplier
-            stock_item.last_stock_update = timezone.now()
-            stock_item.save(update_fields=[
-                'available_stock_in_mtr', 'supplier',
-                'last_stock_update', 'updated_at'
-            ])
+            stock_item.save(update_fields=['supplier', 'updated_at'])
 
             product = getattr(stock_item, 'product', None)
             product_name = (
@@ -344,16 +410,15 @@ class StockBatchCreateSerializer(serializers.Serializer):
                 )
                 for roll in rolls
             ])
-            StockMovement.objects.create(
-                stock_item=stock_item,
+            movement = adjust_available(
+                stock_item,
+                incoming_meterage,
                 movement_type='IN',
-                quantity=incoming_meterage,
-                old_stock_level=old_stock,
-                new_stock_level=stock_item.available_stock_in_mtr,
-                reference_number=batch.batch_id,
+                reference=batch.batch_id,
                 reason='Incoming stock batch',
-                created_by=getattr(user, 'username', None),
+                user=user,
             )
+            old_stock = movement.old_stock_level
 
         batch.old_stock_in_mtr = old_stock
         batch.incoming_meterage = incoming_meterage
@@ -389,19 +454,5 @@ def normalize_stock_batch_sku(value):
 
 
 def find_stock_item_for_batch_sku(value, queryset=None):
-    queryset = queryset or StockItem.all_objects.all()
-    sku = str(value or '').strip()
-    normalized_sku = normalize_stock_batch_sku(sku)
-
-    exact = queryset.filter(sku=sku, is_deleted=False).first()
-    if exact:
-        return exact
-
-    normalized = queryset.filter(sku=normalized_sku, is_deleted=False).first()
-    if normalized:
-        return normalized
-
-    for stock_item in queryset.filter(is_deleted=False):
-        if normalize_stock_batch_sku(stock_item.sku) == normalized_sku:
-            return stock_item
-    return None
+    queryset = StockItem.all_objects.all() if queryset is None else queryset
+    return resolve_stock_item(value, queryset=queryset.filter(is_deleted=False))
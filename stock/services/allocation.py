@@ -0,0 +1,177 @@
+from collections import OrderedDict
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from stock.models import StockItem, StockMovement
+from stock.services.ledger import build_movement
+from stock.services.stock_health import invalidate_stock_health
+from stock.sku_utils import normalize_sku_reference
+
+
+POLICY_ALL_OR_NOTHING = 'all_or_nothing'
+POLICY_PARTIAL = 'partial'
+POLICY_CHOICES = (POLICY_ALL_OR_NOTHING, POLICY_PARTIAL)
+
+# Conditional updates that lose a race re-read the row and try again this many times.
+MAX_ATTEMPTS = 3
+
+
+class _AllocationShortfall(Exception):
+    pass
+
+
+def order_allocation_lines(order_ids):
+    """(sku, quantity) lines for the items of ``order_ids``, linked stock SKU first."""
+    from orders.models import OrderItem
+
+    items = OrderItem.objects.filter(order_id__in=order_ids, order__is_deleted=False)
+    return [
+        (stock_item_id or sku, quantity)
+        for stock_item_id, sku, quantity in items.values_list('stock_item_id', 'sku', 'quantity')
+    ]
+
+
+def batch_allocation_lines(batch):
+    return order_allocation_lines(batch.order_links.values_list('order_id', flat=True))
+
+
+def _merge_lines(lines):
+    merged = OrderedDict()
+    for sku, quantity in lines:
+        sku = normalize_sku_reference(sku)[:50]
+        quantity = int(quantity)
+        if not sku or quantity <= 0:
+            continue
+        merged[sku] = merged.get(sku, 0) + quantity
+    return merged
+
+
+def allocate_stock(lines, *, policy=POLICY_ALL_OR_NOTHING, reference=None, user=None):
+    """
+    Reserve stock for many (sku, quantity) lines in one transaction.
+
+    Lines are merged per SKU and the stock rows are locked in SKU order, so
+    two allocations over overlapping SKUs cannot deadlock. Each SKU is
+    reserved with a conditional UPDATE (never past available stock) and all
+    RESERVED movements are written with one ``bulk_create``. With
+    ``all_or_nothing`` any shortfall rolls every reservation back; with
+    ``partial`` each SKU gets as much as is free.
+    """
+    if policy not in POLICY_CHOICES:
+        raise ValueError(f"policy must be one of: {', '.join(POLICY_CHOICES)}")
+
+    requested = _merge_lines(lines)
+    result = {
+        'policy': policy,
+        'reference': reference,
+        'committed': False,
+        'fully_allocated': False,
+        'lines': [],
+        'shortfalls': [],
+        'movements_created': 0,
+    }
+    if not requested:
+        return result
+
+    try:
+        with transaction.atomic():
+            lines_out, shortfalls, movements = _allocate_locked(requested, policy, reference, user)
+            if shortfalls and policy == POLICY_ALL_OR_NOTHING:
+                raise _AllocationShortfall
+            StockMovement.objects.bulk_create(movements)
+            if movements:
+                invalidate_stock_health()
+    except _AllocationShortfall:
+        for line in lines_out:
+            line['allocated'] = 0
+        result.update(lines=lines_out, shortfalls=shortfalls)
+        return result
+
+    result.update(
+        committed=bool(movements),
+        fully_allocated=not shortfalls,
+        lines=lines_out,
+        shortfalls=shortfalls,
+        movements_created=len(movements),
+    )
+    return result
+
+
+def _allocate_locked(requested, policy, reference, user):
+    skus = sorted(requested)
+    free = {
+        sku: available - reserved
+        for sku, available, reserved in StockItem.objects.select_for_update()
+        .filter(sku__in=skus)
+        .order_by('sku')
+        .values_list('sku', 'available_stock_in_mtr', 'reserved_stock')
+    }
+
+    now = timezone.now()
+    allocated = {}
+    shortfalls = []
+    for sku in skus:
+        quantity = requested[sku]
+        granted = 0
+        if sku in free:
+            granted = _reserve(sku, quantity, free[sku], policy, now)
+        allocated[sku] = granted
+        if granted < quantity:
+            available = max(0, free.get(sku, 0))
+            shortfalls.append({
+                'sku': sku,
+                'requested': quantity,
+                'available': available,
+                'shortfall': quantity - max(granted, min(quantity, available)),
+                'reason': 'Insufficient stock available' if sku in free else 'Stock item not found',
+            })
+
+    levels_after = {
+        sku: (available, reserved)
+        for sku, available, reserved in StockItem.objects.filter(
+            sku__in=[sku for sku, qty in allocated.items() if qty]
+        ).values_list('sku', 'available_stock_in_mtr', 'reserved_stock')
+    }
+    movements = [
+        build_movement(
+            sku,
+            'RESERVED',
+            allocated[sku],
+            available_balance=levels_after[sku][0],
+            reserved_balance=levels_after[sku][1],
+            old_stock_level=levels_after[sku][1] - allocated[sku],
+            new_stock_level=levels_after[sku][1],
+            reference=reference,
+            reason='Bulk stock allocation',
+            user=user,
+        )
+        for sku in skus
+        if allocated.get(sku)
+    ]
+    lines = [
+        {'sku': sku, 'requested': requested[sku], 'allocated': allocated.get(sku, 0)}
+        for sku in requested
+    ]
+    return lines, shortfalls, movements
+
+
+def _reserve(sku, quantity, free, policy, now):
+    """Reserve up to ``quantity`` of ``sku``; returns the amount actually reserved."""
+    for _ in range(MAX_ATTEMPTS):
+        amount = quantity if policy == POLICY_ALL_OR_NOTHING else min(quantity, free)
+        if amount <= 0 or amount > free:
+            return 0
+        updated = StockItem.objects.filter(
+            sku=sku,
+            available_stock_in_mtr__gte=F('reserved_stock') + amount,
+        ).update(reserved_stock=F('reserved_stock') + amount, last_stock_update=now, updated_at=now)
+        if updated:
+            return amount
+        # Row locks make this unreachable on databases that honour select_for_update.
+        row = StockItem.objects.filter(sku=sku).values_list('available_stock_in_mtr', 'reserved_stock').first()
+        if row is None:
+            return 0
+        free = row[0] - row[1]
+    return 0
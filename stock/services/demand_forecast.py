@@ -0,0 +1,199 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from stock.models import StockItem
+from stock.services.sku_resolver import sku_resolver
+
+
+DEFAULT_WINDOW_DAYS = 28
+DEFAULT_SERVICE_LEVEL = 0.95
+DEFAULT_HISTORY_YEARS = 5
+# 52 weeks, so last year's window starts on the same weekday as this year's.
+SEASON_DAYS = 364
+SEASONAL_FACTOR_BOUNDS = (0.5, 2.0)
+
+
+def daily_demand(since, until):
+    """
+    Ordered quantity per (stock item, day) from ``since`` to ``until``, as a DataFrame.
+
+    Summed by the database in one grouped query. Cancelled and deleted
+    orders and sample requests are left out; lines without a stock item
+    link are matched to one through the SKU resolver.
+    """
+    from orders.models import Order, OrderItem
+
+    start = timezone.make_aware(datetime.combine(since, time.min))
+    end = timezone.make_aware(datetime.combine(until + timedelta(days=1), time.min))
+    rows = (
+        OrderItem.objects.filter(
+            order__is_deleted=False,
+            order__order_date__gte=start,
+            order__order_date__lt=end,
+            is_sample=False,
+        )
+        .exclude(order__order_status=Order.STATUS_CANCELLED)
+        .annotate(day=TruncDate('order__order_date'))
+        .values('stock_item_id', 'sku', 'day')
+        .annotate(quantity=Sum('quantity'))
+        .order_by()
+    )
+    frame = pd.DataFrame.from_records(list(rows), columns=['stock_item_id', 'sku', 'day', 'quantity'])
+    if frame.empty:
+        return pd.DataFrame(columns=['sku', 'day', 'quantity'])
+
+    unlinked = frame['stock_item_id'].isna()
+    if unlinked.any():
+        resolved = sku_resolver.resolve_many(frame.loc[unlinked, 'sku'].unique())
+        frame.loc[unlinked, 'stock_item_id'] = frame.loc[unlinked, 'sku'].map(
+            {value: stock_item.pk for value, stock_item in resolved.items()}
+        )
+    frame = frame.dropna(subset=['stock_item_id'])
+    return (
+        frame.groupby(['stock_item_id', 'day'], as_index=False)['quantity'].sum()
+        .rename(columns={'stock_item_id': 'sku'})
+    )
+
+
+def demand_statistics(demand, as_of, window_days=DEFAULT_WINDOW_DAYS, history_years=DEFAULT_HISTORY_YEARS):
+    """
+    Per-SKU demand rates from a ``daily_demand`` frame, indexed by SKU.
+
+    ``average_daily_demand`` and ``demand_std`` cover the last
+    ``window_days`` days (days without orders count as zero). The seasonal
+    factor compares, over every past year in the history, the
+    ``window_days`` that followed this date with the ``window_days`` that
+    led up to it.
+    """
+    columns = ['average_daily_demand', 'demand_std', 'seasonal_factor']
+    if demand.empty:
+        return pd.DataFrame(columns=columns, dtype=float)
+
+    days_ago = (pd.Timestamp(as_of) - pd.to_datetime(demand['day'])).dt.days.to_numpy()
+    quantity = demand['quantity'].to_numpy(dtype=float)
+    skus = demand['sku'].to_numpy()
+
+    def window_sum(values, start, stop):
+        mask = (days_ago >= start) & (days_ago < stop)
+        return pd.Series(values[mask]).groupby(skus[mask]).sum()
+
+    recent = window_sum(quantity, 0, window_days)
+    recent_squares = window_sum(quantity ** 2, 0, window_days)
+    stats = pd.DataFrame(index=pd.Index(pd.unique(skus), name='sku'))
+    mean = recent.reindex(stats.index, fill_value=0.0) / window_days
+    mean_square = recent_squares.reindex(stats.index, fill_value=0.0) / window_days
+    stats['average_daily_demand'] = mean
+    stats['demand_std'] = np.sqrt((mean_square - mean ** 2).clip(lower=0))
+
+    following = pd.Series(0.0, index=stats.index)
+    preceding = pd.Series(0.0, index=stats.index)
+    for year in range(1, history_years + 1):
+        offset = year * SEASON_DAYS
+        following = following.add(window_sum(quantity, offset - window_days, offset), fill_value=0.0)
+        preceding = preceding.add(window_sum(quantity, offset, offset + window_days), fill_value=0.0)
+    factor = (following / preceding.where(preceding > 0)).fillna(1.0)
+    stats['seasonal_factor'] = factor.clip(*SEASONAL_FACTOR_BOUNDS)
+    return stats[columns]
+
+
+def reorder_suggestions(
+    *,
+    as_of=None,
+    window_days=DEFAULT_WINDOW_DAYS,
+    service_level=DEFAULT_SERVICE_LEVEL,
+    history_years=DEFAULT_HISTORY_YEARS,
+    queryset=None,
+):
+    """
+    Reorder point and suggested order quantity for each active stock item.
+
+    The forecast daily demand is the recent average scaled by the seasonal
+    factor. Over an item's ``lead_time_days`` it gives the reorder point,
+    plus safety stock of ``z * demand_std * sqrt(lead time)`` for the
+    requested service level. An item needs reordering once its free stock
+    (available minus reserved) is at or below that point. The suggested
+    quantity brings it back to the reorder point plus another
+    ``window_days`` of demand.
+    """
+    as_of = as_of or timezone.localdate()
+    window_days = max(1, int(window_days))
+    z = NormalDist().inv_cdf(min(max(float(service_level), 0.5), 0.999))
+    queryset = StockItem.objects.filter(is_active=True) if queryset is None else queryset
+
+    items = pd.DataFrame.from_records(
+        list(queryset.values_list('sku', 'product_type', 'available_stock_in_mtr', 'reserved_stock', 'lead_time_days')),
+        columns=['sku', 'product_type', 'available_stock_in_mtr', 'reserved_stock', 'lead_time_days'],
+    )
+    if items.empty:
+        return []
+
+    since = as_of - timedelta(days=history_years * SEASON_DAYS + window_days)
+    stats = demand_statistics(daily_demand(since, as_of), as_of, window_days, history_years)
+    items = items.join(stats, on='sku')
+    items['average_daily_demand'] = items['average_daily_demand'].fillna(0.0)
+    items['demand_std'] = items['demand_std'].fillna(0.0)
+    items['seasonal_factor'] = items['seasonal_factor'].fillna(1.0)
+
+    lead_time = items['lead_time_days'].astype(float)
+    forecast = items['average_daily_demand'] * items['seasonal_factor']
+    safety_stock = z * items['demand_std'] * np.sqrt(lead_time)
+    reorder_point = np.ceil(forecast * lead_time + safety_stock)
+    free_stock = items['available_stock_in_mtr'] - items['reserved_stock']
+    needs_reorder = (forecast > 0) & (free_stock <= reorder_point)
+    order_quantity = np.ceil(reorder_point + forecast * window_days - free_stock).clip(lower=0).where(needs_reorder, 0)
+
+    items['forecast_daily_demand'] = forecast
+    items['safety_stock'] = safety_stock
+    items['reorder_point'] = reorder_point.astype(int)
+    items['free_stock'] = free_stock
+    items['suggested_order_quantity'] = order_quantity.astype(int)
+    items['needs_reorder'] = needs_reorder
+    items['stock_cover_gap'] = free_stock - reorder_point
+    items = items.sort_values(['needs_reorder', 'stock_cover_gap', 'sku'], ascending=[False, True, True])
+
+    return [
+        {
+            'sku': row.sku,
+            'product_type': row.product_type,
+            'available_stock_in_mtr': int(row.available_stock_in_mtr),
+            'reserved_stock': int(row.reserved_stock),
+            'free_stock': int(row.free_stock),
+            'lead_time_days': int(row.lead_time_days),
+            'average_daily_demand': round(float(row.average_daily_demand), 3),
+            'seasonal_factor': round(float(row.seasonal_factor), 3),
+            'forecast_daily_demand': round(float(row.forecast_daily_demand), 3),
+            'demand_std': round(float(row.demand_std), 3),
+            'safety_stock': round(float(row.safety_stock), 3),
+            'reorder_point': int(row.reorder_point),
+            'suggested_order_quantity': int(row.suggested_order_quantity),
+            'needs_reorder': bool(row.needs_reorder),
+        }
+        for row in items.itertuples(index=False)
+    ]
+
+
+def store_reorder_suggestions(suggestions, batch_size=1000):
+    """Write forecast demand and suggested levels onto the stock items; returns how many were updated."""
+    now = timezone.now()
+    stock_items = []
+    for suggestion in suggestions:
+        stock_items.append(StockItem(
+            sku=suggestion['sku'],
+            forecast_daily_demand=Decimal(str(suggestion['forecast_daily_demand'])),
+            suggested_reorder_point=suggestion['reorder_point'],
+            suggested_order_quantity=suggestion['suggested_order_quantity'],
+            forecast_updated_at=now,
+        ))
+    StockItem.all_objects.bulk_update(
+        stock_items,
+        ['forecast_daily_demand', 'suggested_reorder_point', 'suggested_order_quantity', 'forecast_updated_at'],
+        batch_size=batch_size,
+    )
+    return len(stock_items)
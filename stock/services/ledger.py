@@ -0,0 +1,376 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.utils import timezone
+
+from stock.models import StockBalanceSnapshot, StockItem, StockMovement
+from stock.services.stock_health import invalidate_stock_health
+
+
+RESERVATION_MOVEMENT_TYPES = ('RESERVED', 'RELEASED')
+LEVEL_FIELDS = ['available_stock_in_mtr', 'reserved_stock', 'last_stock_update', 'updated_at']
+
+
+class StockLedgerConflict(RuntimeError):
+    pass
+
+
+# Compare-and-set writes give up after this many lost races instead of spinning forever.
+MAX_CAS_ATTEMPTS = 50
+
+
+def build_movement(
+    stock_item_id,
+    movement_type,
+    quantity,
+    *,
+    available_balance,
+    reserved_balance,
+    old_stock_level,
+    new_stock_level,
+    reference=None,
+    reason=None,
+    user=None,
+):
+    """
+    Unsaved ledger movement carrying the running balances after it.
+
+    ``old_stock_level``/``new_stock_level`` are the reserved level for
+    RESERVED/RELEASED movements and the available level for everything else;
+    ``available_balance``/``reserved_balance`` always hold both levels.
+    """
+    return StockMovement(
+        stock_item_id=stock_item_id,
+        movement_type=movement_type,
+        quantity=quantity,
+        old_stock_level=old_stock_level,
+        new_stock_level=new_stock_level,
+        available_balance=available_balance,
+        reserved_balance=reserved_balance,
+        reference_number=reference,
+        reason=reason,
+        created_by=getattr(user, 'username', None),
+    )
+
+
+def change_reserved(stock_item, delta, *, reference=None, reason=None, user=None):
+    """
+    Reserve (positive ``delta``) or release (negative) stock with one conditional UPDATE.
+
+    Returns the movement, or None when the reservation would exceed available
+    stock or the release exceeds what is reserved.
+    """
+    movement_type = 'RESERVED' if delta > 0 else 'RELEASED'
+    candidates = StockItem.all_objects.filter(sku=stock_item.sku)
+    if delta > 0:
+        candidates = candidates.filter(available_stock_in_mtr__gte=F('reserved_stock') + delta)
+    else:
+        candidates = candidates.filter(reserved_stock__gte=-delta)
+
+    now = timezone.now()
+    with transaction.atomic():
+        updated = candidates.update(
+            reserved_stock=F('reserved_stock') + delta,
+            last_stock_update=now,
+            updated_at=now,
+        )
+        if not updated:
+            return None
+        invalidate_stock_health()
+        # The row stays write-locked until commit, so this reads exactly our result.
+        stock_item.refresh_from_db(fields=LEVEL_FIELDS)
+        movement = build_movement(
+            stock_item.sku,
+            movement_type,
+            abs(delta),
+            available_balance=stock_item.available_stock_in_mtr,
+            reserved_balance=stock_item.reserved_stock,
+            old_stock_level=stock_item.reserved_stock - delta,
+            new_stock_level=stock_item.reserved_stock,
+            reference=reference,
+            reason=reason or f'Stock {movement_type.lower()}',
+            user=user,
+        )
+        movement.save()
+    return movement
+
+
+def adjust_available(stock_item, quantity, *, movement_type='ADJUSTMENT', reference=None, reason=None, user=None):
+    """Add ``quantity`` (may be negative) to available stock, never going below zero."""
+    return _set_available(
+        stock_item,
+        lambda current: max(0, current + quantity),
+        movement_type=movement_type,
+        quantity=quantity,
+        reference=reference,
+        reason=reason,
+        user=user,
+    )
+
+
+def set_available(stock_item, level, *, movement_type='ADJUSTMENT', reference=None, reason=None, user=None):
+    """Set available stock to ``level``; returns None when it already was."""
+    return _set_available(
+        stock_item,
+        lambda current: max(0, int(level)),
+        movement_type=movement_type,
+        reference=reference,
+        reason=reason,
+        user=user,
+        skip_unchanged=True,
+    )
+
+
+def record_opening_balance(stock_item, *, reason='Opening balance', reference=None, user=None):
+    """Movement for a newly created item's initial levels; None when it starts empty."""
+    if not stock_item.available_stock_in_mtr and not stock_item.reserved_stock:
+        return None
+    movement = build_movement(
+        stock_item.sku,
+        'IN',
+        stock_item.available_stock_in_mtr,
+        available_balance=stock_item.available_stock_in_mtr,
+        reserved_balance=stock_item.reserved_stock,
+        old_stock_level=0,
+        new_stock_level=stock_item.available_stock_in_mtr,
+        reference=reference,
+        reason=reason,
+        user=user,
+    )
+    movement.save()
+    return movement
+
+
+def _set_available(stock_item, new_level_for, *, movement_type, quantity=None, reference, reason, user, skip_unchanged=False):
+    # Compare-and-set on the level that was read, so the movement records the
+    # level it actually replaced even when the new level is clamped at zero.
+    for _ in range(MAX_CAS_ATTEMPTS):
+        old_level = StockItem.all_objects.values_list('available_stock_in_mtr', flat=True).get(sku=stock_item.sku)
+        new_level = new_level_for(old_level)
+        if skip_unchanged and new_level == old_level:
+            stock_item.refresh_from_db(fields=LEVEL_FIELDS)
+            return None
+        now = timezone.now()
+        with transaction.atomic():
+            updated = StockItem.all_objects.filter(
+                sku=stock_item.sku,
+                available_stock_in_mtr=old_level,
+            ).update(available_stock_in_mtr=new_level, last_stock_update=now, updated_at=now)
+            if not updated:
+                continue
+            invalidate_stock_health()
+            stock_item.refresh_from_db(fields=LEVEL_FIELDS)
+            movement = build_movement(
+                stock_item.sku,
+                movement_type,
+                new_level - old_level if quantity is None else quantity,
+                available_balance=new_level,
+                reserved_balance=stock_item.reserved_stock,
+                old_stock_level=old_level,
+                new_stock_level=new_level,
+                reference=reference,
+                reason=reason,
+                user=user,
+            )
+            movement.save()
+        return movement
+    raise StockLedgerConflict(f'Could not update stock for {stock_item.sku}: too many concurrent changes')
+
+
+def movement_deltas(movement):
+    """(available, reserved) change a ledger movement applied."""
+    delta = movement.new_stock_level - movement.old_stock_level
+    if movement.movement_type in RESERVATION_MOVEMENT_TYPES:
+        return 0, delta
+    return delta, 0
+
+
+def balance_at(stock_item, at):
+    """
+    Available and reserved stock for ``stock_item`` as of ``at``.
+
+    Starts from the nearest snapshot taken at or before ``at`` and scans
+    only the movements recorded between that snapshot and ``at``; the
+    latest of them carries the running balances.
+    """
+    snapshot = (
+        StockBalanceSnapshot.objects.filter(stock_item=stock_item, taken_at__lte=at)
+        .order_by('-taken_at', '-id')
+        .first()
+    )
+    movements = StockMovement.all_objects.filter(
+        stock_item=stock_item,
+        created_at__lte=at,
+        available_balance__isnull=False,
+    )
+    if snapshot is not None and snapshot.last_movement_id is not None:
+        # By id rather than time: a movement committed while the snapshot was being
+        # taken can carry an earlier created_at than the snapshot and still be missing from it.
+        movements = movements.filter(id__gt=snapshot.last_movement_id)
+    movement = movements.order_by('-created_at', '-id').first()
+
+    result = {
+        'sku': stock_item.sku,
+        'at': at,
+        'snapshot_taken_at': snapshot.taken_at if snapshot else None,
+        'movement_id': movement.id if movement else None,
+    }
+    if movement is not None:
+        return {
+            **result,
+            'available_stock': movement.available_balance,
+            'reserved_stock': movement.reserved_balance,
+            'source': 'movement',
+        }
+    if snapshot is not None:
+        return {
+            **result,
+            'available_stock': snapshot.available_stock,
+            'reserved_stock': snapshot.reserved_stock,
+            'source': 'snapshot',
+        }
+
+    # No ledger history up to ``at``: roll the first later movement back, or
+    # fall back to the current levels when the item has never moved.
+    first_later = (
+        StockMovement.all_objects.filter(stock_item=stock_item, created_at__gt=at, available_balance__isnull=False)
+        .order_by('created_at', 'id')
+        .first()
+    )
+    if first_later is not None:
+        available_delta, reserved_delta = movement_deltas(first_later)
+        return {
+            **result,
+            'available_stock': first_later.available_balance - available_delta,
+            'reserved_stock': first_later.reserved_balance - reserved_delta,
+            'source': 'opening',
+        }
+    return {
+        **result,
+        'available_stock': stock_item.available_stock_in_mtr,
+        'reserved_stock': stock_item.reserved_stock,
+        'source': 'current',
+    }
+
+
+def take_balance_snapshots(at=None, *, skus=None):
+    """
+    Snapshot the ledger balance of every SKU that moved since its last snapshot.
+
+    Uses one query for the latest movement per SKU and one for the latest
+    snapshot per SKU, then a single ``bulk_create``. Returns the number of
+    snapshots written.
+    """
+    at = at or timezone.now()
+    stock_items = StockItem.all_objects.all()
+    if skus is not None:
+        stock_items = stock_items.filter(sku__in=skus)
+
+    latest_movement = StockMovement.all_objects.filter(
+        stock_item=OuterRef('pk'),
+        created_at__lte=at,
+        available_balance__isnull=False,
+    ).order_by('-created_at', '-id')
+    latest_snapshot = StockBalanceSnapshot.objects.filter(
+        stock_item=OuterRef('pk'),
+        taken_at__lte=at,
+    ).order_by('-taken_at', '-id')
+    rows = stock_items.annotate(
+        movement_id=Subquery(latest_movement.values('id')[:1]),
+        movement_at=Subquery(latest_movement.values('created_at')[:1]),
+        movement_available=Subquery(latest_movement.values('available_balance')[:1]),
+        movement_reserved=Subquery(latest_movement.values('reserved_balance')[:1]),
+        snapshot_at=Subquery(latest_snapshot.values('taken_at')[:1]),
+    ).filter(movement_id__isnull=False).values_list(
+        'sku', 'movement_id', 'movement_at', 'movement_available', 'movement_reserved', 'snapshot_at',
+    )
+
+    snapshots = [
+        StockBalanceSnapshot(
+            stock_item_id=sku,
+            taken_at=at,
+            available_stock=available,
+            reserved_stock=reserved,
+            last_movement_id=movement_id,
+        )
+        for sku, movement_id, movement_at, available, reserved, snapshot_at in rows.iterator()
+        if snapshot_at is None or movement_at > snapshot_at
+    ]
+    StockBalanceSnapshot.objects.bulk_create(snapshots, batch_size=1000)
+    return len(snapshots)
+
+
+def prune_balance_snapshots(keep_days):
+    """Delete snapshots older than ``keep_days`` except each SKU's newest one."""
+    cutoff = timezone.now() - timedelta(days=keep_days)
+    newest = StockBalanceSnapshot.objects.filter(stock_item=OuterRef('stock_item')).order_by('-taken_at', '-id')
+    deleted, _ = (
+        StockBalanceSnapshot.objects.filter(taken_at__lt=cutoff)
+        .exclude(id=Subquery(newest.values('id')[:1]))
+        .delete()
+    )
+    return deleted
+
+
+def check_ledger(stock_item, movements):
+    """
+    Problems in ``stock_item``'s ledger ``movements`` (oldest first).
+
+    Each movement's balances must equal the previous balances plus its own
+    change, and the last balances must equal the stock item's current levels.
+    Returns ``(problems, (available, reserved))`` with the final ledger balance.
+    """
+    problems = []
+    balance = None
+    for movement in movements:
+        available_delta, reserved_delta = movement_deltas(movement)
+        if balance is not None:
+            expected = (balance[0] + available_delta, balance[1] + reserved_delta)
+            if (movement.available_balance, movement.reserved_balance) != expected:
+                problems.append(
+                    f'movement {movement.id} ({movement.movement_type}) balances '
+                    f'{movement.available_balance}/{movement.reserved_balance}, expected {expected[0]}/{expected[1]}'
+                )
+        balance = (movement.available_balance, movement.reserved_balance)
+
+    current = (stock_item.available_stock_in_mtr, stock_item.reserved_stock)
+    if balance is not None and balance != current:
+        problems.append(
+            f'ledger ends at {balance[0]}/{balance[1]} but stock is {current[0]}/{current[1]}'
+        )
+    return problems, balance
+
+
+def reconcile(stock_item, ledger_balance, *, user=None):
+    """Record movements that bring the ledger in line with the stock item's current levels."""
+    available, reserved = ledger_balance or (0, 0)
+    movements = []
+    if stock_item.available_stock_in_mtr != available:
+        movements.append(build_movement(
+            stock_item.sku,
+            'ADJUSTMENT',
+            stock_item.available_stock_in_mtr - available,
+            available_balance=stock_item.available_stock_in_mtr,
+            reserved_balance=reserved,
+            old_stock_level=available,
+            new_stock_level=stock_item.available_stock_in_mtr,
+            reason='Ledger reconciliation',
+            user=user,
+        ))
+    if stock_item.reserved_stock != reserved:
+        delta = stock_item.reserved_stock - reserved
+        movements.append(build_movement(
+            stock_item.sku,
+            'RESERVED' if delta > 0 else 'RELEASED',
+            abs(delta),
+            available_balance=stock_item.available_stock_in_mtr,
+            reserved_balance=stock_item.reserved_stock,
+            old_stock_level=reserved,
+            new_stock_level=stock_item.reserved_stock,
+            reason='Ledger reconciliation',
+            user=user,
+        ))
+    for movement in movements:
+        movement.save()
+    return movements
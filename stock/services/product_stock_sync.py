@@ -1,158 +1,243 @@
 import re
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection, transaction
+from django.utils import timezone
 
 from colors.models import Color
 from products.models import Product
-from stock.models import StockItem
+from stock.models import StockItem, StockMovement
+from stock.services.ledger import build_movement
+from stock.services.stock_health import invalidate_stock_health
 from stock.sku_utils import normalize_sku_reference
 
 
 UNKNOWN_COLOR_CODE = 'UNKNOWN'
+UNKNOWN_COLOR_NAME = 'Unknown'
+DEFAULT_CHUNK_SIZE = 1000
+SYNC_REASON = 'Opening stock from product sync'
+
+PRODUCT_FIELDS = (
+    'vs_child_id', 'parent_reference', 'child_reference', 'child_active', 'parent_active', 'is_deleted',
+    'tag_colours', 'attribute_colour', 'min_purchase_quantity', 'max_purchase_quantity', 'pick_location',
+    'cost_price_inc_vat', 'stock_value',
+)
+# Stock item fields kept in step with the product; stock levels are only set on creation.
+SYNCED_FIELDS = (
+    'product_type', 'product_id', 'color_id', 'minimum_stock_level', 'maximum_stock_level',
+    'warehouse_location', 'unit_cost', 'last_purchase_price', 'is_active', 'is_deleted',
+)
+
+
+def sync_product_stock_items(dry_run=False, chunk_size=DEFAULT_CHUNK_SIZE, workers=1, products=None):
+    """
+    Ensure every product has at least one stock item.
+
+    Products, their stock items, the colors they name and every existing
+    SKU are read up front into dicts, so the diff runs in memory without a
+    query per product. Only rows that differ are written, with
+    ``bulk_create``/``bulk_update`` in chunks of ``chunk_size``, each chunk
+    in its own transaction. A created stock item with an opening level gets
+    its IN movement in the same chunk, so the ledger starts where the stock
+    does. With ``workers`` above 1 the chunks are written from that many
+    threads, each on its own connection; SQLite serializes writers on one
+    database lock, so it is refused there. ``products`` limits the run to a
+    product queryset.
+    """
+    if workers > 1 and not dry_run and connection.vendor == 'sqlite':
+        raise ValueError('workers above 1 need a database with concurrent writers; SQLite has one write lock')
 
-
-def sync_product_stock_items(dry_run=False):
-    """Ensure every product has at least one stock item."""
     stats = {
         'products_seen': 0,
         'stock_created': 0,
         'stock_updated': 0,
         'stock_unchanged': 0,
+        'colors_created': 0,
+        'colors_updated': 0,
     }
-
-    unknown_color = _get_or_create_unknown_color(dry_run)
-
-    for product in Product.all_objects.all().order_by('vs_child_id'):
-        stats['products_seen'] += 1
-        stock_items = list(StockItem.all_objects.filter(product=product).order_by('sku'))
-        desired = _stock_defaults_for_product(
-            product,
-            unknown_color,
-            create_stock=not stock_items,
-            dry_run=dry_run,
-        )
-
-        if stock_items:
-            changed_any = False
-            updates = {
-                field: value
-                for field, value in desired.items()
-                if field not in {'available_stock_in_mtr', 'reserved_stock'}
-            }
-
-            for stock_item in stock_items:
-                changed_fields = {
-                    field: value
-                    for field, value in updates.items()
-                    if getattr(stock_item, field) != value
-                }
-                if not changed_fields:
-                    continue
-                changed_any = True
-                if not dry_run:
-                    for field, value in changed_fields.items():
-                        setattr(stock_item, field, value)
-                    stock_item.save(update_fields=[*changed_fields.keys(), 'updated_at'])
-
-            if changed_any:
-                stats['stock_updated'] += len(stock_items)
-            else:
-                stats['stock_unchanged'] += len(stock_items)
+    chunk_size = max(1, int(chunk_size))
+    products = Product.all_objects.all() if products is None else products
+    product_rows = list(products.order_by('vs_child_id').values(*PRODUCT_FIELDS))
+    stats['products_seen'] = len(product_rows)
+
+    color_names = {UNKNOWN_COLOR_CODE: UNKNOWN_COLOR_NAME}
+    product_colors = {}
+    for row in product_rows:
+        color_name = _first_list_value(row['tag_colours'] or row['attribute_colour'])
+        color_code = _color_code(color_name) if color_name else UNKNOWN_COLOR_CODE
+        if color_name:
+            # As with one update_or_create per product, the last product naming a code sets its name.
+            color_names[color_code] = color_name[:100]
+        product_colors[row['vs_child_id']] = color_code
+    colors_to_create, colors_to_update = _diff_colors(color_names)
+    stats['colors_created'] = len(colors_to_create)
+    stats['colors_updated'] = len(colors_to_update)
+
+    stock_by_product = {}
+    sku_owners = {}
+    for stock in StockItem.all_objects.order_by('sku').values('sku', *SYNCED_FIELDS):
+        sku_owners[stock['sku']] = stock['product_id']
+        stock_by_product.setdefault(stock['product_id'], []).append(stock)
+
+    now = timezone.now()
+    to_create = []
+    opening_movements = {}
+    # Stock items to update, grouped by the fields that changed so each bulk_update sets only those.
+    to_update = {}
+    for row in product_rows:
+        desired = _stock_defaults_for_product(row, product_colors[row['vs_child_id']])
+        stock_items = stock_by_product.get(row['vs_child_id'])
+        if not stock_items:
+            sku = _unique_stock_sku_for_product(row, sku_owners)
+            sku_owners[sku] = row['vs_child_id']
+            level = _stock_mtr_from_product(row)
+            to_create.append(StockItem(
+                sku=sku,
+                sku_normalized=sku,
+                available_stock_in_mtr=level,
+                reserved_stock=0,
+                **desired,
+            ))
+            if level:
+                opening_movements[sku] = build_movement(
+                    sku,
+                    'IN',
+                    level,
+                    available_balance=level,
+                    reserved_balance=0,
+                    old_stock_level=0,
+                    new_stock_level=level,
+                    reason=SYNC_REASON,
+                )
+            stats['stock_created'] += 1
             continue
 
-        sku = _unique_stock_sku_for_product(product)
-        if not dry_run:
-            StockItem.all_objects.create(sku=sku, **desired)
-        stats['stock_created'] += 1
+        changed_any = False
+        for stock in stock_items:
+            changed_fields = tuple(field for field in SYNCED_FIELDS if stock[field] != desired[field])
+            if changed_fields:
+                changed_any = True
+                to_update.setdefault(changed_fields, []).append(StockItem(sku=stock['sku'], updated_at=now, **desired))
+        if changed_any:
+            stats['stock_updated'] += len(stock_items)
+        else:
+            stats['stock_unchanged'] += len(stock_items)
 
+    if dry_run:
+        return stats
+
+    if colors_to_create or colors_to_update:
+        with transaction.atomic():
+            Color.all_objects.bulk_create(colors_to_create, batch_size=chunk_size)
+            Color.all_objects.bulk_update(
+                colors_to_update, ['color_name', 'is_deleted', 'deleted_at', 'updated_at'], batch_size=chunk_size,
+            )
+
+    writes = []
+    for start in range(0, len(to_create), chunk_size):
+        stock_items = to_create[start:start + chunk_size]
+        movements = [opening_movements[item.sku] for item in stock_items if item.sku in opening_movements]
+        writes.append((None, stock_items, movements))
+    for fields, stock_items in to_update.items():
+        writes += [
+            (fields, stock_items[start:start + chunk_size], [])
+            for start in range(0, len(stock_items), chunk_size)
+        ]
+    _run_writes(writes, workers)
+    if writes:
+        invalidate_stock_health()
     return stats
 
 
-def _stock_defaults_for_product(product, unknown_color, create_stock=False, dry_run=False):
-    is_active = bool(product.child_active and product.parent_active and not product.is_deleted)
-    defaults = {
-        'product_type': _product_type(product),
-        'product': product,
-        'color': _color_for_product(product, unknown_color, dry_run=dry_run),
-        'minimum_stock_level': product.min_purchase_quantity or 0,
-        'maximum_stock_level': product.max_purchase_quantity or 0,
-        'warehouse_location': product.pick_location,
-        'unit_cost': product.cost_price_inc_vat or 0,
-        'last_purchase_price': product.cost_price_inc_vat or 0,
-        'is_active': is_active,
-        'is_deleted': bool(product.is_deleted),
+def _diff_colors(color_names):
+    """Colors to create and colors whose name or deleted flag must change."""
+    existing = Color.all_objects.in_bulk(list(color_names))
+    now = timezone.now()
+    to_create = []
+    to_update = []
+    for color_code, color_name in color_names.items():
+        color = existing.get(color_code)
+        if color is None:
+            to_create.append(Color(color_code=color_code, color_name=color_name))
+        elif color.color_name != color_name or color.is_deleted or color.deleted_at is not None:
+            color.color_name = color_name
+            color.is_deleted = False
+            color.deleted_at = None
+            color.updated_at = now
+            to_update.append(color)
+    return to_create, to_update
+
+
+def _run_writes(writes, workers):
+    if workers <= 1 or len(writes) <= 1:
+        for write in writes:
+            _write_chunk(write)
+        return
+
+    def write_in_thread(write):
+        try:
+            _write_chunk(write)
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(write_in_thread, writes))
+
+
+def _write_chunk(write):
+    """Create ``stock_items`` and their opening movements when ``fields`` is None, otherwise update just ``fields``."""
+    fields, stock_items, movements = write
+    with transaction.atomic():
+        if fields is None:
+            StockItem.all_objects.bulk_create(stock_items)
+            StockMovement.objects.bulk_create(movements)
+        else:
+            StockItem.all_objects.bulk_update(stock_items, [*fields, 'updated_at'])
+
+
+def _stock_defaults_for_product(row, color_code):
+    return {
+        'product_type': _product_type(row),
+        'product_id': row['vs_child_id'],
+        'color_id': color_code,
+        'minimum_stock_level': row['min_purchase_quantity'] or 0,
+        'maximum_stock_level': row['max_purchase_quantity'] or 0,
+        'warehouse_location': row['pick_location'],
+        'unit_cost': row['cost_price_inc_vat'] or 0,
+        'last_purchase_price': row['cost_price_inc_vat'] or 0,
+        'is_active': bool(row['child_active'] and row['parent_active'] and not row['is_deleted']),
+        'is_deleted': bool(row['is_deleted']),
     }
-    if create_stock:
-        defaults['available_stock_in_mtr'] = _stock_mtr_from_product(product)
-        defaults['reserved_stock'] = 0
-    return defaults
 
 
-def _unique_stock_sku_for_product(product):
+def _unique_stock_sku_for_product(row, sku_owners):
     base_sku = normalize_sku_reference(
-        product.child_reference or product.parent_reference or f'VS{product.vs_child_id}'
+        row['child_reference'] or row['parent_reference'] or f"VS{row['vs_child_id']}"
     )[:50]
-
-    existing = StockItem.all_objects.filter(sku=base_sku).first()
-    if existing is None or existing.product_id == product.pk:
+    if sku_owners.get(base_sku, row['vs_child_id']) == row['vs_child_id']:
         return base_sku
 
-    suffix = f' {product.vs_child_id}'
+    suffix = f" {row['vs_child_id']}"
     candidate = f'{base_sku[:50 - len(suffix)]}{suffix}'
-    existing = StockItem.all_objects.filter(sku=candidate).first()
-    if existing is None or existing.product_id == product.pk:
+    if sku_owners.get(candidate, row['vs_child_id']) == row['vs_child_id']:
         return candidate
 
-    return f'VS{product.vs_child_id}'[:50]
+    return f"VS{row['vs_child_id']}"[:50]
 
 
-def _product_type(product):
+def _product_type(row):
     return normalize_sku_reference(
-        product.parent_reference or product.child_reference or f'VS{product.vs_child_id}'
+        row['parent_reference'] or row['child_reference'] or f"VS{row['vs_child_id']}"
     )[:20]
 
 
-def _stock_mtr_from_product(product):
+def _stock_mtr_from_product(row):
     try:
-        return max(0, int(product.stock_value or 0))
+        return max(0, int(row['stock_value'] or 0))
     except (TypeError, ValueError):
         return 0
 
 
-def _color_for_product(product, unknown_color, dry_run=False):
-    color_name = _first_list_value(product.tag_colours or product.attribute_colour)
-    if not color_name:
-        return unknown_color
-
-    color_code = _color_code(color_name)
-    if dry_run:
-        return (
-            Color.all_objects.filter(color_code=color_code).first()
-            or Color(color_code=color_code, color_name=color_name[:100])
-        )
-    color, _ = Color.all_objects.update_or_create(
-        color_code=color_code,
-        defaults={
-            'color_name': color_name[:100],
-            'is_deleted': False,
-            'deleted_at': None,
-        },
-    )
-    return color
-
-
-def _get_or_create_unknown_color(dry_run=False):
-    if dry_run:
-        return Color(color_code=UNKNOWN_COLOR_CODE, color_name='Unknown')
-    color, _ = Color.all_objects.update_or_create(
-        color_code=UNKNOWN_COLOR_CODE,
-        defaults={
-            'color_name': 'Unknown',
-            'is_deleted': False,
-            'deleted_at': None,
-        },
-    )
-    return color
-
-
 def _first_list_value(value):
     value = str(value or '').strip()
     if not value:
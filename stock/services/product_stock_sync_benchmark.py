@@ -0,0 +1,131 @@
+import random
+import string
+import time
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import Max
+
+from colors.models import Color
+from products.models import Product
+from stock.models import StockItem
+from stock.services.product_stock_sync import DEFAULT_CHUNK_SIZE, sync_product_stock_items
+
+
+PHASE_INITIAL = 'initial'
+PHASE_NO_CHANGE = 'no_change'
+PHASE_CHANGED = 'changed'
+
+PRODUCT_INSERT_BATCH = 5000
+COLOR_PALETTE_SIZE = 40
+# Every this many products reuse the previous reference, to exercise the fallback SKUs.
+DUPLICATE_REFERENCE_EVERY = 50
+
+
+class ProductStockSyncBenchmark:
+    """
+    Time ``sync_product_stock_items`` on a synthetic catalogue.
+
+    Creates ``products`` products with a run-specific reference prefix and
+    syncs only those, three times: once creating every stock item, once
+    with nothing to do, and once after ``change_ratio`` of the products
+    have a new cost price. Each phase reports wall time, products per
+    second and the queries issued on the calling thread's connection.
+    """
+
+    def __init__(self, *, products=50000, chunk_size=DEFAULT_CHUNK_SIZE, workers=1, change_ratio=0.1,
+                 keep_data=False, seed=None):
+        self.products = products
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.change_ratio = change_ratio
+        self.keep_data = keep_data
+        self.random = random.Random(seed)
+        self.run_id = ''.join(self.random.choice(string.ascii_uppercase) for _ in range(4))
+        self.first_id = None
+
+    @property
+    def reference_prefix(self):
+        return f'BM{self.run_id}'
+
+    def product_queryset(self):
+        return Product.all_objects.filter(
+            vs_child_id__gte=self.first_id,
+            vs_child_id__lt=self.first_id + self.products,
+        )
+
+    def run(self):
+        self._create_products()
+        try:
+            results = [self._run_phase(PHASE_INITIAL), self._run_phase(PHASE_NO_CHANGE)]
+            changed = self._change_products()
+            results.append(self._run_phase(PHASE_CHANGED, products_changed=changed))
+            return results
+        finally:
+            if not self.keep_data:
+                self.cleanup()
+
+    def cleanup(self):
+        StockItem.all_objects.filter(product__in=self.product_queryset()).delete()
+        self.product_queryset().delete()
+        Color.all_objects.filter(color_code__startswith=self.reference_prefix).delete()
+
+    def _run_phase(self, phase, **extra):
+        queries = []
+
+        def count_query(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        with connection.execute_wrapper(count_query):
+            stats = sync_product_stock_items(
+                chunk_size=self.chunk_size,
+                workers=self.workers,
+                products=self.product_queryset(),
+            )
+        wall_seconds = time.perf_counter() - started
+        return {
+            'phase': phase,
+            **extra,
+            **stats,
+            'wall_seconds': round(wall_seconds, 3),
+            'products_per_second': round(self.products / wall_seconds, 1) if wall_seconds > 0 else 0.0,
+            'queries': len(queries),
+        }
+
+    def _create_products(self):
+        self.first_id = (Product.all_objects.aggregate(last=Max('vs_child_id'))['last'] or 0) + 1
+        batch = []
+        reference = None
+        for index in range(self.products):
+            if index % DUPLICATE_REFERENCE_EVERY or reference is None:
+                reference = f'{self.reference_prefix} {index}'
+            batch.append(Product(
+                vs_parent_id=self.first_id + index,
+                vs_child_id=self.first_id + index,
+                parent_reference=reference,
+                child_reference=reference,
+                parent_product_title=f'Benchmark {self.run_id}',
+                child_product_title=f'Benchmark {self.run_id} {index}',
+                tag_colours=f'{self.reference_prefix}C{self.random.randrange(COLOR_PALETTE_SIZE)}',
+                cost_price_inc_vat=Decimal(self.random.randrange(100, 5000)) / 100,
+                stock_value=Decimal(self.random.randrange(0, 500)),
+                min_purchase_quantity=self.random.randrange(0, 10),
+                max_purchase_quantity=self.random.randrange(10, 200),
+            ))
+            if len(batch) >= PRODUCT_INSERT_BATCH:
+                Product.all_objects.bulk_create(batch)
+                batch = []
+        Product.all_objects.bulk_create(batch)
+
+    def _change_products(self):
+        count = int(self.products * self.change_ratio)
+        if not count:
+            return 0
+        ids = self.random.sample(range(self.first_id, self.first_id + self.products), count)
+        for start in range(0, count, PRODUCT_INSERT_BATCH):
+            Product.all_objects.filter(vs_child_id__in=ids[start:start + PRODUCT_INSERT_BATCH]).update(
+                cost_price_inc_vat=Decimal('99.99'),
+            )
+        return count
@@ -0,0 +1,231 @@
+from stock.models import StockBatchRoll
+
+
+LABEL_FORMAT_PDF = 'pdf'
+LABEL_FORMAT_ZPL = 'zpl'
+LABEL_FORMAT_CHOICES = (LABEL_FORMAT_PDF, LABEL_FORMAT_ZPL)
+LABEL_CONTENT_TYPES = {
+    LABEL_FORMAT_PDF: 'application/pdf',
+    LABEL_FORMAT_ZPL: 'application/x-zpl',
+}
+
+# 4 x 2 inch roll labels, in PDF points and in 203 dpi printer dots.
+LABEL_WIDTH_PT = 288
+LABEL_HEIGHT_PT = 144
+ZPL_WIDTH_DOTS = 812
+ZPL_HEIGHT_DOTS = 406
+
+ROLL_ITERATOR_CHUNK_SIZE = 500
+
+
+def roll_label_queryset(batches):
+    """Rolls of all ``batches`` with their batch, in print order, as one query."""
+    return (
+        StockBatchRoll.objects.filter(batch__in=batches)
+        .select_related('batch')
+        .order_by('batch__batch_id', 'roll_number')
+    )
+
+
+def iter_label_rolls(batches):
+    return roll_label_queryset(batches).iterator(chunk_size=ROLL_ITERATOR_CHUNK_SIZE)
+
+
+def roll_barcode_value(roll):
+    return f'{roll.batch.batch_id}-R{roll.roll_number:03d}'
+
+
+def render_roll_labels(rolls, label_format):
+    """Byte chunks of one printable document holding a label per roll."""
+    if label_format == LABEL_FORMAT_PDF:
+        return iter_pdf_labels(rolls)
+    if label_format == LABEL_FORMAT_ZPL:
+        return iter_zpl_labels(rolls)
+    raise ValueError(f"label_format must be one of: {', '.join(LABEL_FORMAT_CHOICES)}")
+
+
+def _label_lines(roll):
+    batch = roll.batch
+    return {
+        'sku': batch.sku or '',
+        'product_name': (batch.product_name or '')[:48],
+        'batch': f'Batch {batch.batch_id}',
+        'supplier': f'Supplier {batch.supplier}' if batch.supplier else '',
+        'date': f'Date {batch.batch_date:%d/%m/%Y}' if batch.batch_date else '',
+        'roll': f'Roll {roll.roll_number}',
+        'meterage': f'{roll.meterage} mtr',
+    }
+
+
+# ZPL ------------------------------------------------------------------------
+
+def iter_zpl_labels(rolls):
+    """One ^XA...^XZ block per roll, with a Code 128 barcode drawn by the printer."""
+    for roll in rolls:
+        lines = _label_lines(roll)
+        yield (
+            '^XA^CI28'
+            f'^PW{ZPL_WIDTH_DOTS}^LL{ZPL_HEIGHT_DOTS}'
+            f'^FO30,20^A0N,40,40^FD{_zpl_text(lines["sku"])}^FS'
+            f'^FO30,66^A0N,24,24^FD{_zpl_text(lines["product_name"])}^FS'
+            f'^FO30,96^A0N,22,22^FD{_zpl_text(lines["batch"])}^FS'
+            f'^FO30,122^A0N,22,22^FD{_zpl_text(lines["supplier"])}^FS'
+            f'^FO30,148^A0N,22,22^FD{_zpl_text(lines["date"])}^FS'
+            f'^FO560,20^A0N,34,34^FD{_zpl_text(lines["roll"])}^FS'
+            f'^FO560,60^A0N,34,34^FD{_zpl_text(lines["meterage"])}^FS'
+            f'^FO30,200^BY2^BCN,130,Y,N,N^FD{_zpl_text(roll_barcode_value(roll))}^FS'
+            '^XZ\n'
+        ).encode('utf-8')
+
+
+def _zpl_text(value):
+    # ^ and ~ start ZPL commands; they cannot appear inside field data.
+    return str(value).replace('^', ' ').replace('~', ' ')
+
+
+# PDF ------------------------------------------------------------------------
+
+CATALOG_OBJECT = 1
+PAGES_OBJECT = 2
+FONT_OBJECT = 3
+BOLD_FONT_OBJECT = 4
+FIRST_PAGE_OBJECT = 5
+
+
+def iter_pdf_labels(rolls):
+    """
+    A PDF with one label-sized page per roll, written as it is generated.
+
+    Pages go out as soon as they are drawn; the page tree, which has to
+    list every page, and the cross-reference table come last, so memory
+    use does not grow with the number of labels. pypdf is installed, but
+    it only reads, merges and copies existing pages and cannot draw text
+    or barcodes, so the pages are written here.
+    """
+    writer = _PdfWriter()
+    yield writer.header()
+    yield writer.object(CATALOG_OBJECT, f'<< /Type /Catalog /Pages {PAGES_OBJECT} 0 R >>')
+    yield writer.object(FONT_OBJECT, _font('Helvetica'))
+    yield writer.object(BOLD_FONT_OBJECT, _font('Helvetica-Bold'))
+
+    page_objects = []
+    next_object = FIRST_PAGE_OBJECT
+    for roll in rolls:
+        page_object, content_object = next_object, next_object + 1
+        next_object += 2
+        page_objects.append(page_object)
+        yield writer.object(
+            page_object,
+            f'<< /Type /Page /Parent {PAGES_OBJECT} 0 R /MediaBox [0 0 {LABEL_WIDTH_PT} {LABEL_HEIGHT_PT}] '
+            f'/Resources << /Font << /F1 {FONT_OBJECT} 0 R /F2 {BOLD_FONT_OBJECT} 0 R >> >> '
+            f'/Contents {content_object} 0 R >>',
+        )
+        yield writer.stream(content_object, _pdf_label_content(roll))
+
+    kids = ' '.join(f'{number} 0 R' for number in page_objects)
+    yield writer.object(PAGES_OBJECT, f'<< /Type /Pages /Kids [{kids}] /Count {len(page_objects)} >>')
+    yield writer.trailer(root=CATALOG_OBJECT)
+
+
+class _PdfWriter:
+    def __init__(self):
+        self.position = 0
+        self.offsets = {}
+
+    def _emit(self, data):
+        self.position += len(data)
+        return data
+
+    def header(self):
+        return self._emit(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def object(self, number, body):
+        self.offsets[number] = self.position
+        return self._emit(f'{number} 0 obj\n{body}\nendobj\n'.encode('latin-1'))
+
+    def stream(self, number, content):
+        self.offsets[number] = self.position
+        return self._emit(
+            f'{number} 0 obj\n<< /Length {len(content)} >>\nstream\n'.encode('latin-1')
+            + content
+            + b'\nendstream\nendobj\n'
+        )
+
+    def trailer(self, root):
+        xref_position = self.position
+        size = max(self.offsets) + 1
+        entries = ['0000000000 65535 f \n']
+        entries.extend(
+            f'{self.offsets[number]:010d} 00000 n \n' if number in self.offsets else '0000000000 65535 f \n'
+            for number in range(1, size)
+        )
+        return self._emit(
+            (
+                f'xref\n0 {size}\n{"".join(entries)}'
+                f'trailer\n<< /Size {size} /Root {root} 0 R >>\nstartxref\n{xref_position}\n%%EOF\n'
+            ).encode('latin-1')
+        )
+
+
+def _font(name):
+    return f'<< /Type /Font /Subtype /Type1 /BaseFont /{name} /Encoding /WinAnsiEncoding >>'
+
+
+def _pdf_label_content(roll):
+    lines = _label_lines(roll)
+    ops = [
+        _pdf_text('F2', 14, 10, 124, lines['sku']),
+        _pdf_text('F1', 8, 10, 112, lines['product_name']),
+        _pdf_text('F1', 8, 10, 101, lines['batch']),
+        _pdf_text('F1', 8, 10, 90, lines['supplier']),
+        _pdf_text('F1', 8, 10, 79, lines['date']),
+        _pdf_text('F2', 12, 196, 124, lines['roll']),
+        _pdf_text('F2', 12, 196, 109, lines['meterage']),
+    ]
+
+    value = roll_barcode_value(roll)
+    modules = code128_modules(value)
+    module_width = min(1.0, (LABEL_WIDTH_PT - 20) / sum(modules))
+    x = 10.0
+    bars = []
+    for index, width in enumerate(modules):
+        # Code 128 alternates bar, space, bar, ... starting with a bar.
+        if index % 2 == 0:
+            bars.append(f'{x:.3f} 16 {width * module_width:.3f} 48 re')
+        x += width * module_width
+    ops.append('0 g ' + ' '.join(bars) + ' f')
+    ops.append(_pdf_text('F1', 7, 10, 6, value))
+    return '\n'.join(ops).encode('cp1252', errors='replace')
+
+
+def _pdf_text(font, size, x, y, text):
+    escaped = str(text).replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+    return f'BT /{font} {size} Tf {x} {y} Td ({escaped}) Tj ET'
+
+
+# Code 128 -------------------------------------------------------------------
+
+# Bar/space module widths for symbol values 0-105, then the stop pattern.
+CODE128_PATTERNS = (
+    '212222', '222122', '222221', '121223', '121322', '131222', '122213', '122312', '132212', '221213',
+    '221312', '231212', '112232', '122132', '122231', '113222', '123122', '123221', '223211', '221132',
+    '221231', '213212', '223112', '312131', '311222', '321122', '321221', '312212', '322112', '322211',
+    '212123', '212321', '232121', '111323', '131123', '131321', '112313', '132113', '132311', '211313',
+    '231113', '231311', '112133', '112331', '132131', '113123', '113321', '133121', '313121', '211331',
+    '231131', '213113', '213311', '213131', '311123', '311321', '331121', '312113', '312311', '332111',
+    '314111', '221411', '431111', '111224', '111422', '121124', '121421', '141122', '141221', '112214',
+    '112412', '122114', '122411', '142112', '142211', '241211', '221114', '413111', '241112', '134111',
+    '111242', '121142', '121241', '114212', '124112', '124211', '411212', '421112', '421211', '212141',
+    '214121', '412121', '111143', '111341', '131141', '114113', '114311', '411113', '411311', '113141',
+    '114131', '311141', '411131', '211412', '211214', '211232', '2331112',
+)
+CODE128_START_B = 104
+CODE128_STOP = 106
+
+
+def code128_modules(value):
+    """Module widths (bar, space, bar, ...) of ``value`` as Code 128 set B, with quiet zones left to the caller."""
+    codes = [ord(char) - 32 if 32 <= ord(char) < 127 else ord('?') - 32 for char in str(value)]
+    checksum = (CODE128_START_B + sum(position * code for position, code in enumerate(codes, start=1))) % 103
+    symbols = [CODE128_START_B, *codes, checksum, CODE128_STOP]
+    return [int(width) for symbol in symbols for width in CODE128_PATTERNS[symbol]]
@@ -0,0 +1,361 @@
+import json
+import os
+import time
+from pathlib import Path
+
+from django.db import transaction
+from django.db.models import Case, CharField, Value, When
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+from products.models import Product, ProductExtendedData
+from stock.models import StockBatch, StockItem, StockMovement, StockSkuAlias
+from stock.services.sku_resolver import sku_resolver
+from stock.services.stock_health import invalidate_stock_health
+from stock.sku_utils import normalize_sku_reference
+
+
+DEFAULT_CHUNK_SIZE = 2000
+DEFAULT_CHECKPOINT_PATH = 'logs/sku_normalization_checkpoint.json'
+CHECKPOINT_VERSION = 1
+ALIAS_SOURCE = 'normalize_stock_skus'
+
+PHASE_PRODUCTS = 'products'
+PHASE_EXTENDED_DATA = 'product_extended_data'
+PHASE_STOCK_ITEMS = 'stock_items'
+PHASE_STOCK_BATCHES = 'stock_batches'
+PHASE_ORDER_ITEMS = 'order_items'
+PHASES = (PHASE_PRODUCTS, PHASE_EXTENDED_DATA, PHASE_STOCK_ITEMS, PHASE_STOCK_BATCHES, PHASE_ORDER_ITEMS)
+
+# Column phases: SKU fields (with the length they are cut to) and the stats they count into.
+COLUMN_PHASES = {
+    PHASE_PRODUCTS: {
+        'queryset': lambda: Product.all_objects.all(),
+        'fields': {'parent_reference': None, 'child_reference': None},
+        'row_stat': 'products_updated',
+        'field_stats': {},
+    },
+    PHASE_EXTENDED_DATA: {
+        'queryset': lambda: ProductExtendedData.objects.all(),
+        'fields': {'parent_reference': None, 'child_reference': None, 'amazon_sku_uk': None},
+        'row_stat': 'extended_product_rows_updated',
+        'field_stats': {},
+    },
+    PHASE_STOCK_BATCHES: {
+        'queryset': lambda: StockBatch.all_objects.all(),
+        'fields': {'sku': 50},
+        'row_stat': 'stock_batches_updated',
+        'field_stats': {},
+    },
+    PHASE_ORDER_ITEMS: {
+        'queryset': lambda: OrderItem.objects.all(),
+        'fields': {'sku': 50, 'product_type': 50},
+        'row_stat': None,
+        'field_stats': {'sku': 'order_item_skus_updated', 'product_type': 'order_item_product_types_updated'},
+    },
+}
+
+# Stock item fields combined when two items normalize to the same SKU.
+MERGE_MAX_FIELDS = ('reserved_stock', 'minimum_stock_level', 'maximum_stock_level', 'available_stock_in_mtr')
+MERGE_FILL_FIELDS = (
+    'warehouse_location', 'supplier', 'last_purchase_date', 'notes', 'primary_location_id', 'secondary_location_id',
+)
+MERGE_UPDATE_FIELDS = (
+    *MERGE_MAX_FIELDS,
+    'warehouse_location', 'supplier', 'last_purchase_date', 'notes', 'primary_location', 'secondary_location',
+    'product_type', 'is_active', 'is_discontinued', 'is_deleted', 'deleted_at',
+)
+
+
+def empty_stats():
+    return {
+        'products_updated': 0,
+        'stock_renamed': 0,
+        'stock_merged': 0,
+        'stock_product_type_updated': 0,
+        'stock_batches_updated': 0,
+        'stock_movements_relinked': 0,
+        'order_items_relinked': 0,
+        'order_item_skus_updated': 0,
+        'order_item_product_types_updated': 0,
+        'extended_product_rows_updated': 0,
+    }
+
+
+class SkuNormalizer:
+    """
+    Normalize SKUs across products, stock and orders in resumable chunks.
+
+    Each table is read in primary-key order, ``chunk_size`` rows at a time,
+    reading only the SKU columns. Normalized values are computed in Python
+    for the whole chunk and written with one grouped ``UPDATE ... CASE``
+    per changed column. Each chunk commits on its own and then records its
+    position in the checkpoint file, so an interrupted run can continue
+    with ``resume=True``.
+
+    A stock item whose SKU changes is copied under the new SKU, or merged
+    into the item that already holds it. Every row that points at the old
+    SKU is then repointed in one statement per table, and the old row is
+    deleted. Foreign keys stay valid throughout, so constraint checking is
+    never switched off. Without ``commit`` nothing is written, checkpoint
+    included.
+    """
+
+    def __init__(self, *, commit=False, chunk_size=DEFAULT_CHUNK_SIZE, checkpoint_path=DEFAULT_CHECKPOINT_PATH,
+                 resume=False, progress=None):
+        self.commit = commit
+        self.chunk_size = max(1, int(chunk_size))
+        self.checkpoint_path = Path(checkpoint_path) if checkpoint_path else None
+        self.resume = resume
+        self.progress = progress
+        self.stats = empty_stats()
+        self.phase_timings = {}
+        # SKUs created by earlier chunks; in a dry run they only exist here.
+        self.created_skus = set()
+
+    def run(self):
+        checkpoint = self._load_checkpoint() if self.resume else None
+        completed = set(checkpoint['completed_phases']) if checkpoint else set()
+        if checkpoint:
+            self.stats.update(checkpoint['stats'])
+            self.phase_timings.update(checkpoint.get('phase_timings', {}))
+
+        started = time.perf_counter()
+        for phase in PHASES:
+            if phase in completed:
+                continue
+            after = checkpoint['after'] if checkpoint and checkpoint['phase'] == phase else None
+            self._run_phase(phase, after, completed)
+            completed.add(phase)
+
+        if self.commit:
+            sku_resolver.clear()
+            invalidate_stock_health()
+            self._clear_checkpoint()
+
+        rows = sum(timing['rows'] for timing in self.phase_timings.values())
+        seconds = time.perf_counter() - started
+        return {
+            'stats': self.stats,
+            'phases': self.phase_timings,
+            'rows_scanned': rows,
+            'elapsed_seconds': round(seconds, 3),
+            'rows_per_second': round(rows / seconds, 1) if seconds > 0 else 0.0,
+            'resumed': checkpoint is not None,
+        }
+
+    def _run_phase(self, phase, after, completed):
+        timing = self.phase_timings.setdefault(phase, {'rows': 0, 'seconds': 0.0, 'rows_per_second': 0.0})
+        while True:
+            chunk_started = time.perf_counter()
+            with transaction.atomic():
+                if phase == PHASE_STOCK_ITEMS:
+                    rows, after = self._stock_chunk(after)
+                else:
+                    rows, after = self._column_chunk(COLUMN_PHASES[phase], after)
+                if not self.commit:
+                    transaction.set_rollback(True)
+            if not rows:
+                break
+
+            timing['rows'] += rows
+            timing['seconds'] = round(timing['seconds'] + time.perf_counter() - chunk_started, 3)
+            timing['rows_per_second'] = round(timing['rows'] / timing['seconds'], 1) if timing['seconds'] else 0.0
+            self._save_checkpoint(phase, after, completed)
+            if self.progress:
+                self.progress(phase, timing)
+
+    # Column phases ------------------------------------------------------------
+
+    def _column_chunk(self, spec, after):
+        queryset = spec['queryset']()
+        pk_name = queryset.model._meta.pk.attname
+        rows = list(_keyset_chunk(queryset, pk_name, after, self.chunk_size).values_list('pk', *spec['fields']))
+        if not rows:
+            return 0, after
+
+        changes = {field: {} for field in spec['fields']}
+        changed_rows = set()
+        for pk, *values in rows:
+            for (field, max_length), current in zip(spec['fields'].items(), values):
+                normalized = normalize_sku_reference(current)
+                if max_length:
+                    normalized = normalized[:max_length]
+                if normalized != (current or ''):
+                    changes[field][pk] = normalized
+                    changed_rows.add(pk)
+
+        if spec['row_stat']:
+            self.stats[spec['row_stat']] += len(changed_rows)
+        for field, stat in spec['field_stats'].items():
+            self.stats[stat] += len(changes[field])
+
+        if queryset.model is OrderItem and changed_rows:
+            Order.invalidate_shipping_profiles(
+                OrderItem.objects.filter(pk__in=changed_rows).values_list('order_id', flat=True).distinct()
+            )
+        for field, values in changes.items():
+            _update_by_pk(queryset.model._base_manager, field, values)
+        return len(rows), rows[-1][0]
+
+    # Stock items --------------------------------------------------------------
+
+    def _stock_chunk(self, after):
+        rows = list(
+            _keyset_chunk(StockItem.all_objects.all(), 'sku', after, self.chunk_size)
+            .values_list('sku', 'product_type', 'sku_normalized')
+        )
+        if not rows:
+            return 0, after
+
+        renames = {}
+        type_updates = {}
+        normalized_updates = {}
+        for sku, product_type, sku_normalized in rows:
+            new_sku = normalize_sku_reference(sku)[:50]
+            if new_sku and new_sku != sku:
+                renames[sku] = new_sku
+                continue
+            normalized_type = normalize_sku_reference(product_type)[:20]
+            if normalized_type and normalized_type != product_type:
+                type_updates[sku] = normalized_type
+            if sku_normalized != sku:
+                normalized_updates[sku] = sku
+
+        self.stats['stock_product_type_updated'] += len(type_updates)
+        _update_by_pk(StockItem.all_objects, 'product_type', type_updates)
+        _update_by_pk(StockItem.all_objects, 'sku_normalized', normalized_updates)
+        if renames:
+            self._rename_stock_items(renames)
+        return len(rows), rows[-1][0]
+
+    def _rename_stock_items(self, renames):
+        sources = StockItem.all_objects.in_bulk(list(renames))
+        targets = StockItem.all_objects.in_bulk(set(renames.values()))
+        copies = {}
+        merged = {}
+        for old_sku in sorted(renames):
+            source = sources[old_sku]
+            new_sku = renames[old_sku]
+            target = targets.get(new_sku) or copies.get(new_sku)
+            if target is None:
+                source.sku = new_sku
+                source.sku_normalized = new_sku
+                source.product_type = normalize_sku_reference(source.product_type)[:20]
+                copies[new_sku] = source
+                # A dry run rolls back each chunk, so a copy made by an earlier chunk is not there to merge into.
+                self.stats['stock_merged' if new_sku in self.created_skus else 'stock_renamed'] += 1
+            else:
+                _merge_stock_item(target, source)
+                if new_sku in targets:
+                    merged[new_sku] = target
+                self.stats['stock_merged'] += 1
+
+        # Copies first so repointed rows always have a parent, then the old rows go.
+        StockItem.all_objects.bulk_create(list(copies.values()))
+        StockItem.all_objects.bulk_update(list(merged.values()), MERGE_UPDATE_FIELDS)
+        self.created_skus.update(copies)
+
+        old_skus = list(renames)
+        order_ids = OrderItem.objects.filter(stock_item_id__in=old_skus).values_list('order_id', flat=True).distinct()
+        Order.invalidate_shipping_profiles(list(order_ids))
+        for relation in StockItem._meta.related_objects:
+            updated = _repoint(relation.related_model._base_manager, relation.field.attname, renames)
+            if relation.related_model is OrderItem:
+                self.stats['order_items_relinked'] += updated
+            elif relation.related_model is StockBatch:
+                self.stats['stock_batches_updated'] += updated
+            elif relation.related_model is StockMovement:
+                self.stats['stock_movements_relinked'] += updated
+
+        # Old spellings stay resolvable, as StockItem.save does for new ones.
+        _repoint(StockSkuAlias.objects, 'alias', renames, target_field='stock_item_id', source=ALIAS_SOURCE)
+        StockSkuAlias.objects.bulk_create(
+            [
+                StockSkuAlias(alias=old_sku[:100], stock_item_id=new_sku, source=ALIAS_SOURCE)
+                for old_sku, new_sku in renames.items()
+            ],
+            ignore_conflicts=True,
+        )
+        StockItem.all_objects.filter(sku__in=old_skus).delete()
+
+    # Checkpoints --------------------------------------------------------------
+
+    def _load_checkpoint(self):
+        if not self.checkpoint_path or not self.checkpoint_path.exists():
+            return None
+        checkpoint = json.loads(self.checkpoint_path.read_text(encoding='utf-8'))
+        if checkpoint.get('version') != CHECKPOINT_VERSION:
+            raise ValueError(f'Unsupported checkpoint version in {self.checkpoint_path}')
+        return checkpoint
+
+    def _save_checkpoint(self, phase, after, completed):
+        if not self.commit or not self.checkpoint_path:
+            return
+        self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.checkpoint_path.with_suffix('.tmp')
+        temporary.write_text(json.dumps({
+            'version': CHECKPOINT_VERSION,
+            'phase': phase,
+            'after': after,
+            'completed_phases': sorted(completed),
+            'stats': self.stats,
+            'phase_timings': self.phase_timings,
+            'updated_at': timezone.now().isoformat(),
+        }), encoding='utf-8')
+        # Replace in one step so a crash never leaves a half-written checkpoint.
+        os.replace(temporary, self.checkpoint_path)
+
+    def _clear_checkpoint(self):
+        if self.checkpoint_path and self.checkpoint_path.exists():
+            self.checkpoint_path.unlink()
+
+
+def _keyset_chunk(queryset, pk_name, after, chunk_size):
+    if after is not None:
+        queryset = queryset.filter(**{f'{pk_name}__gt': after})
+    return queryset.order_by(pk_name)[:chunk_size]
+
+
+def _case_by(field, mapping):
+    return Case(
+        *[When(**{field: old}, then=Value(new)) for old, new in mapping.items()],
+        output_field=CharField(),
+    )
+
+
+def _repoint(manager, field, renames, target_field=None, **extra):
+    """
+    Set ``target_field`` (default ``field``) to ``renames[field]`` on rows whose ``field`` is an old SKU.
+
+    The old SKUs actually present are looked up first, so the CASE only
+    lists those and tables with nothing to repoint get no UPDATE at all.
+    """
+    present = set(manager.filter(**{f'{field}__in': list(renames)}).values_list(field, flat=True).distinct())
+    if not present:
+        return 0
+    mapping = {old: renames[old] for old in present}
+    return manager.filter(**{f'{field}__in': list(present)}).update(
+        **{target_field or field: _case_by(field, mapping)}, **extra,
+    )
+
+
+def _update_by_pk(manager, field, values):
+    """One ``UPDATE ... SET field = CASE pk ... WHERE pk IN (...)`` for ``{pk: value}``."""
+    if not values:
+        return 0
+    return manager.filter(pk__in=list(values)).update(**{field: _case_by('pk', values)})
+
+
+def _merge_stock_item(target, source):
+    for field in MERGE_MAX_FIELDS:
+        setattr(target, field, max(getattr(target, field), getattr(source, field)))
+    for field in MERGE_FILL_FIELDS:
+        if not getattr(target, field) and getattr(source, field):
+            setattr(target, field, getattr(source, field))
+    target.product_type = normalize_sku_reference(target.product_type)[:20]
+    target.is_active = target.is_active or source.is_active
+    target.is_discontinued = target.is_discontinued and source.is_discontinued
+    target.is_deleted = target.is_deleted and source.is_deleted
+    if not target.deleted_at and source.deleted_at:
+        target.deleted_at = source.deleted_at
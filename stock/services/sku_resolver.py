@@ -0,0 +1,126 @@
+import threading
+from collections import OrderedDict
+
+from django.db.models import Q
+
+from stock.models import StockItem, StockSkuAlias
+from stock.sku_utils import normalize_sku_reference
+
+
+DEFAULT_CACHE_SIZE = 4096
+
+
+class SkuResolver:
+    """
+    Find the stock item a source SKU refers to.
+
+    A SKU matches, in order, a stock item's exact ``sku``, its indexed
+    ``sku_normalized`` key, or a ``StockSkuAlias`` recorded for a historical
+    or source spelling such as ``(109 LT) DSND``. Resolved SKUs are kept in a
+    bounded in-process LRU; a cached entry is only trusted once the row it
+    points at is fetched again, so renames and merges never return stale rows
+    and misses are never cached.
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def resolve(self, value, queryset=None):
+        """Return the stock item for ``value`` within ``queryset`` (live items by default), or None."""
+        raw, normalized = _lookup_keys(value)
+        if not raw:
+            return None
+        queryset = StockItem.objects.all() if queryset is None else queryset
+
+        cached_sku = self._cached(raw)
+        if cached_sku is not None:
+            stock_item = queryset.filter(pk=cached_sku).first()
+            if stock_item is not None:
+                return stock_item
+            self._forget(raw)
+
+        stock_item = (
+            queryset.filter(sku__in={raw, normalized}).order_by('sku').first()
+            or queryset.filter(sku_normalized=normalized).order_by('sku').first()
+            or queryset.filter(sku_aliases__alias__in={raw, normalized}).order_by('sku').first()
+        )
+        if stock_item is not None:
+            self._remember(raw, stock_item.pk)
+        return stock_item
+
+    def resolve_many(self, values, queryset=None):
+        """Map each SKU in ``values`` to its stock item (missing SKUs are left out) in at most three queries."""
+        keys = {value: _lookup_keys(value) for value in values}
+        keys = {value: key for value, key in keys.items() if key[0]}
+        if not keys:
+            return {}
+        queryset = StockItem.objects.all() if queryset is None else queryset
+
+        lookups = {key for pair in keys.values() for key in pair}
+        by_sku = {}
+        by_normalized = {}
+        for stock_item in queryset.filter(Q(sku__in=lookups) | Q(sku_normalized__in=lookups)).order_by('sku'):
+            by_sku[stock_item.sku] = stock_item
+            by_normalized.setdefault(stock_item.sku_normalized, stock_item)
+
+        resolved = {}
+        unresolved = {}
+        for value, (raw, normalized) in keys.items():
+            stock_item = (
+                by_sku.get(raw) or by_sku.get(normalized) or by_normalized.get(normalized)
+            )
+            if stock_item is None:
+                unresolved[value] = (raw, normalized)
+            else:
+                resolved[value] = stock_item
+
+        if unresolved:
+            alias_keys = {key for pair in unresolved.values() for key in pair}
+            alias_targets = dict(
+                StockSkuAlias.objects.filter(alias__in=alias_keys).values_list('alias', 'stock_item_id')
+            )
+            targets = queryset.in_bulk(set(alias_targets.values())) if alias_targets else {}
+            for value, (raw, normalized) in unresolved.items():
+                target_sku = alias_targets.get(raw) or alias_targets.get(normalized)
+                if target_sku in targets:
+                    resolved[value] = targets[target_sku]
+
+        for value, stock_item in resolved.items():
+            self._remember(keys[value][0], stock_item.pk)
+        return resolved
+
+    def _cached(self, raw):
+        with self._lock:
+            sku = self._cache.get(raw)
+            if sku is not None:
+                self._cache.move_to_end(raw)
+            return sku
+
+    def _remember(self, raw, sku):
+        with self._lock:
+            self._cache[raw] = sku
+            self._cache.move_to_end(raw)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+
+    def _forget(self, raw):
+        with self._lock:
+            self._cache.pop(raw, None)
+
+
+def _lookup_keys(value):
+    raw = str(value or '').strip()
+    return raw, normalize_sku_reference(raw)[:50]
+
+
+sku_resolver = SkuResolver()
+
+
+def resolve_stock_item(value, queryset=None):
+    return sku_resolver.resolve(value, queryset=queryset)
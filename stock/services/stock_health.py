@@ -0,0 +1,107 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.utils import timezone
+
+from stock.models import StockItem
+
+
+STOCK_HEALTH_CACHE_KEY = 'stock:health'
+
+ACTIVE = Q(is_active=True)
+OUT_OF_STOCK = ACTIVE & Q(available_stock_in_mtr=0)
+LOW_STOCK = ACTIVE & Q(available_stock_in_mtr__gt=0, available_stock_in_mtr__lte=F('minimum_stock_level'))
+AT_OR_BELOW_MINIMUM = ACTIVE & Q(available_stock_in_mtr__lte=F('minimum_stock_level'))
+IN_STOCK = ACTIVE & Q(available_stock_in_mtr__gt=F('minimum_stock_level'))
+
+
+def stock_health():
+    """Stock KPIs for live (not deleted) items, cached until the next stock write."""
+    health = cache.get(STOCK_HEALTH_CACHE_KEY)
+    if health is None:
+        health = compute_stock_health()
+        cache.set(STOCK_HEALTH_CACHE_KEY, health, settings.STOCK_HEALTH_CACHE_SECONDS)
+    return health
+
+
+def invalidate_stock_health():
+    """Drop cached KPIs now and again once the current transaction commits."""
+    cache.delete(STOCK_HEALTH_CACHE_KEY)
+    # A request that reads before our commit could re-cache the old figures in between.
+    transaction.on_commit(lambda: cache.delete(STOCK_HEALTH_CACHE_KEY))
+
+
+def compute_stock_health():
+    """
+    Totals, stock status counts and value per product type and color.
+
+    Everything comes from one aggregate grouped by (product_type, color);
+    the totals and the per-type/per-color breakdowns are summed from those
+    groups in Python.
+    """
+    stock_value = ExpressionWrapper(
+        F('available_stock_in_mtr') * F('unit_cost'),
+        output_field=DecimalField(max_digits=20, decimal_places=2),
+    )
+    groups = (
+        StockItem.objects.order_by()
+        .values('product_type', 'color_id')
+        .annotate(
+            total_items=Count('pk'),
+            active_items=Count('pk', filter=ACTIVE),
+            in_stock=Count('pk', filter=IN_STOCK),
+            low_stock=Count('pk', filter=LOW_STOCK),
+            out_of_stock=Count('pk', filter=OUT_OF_STOCK),
+            at_or_below_minimum=Count('pk', filter=AT_OR_BELOW_MINIMUM),
+            total_stock_quantity=Sum('available_stock_in_mtr', filter=ACTIVE),
+            total_reserved=Sum('reserved_stock', filter=ACTIVE),
+            total_stock_value=Sum(stock_value, filter=ACTIVE),
+        )
+    )
+
+    totals = _empty_totals()
+    by_product_type = {}
+    by_color = {}
+    for group in groups:
+        for bucket in (
+            totals,
+            by_product_type.setdefault(group['product_type'], _empty_totals()),
+            by_color.setdefault(group['color_id'], _empty_totals()),
+        ):
+            for key in bucket:
+                bucket[key] += group[key] or 0
+
+    return {
+        **_rounded(totals),
+        'inactive_items': totals['total_items'] - totals['active_items'],
+        'by_product_type': [
+            {'product_type': product_type, **_rounded(values)}
+            for product_type, values in sorted(by_product_type.items())
+        ],
+        'by_color': [
+            {'color_code': color_code, **_rounded(values)}
+            for color_code, values in sorted(by_color.items())
+        ],
+        'computed_at': timezone.now(),
+    }
+
+
+def _empty_totals():
+    return {
+        'total_items': 0,
+        'active_items': 0,
+        'in_stock': 0,
+        'low_stock': 0,
+        'out_of_stock': 0,
+        'at_or_below_minimum': 0,
+        'total_stock_quantity': 0,
+        'total_reserved': 0,
+        'total_stock_value': Decimal('0'),
+    }
+
+
+def _rounded(values):
+    return {**values, 'total_stock_value': round(float(values['total_stock_value']), 2)}
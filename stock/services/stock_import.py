@@ -0,0 +1,223 @@
+import time
+
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from colors.models import Color
+from products.models import Product
+from stock.models import StockItem, StockMovement, StockSkuAlias
+from stock.services.ledger import build_movement
+from stock.services.stock_health import invalidate_stock_health
+from stock.sku_utils import normalize_sku_reference
+
+
+SKU_COLUMN = 'SKU'
+PRODUCT_TYPE_COLUMN = 'ProdTpe'
+COLOR_COLUMN = 'Color Abrvs'
+# The first of these present in the sheet holds the available stock.
+STOCK_COLUMNS = ('Available Stock (Mtr)', 'Available Stock (Rolls)')
+IMPORT_REASON = 'Excel import'
+
+
+def import_stock_frame(df, *, user=None, chunk_size=None):
+    """
+    Create or update stock items from a "Current Stock" sheet.
+
+    Columns are normalized with pandas, colors and products are looked up
+    once for the whole sheet, and rows are written in chunks of
+    ``chunk_size`` with ``bulk_create``/``bulk_update``, each chunk in its
+    own short transaction. Every change of available stock gets a ledger
+    movement. When a SKU appears more than once the last row wins.
+
+    Returns counts, every row error as ``{'row', 'sku', 'error'}`` (row
+    numbers count data rows from 1) and the time spent per phase.
+    """
+    started = time.perf_counter()
+    chunk_size = max(1, int(chunk_size or settings.STOCK_IMPORT_CHUNK_SIZE))
+
+    rows = _prepare_rows(df)
+    skipped = int((rows['raw_sku'] == '').sum())
+    rows = rows[rows['raw_sku'] != '']
+    rows.loc[rows['error'].isna() & ~rows['color_code'].isin(_known_colors(rows['color_code'])), 'error'] = (
+        "Color '" + rows['color_code'] + "' not found"
+    )
+
+    errors = [
+        {'row': int(row), 'sku': sku or None, 'error': error}
+        for row, sku, error in rows.loc[rows['error'].notna(), ['row', 'sku', 'error']].itertuples(index=False)
+    ]
+    valid = rows[rows['error'].isna()]
+    superseded = valid['sku'].duplicated(keep='last')
+    duplicates = valid.loc[superseded, 'row'].tolist()
+    records = valid[~superseded].to_dict('records')
+    products = _products_by_sku(records)
+    prepared = time.perf_counter()
+
+    counts = {'created': 0, 'updated': 0, 'unchanged': 0, 'movements_created': 0}
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start:start + chunk_size]
+        try:
+            with transaction.atomic():
+                chunk_counts, chunk_errors = _write_chunk(chunk, products, user)
+        except Exception as e:
+            errors.extend({'row': record['row'], 'sku': record['sku'], 'error': str(e)} for record in chunk)
+            continue
+        errors.extend(chunk_errors)
+        for key, value in chunk_counts.items():
+            counts[key] += value
+    finished = time.perf_counter()
+
+    errors.sort(key=lambda error: error['row'])
+    return {
+        'rows': len(df.index),
+        **counts,
+        'skipped': skipped,
+        'duplicates': duplicates,
+        'error_count': len(errors),
+        'errors': errors,
+        'timing': {
+            'prepare_seconds': round(prepared - started, 3),
+            'write_seconds': round(finished - prepared, 3),
+            'total_seconds': round(finished - started, 3),
+        },
+    }
+
+
+def _prepare_rows(df):
+    frame = df.rename(columns=lambda column: str(column).strip())
+    rows = pd.DataFrame({'row': frame.index + 1}, index=frame.index)
+    rows['raw_sku'] = _text_column(frame, SKU_COLUMN)
+    rows['sku'] = _normalized(rows['raw_sku'], 50)
+    rows['product_type'] = _normalized(_text_column(frame, PRODUCT_TYPE_COLUMN), 20)
+    rows['color_code'] = _text_column(frame, COLOR_COLUMN)
+
+    stock_column = next((column for column in STOCK_COLUMNS if column in frame), None)
+    if stock_column is None:
+        raw_stock = pd.Series(float('nan'), index=frame.index)
+    else:
+        raw_stock = frame[stock_column]
+    numeric = pd.to_numeric(raw_stock, errors='coerce')
+    rows['available'] = numeric.fillna(0).clip(lower=0).astype('int64')
+
+    rows['error'] = None
+    invalid_stock = raw_stock.notna() & numeric.isna()
+    rows.loc[invalid_stock, 'error'] = "Invalid available stock '" + raw_stock[invalid_stock].astype(str) + "'"
+    rows.loc[(rows['raw_sku'] != '') & (rows['sku'] == ''), 'error'] = 'SKU is empty after normalization'
+    return rows
+
+
+def _text_column(frame, column):
+    if column not in frame:
+        return pd.Series('', index=frame.index)
+    values = frame[column]
+    return values.where(values.notna(), '').astype(str).str.strip()
+
+
+def _normalized(values, max_length):
+    # Normalize each distinct value once rather than once per row.
+    mapping = {value: normalize_sku_reference(value)[:max_length] for value in values.unique()}
+    return values.map(mapping)
+
+
+def _known_colors(color_codes):
+    return set(Color.objects.filter(color_code__in=set(color_codes)).values_list('color_code', flat=True))
+
+
+def _products_by_sku(records):
+    """Product to link new stock items to, matched on the normalized child reference."""
+    keys = {record['sku'] for record in records} | {record['raw_sku'] for record in records}
+    products = {}
+    queryset = Product.objects.filter(child_reference__in=keys).order_by('vs_child_id')
+    for product_id, child_reference in queryset.values_list('pk', 'child_reference'):
+        products.setdefault(normalize_sku_reference(child_reference)[:50], product_id)
+    return products
+
+
+def _write_chunk(chunk, products, user):
+    existing = {
+        stock_item.sku: stock_item
+        for stock_item in StockItem.all_objects.select_for_update().filter(sku__in=[record['sku'] for record in chunk])
+    }
+    now = timezone.now()
+    counts = {'created': 0, 'updated': 0, 'unchanged': 0, 'movements_created': 0}
+    errors = []
+    to_create = []
+    to_update = []
+    movements = []
+    aliases = []
+
+    for record in chunk:
+        sku = record['sku']
+        level = record['available']
+        stock_item = existing.get(sku)
+
+        if stock_item is None:
+            product_id = products.get(sku)
+            if product_id is None:
+                errors.append({'row': record['row'], 'sku': sku, 'error': f"No product found for SKU '{sku}'"})
+                continue
+            to_create.append(StockItem(
+                sku=sku,
+                sku_normalized=sku,
+                product_id=product_id,
+                product_type=record['product_type'],
+                color_id=record['color_code'],
+                available_stock_in_mtr=level,
+            ))
+            if level:
+                movements.append(_movement(sku, 'IN', level, 0, level, 0, user))
+            counts['created'] += 1
+        elif stock_item.is_deleted:
+            errors.append({'row': record['row'], 'sku': sku, 'error': f"Stock item '{sku}' is deleted"})
+            continue
+        else:
+            changed = False
+            if stock_item.product_type != record['product_type'] or stock_item.color_id != record['color_code']:
+                stock_item.product_type = record['product_type']
+                stock_item.color_id = record['color_code']
+                changed = True
+            old_level = stock_item.available_stock_in_mtr
+            if level != old_level:
+                movements.append(_movement(
+                    sku, 'ADJUSTMENT', level - old_level, old_level, level, stock_item.reserved_stock, user,
+                ))
+                stock_item.available_stock_in_mtr = level
+                stock_item.last_stock_update = now
+                changed = True
+            if changed:
+                stock_item.updated_at = now
+                to_update.append(stock_item)
+                counts['updated'] += 1
+            else:
+                counts['unchanged'] += 1
+
+        if record['raw_sku'] != sku:
+            aliases.append(StockSkuAlias(alias=record['raw_sku'][:100], stock_item_id=sku, source='import'))
+
+    StockItem.all_objects.bulk_create(to_create)
+    StockItem.all_objects.bulk_update(
+        to_update,
+        ['product_type', 'color', 'available_stock_in_mtr', 'last_stock_update', 'updated_at'],
+    )
+    StockMovement.objects.bulk_create(movements)
+    StockSkuAlias.objects.bulk_create(aliases, ignore_conflicts=True)
+    if to_create or to_update:
+        invalidate_stock_health()
+    counts['movements_created'] = len(movements)
+    return counts, errors
+
+
+def _movement(sku, movement_type, quantity, old_level, new_level, reserved, user):
+    return build_movement(
+        sku,
+        movement_type,
+        quantity,
+        available_balance=new_level,
+        reserved_balance=reserved,
+        old_stock_level=old_level,
+        new_stock_level=new_level,
+        reason=IMPORT_REASON,
+        user=user,
+    )
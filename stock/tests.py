@@ -1,13 +1,29 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
 from decimal import Decimal
 
+import pandas as pd
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
+from pypdf import PdfReader
 from rest_framework.test import APIClient
 
 from colors.models import Color
 from products.models import Product, ProductExtendedData
-from stock.models import StockBatch, StockBatchRoll, StockItem, StockMovement
+from stock.models import StockBalanceSnapshot, StockBatch, StockBatchRoll, StockItem, StockMovement, StockSkuAlias
+from stock.services.ledger import balance_at, take_balance_snapshots
+from stock.services.sku_resolver import sku_resolver
+from stock.services.stock_health import STOCK_HEALTH_CACHE_KEY
 from stock.services.product_stock_sync import sync_product_stock_items
 
 
@@ -240,6 +256,47 @@ class StockBatchIncomingAPITest(TestCase):
         self.assertEqual(response.data['updated_batch_count'], 2)
         self.assertEqual(response.data['updated_label_count'], 2)
 
+    def test_bulk_mark_labels_generated_renders_all_rolls_in_one_document(self):
+        batches = []
+        for meterage in (100, 60, 40):
+            batch = StockBatch.objects.create(
+                stock_item=self.stock_item,
+                sku='AB',
+                product_name='Product (AB)',
+                supplier='Supplier Ltd',
+                created_by=self.user,
+                total_meterage=meterage,
+                roll_count=2,
+            )
+            StockBatchRoll.objects.create(batch=batch, roll_number=1, meterage=meterage // 2)
+            StockBatchRoll.objects.create(batch=batch, roll_number=2, meterage=meterage // 2)
+            batches.append(batch)
+        batch_ids = [batch.batch_id for batch in batches]
+
+        with self.assertNumQueries(3):
+            response = self.client.post('/api/v1/stock-batches/mark-labels-generated/', {'batch_ids': batch_ids}, format='json')
+        self.assertEqual(response.data['updated_label_count'], 6)
+        self.assertEqual([len(batch['labels']) for batch in response.data['batches']], [2, 2, 2])
+
+        response = self.client.post(
+            '/api/v1/stock-batches/mark-labels-generated/',
+            {'batch_ids': batch_ids, 'label_format': 'pdf'},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        document = PdfReader(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(len(document.pages), 6)
+        self.assertIn(f'{batch_ids[0]}-R002', document.pages[1].extract_text())
+
+        response = self.client.get(f'/api/v1/stock-batches/{batch_ids[1]}/labels/', {'label_format': 'zpl'})
+        zpl = b''.join(response.streaming_content).decode('utf-8')
+        self.assertEqual(zpl.count('^XA'), 2)
+        self.assertIn(f'^BCN,130,Y,N,N^FD{batch_ids[1]}-R001^FS', zpl)
+
+        response = self.client.get(f'/api/v1/stock-batches/{batch_ids[1]}/labels/', {'label_format': 'png'})
+        self.assertEqual(response.status_code, 400)
+
     def test_create_rejects_duplicate_roll_numbers_without_stock_change(self):
         response = self.client.post(
             '/api/v1/stock-batches/',
@@ -306,6 +363,652 @@ class StockBatchIncomingAPITest(TestCase):
         self.assertEqual(label_response.data['labels'][0]['sku'], '109 LT DSND')
 
 
+class SkuResolverTest(TestCase):
+    def setUp(self):
+        sku_resolver.clear()
+        self.color = Color.objects.create(color_code='BLK', color_name='Black')
+        self.product = Product.objects.create(
+            vs_parent_id=700,
+            vs_child_id=700,
+            parent_reference='109 LT DSND',
+            child_reference='109 LT DSND',
+            parent_product_title='Product 109',
+            child_product_title='Product 109',
+        )
+
+    def _stock_item(self, sku):
+        return StockItem.objects.create(
+            sku=sku,
+            product_type='109 LT',
+            product=self.product,
+            color=self.color,
+        )
+
+    def test_save_maintains_normalized_key_and_records_source_alias(self):
+        stock_item = self._stock_item('(109 LT) DSND')
+
+        self.assertEqual(stock_item.sku, '109 LT DSND')
+        self.assertEqual(StockItem.objects.get(sku='109 LT DSND').sku_normalized, '109 LT DSND')
+        alias = StockSkuAlias.objects.get(alias='(109 LT) DSND')
+        self.assertEqual(alias.stock_item_id, '109 LT DSND')
+
+    def test_resolves_legacy_rows_by_indexed_key_and_aliases_without_scanning(self):
+        self._stock_item('109 LT DSND')
+        # A legacy row written without save(): sku still has its source spelling.
+        StockItem.objects.filter(sku='109 LT DSND').update(sku='(109 LT)  DSND')
+        StockItem.objects.filter(sku='(109 LT)  DSND').update(sku_normalized='109 LT DSND')
+        legacy = StockItem.objects.get(sku='(109 LT)  DSND')
+        StockSkuAlias.objects.create(alias='OLD-DSND', stock_item=legacy)
+
+        with self.assertNumQueries(2):
+            self.assertEqual(sku_resolver.resolve('109 LT DSND'), legacy)
+        with self.assertNumQueries(1):
+            self.assertEqual(sku_resolver.resolve('109 LT DSND'), legacy)
+        self.assertEqual(sku_resolver.resolve('OLD-DSND'), legacy)
+        self.assertIsNone(sku_resolver.resolve('UNKNOWN'))
+
+        with self.assertNumQueries(3):
+            resolved = sku_resolver.resolve_many(['(109 LT) DSND', 'OLD-DSND', 'UNKNOWN'])
+        self.assertEqual(resolved, {'(109 LT) DSND': legacy, 'OLD-DSND': legacy})
+
+    def test_cached_sku_is_dropped_after_rename(self):
+        self._stock_item('ROLL A')
+        self.assertEqual(sku_resolver.resolve('ROLL A').sku, 'ROLL A')
+
+        StockItem.objects.filter(sku='ROLL A').update(sku='ROLL B', sku_normalized='ROLL B')
+        StockSkuAlias.objects.create(alias='ROLL A', stock_item_id='ROLL B')
+
+        self.assertEqual(sku_resolver.resolve('ROLL A').sku, 'ROLL B')
+
+
+class SkuNormalizationCommandTest(TestCase):
+    def setUp(self):
+        import tempfile
+
+        self.checkpoint = f'{tempfile.mkdtemp()}/checkpoint.json'
+        self.color = Color.objects.create(color_code='BLK', color_name='Black')
+        self.product = Product.objects.create(
+            vs_parent_id=710,
+            vs_child_id=710,
+            parent_reference='NRM',
+            child_reference='NRM 1 RED',
+            parent_product_title='Normalize',
+            child_product_title='Normalize',
+        )
+        Product.objects.filter(pk=710).update(child_reference='(NRM 1) RED')
+        # Legacy rows written without save(), so their SKUs keep the source spelling.
+        StockItem.all_objects.bulk_create([
+            StockItem(sku=sku, product_type='(NRM)', product=self.product, color=self.color,
+                      available_stock_in_mtr=available)
+            for sku, available in [('(NRM 1) RED', 5), ('NRM 1 RED', 3), ('(NRM 2)  BLU', 8)]
+        ])
+        StockMovement.objects.create(
+            stock_item_id='(NRM 2)  BLU', movement_type='IN', quantity=8, old_stock_level=0, new_stock_level=8,
+        )
+        from orders.models import Order, OrderItem
+
+        order = Order.objects.create(customer_name='Normalize', total_amount=Decimal('1.00'))
+        self.order_item = OrderItem.objects.create(
+            order=order, stock_item_id='(NRM 1) RED', sku='NRM 1 RED', product_name='Normalize',
+            quantity=1, quantity_ordered=1, unit_price=Decimal('1.00'),
+        )
+        OrderItem.objects.filter(pk=self.order_item.pk).update(sku='(NRM 1) RED')
+
+    def _normalize(self, *args):
+        out = io.StringIO()
+        call_command('normalize_stock_skus', *args, '--chunk-size', '1', '--checkpoint', self.checkpoint, stdout=out)
+        return out.getvalue()
+
+    def _assert_normalized(self):
+        self.assertEqual(set(StockItem.all_objects.values_list('sku', flat=True)), {'NRM 1 RED', 'NRM 2 BLU'})
+        merged = StockItem.all_objects.get(sku='NRM 1 RED')
+        self.assertEqual((merged.available_stock_in_mtr, merged.product_type), (5, 'NRM'))
+        self.assertEqual(StockItem.all_objects.get(sku='NRM 2 BLU').sku_normalized, 'NRM 2 BLU')
+        self.assertEqual(StockMovement.objects.get().stock_item_id, 'NRM 2 BLU')
+        self.order_item.refresh_from_db()
+        self.assertEqual((self.order_item.stock_item_id, self.order_item.sku), ('NRM 1 RED', 'NRM 1 RED'))
+        self.assertEqual(StockSkuAlias.objects.get(alias='(NRM 2)  BLU').stock_item_id, 'NRM 2 BLU')
+        self.assertEqual(Product.objects.get(pk=710).child_reference, 'NRM 1 RED')
+
+    def test_dry_run_reports_without_writing(self):
+        output = self._normalize()
+
+        self.assertIn('stock_renamed: 1', output)
+        self.assertIn('stock_merged: 1', output)
+        self.assertIn('rows/s', output)
+        self.assertTrue(StockItem.all_objects.filter(sku='(NRM 1) RED').exists())
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_commit_renames_merges_and_relinks_in_chunks(self):
+        output = self._normalize('--commit')
+
+        self.assertIn('order_items_relinked: 1', output)
+        self.assertIn('stock_movements_relinked: 1', output)
+        self._assert_normalized()
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_interrupted_run_resumes_from_checkpoint(self):
+        from stock.services.sku_normalization import PHASE_STOCK_ITEMS, SkuNormalizer
+
+        def stop_after_first_stock_chunk(phase, timing):
+            if phase == PHASE_STOCK_ITEMS:
+                raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            SkuNormalizer(commit=True, chunk_size=1, checkpoint_path=self.checkpoint,
+                          progress=stop_after_first_stock_chunk).run()
+        self.assertTrue(os.path.exists(self.checkpoint))
+        self.assertEqual(StockItem.all_objects.filter(sku='(NRM 2)  BLU').count(), 1)
+
+        output = self._normalize('--commit', '--resume')
+
+        self.assertIn('Resumed from', output)
+        self.assertIn('stock_merged: 1', output)
+        self._assert_normalized()
+
+
+class StockLedgerTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='ledger', password='test123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.color = Color.objects.create(color_code='BLK', color_name='Black')
+        self.product = Product.objects.create(
+            vs_parent_id=800,
+            vs_child_id=800,
+            parent_reference='LEDGER',
+            child_reference='LEDGER',
+            parent_product_title='Ledger Product',
+            child_product_title='Ledger Product',
+        )
+        self.stock_item = StockItem.objects.create(
+            sku='LEDGER',
+            product_type='FABRIC',
+            product=self.product,
+            color=self.color,
+        )
+
+    def _at(self, movement):
+        return movement.created_at.isoformat()
+
+    def test_every_mutation_writes_running_balances_and_balance_endpoint_replays_them(self):
+        self.stock_item.adjust_stock(40, 'Delivery')
+        self.stock_item.reserve_stock(15, reference='ORD-1')
+        self.client.post('/api/v1/stock/LEDGER/decrement/', {'quantity': 5}, format='json')
+        self.client.patch('/api/v1/stock/LEDGER/', {'available_stock_in_mtr': 50}, format='json')
+        self.stock_item.release_stock(10)
+
+        movements = list(StockMovement.objects.filter(stock_item=self.stock_item).order_by('id'))
+        self.assertEqual(
+            [(m.movement_type, m.available_balance, m.reserved_balance) for m in movements],
+            [
+                ('ADJUSTMENT', 40, 0),
+                ('RESERVED', 40, 15),
+                ('ADJUSTMENT', 35, 15),
+                ('ADJUSTMENT', 50, 15),
+                ('RELEASED', 50, 5),
+            ],
+        )
+
+        take_balance_snapshots(at=movements[2].created_at)
+        self.assertEqual(StockBalanceSnapshot.objects.count(), 1)
+
+        response = self.client.get('/api/v1/stock/LEDGER/balance/', {'at': self._at(movements[1])})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['available_stock'], response.data['reserved_stock']), (40, 15))
+        self.assertIsNone(response.data['snapshot_taken_at'])
+
+        with self.assertNumQueries(2):
+            balance = balance_at(self.stock_item, movements[3].created_at)
+        self.assertEqual((balance['available_stock'], balance['reserved_stock'], balance['source']), (50, 15, 'movement'))
+        self.assertEqual(balance['snapshot_taken_at'], movements[2].created_at)
+
+        balance = balance_at(self.stock_item, movements[2].created_at)
+        self.assertEqual((balance['available_stock'], balance['reserved_stock'], balance['source']), (35, 15, 'snapshot'))
+
+        before = balance_at(self.stock_item, movements[0].created_at - timedelta(seconds=1))
+        self.assertEqual((before['available_stock'], before['reserved_stock'], before['source']), (0, 0, 'opening'))
+
+        self.assertEqual(self.client.get('/api/v1/stock/LEDGER/balance/', {'at': 'yesterday'}).status_code, 400)
+        for impossible in ('2026-02-30', '2026-02-30T10:00:00'):
+            self.assertEqual(self.client.get('/api/v1/stock/LEDGER/balance/', {'at': impossible}).status_code, 400)
+
+    def test_integrity_check_reports_and_repairs_drift(self):
+        self.stock_item.adjust_stock(20, 'Delivery')
+        StockItem.objects.filter(sku='LEDGER').update(available_stock_in_mtr=26, reserved_stock=3)
+
+        output = io.StringIO()
+        call_command('check_stock_ledger', stdout=output)
+        self.assertIn('ledger ends at 20/0 but stock is 26/3', output.getvalue())
+
+        call_command('check_stock_ledger', '--repair', stdout=io.StringIO())
+        output = io.StringIO()
+        call_command('check_stock_ledger', stdout=output)
+        self.assertIn('0 inconsistent', output.getvalue())
+        last = StockMovement.objects.filter(stock_item=self.stock_item).order_by('-id').first()
+        self.assertEqual((last.available_balance, last.reserved_balance), (26, 3))
+
+
+class StockItemMovementsAPITest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='movements', password='test123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.color = Color.objects.create(color_code='BLK', color_name='Black')
+        self.items = [self._stock_item(index) for index in range(2)]
+
+    def _stock_item(self, index):
+        product = Product.objects.create(
+            vs_parent_id=900 + index,
+            vs_child_id=900 + index,
+            parent_reference=f'MOVE-{index}',
+            child_reference=f'MOVE-{index}',
+            parent_product_title='Movement Product',
+            child_product_title='Movement Product',
+        )
+        ProductExtendedData.objects.create(
+            product=product,
+            source_file_name='backup.csv',
+            row_number=index + 1,
+            row_hash=f'move-row-{index}',
+            child_product_url=f'https://example.com/move-{index}',
+        )
+        stock_item = StockItem.objects.create(
+            sku=f'MOVE-{index}',
+            product_type='FABRIC',
+            product=product,
+            color=self.color,
+        )
+        for quantity in range(1, 13):
+            stock_item.adjust_stock(quantity, 'Delivery')
+        return stock_item
+
+    def _list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/stock/', {'include': 'movements'})
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    @override_settings(STOCK_RECENT_MOVEMENTS_LIMIT=5)
+    def test_list_and_detail_embed_only_latest_movements(self):
+        response = self.client.get('/api/v1/stock/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('recent_movements', response.data['results'][0])
+        self.assertEqual(response.data['results'][0]['child_product_url'], 'https://example.com/move-0')
+
+        response = self.client.get('/api/v1/stock/', {'include': 'movements'})
+        for row in response.data['results']:
+            self.assertEqual([movement['quantity'] for movement in row['recent_movements']], [12, 11, 10, 9, 8])
+
+        response = self.client.get('/api/v1/stock/MOVE-1/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['recent_movements']), 5)
+        self.assertEqual(response.data['recent_movements'][0]['new_stock_level'], 78)
+
+        queries = self._list_queries()
+        self.items.append(self._stock_item(2))
+        self.assertEqual(self._list_queries(), queries)
+
+    def test_movements_endpoint_pages_full_history(self):
+        response = self.client.get('/api/v1/stock/MOVE-0/movements/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 12)
+        self.assertEqual([row['quantity'] for row in response.data['results']][:3], [12, 11, 10])
+
+        response = self.client.get('/api/v1/stock/MOVE-0/movements/', {'movement_type': 'out'})
+        self.assertEqual(response.data['count'], 0)
+
+
+class StockExcelImportTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='importer', password='test123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.color = Color.objects.create(color_code='BLK', color_name='Black')
+        self.products = {
+            reference: Product.objects.create(
+                vs_parent_id=700 + index,
+                vs_child_id=700 + index,
+                parent_reference=reference,
+                child_reference=reference,
+                parent_product_title=reference,
+                child_product_title=reference,
+            )
+            for index, reference in enumerate(['IMP 1', 'IMP EXIST', 'IMP SAME'])
+        }
+        for sku, available in [('IMP EXIST', 10), ('IMP SAME', 4)]:
+            StockItem.objects.create(
+                sku=sku,
+                product_type='IMP',
+                product=self.products[sku],
+                color=self.color,
+                available_stock_in_mtr=available,
+                reserved_stock=2,
+            )
+
+    def _upload(self, rows):
+        buffer = io.BytesIO()
+        frame = pd.DataFrame(rows, columns=['SKU', 'ProdTpe', 'Color Abrvs', 'Available Stock (Mtr)'])
+        frame.to_excel(buffer, sheet_name='Current Stock', index=False)
+        upload = SimpleUploadedFile('stock.xlsx', buffer.getvalue())
+        return self.client.post('/api/v1/stock/import-excel/', {'file': upload}, format='multipart')
+
+    @override_settings(STOCK_IMPORT_CHUNK_SIZE=2)
+    def test_import_writes_in_chunks_with_movements_and_row_errors(self):
+        response = self._upload([
+            ['(IMP 1)', 'IMP', 'BLK', 12],
+            ['IMP EXIST', 'IMP', 'BLK', 7],
+            ['IMP SAME', 'IMP', 'BLK', 4],
+            ['IMP 2', 'IMP', 'ZZZ', 1],
+            [None, 'IMP', 'BLK', 1],
+            ['IMP 3', 'IMP', 'BLK', 'lots'],
+            ['IMP NOPROD', 'IMP', 'BLK', 1],
+            ['()', 'IMP', 'BLK', 1],
+            ['IMP EXIST', 'IMP', 'BLK', 9],
+        ])
+
+        self.assertEqual(response.status_code, 200, response.data)
+        data = response.data
+        self.assertEqual(
+            (data['created'], data['updated'], data['unchanged'], data['skipped'], data['movements_created']),
+            (1, 1, 1, 1, 2),
+        )
+        self.assertEqual(data['duplicates'], [2])
+        self.assertEqual(
+            [(error['row'], error['sku']) for error in data['errors']],
+            [(4, 'IMP 2'), (6, 'IMP 3'), (7, 'IMP NOPROD'), (8, None)],
+        )
+        self.assertEqual(data['error_count'], 4)
+        self.assertIn('read_seconds', data['timing'])
+
+        created = StockItem.objects.get(sku='IMP 1')
+        self.assertEqual((created.available_stock_in_mtr, created.sku_normalized), (12, 'IMP 1'))
+        self.assertEqual(created.product, self.products['IMP 1'])
+        self.assertTrue(StockSkuAlias.objects.filter(alias='(IMP 1)', stock_item=created).exists())
+
+        movement = StockMovement.objects.get(stock_item_id='IMP EXIST')
+        self.assertEqual(
+            (movement.movement_type, movement.quantity, movement.old_stock_level, movement.new_stock_level),
+            ('ADJUSTMENT', -1, 10, 9),
+        )
+        self.assertEqual((movement.available_balance, movement.reserved_balance), (9, 2))
+        self.assertEqual(movement.created_by, 'importer')
+        self.assertFalse(StockMovement.objects.filter(stock_item_id='IMP SAME').exists())
+
+
+class StockHealthTest(TestCase):
+    def setUp(self):
+        cache.delete(STOCK_HEALTH_CACHE_KEY)
+        self.user = User.objects.create_user(username='health', password='test123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.black = Color.objects.create(color_code='BLK', color_name='Black')
+        self.red = Color.objects.create(color_code='RED', color_name='Red')
+        self.product = Product.objects.create(
+            vs_parent_id=950,
+            vs_child_id=950,
+            parent_reference='HEALTH',
+            child_reference='HEALTH',
+            parent_product_title='Health Product',
+            child_product_title='Health Product',
+        )
+        for sku, product_type, color, available, minimum, active in [
+            ('H IN', 'LYCRA', self.black, 20, 5, True),
+            ('H LOW', 'LYCRA', self.red, 3, 5, True),
+            ('H LOWER', 'MESH', self.red, 1, 8, True),
+            ('H OUT', 'MESH', self.black, 0, 5, True),
+            ('H OFF', 'MESH', self.black, 50, 5, False),
+        ]:
+            StockItem.objects.create(
+                sku=sku,
+                product_type=product_type,
+                product=self.product,
+                color=color,
+                available_stock_in_mtr=available,
+                minimum_stock_level=minimum,
+                unit_cost=Decimal('2.50'),
+                is_active=active,
+            )
+
+    def test_stats_are_cached_until_a_stock_write(self):
+        response = self.client.get('/api/v1/stock/stats/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            (
+                response.data['total_items'], response.data['active_items'], response.data['in_stock_items'],
+                response.data['low_stock_items'], response.data['out_of_stock_items'],
+            ),
+            (5, 4, 1, 3, 1),
+        )
+        self.assertEqual(response.data['total_stock_quantity'], 24)
+        self.assertEqual(response.data['total_stock_value'], 60.0)
+        by_type = {row['product_type']: row for row in response.data['by_product_type']}
+        self.assertEqual((by_type['MESH']['total_items'], by_type['MESH']['total_stock_value']), (3, 2.5))
+        by_color = {row['color_code']: row for row in response.data['by_color']}
+        self.assertEqual(by_color['RED']['low_stock'], 2)
+
+        with self.assertNumQueries(0):
+            self.client.get('/api/v1/stock/stats/')
+
+        StockItem.objects.get(sku='H OUT').adjust_stock(10, 'Delivery')
+        response = self.client.get('/api/v1/stock/stats/')
+        self.assertEqual((response.data['out_of_stock_items'], response.data['in_stock_items']), (0, 2))
+
+        dashboard = self.client.get('/api/v1/dashboard/stats/')
+        self.assertEqual(dashboard.data['stock']['in_stock'], 2)
+        self.assertEqual(dashboard.data['stock']['inactive'], 1)
+
+    def test_low_stock_is_paginated_and_sorted_by_gap(self):
+        response = self.client.get('/api/v1/stock/low-stock/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual([row['sku'] for row in response.data['results']], ['H LOWER', 'H OUT', 'H LOW'])
+
+        response = self.client.get('/api/v1/stock/low-stock/', {'ordering': '-sku'})
+        self.assertEqual([row['sku'] for row in response.data['results']], ['H OUT', 'H LOWER', 'H LOW'])
+
+        response = self.client.get('/api/v1/stock/low-stock/', {'ordering': 'unit_cost'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ReorderForecastTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='planner', password='test123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.color = Color.objects.create(color_code='BLK', color_name='Black')
+        self.items = {}
+        for index, (sku, available) in enumerate([('FC A', 10), ('FC B', 0), ('FC C', 1000)]):
+            product = Product.objects.create(
+                vs_parent_id=980 + index,
+                vs_child_id=980 + index,
+                parent_reference=sku,
+                child_reference=sku,
+                parent_product_title=sku,
+                child_product_title=sku,
+            )
+            self.items[sku] = StockItem.objects.create(
+                sku=sku,
+                product_type='FORECAST',
+                product=product,
+                color=self.color,
+                available_stock_in_mtr=available,
+                lead_time_days=7,
+            )
+
+    def _order(self, days_ago, lines):
+        from orders.models import Order, OrderItem
+
+        order = Order.objects.create(
+            customer_name='Forecast Customer',
+            total_amount=Decimal('1.00'),
+            order_date=timezone.now() - timedelta(days=days_ago),
+        )
+        for sku, stock_item, quantity in lines:
+            OrderItem.objects.create(
+                order=order,
+                stock_item=stock_item,
+                sku=sku,
+                product_name=sku,
+                quantity=quantity,
+                quantity_ordered=quantity,
+                unit_price=Decimal('1.00'),
+            )
+
+    def test_reorder_points_use_recent_demand_seasonality_and_lead_time(self):
+        for days_ago in range(28):
+            # Every other line carries only the source SKU and is matched through the resolver.
+            a_line = ('FC A', self.items['FC A'], 2) if days_ago % 2 else ('(FC A)', None, 2)
+            self._order(days_ago, [a_line, ('FC C', self.items['FC C'], 1)])
+        for days_ago in range(336, 392):
+            self._order(days_ago, [('FC C', self.items['FC C'], 3 if days_ago < 364 else 1)])
+
+        response = self.client.get('/api/v1/stock/reorder-suggestions/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['sku'] for row in response.data['results']], ['FC A'])
+        suggestion = response.data['results'][0]
+        self.assertEqual(suggestion['average_daily_demand'], 2.0)
+        self.assertEqual(suggestion['reorder_point'], 14)
+        self.assertEqual(suggestion['suggested_order_quantity'], 60)
+
+        response = self.client.get('/api/v1/stock/reorder-suggestions/', {'include_all': 'true'})
+        rows = {row['sku']: row for row in response.data['results']}
+        self.assertEqual(rows['FC C']['seasonal_factor'], 2.0)
+        self.assertEqual(rows['FC C']['forecast_daily_demand'], 2.0)
+        self.assertFalse(rows['FC C']['needs_reorder'])
+        self.assertEqual((rows['FC B']['reorder_point'], rows['FC B']['needs_reorder']), (0, False))
+
+        call_command('forecast_stock_demand', stdout=io.StringIO())
+        stored = StockItem.objects.get(sku='FC A')
+        self.assertEqual((stored.suggested_reorder_point, stored.suggested_order_quantity), (14, 60))
+        self.assertEqual(stored.forecast_daily_demand, Decimal('2.000'))
+        self.assertIsNotNone(stored.forecast_updated_at)
+
+        response = self.client.get('/api/v1/stock/reorder-suggestions/', {'service_level': '2'})
+        self.assertEqual(response.status_code, 400)
+
+
+class StockAllocationAPITest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='allocator', password='test123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.color = Color.objects.create(color_code='BLK', color_name='Black')
+        self.items = {}
+        for index, (sku, available) in enumerate([('AL 1', 20), ('AL 2', 5), ('AL 3', 8)], start=1):
+            product = Product.objects.create(
+                vs_parent_id=600 + index,
+                vs_child_id=600 + index,
+                parent_reference=sku,
+                child_reference=sku,
+                parent_product_title=sku,
+                child_product_title=sku,
+            )
+            self.items[sku] = StockItem.objects.create(
+                sku=sku,
+                product_type='FABRIC',
+                product=product,
+                color=self.color,
+                available_stock_in_mtr=available,
+            )
+
+    def _reserved(self):
+        return dict(StockItem.objects.values_list('sku', 'reserved_stock'))
+
+    def test_all_or_nothing_allocation_reserves_nothing_on_shortfall(self):
+        response = self.client.post('/api/v1/stock/allocate/', {
+            'lines': [
+                {'sku': 'AL 1', 'quantity': 10},
+                {'sku': '(AL) 2', 'quantity': 7},
+                {'sku': 'MISSING', 'quantity': 1},
+            ],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(response.data['committed'])
+        self.assertEqual(
+            {(entry['sku'], entry['shortfall']) for entry in response.data['shortfalls']},
+            {('AL 2', 2), ('MISSING', 1)},
+        )
+        self.assertEqual(self._reserved(), {'AL 1': 0, 'AL 2': 0, 'AL 3': 0})
+        self.assertFalse(StockMovement.objects.exists())
+
+    def test_partial_allocation_reserves_what_is_free(self):
+        self.items['AL 2'].reserve_stock(3)
+
+        response = self.client.post('/api/v1/stock/allocate/', {
+            'policy': 'partial',
+            'reference': 'WAVE-1',
+            'lines': [
+                {'sku': 'AL 2', 'quantity': 4},
+                {'sku': 'AL 1', 'quantity': 6},
+                {'sku': 'AL 1', 'quantity': 4},
+            ],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['committed'])
+        self.assertFalse(response.data['fully_allocated'])
+        self.assertEqual(
+            [(line['sku'], line['requested'], line['allocated']) for line in response.data['lines']],
+            [('AL 2', 4, 2), ('AL 1', 10, 10)],
+        )
+        self.assertEqual(response.data['shortfalls'][0]['shortfall'], 2)
+        self.assertEqual(self._reserved(), {'AL 1': 10, 'AL 2': 5, 'AL 3': 0})
+        movement = StockMovement.objects.get(stock_item_id='AL 2', reference_number='WAVE-1')
+        self.assertEqual((movement.old_stock_level, movement.new_stock_level), (3, 5))
+        self.assertEqual(movement.created_by, 'allocator')
+
+    def test_batch_allocation_aggregates_order_items_in_one_request(self):
+        from orders.models import Order, OrderBatch, OrderItem
+
+        batch = OrderBatch.objects.create(batch_date=timezone.localdate(), batch_number=1, created_by=self.user)
+        for index, lines in enumerate([[('AL 1', 3), ('AL 3', 2)], [('AL 1', 4)], [('AL 3', 5)]]):
+            order = Order.objects.create(
+                customer_name=f'Wave Customer {index}',
+                shipping_address_line1='1 Wave Street',
+                shipping_city='London',
+                shipping_postal_code='SW1A 1AA',
+                shipping_country='UK',
+                total_amount=Decimal('10.00'),
+                created_by=self.user,
+            )
+            batch.order_links.create(order=order)
+            for sku, quantity in lines:
+                OrderItem.objects.create(
+                    order=order,
+                    stock_item=self.items[sku],
+                    sku=sku,
+                    product_name=sku,
+                    quantity=quantity,
+                    quantity_ordered=quantity,
+                    unit_price=Decimal('1.00'),
+                )
+
+        response = self.client.post('/api/v1/stock/allocate/', {'batch_id': batch.id}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['fully_allocated'])
+        self.assertEqual(response.data['reference'], batch.batch_name)
+        self.assertEqual(response.data['movements_created'], 2)
+        self.assertEqual(self._reserved(), {'AL 1': 7, 'AL 2': 0, 'AL 3': 7})
+        self.assertEqual(
+            StockMovement.objects.filter(movement_type='RESERVED', reference_number=batch.batch_name).count(),
+            2,
+        )
+
+    def test_allocation_requires_exactly_one_source(self):
+        response = self.client.post('/api/v1/stock/allocate/', {
+            'lines': [{'sku': 'AL 1', 'quantity': 1}],
+            'order_ids': [1],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+
+
 class ProductStockSyncTest(TestCase):
     def setUp(self):
         self.color = Color.objects.create(color_code='BLK', color_name='Black')
@@ -328,6 +1031,29 @@ class ProductStockSyncTest(TestCase):
         self.assertEqual(stock.available_stock_in_mtr, 0)
         self.assertTrue(stock.is_active)
 
+    def test_sync_records_opening_ledger_movement_for_created_stock(self):
+        Product.objects.create(
+            vs_parent_id=210,
+            vs_child_id=210,
+            parent_reference='OPEN LVL',
+            child_reference='OPEN LVL',
+            parent_product_title='Parent Product',
+            child_product_title='Child Product',
+            stock_value=Decimal('12'),
+        )
+
+        sync_product_stock_items()
+
+        movement = StockMovement.objects.get(stock_item_id='OPEN LVL')
+        self.assertEqual(movement.movement_type, 'IN')
+        self.assertEqual((movement.quantity, movement.available_balance, movement.reserved_balance), (12, 12, 0))
+        out = io.StringIO()
+        call_command('check_stock_ledger', '--sku', 'OPEN LVL', stdout=out)
+        self.assertIn('0 inconsistent', out.getvalue())
+
+        with self.assertRaises(ValueError):
+            sync_product_stock_items(workers=2)
+
     def test_sync_uses_unique_fallback_sku_for_duplicate_product_reference(self):
         first = Product.objects.create(
             vs_parent_id=300,
@@ -375,3 +1101,170 @@ class ProductStockSyncTest(TestCase):
 
         stock = StockItem.all_objects.get(product=product)
         self.assertFalse(stock.is_active)
+
+    def test_sync_diffs_in_memory_and_writes_only_changed_rows(self):
+        for index in range(5):
+            Product.objects.create(
+                vs_parent_id=600 + index,
+                vs_child_id=600 + index,
+                parent_reference=f'BULK {index}',
+                child_reference=f'BULK {index}',
+                parent_product_title='Bulk Parent',
+                child_product_title='Bulk Child',
+                tag_colours='Ruby Red, Navy',
+                cost_price_inc_vat=Decimal('4.50'),
+            )
+
+        stats = sync_product_stock_items(chunk_size=2)
+
+        self.assertEqual((stats['stock_created'], stats['colors_created']), (5, 2))
+        self.assertEqual(
+            set(StockItem.all_objects.filter(product_id__gte=600).values_list('color_id', flat=True)),
+            {'RUBYRED'},
+        )
+
+        with self.assertNumQueries(3):
+            stats = sync_product_stock_items()
+        self.assertEqual((stats['stock_unchanged'], stats['stock_updated']), (5, 0))
+
+        Product.objects.filter(vs_child_id=602).update(cost_price_inc_vat=Decimal('6.00'), child_active=False)
+        stats = sync_product_stock_items()
+
+        self.assertEqual((stats['stock_updated'], stats['stock_unchanged']), (1, 4))
+        stock = StockItem.all_objects.get(product_id=602)
+        self.assertEqual(stock.unit_cost, Decimal('6.00'))
+        self.assertFalse(stock.is_active)
+        self.assertEqual(StockItem.all_objects.filter(product_id__gte=600, is_active=True).count(), 4)
+
+    def test_sync_benchmark_runs_each_phase_then_cleans_up(self):
+        from stock.services.product_stock_sync_benchmark import ProductStockSyncBenchmark
+
+        benchmark = ProductStockSyncBenchmark(products=120, chunk_size=50, change_ratio=0.25, seed=7)
+        results = {row['phase']: row for row in benchmark.run()}
+
+        self.assertEqual(results['initial']['stock_created'], 120)
+        self.assertEqual(results['no_change']['stock_unchanged'], 120)
+        self.assertEqual(results['changed']['products_changed'], 30)
+        self.assertEqual(results['changed']['stock_updated'], 30)
+        self.assertEqual(StockItem.all_objects.filter(product__in=benchmark.product_queryset()).count(), 0)
+        self.assertFalse(Product.all_objects.filter(parent_reference__startswith=benchmark.reference_prefix).exists())
+
+
+class StockReservationConcurrencyTest(TransactionTestCase):
+    """
+    Runs on a temporary file database when the suite uses in-memory SQLite.
+
+    Shared-cache in-memory SQLite fails concurrent writers at once instead of
+    letting them wait on the lock, so the threads here need a real file.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls._memory_database = None
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            cls._database_dir = tempfile.mkdtemp()
+            # Keep the in-memory connection open: closing the last one drops that database.
+            cls._memory_database = (connection.settings_dict['NAME'], connection.connection)
+            connection.connection = None
+            connection.settings_dict['NAME'] = os.path.join(cls._database_dir, 'concurrency.sqlite3')
+            call_command('migrate', run_syncdb=True, verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if cls._memory_database is not None:
+            connection.close()
+            connection.settings_dict['NAME'], connection.connection = cls._memory_database
+            shutil.rmtree(cls._database_dir, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='picker', password='test123')
+        self.color = Color.objects.create(color_code='BLK', color_name='Black')
+        self.product = Product.objects.create(
+            vs_parent_id=500,
+            vs_child_id=500,
+            parent_reference='RACE',
+            child_reference='RACE',
+            parent_product_title='Race Product',
+            child_product_title='Race Product',
+        )
+        self.stock_item = StockItem.objects.create(
+            sku='RACE',
+            product_type='FABRIC',
+            product=self.product,
+            color=self.color,
+            available_stock_in_mtr=40,
+        )
+
+    def test_stale_instances_cannot_over_reserve(self):
+        first = StockItem.objects.get(sku='RACE')
+        second = StockItem.objects.get(sku='RACE')
+
+        self.assertTrue(first.reserve_stock(30, reference='ORD-1', user=self.user))
+        # ``second`` still believes 40 metres are free; the database knows only 10 are.
+        self.assertFalse(second.reserve_stock(30, reference='ORD-2'))
+        self.assertTrue(second.reserve_stock(10, reference='ORD-2'))
+        self.assertEqual(second.reserved_stock, 40)
+
+        self.assertTrue(first.release_stock(25, reference='ORD-1'))
+        self.assertFalse(second.release_stock(20))
+
+        self.stock_item.refresh_from_db()
+        self.assertEqual(self.stock_item.reserved_stock, 15)
+        movements = list(
+            StockMovement.objects.filter(stock_item=self.stock_item).order_by('id').values_list(
+                'movement_type', 'quantity', 'old_stock_level', 'new_stock_level', 'reference_number', 'created_by',
+            )
+        )
+        self.assertEqual(movements, [
+            ('RESERVED', 30, 0, 30, 'ORD-1', 'picker'),
+            ('RESERVED', 10, 30, 40, 'ORD-2', None),
+            ('RELEASED', 25, 40, 15, 'ORD-1', None),
+        ])
+
+    def test_concurrent_reservations_and_adjustments_lose_no_updates(self):
+        barrier = threading.Barrier(8)
+        outcomes = []
+        outcomes_lock = threading.Lock()
+
+        def reserve():
+            try:
+                item = StockItem.objects.get(sku='RACE')
+                barrier.wait()
+                for _ in range(5):
+                    reserved = item.reserve_stock(2)
+                    with outcomes_lock:
+                        outcomes.append(reserved)
+            finally:
+                connection.close()
+
+        def adjust():
+            try:
+                item = StockItem.objects.get(sku='RACE')
+                barrier.wait()
+                for _ in range(5):
+                    item.adjust_stock(1, 'Stress test')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=reserve) for _ in range(6)]
+        threads += [threading.Thread(target=adjust) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.stock_item.refresh_from_db()
+        self.assertEqual(self.stock_item.available_stock_in_mtr, 50)
+        self.assertEqual(self.stock_item.reserved_stock, 2 * outcomes.count(True))
+        self.assertLessEqual(self.stock_item.reserved_stock, self.stock_item.available_stock_in_mtr)
+        self.assertGreaterEqual(outcomes.count(True), 20)
+        self.assertEqual(
+            StockMovement.objects.filter(stock_item=self.stock_item, movement_type='RESERVED').count(),
+            outcomes.count(True),
+        )
+        self.assertEqual(
+            StockMovement.objects.filter(stock_item=self.stock_item, movement_type='ADJUSTMENT').count(),
+            10,
+        )
@@ -4,19 +4,36 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
+import time
 import pandas as pd
-from django.db import transaction, models
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.db import models
+from django.db.models import Prefetch
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime
 from decimal import Decimal
 from .models import StockItem, StockMovement, StockBatch, StockBatchRoll
-from .sku_utils import normalize_sku_reference
 from .serializers import (
     StockItemListSerializer, StockItemDetailSerializer, 
     StockItemCreateUpdateSerializer, StockMovementSerializer,
     StockAdjustmentSerializer, StockBatchCreateSerializer,
     StockBatchListSerializer, StockBatchDetailSerializer,
-    StockBatchLabelSerializer
+    StockBatchLabelSerializer, StockAllocationSerializer
 )
+from .services.allocation import allocate_stock, batch_allocation_lines, order_allocation_lines
+from .services.demand_forecast import (
+    DEFAULT_HISTORY_YEARS, DEFAULT_SERVICE_LEVEL, DEFAULT_WINDOW_DAYS,
+    reorder_suggestions as forecast_reorder_suggestions,
+)
+from .services.ledger import balance_at
+from .services.roll_labels import (
+    LABEL_CONTENT_TYPES, LABEL_FORMAT_CHOICES, iter_label_rolls, render_roll_labels, roll_label_queryset,
+)
+from .services.stock_health import stock_health
+from .services.stock_import import import_stock_frame
+from products.models import ProductExtendedData
 
 class StockItemViewSet(viewsets.ModelViewSet):
     """ViewSet for Stock Item CRUD operations with soft delete support"""
@@ -39,17 +56,14 @@ class StockItemViewSet(viewsets.ModelViewSet):
         include_deleted = self.request.query_params.get('include_deleted', 'false').lower()
         
         if include_deleted == 'true':
-            queryset = StockItem.all_objects.select_related('color', 'product').prefetch_related(
-                'movements', 'product__extended_data'
-            )
+            queryset = StockItem.all_objects.all()
         elif self.request.query_params.get('only_deleted', 'false').lower() == 'true':
-            queryset = StockItem.all_objects.filter(is_deleted=True).select_related('color', 'product').prefetch_related(
-                'movements', 'product__extended_data'
-            )
+            queryset = StockItem.all_objects.filter(is_deleted=True)
         else:
-            queryset = StockItem.objects.select_related('color', 'product').prefetch_related(
-                'movements', 'product__extended_data'
-            )
+            queryset = StockItem.objects.all()
+        queryset = queryset.select_related('color', 'product').prefetch_related(
+            *self._stock_item_prefetches(embed_movements=self.action == 'retrieve' or self._include_movements())
+        )
         
         # Filter by stock status
         stock_status = self.request.query_params.get('stock_status', None)
@@ -73,8 +87,41 @@ class StockItemViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(available_stock_in_mtr__lte=max_stock)
         
         return queryset
+
+    def _include_movements(self):
+        include = self.request.query_params.get('include', '')
+        return 'movements' in {part.strip().lower() for part in include.split(',')}
+
+    def _stock_item_prefetches(self, embed_movements):
+        """
+        Prefetches for stock item responses: the extended-data columns the
+        product serializers read and, when embedded, only the latest
+        ``STOCK_RECENT_MOVEMENTS_LIMIT`` movements per item (a windowed
+        ROW_NUMBER() query rather than every movement ever recorded).
+        """
+        prefetches = [
+            Prefetch(
+                'product__extended_data',
+                queryset=ProductExtendedData.objects.only('id', 'product_id', 'child_product_url'),
+            )
+        ]
+        if embed_movements:
+            prefetches.append(
+                Prefetch(
+                    'movements',
+                    queryset=StockMovement.objects.order_by('-created_at', '-id')[:settings.STOCK_RECENT_MOVEMENTS_LIMIT],
+                    to_attr='recent_movement_list',
+                )
+            )
+        return prefetches
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['include_movements'] = self._include_movements()
+        return context
+
     def get_serializer_class(self):
-        if self.action == 'list':
+        if self.action in ['list', 'low_stock']:
             return StockItemListSerializer
         elif self.action in ['create', 'update', 'partial_update']:
             return StockItemCreateUpdateSerializer
@@ -133,7 +180,7 @@ class StockItemViewSet(viewsets.ModelViewSet):
             reason = serializer.validated_data['reason']
             
             # Perform stock adjustment
-            stock_item.adjust_stock(quantity, reason)
+            stock_item.adjust_stock(quantity, reason, user=request.user)
             
             return Response({
                 'message': f'Stock adjusted by {quantity}',
@@ -158,7 +205,7 @@ class StockItemViewSet(viewsets.ModelViewSet):
         if qty <= 0:
             return Response({'error': 'Quantity must be a positive integer'}, status=status.HTTP_400_BAD_REQUEST)
 
-        stock_item.adjust_stock(qty, reason)
+        stock_item.adjust_stock(qty, reason, user=request.user)
         return Response({
             'message': f'Stock increased by {qty}',
             'new_stock_level': stock_item.available_stock_in_mtr,
@@ -181,7 +228,7 @@ class StockItemViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Quantity must be a positive integer'}, status=status.HTTP_400_BAD_REQUEST)
 
         # Use negative quantity for adjustment
-        stock_item.adjust_stock(-qty, reason)
+        stock_item.adjust_stock(-qty, reason, user=request.user)
         return Response({
             'message': f'Stock decreased by {qty}',
             'new_stock_level': stock_item.available_stock_in_mtr,
@@ -202,7 +249,7 @@ class StockItemViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            if stock_item.reserve_stock(quantity):
+            if stock_item.reserve_stock(quantity, reference=request.data.get('reference'), user=request.user):
                 return Response({
                     'message': f'Reserved {quantity} units',
                     'reserved_stock': stock_item.reserved_stock,
@@ -234,7 +281,7 @@ class StockItemViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            if stock_item.release_stock(quantity):
+            if stock_item.release_stock(quantity, reference=request.data.get('reference'), user=request.user):
                 return Response({
                     'message': f'Released {quantity} units',
                     'reserved_stock': stock_item.reserved_stock,
@@ -252,6 +299,84 @@ class StockItemViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+    @action(detail=True, methods=['get'], url_path='balance')
+    def balance(self, request, pk=None):
+        """Available and reserved stock as of ``?at=<ISO timestamp>`` (default: now), from the ledger."""
+        stock_item = self.get_object()
+        at = timezone.now()
+        raw_at = request.query_params.get('at')
+        if raw_at:
+            # Well-formed but impossible values such as 2026-02-30 raise ValueError.
+            try:
+                at = parse_datetime(raw_at)
+                parsed_date = parse_date(raw_at) if at is None else None
+            except ValueError:
+                at = parsed_date = None
+            if at is None:
+                if parsed_date is None:
+                    return Response(
+                        {'error': 'at must be an ISO 8601 date or datetime'},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+                # A bare date means the end of that day.
+                at = datetime.combine(parsed_date, datetime.max.time())
+            if timezone.is_naive(at):
+                at = timezone.make_aware(at)
+        return Response(balance_at(stock_item, at))
+
+    @action(detail=True, methods=['get'], url_path='movements')
+    def movements(self, request, pk=None):
+        """Full movement history of one stock item, newest first and paginated."""
+        stock_item = self.get_object()
+        queryset = StockMovement.objects.filter(stock_item=stock_item).order_by('-created_at', '-id')
+        movement_type = request.query_params.get('movement_type')
+        if movement_type:
+            queryset = queryset.filter(movement_type=movement_type.upper())
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(StockMovementSerializer(page, many=True).data)
+        return Response(StockMovementSerializer(queryset, many=True).data)
+
+    @action(detail=False, methods=['post'], url_path='allocate')
+    def allocate(self, request):
+        """
+        Reserve stock for many lines, an order list or an order batch in one transaction.
+
+        Returns per-SKU allocations and shortfalls; an ``all_or_nothing``
+        allocation that cannot be met in full reserves nothing and answers 409.
+        """
+        serializer = StockAllocationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        reference = data.get('reference') or None
+
+        if data.get('lines'):
+            lines = [(line['sku'], line['quantity']) for line in data['lines']]
+        elif data.get('batch_id'):
+            from orders.models import OrderBatch
+
+            batch = OrderBatch.objects.filter(id=data['batch_id'], is_deleted=False).first()
+            if batch is None:
+                return Response({'error': 'Order batch not found'}, status=status.HTTP_404_NOT_FOUND)
+            lines = batch_allocation_lines(batch)
+            reference = reference or batch.batch_name
+        else:
+            from orders.models import Order
+
+            order_numbers = list(
+                Order.objects.filter(id__in=data['order_ids']).values_list('order_number', flat=True)
+            )
+            if not order_numbers:
+                return Response({'error': 'No matching orders found'}, status=status.HTTP_404_NOT_FOUND)
+            lines = order_allocation_lines(data['order_ids'])
+            if len(order_numbers) == 1:
+                reference = reference or order_numbers[0]
+
+        result = allocate_stock(lines, policy=data['policy'], reference=reference, user=request.user)
+        conflict = result['shortfalls'] and not result['committed']
+        return Response(result, status=status.HTTP_409_CONFLICT if conflict else status.HTTP_200_OK)
+
     @action(detail=True, methods=['patch'], url_path='locations')
     def update_locations(self, request, pk=None):
         """Update primary and/or secondary location for a stock item.
@@ -314,6 +439,7 @@ class StockItemViewSet(viewsets.ModelViewSet):
                 )
             
             # Read Excel file
+            read_started = time.perf_counter()
             try:
                 df = pd.read_excel(file, sheet_name='Current Stock')
             except Exception as e:
@@ -321,58 +447,13 @@ class StockItemViewSet(viewsets.ModelViewSet):
                     {'error': f'Error reading Excel file: {str(e)}'}, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
+            read_seconds = round(time.perf_counter() - read_started, 3)
             
-            # Import data
-            created_count = 0
-            updated_count = 0
-            errors = []
-            
-            with transaction.atomic():
-                for index, row in df.iterrows():
-                    try:
-                        if pd.isna(row.get('SKU')):
-                            continue
-                        
-                        sku = normalize_sku_reference(row['SKU'])
-                        product_type = normalize_sku_reference(row.get('ProdTpe', ''))[:20]
-                        color_code = str(row.get('Color Abrvs', '')).strip()
-                        raw_available_stock = row.get(
-                            'Available Stock (Mtr)',
-                            row.get('Available Stock (Rolls)', 0),
-                        )
-                        available_stock = int(raw_available_stock) if not pd.isna(raw_available_stock) else 0
-                        
-                        # Validate color exists
-                        from colors.models import Color
-                        try:
-                            color = Color.objects.get(color_code=color_code)
-                        except Color.DoesNotExist:
-                            errors.append(f"Row {index + 1}: Color '{color_code}' not found")
-                            continue
-                        
-                        # Create or update stock item
-                        stock_item, created = StockItem.objects.update_or_create(
-                            sku=sku,
-                            defaults={
-                                'product_type': product_type,
-                                'color': color,
-                                'available_stock_in_mtr': available_stock,
-                            }
-                        )
-                        
-                        if created:
-                            created_count += 1
-                        else:
-                            updated_count += 1
-                            
-                    except Exception as e:
-                        errors.append(f"Row {index + 1}: {str(e)}")
-            
+            result = import_stock_frame(df, user=request.user)
+            result['timing']['read_seconds'] = read_seconds
             return Response({
                 'message': 'Import completed successfully',
-                'created': created_count,
-                'updated': updated_count,
-                'errors': errors[:10]  # Limit errors to first 10
+                **result,
             }, status=status.HTTP_200_OK)
             
         except Exception as e:
@@ -383,42 +464,21 @@ class StockItemViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'], url_path='stats')
     def stats(self, request):
-        """Get stock statistics"""
+        """Get stock statistics (cached until the next stock write)"""
         try:
-            total_items = StockItem.objects.count()
-            active_items = StockItem.objects.filter(is_active=True).count()
-            low_stock_items = StockItem.objects.filter(
-                available_stock_in_mtr__lte=models.F('minimum_stock_level'),
-                is_active=True
-            ).count()
-            out_of_stock_items = StockItem.objects.filter(
-                available_stock_in_mtr=0,
-                is_active=True
-            ).count()
-            
-            # Stock value calculation
-            total_stock_value = StockItem.objects.filter(
-                is_active=True
-            ).aggregate(
-                total_value=models.Sum(
-                    models.F('available_stock_in_mtr') * models.F('unit_cost')
-                )
-            )['total_value'] or 0
-            
-            # Total stock quantity
-            total_stock_quantity = StockItem.objects.filter(
-                is_active=True
-            ).aggregate(
-                total_quantity=models.Sum('available_stock_in_mtr')
-            )['total_quantity'] or 0
-            
+            health = stock_health()
             return Response({
-                'total_items': total_items,
-                'active_items': active_items,
-                'low_stock_items': low_stock_items,
-                'out_of_stock_items': out_of_stock_items,
-                'total_stock_value': round(float(total_stock_value), 2),
-                'total_stock_quantity': total_stock_quantity
+                'total_items': health['total_items'],
+                'active_items': health['active_items'],
+                'in_stock_items': health['in_stock'],
+                'low_stock_items': health['at_or_below_minimum'],
+                'out_of_stock_items': health['out_of_stock'],
+                'total_stock_value': health['total_stock_value'],
+                'total_stock_quantity': health['total_stock_quantity'],
+                'total_reserved': health['total_reserved'],
+                'by_product_type': health['by_product_type'],
+                'by_color': health['by_color'],
+                'computed_at': health['computed_at'],
             })
             
         except Exception as e:
@@ -427,17 +487,75 @@ class StockItemViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    @action(detail=False, methods=['get'], url_path='reorder-suggestions')
+    def reorder_suggestions(self, request):
+        """
+        Reorder points forecast from order history, most urgent first.
+
+        Only items that need reordering are listed unless ``?include_all=true``;
+        ``window_days``, ``service_level`` and ``history_years`` tune the forecast.
+        """
+        try:
+            window_days = int(request.query_params.get('window_days', DEFAULT_WINDOW_DAYS))
+            service_level = float(request.query_params.get('service_level', DEFAULT_SERVICE_LEVEL))
+            history_years = int(request.query_params.get('history_years', DEFAULT_HISTORY_YEARS))
+        except ValueError:
+            return Response(
+                {'error': 'window_days and history_years must be integers and service_level a number'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not 1 <= window_days <= 365 or not 0 <= history_years <= 10 or not 0.5 <= service_level < 1:
+            return Response(
+                {'error': 'window_days must be 1-365, history_years 0-10 and service_level between 0.5 and 1'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        suggestions = forecast_reorder_suggestions(
+            window_days=window_days,
+            service_level=service_level,
+            history_years=history_years,
+        )
+        if request.query_params.get('include_all', 'false').lower() != 'true':
+            suggestions = [suggestion for suggestion in suggestions if suggestion['needs_reorder']]
+
+        page = self.paginate_queryset(suggestions)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(suggestions)
+
+    LOW_STOCK_ORDERINGS = {
+        'stock_gap', '-stock_gap', 'sku', '-sku',
+        'available_stock_in_mtr', '-available_stock_in_mtr',
+    }
+
     @action(detail=False, methods=['get'], url_path='low-stock')
     def low_stock(self, request):
-        """Get items with low stock"""
+        """
+        Active items at or below their minimum stock level, paginated.
+
+        Sorted furthest below minimum first (``stock_gap`` = available minus
+        minimum) unless ``?ordering=`` names another allowed field; the
+        filter and default sort use the ``stock_low_stock_gap_idx`` index.
+        """
+        ordering = request.query_params.get('ordering') or 'stock_gap'
+        if ordering not in self.LOW_STOCK_ORDERINGS:
+            return Response(
+                {'error': f"ordering must be one of: {', '.join(sorted(self.LOW_STOCK_ORDERINGS))}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
         try:
-            low_stock_items = StockItem.objects.filter(
-                available_stock_in_mtr__lte=models.F('minimum_stock_level'),
-                is_active=True
-            ).select_related('color')
+            low_stock_items = StockItem.objects.annotate(
+                stock_gap=models.F('available_stock_in_mtr') - models.F('minimum_stock_level')
+            ).filter(
+                is_active=True,
+                stock_gap__lte=0,
+            ).select_related('color', 'product').prefetch_related(
+                *self._stock_item_prefetches(embed_movements=self._include_movements())
+            ).order_by(ordering, 'sku')
             
-            serializer = self.get_serializer(low_stock_items, many=True)
-            return Response(serializer.data)
+            page = self.paginate_queryset(low_stock_items)
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
             
         except Exception as e:
             return Response(
@@ -556,7 +674,12 @@ class StockBatchViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'], url_path='labels')
     def labels(self, request, batch_id=None):
         stock_batch = self.get_object()
-        labels = StockBatchLabelSerializer(stock_batch.rolls.all(), many=True).data
+        label_format, error = self._label_format(request)
+        if error:
+            return error
+        if label_format:
+            return self._label_document([stock_batch], label_format)
+        labels = StockBatchLabelSerializer(roll_label_queryset([stock_batch]), many=True).data
         return Response({
             'batch_id': stock_batch.batch_id,
             'labels': labels,
@@ -565,7 +688,7 @@ class StockBatchViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'], url_path='mark-labels-generated')
     def mark_labels_generated(self, request, batch_id=None):
         stock_batch = self.get_object()
-        return self._mark_batches_labels_generated([stock_batch], request.user)
+        return self._mark_batches_labels_generated([stock_batch], request)
 
     @action(detail=False, methods=['post'], url_path='mark-labels-generated')
     def bulk_mark_labels_generated(self, request):
@@ -584,12 +707,7 @@ class StockBatchViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        batches = list(
-            StockBatch.objects.filter(batch_id__in=batch_ids)
-            .select_related('stock_item', 'stock_item__product', 'created_by')
-            .prefetch_related('rolls')
-            .order_by('batch_id')
-        )
+        batches = list(StockBatch.objects.filter(batch_id__in=batch_ids).order_by('batch_id'))
         found_ids = {batch.batch_id for batch in batches}
         missing_ids = [batch_id for batch_id in batch_ids if batch_id not in found_ids]
         if missing_ids:
@@ -601,9 +719,14 @@ class StockBatchViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        return self._mark_batches_labels_generated(batches, request.user)
+        return self._mark_batches_labels_generated(batches, request)
+
+    def _mark_batches_labels_generated(self, batches, request):
+        label_format, error = self._label_format(request)
+        if error:
+            return error
 
-    def _mark_batches_labels_generated(self, batches, user):
+        user = request.user
         now = timezone.now()
         batch_ids = [batch.batch_id for batch in batches]
         StockBatchRoll.objects.filter(batch__in=batches).update(
@@ -611,16 +734,17 @@ class StockBatchViewSet(viewsets.ModelViewSet):
             label_generated_at=now,
             label_generated_by_id=user.id if user and user.is_authenticated else None,
         )
-        batch_payloads = []
-        labels = []
-        for batch in batches:
-            batch_rolls = StockBatchRoll.objects.filter(batch=batch).order_by('roll_number')
-            batch_labels = StockBatchLabelSerializer(batch_rolls, many=True).data
-            labels.extend(batch_labels)
-            batch_payloads.append({
-                'batch_id': batch.batch_id,
-                'labels': batch_labels,
-            })
+        if label_format:
+            return self._label_document(batches, label_format)
+
+        labels = StockBatchLabelSerializer(roll_label_queryset(batches), many=True).data
+        labels_by_batch = {}
+        for label in labels:
+            labels_by_batch.setdefault(label['batch_id'], []).append(label)
+        batch_payloads = [
+            {'batch_id': batch_id, 'labels': labels_by_batch.get(batch_id, [])}
+            for batch_id in batch_ids
+        ]
 
         return Response({
             'message': 'Labels marked as generated',
@@ -631,3 +755,27 @@ class StockBatchViewSet(viewsets.ModelViewSet):
             'batches': batch_payloads,
             'labels': labels,
         })
+
+    def _label_format(self, request):
+        """``label_format`` (pdf or zpl) from the query string or body; None means JSON."""
+        label_format = request.query_params.get('label_format')
+        if label_format is None and hasattr(request.data, 'get'):
+            label_format = request.data.get('label_format')
+        label_format = (label_format or '').strip().lower()
+        if not label_format or label_format == 'json':
+            return None, None
+        if label_format not in LABEL_FORMAT_CHOICES:
+            return None, Response(
+                {'error': f"label_format must be one of: json, {', '.join(LABEL_FORMAT_CHOICES)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return label_format, None
+
+    def _label_document(self, batches, label_format):
+        response = StreamingHttpResponse(
+            render_roll_labels(iter_label_rolls(batches), label_format),
+            content_type=LABEL_CONTENT_TYPES[label_format],
+        )
+        name = batches[0].batch_id if len(batches) == 1 else 'stock-batch-labels'
+        response['Content-Disposition'] = f'inline; filename="{name}.{label_format}"'
+        return response